@@ -30,6 +30,7 @@ from app.models.user import User
 from app.models.api_key import APIKey
 from app.models.budget import Budget
 from app.models.usage_tracking import UsageTracking
+from app.models.usage_rollup import UsageRollup
 from app.models.audit_log import AuditLog
 from app.models.module import Module
 
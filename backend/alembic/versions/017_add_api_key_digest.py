@@ -0,0 +1,29 @@
+"""Add key_digest column to api_keys table
+
+Revision ID: 017_add_api_key_digest
+Revises: 016_remove_display_name
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '017_add_api_key_digest'
+down_revision = '016_remove_display_name'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keyed HMAC digest for fast verification. Existing keys stay NULL and
+    # are migrated on their next successful bcrypt verification.
+    op.add_column(
+        'api_keys',
+        sa.Column('key_digest', sa.String(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    # Remove key_digest column
+    op.drop_column('api_keys', 'key_digest')
@@ -0,0 +1,59 @@
+"""Add usage_rollups table for pre-aggregated analytics
+
+Revision ID: 018_add_usage_rollups
+Revises: 017_add_api_key_digest
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '018_add_usage_rollups'
+down_revision = '017_add_api_key_digest'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Per minute/hour/day totals by user, API key, model and endpoint.
+    # Analytics dashboards read these instead of scanning usage_tracking.
+    op.create_table(
+        'usage_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('api_key_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('model', sa.String(), nullable=False, server_default=''),
+        sa.Column('endpoint', sa.String(), nullable=False),
+        sa.Column('request_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('error_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('request_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('response_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_tokens', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('cost_cents', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_response_time_ms', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'granularity', 'bucket_start', 'user_id', 'api_key_id', 'model', 'endpoint',
+            name='uq_usage_rollups_bucket'
+        ),
+    )
+    op.create_index(op.f('ix_usage_rollups_id'), 'usage_rollups', ['id'], unique=False)
+    op.create_index(
+        'ix_usage_rollups_granularity_bucket', 'usage_rollups',
+        ['granularity', 'bucket_start'], unique=False
+    )
+    op.create_index(
+        'ix_usage_rollups_user_bucket', 'usage_rollups',
+        ['granularity', 'user_id', 'bucket_start'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_usage_rollups_user_bucket', table_name='usage_rollups')
+    op.drop_index('ix_usage_rollups_granularity_bucket', table_name='usage_rollups')
+    op.drop_index(op.f('ix_usage_rollups_id'), table_name='usage_rollups')
+    op.drop_table('usage_rollups')
@@ -322,6 +322,30 @@ class HealthChecker:
                 "timestamp": datetime.utcnow().isoformat(),
             }
 
+    def check_audit_writer_health(self) -> Dict[str, Any]:
+        """Check the batched audit writer's queue depth and flush latency"""
+        from app.services.audit_service import audit_writer
+
+        stats = audit_writer.get_stats()
+        issues = []
+        writer_status = "healthy"
+
+        if stats["queue_depth"] >= audit_writer.max_queue * 0.8:
+            writer_status = "warning"
+            issues.append(
+                f"Audit queue at {stats['queue_depth']}/{audit_writer.max_queue} events"
+            )
+        if stats["dropped"]:
+            writer_status = "warning"
+            issues.append(f"{stats['dropped']} audit events dropped")
+
+        return {
+            "status": writer_status,
+            "timestamp": datetime.utcnow().isoformat(),
+            "stats": stats,
+            "issues": issues,
+        }
+
     async def get_comprehensive_health(self) -> Dict[str, Any]:
         """Get comprehensive health status"""
         checks = {
@@ -331,6 +355,7 @@ class HealthChecker:
             "connections": await self.check_connection_health(),
             "embedding_service": await self.check_embedding_service_health(),
             "redis": await self.check_redis_health(),
+            "audit_writer": self.check_audit_writer_health(),
         }
 
         # Determine overall status
@@ -444,3 +469,9 @@ async def database_pool_health_check():
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Database pool health check failed: {str(e)}",
         )
+
+
+@router.get("/health/audit")
+async def audit_writer_health_check():
+    """Audit writer queue depth and flush latency"""
+    return health_checker.check_audit_writer_health()
@@ -2,7 +2,7 @@
 Debugging API endpoints for troubleshooting chatbot issues
 """
 from typing import Dict, Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
@@ -12,6 +12,7 @@ from app.models.user import User
 from app.models.chatbot import ChatbotInstance
 from app.models.prompt_template import PromptTemplate
 from app.models.rag_collection import RagCollection
+from app.services.tracing import slow_traces
 
 router = APIRouter()
 
@@ -227,3 +228,28 @@ async def get_system_status(
         "qdrant": qdrant_status,
         "timestamp": "UTC",
     }
+
+
+@router.get("/traces/slow")
+async def get_slow_traces(
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+):
+    """Get the most recent slow requests with their per-stage timings (admin only)"""
+    if not current_user["is_superuser"]:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return {
+        "traces": slow_traces.list(limit),
+        "stats": slow_traces.get_stats(),
+    }
+
+
+@router.delete("/traces/slow")
+async def clear_slow_traces(current_user: User = Depends(get_current_user)):
+    """Clear the slow request buffer (admin only)"""
+    if not current_user["is_superuser"]:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    slow_traces.clear()
+    return {"cleared": True}
@@ -2,12 +2,11 @@
 Analytics API endpoints for usage metrics, cost analysis, and system health
 Integrated with the core analytics service for comprehensive tracking.
 """
+import asyncio
 from typing import Optional, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
 
 from app.core.security import get_current_user
-from app.db.database import get_db
 from app.models.user import User
 from app.services.analytics import get_analytics_service
 from app.services.module_manager import module_manager
@@ -22,7 +21,6 @@ router = APIRouter()
 async def get_usage_metrics(
     hours: int = Query(24, ge=1, le=168, description="Hours to analyze (1-168)"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """Get comprehensive usage metrics including costs and budgets"""
     try:
@@ -41,7 +39,6 @@ async def get_usage_metrics(
 async def get_system_metrics(
     hours: int = Query(24, ge=1, le=168),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """Get system-wide metrics (admin only)"""
     if not current_user["is_superuser"]:
@@ -58,9 +55,7 @@ async def get_system_metrics(
 
 
 @router.get("/health")
-async def get_system_health(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
-):
+async def get_system_health(current_user: User = Depends(get_current_user)):
     """Get system health status including budget and performance analysis"""
     try:
         analytics = get_analytics_service()
@@ -76,7 +71,6 @@ async def get_system_health(
 async def get_cost_analysis(
     days: int = Query(30, ge=1, le=365, description="Days to analyze (1-365)"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """Get detailed cost analysis and trends"""
     try:
@@ -95,7 +89,6 @@ async def get_cost_analysis(
 async def get_system_cost_analysis(
     days: int = Query(30, ge=1, le=365),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """Get system-wide cost analysis (admin only)"""
     if not current_user["is_superuser"]:
@@ -112,9 +105,7 @@ async def get_system_cost_analysis(
 
 
 @router.get("/endpoints")
-async def get_endpoint_stats(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
-):
+async def get_endpoint_stats(current_user: User = Depends(get_current_user)):
     """Get endpoint usage statistics"""
     try:
         analytics = get_analytics_service()
@@ -139,44 +130,11 @@ async def get_endpoint_stats(
 async def get_usage_trends(
     days: int = Query(7, ge=1, le=30, description="Days for trend analysis"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
 ):
     """Get usage trends over time"""
     try:
-        from datetime import datetime, timedelta
-        from sqlalchemy import func
-        from app.models.usage_tracking import UsageTracking
-
-        cutoff_time = datetime.utcnow() - timedelta(days=days)
-
-        # Daily usage trends
-        daily_usage = (
-            db.query(
-                func.date(UsageTracking.created_at).label("date"),
-                func.count(UsageTracking.id).label("requests"),
-                func.sum(UsageTracking.total_tokens).label("tokens"),
-                func.sum(UsageTracking.cost_cents).label("cost_cents"),
-            )
-            .filter(
-                UsageTracking.created_at >= cutoff_time,
-                UsageTracking.user_id == current_user["id"],
-            )
-            .group_by(func.date(UsageTracking.created_at))
-            .order_by("date")
-            .all()
-        )
-
-        trends = []
-        for date, requests, tokens, cost_cents in daily_usage:
-            trends.append(
-                {
-                    "date": date.isoformat(),
-                    "requests": requests,
-                    "tokens": tokens or 0,
-                    "cost_cents": cost_cents or 0,
-                    "cost_dollars": (cost_cents or 0) / 100,
-                }
-            )
+        analytics = get_analytics_service()
+        trends = await analytics.get_usage_trends(days=days, user_id=current_user["id"])
 
         return {"success": True, "data": {"trends": trends, "period_days": days}}
     except Exception as e:
@@ -186,18 +144,16 @@ async def get_usage_trends(
 
 
 @router.get("/overview")
-async def get_analytics_overview(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
-):
+async def get_analytics_overview(current_user: User = Depends(get_current_user)):
     """Get analytics overview data"""
     try:
         analytics = get_analytics_service()
 
         # Get basic metrics
-        metrics = await analytics.get_usage_metrics(
-            hours=24, user_id=current_user["id"]
+        metrics, health = await asyncio.gather(
+            analytics.get_usage_metrics(hours=24, user_id=current_user["id"]),
+            analytics.get_system_health(),
         )
-        health = await analytics.get_system_health()
 
         return {
             "success": True,
@@ -216,9 +172,7 @@ async def get_analytics_overview(
 
 
 @router.get("/modules")
-async def get_module_analytics(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
-):
+async def get_module_analytics(current_user: User = Depends(get_current_user)):
     """Get analytics data for all modules"""
     try:
         module_stats = []
@@ -15,9 +15,10 @@ import string
 from app.db.database import get_db
 from app.models.api_key import APIKey
 from app.models.user import User
-from app.core.security import get_current_user
+from app.core.security import get_api_key_digest, get_current_user
 from app.services.permission_manager import require_permission
 from app.services.audit_service import log_audit_event, log_audit_event_async
+from app.services.cached_api_key import cached_api_key_service
 from app.core.logging import get_logger
 from app.core.config import settings
 
@@ -319,6 +320,7 @@ async def create_api_key(
         description=api_key_data.description,
         key_hash=key_hash,
         key_prefix=key_prefix,
+        key_digest=get_api_key_digest(full_key),
         user_id=current_user["id"],
         scopes=api_key_data.scopes,
         expires_at=api_key_data.expires_at,
@@ -398,6 +400,7 @@ async def update_api_key(
 
     await db.commit()
     await db.refresh(api_key)
+    await cached_api_key_service.invalidate_api_key_cache(api_key.key_prefix)
 
     # Log audit event
     await log_audit_event(
@@ -445,6 +448,7 @@ async def delete_api_key(
     # Delete API key
     await db.delete(api_key)
     await db.commit()
+    await cached_api_key_service.invalidate_api_key_cache(api_key.key_prefix)
 
     # Log audit event
     await log_audit_event(
@@ -490,11 +494,14 @@ async def regenerate_api_key(
     key_prefix = full_key[:8]  # Store only first 8 characters for lookup
 
     # Update API key
+    old_key_prefix = api_key.key_prefix
     api_key.key_hash = key_hash
     api_key.key_prefix = key_prefix
+    api_key.key_digest = get_api_key_digest(full_key)
 
     await db.commit()
     await db.refresh(api_key)
+    await cached_api_key_service.invalidate_api_key_cache(old_key_prefix)
 
     # Log audit event
     await log_audit_event(
@@ -660,6 +667,7 @@ async def deactivate_api_key(
     # Deactivate API key
     api_key.is_active = False
     await db.commit()
+    await cached_api_key_service.invalidate_api_key_cache(api_key.key_prefix)
 
     # Log audit event
     await log_audit_event(
@@ -14,8 +14,8 @@ from sqlalchemy.orm import selectinload
 from app.core.config import settings
 from app.core.logging import get_logger
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     create_refresh_token,
     verify_token,
@@ -24,6 +24,7 @@ from app.core.security import (
 )
 from app.db.database import get_db, create_default_admin
 from app.models.user import User
+from app.services.auth_context_cache import auth_context_cache
 from app.utils.exceptions import AuthenticationError, ValidationError
 
 logger = get_logger(__name__)
@@ -147,7 +148,7 @@ async def register(user_data: UserRegisterRequest, db: AsyncSession = Depends(ge
     user = User(
         email=user_data.email,
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await get_password_hash_async(user_data.password),
         full_name=full_name,
         is_active=True,
         is_verified=False,
@@ -258,7 +259,7 @@ async def login(user_data: UserLoginRequest, db: AsyncSession = Depends(get_db))
     logger.info("LOGIN_PASSWORD_VERIFY_START")
     verify_start = datetime.utcnow()
 
-    if not verify_password(user_data.password, user.hashed_password):
+    if not await verify_password_async(user_data.password, user.hashed_password):
         verify_end = datetime.utcnow()
         logger.warning(
             "LOGIN_PASSWORD_VERIFY_FAILURE",
@@ -463,16 +464,19 @@ async def change_password(
         )
 
     # Verify current password
-    if not verify_password(password_data.current_password, user.hashed_password):
+    if not await verify_password_async(
+        password_data.current_password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect",
         )
 
     # Update password
-    user.hashed_password = get_password_hash(password_data.new_password)
+    user.hashed_password = await get_password_hash_async(password_data.new_password)
     user.updated_at = datetime.utcnow()
 
     await db.commit()
+    await auth_context_cache.invalidate_user(user.id)
 
     return {"message": "Password changed successfully"}
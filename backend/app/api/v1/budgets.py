@@ -17,6 +17,8 @@ from app.models.usage_tracking import UsageTracking
 from app.core.security import get_current_user
 from app.services.permission_manager import require_permission
 from app.services.audit_service import log_audit_event
+from app.services.budget_ledger import budget_ledger
+from app.services.budget_plan_cache import budget_plan_cache
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -307,6 +309,7 @@ async def create_budget(
     db.add(new_budget)
     await db.commit()
     await db.refresh(new_budget)
+    await budget_plan_cache.invalidate_user(new_budget.user_id)
 
     # Build response
     budget_response = BudgetResponse.model_validate(new_budget)
@@ -379,6 +382,7 @@ async def update_budget(
 
     await db.commit()
     await db.refresh(budget)
+    await budget_plan_cache.invalidate_user(budget.user_id)
 
     # Calculate current usage
     usage = await _calculate_budget_usage(db, budget)
@@ -434,8 +438,11 @@ async def delete_budget(
         )
 
     # Delete budget
+    owner_id, deleted_id = budget.user_id, budget.id
     await db.delete(budget)
     await db.commit()
+    await budget_plan_cache.invalidate_user(owner_id)
+    await budget_ledger.forget([deleted_id])
 
     # Log audit event
     await log_audit_event(
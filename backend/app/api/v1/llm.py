@@ -2,12 +2,16 @@
 LLM API endpoints - interface to secure LLM service with authentication and budget enforcement
 """
 
+import json
 import logging
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncGenerator, List, Optional
 
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import get_db
@@ -34,12 +38,13 @@ from app.services.llm.exceptions import (
 )
 from app.services.async_budget_enforcement import (
     AsyncBudgetEnforcementService,
-    async_check_budget_for_request,
-    async_record_request_usage,
     async_atomic_check_and_reserve_budget,
+    async_release_budget_reservation,
+    async_settle_budget_reservation,
     async_atomic_finalize_usage,
 )
 from app.services.cost_calculator import CostCalculator, estimate_request_cost
+from app.services.token_estimator import token_estimator
 from app.utils.exceptions import AuthenticationError, AuthorizationError
 from app.middleware.analytics import set_analytics_data
 
@@ -153,6 +158,181 @@ class ModelsResponse(BaseModel):
     data: List[ModelInfo]
 
 
+def _sse_event(data: Any) -> str:
+    """Format one server-sent event in the OpenAI streaming format"""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    return f"data: {payload}\n\n"
+
+
+async def _finalize_chat_usage(
+    db: AsyncSession,
+    context: Dict[str, Any],
+    api_key,
+    model: str,
+    reserved_budget_ids: List[int],
+    input_tokens: int,
+    output_tokens: int,
+    total_tokens: int,
+) -> int:
+    """Settle reserved budgets and API key usage; returns the actual cost in cents"""
+    actual_cost_cents = CostCalculator.calculate_cost_cents(
+        model, input_tokens, output_tokens
+    )
+
+    # Finalize actual usage in budgets (only for API key users) - fully async
+    if context.get("auth_type", "api_key") == "api_key" and api_key:
+        await async_atomic_finalize_usage(
+            db,
+            reserved_budget_ids,
+            api_key,
+            model,
+            input_tokens,
+            output_tokens,
+            "chat/completions",
+        )
+
+        # Update API key usage statistics
+        auth_service = APIKeyAuthService(db)
+        await auth_service.update_usage_stats(context, total_tokens, actual_cost_cents)
+
+    return actual_cost_cents
+
+
+async def _stream_chat_completion(
+    llm_request: ChatRequest,
+    context: Dict[str, Any],
+    db: AsyncSession,
+    api_key,
+    reserved_budget_ids: List[int],
+    warnings: List[Dict[str, Any]],
+    estimated_prompt_tokens: int,
+) -> StreamingResponse:
+    """Relay provider chunks as server-sent events and settle usage at the end
+
+    The first chunk is awaited before the response starts so that provider
+    errors still map to proper HTTP status codes. Budgets are finalized when
+    the stream completes, fails or the client disconnects, including when
+    the client is gone before the body is iterated at all.
+    """
+    stream = llm_service.create_chat_completion_stream(llm_request)
+    try:
+        first_chunk = await stream.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+
+    usage: Optional[Dict[str, Any]] = None
+    completion_parts: List[str] = []
+    finalized = False
+
+    async def finalize() -> None:
+        """Close the provider stream and settle the reservation exactly once"""
+        nonlocal usage, finalized
+        if finalized:
+            return
+        finalized = True
+        with anyio.CancelScope(shield=True):
+            await stream.aclose()
+            usage = usage or _estimate_stream_usage(
+                llm_request.model, estimated_prompt_tokens, completion_parts
+            )
+            try:
+                actual_cost_cents = await _finalize_chat_usage(
+                    db,
+                    context,
+                    api_key,
+                    llm_request.model,
+                    reserved_budget_ids,
+                    usage.get("prompt_tokens", 0),
+                    usage.get("completion_tokens", 0),
+                    usage.get("total_tokens", 0),
+                )
+                # The middleware records the request once the stream ends
+                set_analytics_data(
+                    request_tokens=usage.get("prompt_tokens", 0),
+                    response_tokens=usage.get("completion_tokens", 0),
+                    total_tokens=usage.get("total_tokens", 0),
+                    cost_cents=actual_cost_cents,
+                )
+            except Exception as e:
+                logger.error(f"Failed to finalize streamed usage: {e}")
+
+    async def event_stream() -> AsyncGenerator[str, None]:
+        nonlocal usage
+        last_chunk: Dict[str, Any] = {}
+        chunk = first_chunk
+
+        try:
+            while chunk is not None:
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                choices = chunk.get("choices") or []
+                for choice in choices:
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        completion_parts.append(content)
+
+                # The provider's own usage-only chunk is replaced by ours below
+                if choices:
+                    last_chunk = chunk
+                    yield _sse_event({k: v for k, v in chunk.items() if k != "usage"})
+
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    chunk = None
+
+            usage = usage or _estimate_stream_usage(
+                llm_request.model, estimated_prompt_tokens, completion_parts
+            )
+            final_chunk = {
+                "id": last_chunk.get("id", ""),
+                "object": "chat.completion.chunk",
+                "created": last_chunk.get("created", int(time.time())),
+                "model": last_chunk.get("model", llm_request.model),
+                "choices": [],
+                "usage": usage,
+            }
+            if warnings:
+                final_chunk["budget_warnings"] = warnings
+            yield _sse_event(final_chunk)
+            yield _sse_event("[DONE]")
+
+        except Exception as e:
+            logger.error(f"Streaming chat completion failed: {e}")
+            yield _sse_event(
+                {"error": {"message": "LLM service error", "type": "api_error"}}
+            )
+
+        finally:
+            # Runs on completion, failure and client disconnect (cancellation)
+            await finalize()
+
+    # The generator's finally never runs if the client disconnects before
+    # iteration starts, so the response settles the reservation afterwards too
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        background=BackgroundTask(finalize),
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+        },
+    )
+
+
+def _estimate_stream_usage(
+    model: str, prompt_tokens: int, completion_parts: List[str]
+) -> Dict[str, int]:
+    """Usage for providers that do not report it in the stream"""
+    completion_tokens = token_estimator.count_tokens(model, "".join(completion_parts))
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
 # Authentication: Public API endpoints should use require_api_key
 # Internal API endpoints should use get_current_user from core.security
 
@@ -234,6 +414,11 @@ async def create_chat_completion(
     db: AsyncSession = Depends(get_db),
 ):
     """Create chat completion with budget enforcement"""
+    reserved_budget_ids: List[int] = []
+    # Set once the reservation is settled by this handler or the stream
+    reservation_handed_off = False
+    # Set once the provider has answered, the request is then charged
+    provider_succeeded = False
     try:
         auth_type = context.get("auth_type", "api_key")
 
@@ -280,13 +465,12 @@ async def create_chat_completion(
                 detail="Invalid authentication type",
             )
 
-        # Estimate token usage for budget checking
-        messages_text = " ".join([msg.content for msg in chat_request.messages])
-        estimated_tokens = len(messages_text.split()) * 1.3  # Rough token estimation
-        if chat_request.max_tokens:
-            estimated_tokens += chat_request.max_tokens
-        else:
-            estimated_tokens += 150  # Default response length estimate
+        # Estimate token usage and cost for budget checking
+        estimate = token_estimator.estimate_chat(
+            chat_request.model,
+            [(msg.role, msg.content) for msg in chat_request.messages],
+            chat_request.max_tokens,
+        )
 
         # Atomic budget check and reservation (only for API key users) - fully async
         warnings = []
@@ -301,8 +485,9 @@ async def create_chat_completion(
                 db,
                 api_key,
                 chat_request.model,
-                int(estimated_tokens),
+                estimate.total_tokens,
                 "chat/completions",
+                estimated_cost_cents=estimate.cost_cents,
             )
 
             if not is_allowed:
@@ -336,8 +521,30 @@ async def create_chat_completion(
             else 0,
         )
 
+        if chat_request.stream:
+            # Token counts are only known once the stream has finished
+            set_analytics_data(
+                model=chat_request.model,
+                user_id=context.get("user_id"),
+                api_key_id=context.get("api_key_id") if auth_type == "api_key" else None,
+                budget_ids=reserved_budget_ids,
+                budget_warnings=warnings,
+            )
+            response = await _stream_chat_completion(
+                llm_request,
+                context,
+                db,
+                api_key,
+                reserved_budget_ids,
+                warnings,
+                estimate.prompt_tokens,
+            )
+            reservation_handed_off = True
+            return response
+
         # Make request to LLM service
         llm_response = await llm_service.create_chat_completion(llm_request)
+        provider_succeeded = True
 
         # Convert LLM service response to API format
         response = {
@@ -377,32 +584,26 @@ async def create_chat_completion(
         output_tokens = usage.get("completion_tokens", 0)
         total_tokens = usage.get("total_tokens", input_tokens + output_tokens)
 
-        # Calculate accurate cost
-        actual_cost_cents = CostCalculator.calculate_cost_cents(
-            chat_request.model, input_tokens, output_tokens
-        )
-
-        # Finalize actual usage in budgets (only for API key users) - fully async
-        if auth_type == "api_key" and api_key:
-            await async_atomic_finalize_usage(
+        # Calculate accurate cost and finalize usage; a disconnect must not
+        # interrupt charging a completed call
+        with anyio.CancelScope(shield=True):
+            actual_cost_cents = await _finalize_chat_usage(
                 db,
-                reserved_budget_ids,
+                context,
                 api_key,
                 chat_request.model,
+                reserved_budget_ids,
                 input_tokens,
                 output_tokens,
-                "chat/completions",
-            )
-
-            # Update API key usage statistics
-            auth_service = APIKeyAuthService(db)
-            await auth_service.update_usage_stats(
-                context, total_tokens, actual_cost_cents
+                total_tokens,
             )
+        reservation_handed_off = True
 
         # Set analytics data for middleware
         set_analytics_data(
             model=chat_request.model,
+            user_id=context.get("user_id"),
+            api_key_id=context.get("api_key_id") if auth_type == "api_key" else None,
             request_tokens=input_tokens,
             response_tokens=output_tokens,
             total_tokens=total_tokens,
@@ -455,6 +656,16 @@ async def create_chat_completion(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create chat completion",
         )
+    finally:
+        if reserved_budget_ids and not reservation_handed_off:
+            with anyio.CancelScope(shield=True):
+                if provider_succeeded:
+                    # The call completed but was not finalized, charge the
+                    # estimate rather than leaving the sweeper to refund it
+                    await async_settle_budget_reservation(db, reserved_budget_ids)
+                else:
+                    # Refund the estimate of a request that failed or was cancelled
+                    await async_release_budget_reservation(db, reserved_budget_ids)
 
 
 @router.post("/embeddings")
@@ -464,6 +675,11 @@ async def create_embedding(
     db: AsyncSession = Depends(get_db),
 ):
     """Create embedding with budget enforcement"""
+    reserved_budget_ids: List[int] = []
+    # Set once the reservation has been settled with the actual cost
+    reservation_handed_off = False
+    # Set once the provider has answered, the request is then charged
+    provider_succeeded = False
     try:
         auth_service = APIKeyAuthService(db)
 
@@ -487,12 +703,23 @@ async def create_embedding(
                 detail="API key information not available",
             )
 
-        # Estimate token usage for budget checking
-        estimated_tokens = len(request.input.split()) * 1.3  # Rough token estimation
-
-        # Check budget compliance before making request - fully async
-        is_allowed, error_message, warnings = await async_check_budget_for_request(
-            db, api_key, request.model, int(estimated_tokens), "embeddings"
+        # Estimate token usage and cost for budget checking
+        estimate = token_estimator.estimate_embedding(request.model, request.input)
+        estimated_tokens = estimate.prompt_tokens
+
+        # Atomic budget check and reservation - fully async
+        (
+            is_allowed,
+            error_message,
+            warnings,
+            reserved_budget_ids,
+        ) = await async_atomic_check_and_reserve_budget(
+            db,
+            api_key,
+            request.model,
+            estimated_tokens,
+            "embeddings",
+            estimated_cost_cents=estimate.cost_cents,
         )
 
         if not is_allowed:
@@ -512,6 +739,7 @@ async def create_embedding(
 
         # Make request to LLM service
         llm_response = await llm_service.create_embedding(llm_request)
+        provider_succeeded = True
 
         # Convert LLM service response to API format
         response = {
@@ -549,15 +777,23 @@ async def create_embedding(
             request.model, total_tokens, 0
         )
 
-        # Record actual usage in budgets - fully async
-        await async_record_request_usage(
-            db, api_key, request.model, total_tokens, 0, "embeddings"
-        )
+        with anyio.CancelScope(shield=True):
+            # Replace the reserved estimate with the actual usage - fully async
+            await async_atomic_finalize_usage(
+                db,
+                reserved_budget_ids,
+                api_key,
+                request.model,
+                total_tokens,
+                0,
+                "embeddings",
+            )
 
-        # Update API key usage statistics
-        await auth_service.update_usage_stats(
-            context, total_tokens, actual_cost_cents
-        )
+            # Update API key usage statistics
+            await auth_service.update_usage_stats(
+                context, total_tokens, actual_cost_cents
+            )
+        reservation_handed_off = True
 
         # Add budget warnings to response if any
         if warnings:
@@ -603,6 +839,15 @@ async def create_embedding(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create embedding",
         )
+    finally:
+        if reserved_budget_ids and not reservation_handed_off:
+            with anyio.CancelScope(shield=True):
+                if provider_succeeded:
+                    # The call completed but was not finalized, charge the estimate
+                    await async_settle_budget_reservation(db, reserved_budget_ids)
+                else:
+                    # Refund the estimate of a request that failed or was cancelled
+                    await async_release_budget_reservation(db, reserved_budget_ids)
 
 
 @router.get("/health")
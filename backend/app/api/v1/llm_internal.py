@@ -100,7 +100,7 @@ async def get_metrics(current_user: Dict[str, Any] = Depends(get_current_user)):
     Get LLM service metrics for authenticated users
     """
     try:
-        metrics = await llm_service.get_metrics()
+        metrics = llm_service.get_metrics()
         return {"object": "metrics", "data": metrics}
     except Exception as e:
         logger.error(f"Failed to get metrics: {e}")
@@ -14,6 +14,7 @@ from app.services.permission_manager import (
 )
 from app.core.logging import get_logger
 from app.core.security import get_current_user
+from app.services.auth_context_cache import auth_context_cache
 
 logger = get_logger(__name__)
 
@@ -204,6 +205,8 @@ async def create_role(request: RoleRequest):
             )
 
         permission_registry.create_role(request.role_name, request.permissions)
+        # Cached auth contexts hold permissions expanded from the old roles
+        await auth_context_cache.invalidate_all()
 
         return RoleResponse(
             role_name=request.role_name, permissions=request.permissions
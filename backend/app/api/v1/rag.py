@@ -607,13 +607,13 @@ async def search_with_debug(
             collection_name = collection_name or rag_module.default_collection_name
 
             # Count total documents
-            count_result = rag_module.qdrant_client.count(
+            count_result = await rag_module.qdrant_client.count(
                 collection_name=collection_name, count_filter=Filter(must=[])
             )
             total_points = count_result.count
 
             # Get unique documents and languages
-            scroll_result = rag_module.qdrant_client.scroll(
+            scroll_result = await rag_module.qdrant_client.scroll(
                 collection_name=collection_name,
                 limit=1000,  # Sample for stats
                 with_payload=True,
@@ -14,7 +14,12 @@ from app.db.database import get_db
 from app.models.user import User
 from app.models.api_key import APIKey
 from app.models.budget import Budget
-from app.core.security import get_current_user, get_password_hash, verify_password
+from app.core.security import (
+    get_current_user,
+    get_password_hash_async,
+    verify_password_async,
+)
+from app.services.auth_context_cache import auth_context_cache
 from app.services.permission_manager import require_permission
 from app.services.audit_service import log_audit_event
 from app.core.logging import get_logger
@@ -200,7 +205,7 @@ async def create_user(
         )
 
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -283,6 +288,7 @@ async def update_user(
 
     await db.commit()
     await db.refresh(user)
+    await auth_context_cache.invalidate_user(user.id)
 
     # Log audit event
     await log_audit_event(
@@ -334,6 +340,7 @@ async def delete_user(
     # Soft delete by deactivating
     user.is_active = False
     await db.commit()
+    await auth_context_cache.invalidate_user(user.id)
 
     # Log audit event
     await log_audit_event(
@@ -376,15 +383,18 @@ async def change_password(
 
     # For self-updates, verify current password
     if is_self_update:
-        if not verify_password(password_data.current_password, user.hashed_password):
+        if not await verify_password_async(
+            password_data.current_password, user.hashed_password
+        ):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Current password is incorrect",
             )
 
     # Update password
-    user.hashed_password = get_password_hash(password_data.new_password)
+    user.hashed_password = await get_password_hash_async(password_data.new_password)
     await db.commit()
+    await auth_context_cache.invalidate_user(user.id)
 
     # Log audit event
     await log_audit_event(
@@ -426,8 +436,9 @@ async def reset_password(
         )
 
     # Reset password
-    user.hashed_password = get_password_hash(password_data.new_password)
+    user.hashed_password = await get_password_hash_async(password_data.new_password)
     await db.commit()
+    await auth_context_cache.invalidate_user(user.id)
 
     # Log audit event
     await log_audit_event(
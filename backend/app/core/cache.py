@@ -6,7 +6,7 @@ Consolidates all caching functionality into core system infrastructure
 import asyncio
 import json
 import logging
-from typing import Any, Dict, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 from datetime import datetime, timedelta
 import redis.asyncio as redis
 from redis.asyncio import Redis, ConnectionPool
@@ -100,6 +100,37 @@ class CoreCacheService:
             self.stats["errors"] += 1
             return default
 
+    async def get_many(
+        self, keys: List[str], prefix: str = "core"
+    ) -> List[Optional[Any]]:
+        """Get several values in a single round-trip (None for missing keys)"""
+        if not self.enabled or not keys:
+            return [None] * len(keys)
+
+        try:
+            cache_keys = [self._get_cache_key(key, prefix) for key in keys]
+            values = await self.redis_client.mget(cache_keys)
+
+            results = []
+            for value in values:
+                self.stats["total_requests"] += 1
+                if value is None:
+                    self.stats["misses"] += 1
+                    results.append(None)
+                    continue
+
+                self.stats["hits"] += 1
+                try:
+                    results.append(json.loads(value))
+                except json.JSONDecodeError:
+                    results.append(value)
+            return results
+
+        except Exception as e:
+            logger.error(f"Cache get_many error for keys {keys}: {e}")
+            self.stats["errors"] += 1
+            return [None] * len(keys)
+
     async def set(
         self, key: str, value: Any, ttl: Optional[int] = None, prefix: str = "core"
     ) -> bool:
@@ -192,6 +223,52 @@ class CoreCacheService:
             self.stats["errors"] += 1
             return 0
 
+    async def publish(self, channel: str, message: str) -> int:
+        """Publish a message to all subscribers of a channel"""
+        if not self.enabled:
+            return 0
+
+        try:
+            return await self.redis_client.publish(channel, message)
+        except Exception as e:
+            logger.error(f"Cache publish error on channel {channel}: {e}")
+            self.stats["errors"] += 1
+            return 0
+
+    async def listen(
+        self,
+        channel: str,
+        callback: Callable[[str], None],
+        on_disconnect: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Call callback with every message published on channel until cancelled
+
+        Reconnects after errors; on_disconnect runs first, since messages
+        published while disconnected are lost.
+        """
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub()
+                await pubsub.subscribe(channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        callback(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache subscription to {channel} failed: {e}")
+                if on_disconnect:
+                    on_disconnect()
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.reset()
+                    except Exception:
+                        pass
+
     async def get_stats(self) -> Dict[str, Any]:
         """Get comprehensive cache statistics"""
         stats = self.stats.copy()
@@ -47,6 +47,15 @@ class Settings(BaseSettings):
     BCRYPT_ROUNDS: int = int(
         os.getenv("BCRYPT_ROUNDS", "6")
     )  # Bcrypt work factor - lower for production performance
+    BCRYPT_MAX_WORKERS: int = int(
+        os.getenv("BCRYPT_MAX_WORKERS", "4")
+    )  # Threads available for bcrypt hashing and verification
+    BCRYPT_TIMEOUT: float = float(os.getenv("BCRYPT_TIMEOUT", "5.0"))
+    # Keyed HMAC digests for fast API key verification (needs API_KEY_HMAC_SECRET)
+    API_KEY_HMAC_ENABLED: bool = (
+        os.getenv("API_KEY_HMAC_ENABLED", "True").lower() == "true"
+    )
+    API_KEY_HMAC_SECRET: Optional[str] = os.getenv("API_KEY_HMAC_SECRET")
 
     # Admin user provisioning (used only on first startup)
     ADMIN_EMAIL: str = os.getenv("ADMIN_EMAIL")
@@ -92,6 +101,8 @@ class Settings(BaseSettings):
     QDRANT_PORT: int = int(os.getenv("QDRANT_PORT", "6333"))
     QDRANT_API_KEY: Optional[str] = os.getenv("QDRANT_API_KEY")
     QDRANT_URL: str = os.getenv("QDRANT_URL", "http://localhost:6333")
+    QDRANT_TIMEOUT: float = float(os.getenv("QDRANT_TIMEOUT", "30"))
+    QDRANT_MAX_CONNECTIONS: int = int(os.getenv("QDRANT_MAX_CONNECTIONS", "20"))
 
     # Rate Limiting Configuration
 
@@ -134,6 +145,63 @@ class Settings(BaseSettings):
         os.getenv("API_RATE_LIMIT_PREMIUM_PER_HOUR", "1200")
     )
 
+    # Per-API-key limits (rate_limit_per_minute/hour/day on each key)
+    API_KEY_RATE_LIMIT_ENABLED: bool = (
+        os.getenv("API_KEY_RATE_LIMIT_ENABLED", "True").lower() == "true"
+    )
+    API_KEY_RATE_LIMIT_BACKEND: str = os.getenv("API_KEY_RATE_LIMIT_BACKEND", "redis")
+
+    # In-process cache of verified API key auth contexts (0 disables)
+    API_KEY_LOCAL_CACHE_TTL: float = float(os.getenv("API_KEY_LOCAL_CACHE_TTL", "30"))
+    API_KEY_LOCAL_CACHE_SIZE: int = int(os.getenv("API_KEY_LOCAL_CACHE_SIZE", "10000"))
+
+    # In-process cache of resolved JWT auth contexts (0 disables)
+    AUTH_CONTEXT_CACHE_TTL: float = float(os.getenv("AUTH_CONTEXT_CACHE_TTL", "60"))
+    AUTH_CONTEXT_CACHE_SIZE: int = int(os.getenv("AUTH_CONTEXT_CACHE_SIZE", "10000"))
+    # Interval between batched users.last_login / api_keys.last_used_at writes
+    LAST_SEEN_FLUSH_INTERVAL: float = float(
+        os.getenv("LAST_SEEN_FLUSH_INTERVAL", "60")
+    )
+    # Compiled permission matchers / expanded role sets kept by the registry
+    PERMISSION_CACHE_SIZE: int = int(os.getenv("PERMISSION_CACHE_SIZE", "1024"))
+
+    # Request observability (analytics is always on; audit/debug are opt-in)
+    OBSERVABILITY_QUEUE_SIZE: int = int(os.getenv("OBSERVABILITY_QUEUE_SIZE", "10000"))
+    AUDIT_REQUEST_LOGGING: bool = (
+        os.getenv("AUDIT_REQUEST_LOGGING", "False").lower() == "true"
+    )
+    DEBUG_REQUEST_LOGGING: bool = (
+        os.getenv("DEBUG_REQUEST_LOGGING", "False").lower() == "true"
+    )
+
+    # Batched audit log writer. On overflow "drop_oldest" discards queued
+    # events, "spill" appends new ones to AUDIT_SPILL_PATH for a later replay
+    AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.5"))
+    AUDIT_OVERFLOW_POLICY: str = os.getenv("AUDIT_OVERFLOW_POLICY", "drop_oldest")
+    AUDIT_SPILL_PATH: str = os.getenv("AUDIT_SPILL_PATH", "storage/audit_spill.jsonl")
+
+    # Analytics usage rollups (minute/hour/day buckets)
+    ANALYTICS_ROLLUP_FLUSH_INTERVAL: float = float(
+        os.getenv("ANALYTICS_ROLLUP_FLUSH_INTERVAL", "10")
+    )
+    # Windows up to this many hours are answered from minute buckets
+    ANALYTICS_ROLLUP_MINUTE_WINDOW_HOURS: int = int(
+        os.getenv("ANALYTICS_ROLLUP_MINUTE_WINDOW_HOURS", "6")
+    )
+    ANALYTICS_ROLLUP_MINUTE_RETENTION_HOURS: int = int(
+        os.getenv("ANALYTICS_ROLLUP_MINUTE_RETENTION_HOURS", "48")
+    )
+    ANALYTICS_ROLLUP_HOUR_RETENTION_DAYS: int = int(
+        os.getenv("ANALYTICS_ROLLUP_HOUR_RETENTION_DAYS", "90")
+    )
+    # Seconds analytics results are served from cache (0 disables)
+    ANALYTICS_CACHE_TTL: float = float(os.getenv("ANALYTICS_CACHE_TTL", "30"))
+    ANALYTICS_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "512")
+    )
+
     # Request Size Limits
     API_MAX_REQUEST_BODY_SIZE: int = int(
         os.getenv("API_MAX_REQUEST_BODY_SIZE", "10485760")
@@ -154,6 +222,20 @@ class Settings(BaseSettings):
     PROMETHEUS_ENABLED: bool = os.getenv("PROMETHEUS_ENABLED", "True").lower() == "true"
     PROMETHEUS_PORT: int = int(os.getenv("PROMETHEUS_PORT", "9090"))
 
+    # Per-request latency tracing. Stage timings are returned in a
+    # Server-Timing header only when TRACING_SERVER_TIMING is set; requests
+    # slower than TRACING_SLOW_REQUEST_MS are kept in a ring buffer and, with
+    # TRACING_EXPORT_PATH set, appended there as OTLP/JSON lines
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+    TRACING_SERVER_TIMING: bool = (
+        os.getenv("TRACING_SERVER_TIMING", "False").lower() == "true"
+    )
+    TRACING_SLOW_REQUEST_MS: float = float(
+        os.getenv("TRACING_SLOW_REQUEST_MS", "2000")
+    )
+    TRACING_RING_SIZE: int = int(os.getenv("TRACING_RING_SIZE", "200"))
+    TRACING_EXPORT_PATH: Optional[str] = os.getenv("TRACING_EXPORT_PATH") or None
+
     # File uploads
     MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", "10485760"))  # 10MB
 
@@ -189,6 +271,71 @@ class Settings(BaseSettings):
         os.getenv("RAG_EMBEDDING_GENERATION_TIMEOUT", "120")
     )
     RAG_INDEXING_TIMEOUT: int = int(os.getenv("RAG_INDEXING_TIMEOUT", "120"))
+    RAG_BM25_INDEX_DIR: str = os.getenv("RAG_BM25_INDEX_DIR", "storage/bm25_index")
+    RAG_BM25_FLUSH_DELAY: float = float(os.getenv("RAG_BM25_FLUSH_DELAY", "5.0"))
+    RAG_SEARCH_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("RAG_SEARCH_CACHE_MAX_ENTRIES", "1000")
+    )
+    RAG_SEARCH_CACHE_TTL: int = int(os.getenv("RAG_SEARCH_CACHE_TTL", "300"))
+    RAG_SEARCH_CACHE_REDIS: bool = (
+        os.getenv("RAG_SEARCH_CACHE_REDIS", "True").lower() == "true"
+    )
+    RAG_EMBEDDING_CACHE_SIZE: int = int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "2048"))
+    RAG_EMBEDDING_CACHE_TTL: int = int(os.getenv("RAG_EMBEDDING_CACHE_TTL", "86400"))
+    RAG_EMBEDDING_CACHE_REDIS: bool = (
+        os.getenv("RAG_EMBEDDING_CACHE_REDIS", "True").lower() == "true"
+    )
+    RAG_EMBEDDING_CACHE_DTYPE: str = os.getenv("RAG_EMBEDDING_CACHE_DTYPE", "float16")
+    RAG_EMBEDDING_COALESCE_MAX_BATCH: int = int(
+        os.getenv("RAG_EMBEDDING_COALESCE_MAX_BATCH", "32")
+    )
+    RAG_EMBEDDING_COALESCE_MAX_WAIT_MS: float = float(
+        os.getenv("RAG_EMBEDDING_COALESCE_MAX_WAIT_MS", "5")
+    )
+    RAG_EMBEDDING_EXECUTOR_WORKERS: int = int(
+        os.getenv("RAG_EMBEDDING_EXECUTOR_WORKERS", "1")
+    )
+    # "thread" embeds in the API process, "process" in a pool of worker processes
+    RAG_EMBEDDING_WORKER_MODE: str = os.getenv("RAG_EMBEDDING_WORKER_MODE", "thread")
+    RAG_EMBEDDING_PROCESS_WORKERS: int = int(
+        os.getenv("RAG_EMBEDDING_PROCESS_WORKERS", "2")
+    )
+    # "sentence_transformer" or "onnx" (exported graph, see onnx_embedding_backend)
+    RAG_EMBEDDING_BACKEND: str = os.getenv(
+        "RAG_EMBEDDING_BACKEND", "sentence_transformer"
+    )
+    RAG_EMBEDDING_ONNX_DIR: str = os.getenv(
+        "RAG_EMBEDDING_ONNX_DIR", "storage/onnx/bge-small-en-v1.5"
+    )
+    RAG_EMBEDDING_ONNX_QUANTIZED: bool = (
+        os.getenv("RAG_EMBEDDING_ONNX_QUANTIZED", "False").lower() == "true"
+    )
+    RAG_EMBEDDING_ONNX_POOLING: str = os.getenv("RAG_EMBEDDING_ONNX_POOLING", "cls")
+    RAG_INGEST_EMBED_BATCH_SIZE: int = int(
+        os.getenv("RAG_INGEST_EMBED_BATCH_SIZE", "64")
+    )
+    RAG_INGEST_MAX_PENDING_BATCHES: int = int(
+        os.getenv("RAG_INGEST_MAX_PENDING_BATCHES", "2")
+    )
+    RAG_INGEST_UPSERT_CONCURRENCY: int = int(
+        os.getenv("RAG_INGEST_UPSERT_CONCURRENCY", "2")
+    )
+
+    # Budget ledger: "redis" (shared counters), "memory" (single node only) or
+    # "database" (row-locked reservations)
+    BUDGET_LEDGER_BACKEND: str = os.getenv("BUDGET_LEDGER_BACKEND", "redis")
+    BUDGET_LEDGER_FLUSH_INTERVAL: float = float(
+        os.getenv("BUDGET_LEDGER_FLUSH_INTERVAL", "2.0")
+    )
+    # Reservations not settled within this many seconds are released
+    BUDGET_RESERVATION_TTL: float = float(
+        os.getenv("BUDGET_RESERVATION_TTL", "600")
+    )
+    BUDGET_PLAN_CACHE_SIZE: int = int(os.getenv("BUDGET_PLAN_CACHE_SIZE", "10000"))
+    BUDGET_PLAN_CACHE_TTL: int = int(os.getenv("BUDGET_PLAN_CACHE_TTL", "60"))
+    BUDGET_PLAN_CACHE_REDIS: bool = (
+        os.getenv("BUDGET_PLAN_CACHE_REDIS", "True").lower() == "true"
+    )
 
     # Plugin configuration
     PLUGINS_DIR: str = os.getenv("PLUGINS_DIR", "/plugins")
@@ -0,0 +1,84 @@
+"""
+Core Qdrant connection - shared async clients for the vector database
+Provides one pooled AsyncQdrantClient (and a pooled raw HTTP client for
+endpoints parsed without the qdrant models) per worker, so vector I/O never
+blocks the event loop and connections are reused across requests.
+"""
+
+import logging
+from typing import Optional
+
+import httpx
+from qdrant_client import AsyncQdrantClient
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QdrantConnectionManager:
+    """Lazily created, shared Qdrant clients"""
+
+    def __init__(self):
+        self._client: Optional[AsyncQdrantClient] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def url(self) -> str:
+        qdrant_host = getattr(settings, "QDRANT_HOST", "localhost")
+        qdrant_port = getattr(settings, "QDRANT_PORT", 6333)
+        return f"http://{qdrant_host}:{qdrant_port}"
+
+    def _limits(self) -> httpx.Limits:
+        max_connections = getattr(settings, "QDRANT_MAX_CONNECTIONS", 20)
+        return httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+
+    def get_client(self) -> AsyncQdrantClient:
+        """Return the shared async Qdrant client"""
+        if self._client is None:
+            self._client = AsyncQdrantClient(
+                url=self.url,
+                timeout=getattr(settings, "QDRANT_TIMEOUT", 30),
+                limits=self._limits(),
+            )
+            logger.info(f"Created shared async Qdrant client for {self.url}")
+        return self._client
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        """Return a pooled HTTP client for raw Qdrant REST calls
+
+        Used where responses are read as plain JSON to avoid Pydantic
+        validation issues with the qdrant models.
+        """
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                base_url=self.url,
+                timeout=getattr(settings, "QDRANT_TIMEOUT", 30),
+                limits=self._limits(),
+            )
+        return self._http_client
+
+    async def close(self):
+        """Close the shared clients"""
+        if self._client is not None:
+            try:
+                await self._client.close()
+            except Exception as e:
+                logger.warning(f"Error closing Qdrant client: {e}")
+            self._client = None
+
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+# Global Qdrant connection manager
+qdrant_connection = QdrantConnectionManager()
+
+
+def get_qdrant_client() -> AsyncQdrantClient:
+    """Get the shared async Qdrant client"""
+    return qdrant_connection.get_client()
@@ -4,6 +4,8 @@ Security utilities for authentication and authorization
 
 import asyncio
 import concurrent.futures
+import hashlib
+import hmac
 import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
@@ -27,12 +29,20 @@ pwd_context = CryptContext(
     schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
 )
 
+# Bounded pool so bcrypt never runs on (or floods) the event loop
+_hash_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=settings.BCRYPT_MAX_WORKERS, thread_name_prefix="bcrypt"
+)
+
+# Marks HMAC API key digests so the scheme can change later
+API_KEY_DIGEST_SCHEME = "hmac-sha256"
+
 # JWT token handling
 security = HTTPBearer()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
+    """Verify a password against its hash (blocking, prefer verify_password_async)"""
     import time
 
     start_time = time.time()
@@ -41,12 +51,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
     try:
-        # Run password verification in a thread with timeout
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(
-                pwd_context.verify, plain_password, hashed_password
-            )
-            result = future.result(timeout=5.0)  # 5 second timeout
+        # Run password verification in the bcrypt pool with timeout
+        future = _hash_executor.submit(
+            pwd_context.verify, plain_password, hashed_password
+        )
+        result = future.result(timeout=settings.BCRYPT_TIMEOUT)
 
         end_time = time.time()
         duration = end_time - start_time
@@ -72,14 +81,32 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         raise
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the bcrypt pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(
+                _hash_executor, pwd_context.verify, plain_password, hashed_password
+            ),
+            timeout=settings.BCRYPT_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        logger.error(
+            f"Password verification timed out after {settings.BCRYPT_TIMEOUT}s"
+        )
+        return False  # Treat timeout as verification failure
+
+
 def get_password_hash(password: str) -> str:
     """Generate password hash"""
     return pwd_context.hash(password)
 
 
-def verify_api_key(plain_api_key: str, hashed_api_key: str) -> bool:
-    """Verify an API key against its hash"""
-    return pwd_context.verify(plain_api_key, hashed_api_key)
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash in the bcrypt pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.hash, password)
 
 
 def get_api_key_hash(api_key: str) -> str:
@@ -87,6 +114,51 @@ def get_api_key_hash(api_key: str) -> str:
     return pwd_context.hash(api_key)
 
 
+def api_key_hmac_enabled() -> bool:
+    """Whether API keys are verified with HMAC digests
+
+    Requires a dedicated API_KEY_HMAC_SECRET, so rotating the JWT secret never
+    silently invalidates stored digests.
+    """
+    return settings.API_KEY_HMAC_ENABLED and bool(settings.API_KEY_HMAC_SECRET)
+
+
+def get_api_key_digest(api_key: str) -> Optional[str]:
+    """
+    Keyed HMAC digest of an API key, or None when the fast path is disabled
+
+    API keys are long random strings, so a keyed digest is as hard to reverse
+    as a bcrypt hash while verifying in microseconds.
+    """
+    if not api_key_hmac_enabled():
+        return None
+    digest = hmac.new(
+        settings.API_KEY_HMAC_SECRET.encode(), api_key.encode(), hashlib.sha256
+    ).hexdigest()
+    return f"{API_KEY_DIGEST_SCHEME}${digest}"
+
+
+def verify_api_key_digest(api_key: str, key_digest: str) -> bool:
+    """Constant-time check of an API key against its stored HMAC digest"""
+    expected = get_api_key_digest(api_key)
+    if expected is None:
+        return False
+    return hmac.compare_digest(expected, key_digest)
+
+
+async def verify_api_key_async(
+    api_key: str, hashed_key: str, key_digest: Optional[str] = None
+) -> bool:
+    """Verify an API key, using its HMAC digest when one is stored
+
+    A digest mismatch falls back to bcrypt, since the digest may predate a
+    rotation of API_KEY_HMAC_SECRET.
+    """
+    if key_digest and verify_api_key_digest(api_key, key_digest):
+        return True
+    return await verify_password_async(api_key, hashed_key)
+
+
 def create_access_token(
     data: Dict[str, Any], expires_delta: Optional[timedelta] = None
 ) -> str:
@@ -199,6 +271,16 @@ async def get_current_user(
         if user_id is None:
             raise AuthenticationError("Invalid token payload")
 
+        from app.services.auth_context_cache import auth_context_cache
+        from app.services.last_seen import user_last_seen
+
+        # Serve the resolved context of this user from the cache
+        generation = auth_context_cache.generation(int(user_id))
+        cached_context = auth_context_cache.get(int(user_id))
+        if cached_context is not None:
+            user_last_seen.touch(cached_context["id"])
+            return cached_context
+
         # Load user from database
         from app.models.user import User
         from sqlalchemy import select
@@ -220,9 +302,8 @@ async def get_current_user(
                 "permissions": [],  # Default to empty list for permissions
             }
 
-        # Update last login
-        user.update_last_login()
-        await db.commit()
+        # Update last login in the next batched write
+        user_last_seen.touch(user.id)
 
         # Calculate effective permissions using permission manager
         from app.services.permission_manager import permission_registry
@@ -249,7 +330,7 @@ async def get_current_user(
             roles=user_roles, custom_permissions=custom_permissions
         )
 
-        return {
+        context = {
             "id": user.id,
             "email": user.email,
             "username": user.username,
@@ -259,6 +340,8 @@ async def get_current_user(
             "permissions": effective_permissions,  # Use calculated permissions
             "user_obj": user,  # Include full user object for other operations
         }
+        auth_context_cache.set(user.id, context, generation)
+        return context
     except Exception as e:
         logger.error(f"Authentication error: {e}")
         raise AuthenticationError("Could not validate credentials")
@@ -341,17 +424,26 @@ async def get_api_key_user(
         if not db_api_key:
             return None
 
-        # Verify the API key hash
-        if not verify_api_key(api_key, db_api_key.key_hash):
+        # Verify the API key (HMAC digest, or bcrypt off the event loop)
+        if not await verify_api_key_async(
+            api_key, db_api_key.key_hash, db_api_key.key_digest
+        ):
             return None
 
         # Check if key is valid (not expired)
         if not db_api_key.is_valid():
             return None
 
-        # Update last used timestamp
-        db_api_key.last_used_at = datetime.utcnow()
-        await db.commit()
+        # Migrate legacy keys and stale digests to the fast verification path
+        key_digest = get_api_key_digest(api_key)
+        if key_digest and db_api_key.key_digest != key_digest:
+            db_api_key.key_digest = key_digest
+            await db.commit()
+
+        # Update last used timestamp in the next batched write
+        from app.services.last_seen import api_key_last_used
+
+        api_key_last_used.touch(db_api_key.id)
 
         # Load associated user
         user_stmt = select(User).options(selectinload(User.role)).where(User.id == db_api_key.user_id)
@@ -443,9 +535,11 @@ class RequiresPermission:
         if role in role_permissions and self.permission in role_permissions[role]:
             return current_user
 
-        # Check custom permissions
-        user_permissions = current_user.get("permissions", {})
-        if self.permission in user_permissions:
+        # Check effective permissions against the compiled matcher
+        from app.services.permission_manager import permission_registry
+
+        user_permissions = current_user.get("permissions") or []
+        if permission_registry.tree.has_permission(user_permissions, self.permission):
             return current_user
 
         # If user has access to full user object, use the model's has_permission method
@@ -10,14 +10,16 @@ Pool monitoring is available via get_pool_status() function.
 """
 
 import logging
+import time
 from typing import AsyncGenerator, Dict, Any
 from sqlalchemy import create_engine, MetaData, event
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from sqlalchemy.pool import StaticPool
 
 from app.core.config import settings
+from app.services.tracing import record_span
 
 logger = logging.getLogger(__name__)
 
@@ -131,6 +133,28 @@ def _setup_pool_monitoring():
         logger.warning(f"Could not set up async pool monitoring: {e}")
 
 
+def _setup_commit_tracing():
+    """Record each session commit (final flush included) as a trace span
+
+    Registered on the Session class, so it covers sync sessions and the sync
+    sessions behind AsyncSession, whose greenlets share the caller's context.
+    """
+
+    @event.listens_for(Session, "before_commit")
+    def before_commit(session):
+        session.info["commit_started"] = time.perf_counter()
+
+    @event.listens_for(Session, "after_commit")
+    def after_commit(session):
+        started = session.info.pop("commit_started", None)
+        if started is not None:
+            record_span("db.commit", started)
+
+    @event.listens_for(Session, "after_rollback")
+    def after_rollback(session):
+        session.info.pop("commit_started", None)
+
+
 def get_pool_status() -> Dict[str, Any]:
     """
     Get current status of database connection pools.
@@ -188,6 +212,7 @@ def log_pool_status():
 
 # Initialize pool monitoring
 _setup_pool_monitoring()
+_setup_commit_tracing()
 
 # Metadata for migrations
 metadata = MetaData()
@@ -6,10 +6,10 @@ import sys
 import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException
 from starlette.middleware.sessions import SessionMiddleware
@@ -26,8 +26,9 @@ from app.api.public_v1 import public_api_router
 from app.utils.exceptions import CustomHTTPException
 from app.services.module_manager import module_manager
 from app.services.metrics import setup_metrics
+from app.services.prometheus_metrics import render_metrics
 from app.services.analytics import init_analytics_service
-from app.middleware.analytics import setup_analytics_middleware
+from app.middleware.observability import setup_observability_middleware
 from app.services.config_manager import init_config_manager
 
 # Setup logging
@@ -114,6 +115,14 @@ async def lifespan(app: FastAPI):
     try:
         await core_cache.initialize()
         logger.info("Core cache service initialized successfully")
+
+        from app.services.cached_api_key import cached_api_key_service
+
+        cached_api_key_service.start_invalidation_listener()
+
+        from app.services.auth_context_cache import auth_context_cache
+
+        auth_context_cache.start_invalidation_listener()
     except Exception as e:
         logger.warning(f"Core cache service initialization failed: {e}")
 
@@ -130,6 +139,20 @@ async def lifespan(app: FastAPI):
     # Initialize config manager
     await init_config_manager()
 
+    # Start batched last-seen writes for users and API keys
+    from app.services.last_seen import api_key_last_used, user_last_seen
+
+    user_last_seen.start()
+    api_key_last_used.start()
+
+    # Start the budget ledger's batched Postgres reconciliation
+    from app.services.budget_ledger import budget_ledger
+
+    try:
+        budget_ledger.start()
+    except Exception as exc:
+        logger.warning(f"Budget ledger failed to start: {exc}")
+
     # Ensure platform permissions are registered before module discovery
     from app.services.permission_manager import permission_registry
 
@@ -153,6 +176,11 @@ async def lifespan(app: FastAPI):
     except Exception as exc:
         logger.warning(f"Analytics service initialization failed: {exc}")
 
+    # Start batched usage rollup upserts
+    from app.services.usage_rollups import usage_rollup_writer
+
+    usage_rollup_writer.start()
+
     # Initialize module manager with FastAPI app for router registration
     logger.info("Initializing module manager...")
     await module_manager.initialize(app)
@@ -231,22 +259,67 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Error cleaning up embedding service: {e}")
 
-        # Close core cache service
-        from app.core.cache import core_cache
+        # Write out pending budget usage while Redis is still available
+        from app.services.budget_ledger import budget_ledger
 
-        await core_cache.cleanup()
+        try:
+            await budget_ledger.stop()
+        except Exception as e:
+            logger.error(f"Error flushing budget ledger: {e}")
+
+        # Drain queued analytics/audit/debug records
+        from app.middleware.observability import stop_observability_sinks
+
+        await stop_observability_sinks()
 
-        # Close Redis connection for cached API key service
+        # Write out pending usage rollups
+        from app.services.usage_rollups import usage_rollup_writer
+
+        try:
+            await usage_rollup_writer.stop()
+        except Exception as e:
+            logger.error(f"Error flushing usage rollups: {e}")
+
+        # Write out queued audit events
+        from app.services.audit_service import stop_audit_worker
+
+        try:
+            await stop_audit_worker()
+        except Exception as e:
+            logger.error(f"Error flushing audit events: {e}")
+
+        # Write out pending last-seen timestamps
+        from app.services.last_seen import api_key_last_used, user_last_seen
+
+        for batcher in (user_last_seen, api_key_last_used):
+            try:
+                await batcher.stop()
+            except Exception as e:
+                logger.error(f"Error flushing last seen timestamps: {e}")
+
+        # Stop the auth caches' invalidation listeners
+        from app.services.auth_context_cache import auth_context_cache
         from app.services.cached_api_key import cached_api_key_service
 
+        await auth_context_cache.close()
         await cached_api_key_service.close()
 
+        # Close core cache service
+        from app.core.cache import core_cache
+
+        await core_cache.cleanup()
+
         # Stop document processor
         processor = getattr(app.state, "document_processor", None)
         if processor:
             await processor.stop()
 
         await module_manager.cleanup()
+
+        # Close shared Qdrant clients after modules stop using them
+        from app.core.qdrant import qdrant_connection
+
+        await qdrant_connection.close()
         logger.info("Platform shutdown complete")
 
 
@@ -278,8 +351,8 @@ app.add_middleware(
     max_age=settings.SESSION_EXPIRE_MINUTES * 60,
 )
 
-# Add analytics middleware
-setup_analytics_middleware(app)
+# Add analytics/audit/debug observability middleware
+setup_observability_middleware(app)
 
 # Security middleware disabled - handled externally
 
@@ -367,6 +440,16 @@ async def health_check():
     }
 
 
+# Prometheus / OpenMetrics scrape endpoint
+if settings.PROMETHEUS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics(request: Request):
+        """Gateway internals in Prometheus or OpenMetrics text format"""
+        body, content_type = render_metrics(request.headers.get("accept"))
+        return Response(content=body, media_type=content_type)
+
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -0,0 +1,411 @@
+"""
+Observability middleware
+
+Analytics, audit and debug logging used to be separate ``BaseHTTPMiddleware``
+layers. Each ran the endpoint in its own task and memory stream, decoded the
+JWT again and, for debugging, buffered request bodies, which added per-request
+overhead and held back streamed (SSE) responses.
+
+``ObservabilityMiddleware`` is a single pure-ASGI middleware. It decodes the
+caller's identity once, times the request while passing every message through
+untouched, and hands one ``RequestRecord`` per request to the analytics, audit
+and debug sinks. Each sink is an ``EventSink``: a bounded queue drained by a
+background task, so a slow sink drops records instead of delaying responses.
+
+It also opens the request's ``Trace`` (see ``app.services.tracing``), adds
+the opt-in ``Server-Timing`` header and samples slow traces.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from jose import jwt
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.middleware import audit_middleware, debugging
+from app.middleware.analytics import analytics_context, track_analytics_event
+from app.services.prometheus_metrics import observe_http_request
+from app.services.tracing import Trace, export_trace, slow_traces, trace_context
+
+logger = get_logger(__name__)
+
+# Paths that are never tracked by any sink
+SKIP_PATHS = {"/health", "/metrics", "/docs", "/redoc", "/openapi.json"}
+SKIP_PREFIXES = ("/static",)
+
+# Bytes of request/response body kept for debug and login audit records
+BODY_SAMPLE_LIMIT = 8192
+
+LOGIN_PATHS = ("/auth/login", "/auth/logout", "/auth/refresh")
+
+
+@dataclass
+class RequestRecord:
+    """Everything the sinks need to know about one finished request"""
+
+    request_id: str
+    timestamp: datetime
+    method: str
+    path: str
+    query_string: str
+    client_ip: str
+    user_agent: str
+    headers: Dict[str, str]
+    identity: Optional[Dict[str, Any]]
+    request_size: int
+    status_code: int = 500
+    response_size: int = 0
+    response_content_type: Optional[str] = None
+    ttfb_ms: float = 0.0
+    duration_ms: float = 0.0
+    error_message: Optional[str] = None
+    analytics_data: Dict[str, Any] = field(default_factory=dict)
+    request_body: Optional[bytes] = None
+    response_body: Optional[bytes] = None
+    # Path template of the matched route, e.g. "/api/v1/chatbot/{chatbot_id}"
+    route: Optional[str] = None
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self.identity.get("user_id") if self.identity else None
+
+    @property
+    def success(self) -> bool:
+        return 200 <= self.status_code < 400
+
+
+class EventSink:
+    """Bounded queue of records drained by one background task"""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[None]],
+        maxsize: int = 10000,
+    ):
+        self.name = name
+        self.handler = handler
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"submitted": 0, "dropped": 0, "handled": 0, "errors": 0}
+
+    def submit(self, record: Any) -> bool:
+        """Queue a record without waiting, dropping it if the queue is full"""
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    async def _handle(self, record: Any):
+        try:
+            await self.handler(record)
+            self.stats["handled"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"{self.name} sink failed to handle record: {e}")
+
+    async def _run(self):
+        while True:
+            record = await self._queue.get()
+            try:
+                await self._handle(record)
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        """Start the background task if it is not running"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and handle records still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while not self._queue.empty():
+            await self._handle(self._queue.get_nowait())
+            self._queue.task_done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "queued": self._queue.qsize()}
+
+
+analytics_sink = EventSink(
+    "analytics", track_analytics_event, maxsize=settings.OBSERVABILITY_QUEUE_SIZE
+)
+audit_sink = EventSink(
+    "audit", audit_middleware.write_audit_events, maxsize=settings.OBSERVABILITY_QUEUE_SIZE
+)
+debug_sink = EventSink(
+    "debug", debugging.log_request_debug, maxsize=settings.OBSERVABILITY_QUEUE_SIZE
+)
+trace_export_sink = EventSink(
+    "trace_export", export_trace, maxsize=settings.OBSERVABILITY_QUEUE_SIZE
+)
+SINKS = (analytics_sink, audit_sink, debug_sink, trace_export_sink)
+
+
+def _decode_identity(headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Decode the caller's JWT (or note an API key) once per request"""
+    authorization = headers.get("authorization", "")
+    if authorization.startswith("Bearer "):
+        try:
+            payload = jwt.decode(
+                authorization[7:],
+                settings.JWT_SECRET,
+                algorithms=[settings.JWT_ALGORITHM],
+            )
+            sub = payload.get("sub")
+            return {
+                "user_id": int(sub) if sub else None,
+                "email": payload.get("email"),
+                "is_superuser": payload.get("is_superuser", False),
+                "role": payload.get("role"),
+                "auth_type": "jwt",
+            }
+        except Exception:
+            # Invalid tokens and API keys sent as bearer tokens are still tracked
+            pass
+
+    if headers.get("x-api-key"):
+        return {
+            "user_id": None,
+            "email": "api_key_user",
+            "is_superuser": False,
+            "role": "api_user",
+            "auth_type": "api_key",
+        }
+
+    return None
+
+
+def _client_ip(scope, headers: Dict[str, str]) -> str:
+    """Get client IP address with proxy support"""
+    forwarded_for = headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+
+    real_ip = headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class ObservabilityMiddleware:
+    """Pure-ASGI middleware feeding analytics, audit and debug sinks"""
+
+    def __init__(
+        self,
+        app,
+        analytics: bool = True,
+        audit: bool = False,
+        debug: bool = False,
+        tracing: bool = False,
+        server_timing: bool = False,
+    ):
+        self.app = app
+        self.analytics = analytics
+        self.audit = audit
+        self.debug = debug
+        self.tracing = tracing
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path in SKIP_PATHS or path.startswith(SKIP_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope.get("headers", ())
+        }
+        identity = _decode_identity(headers)
+
+        request_id = str(uuid4())
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+        state["request_start"] = start
+        state["identity"] = identity
+
+        method = scope["method"]
+        try:
+            request_size = int(headers.get("content-length", 0))
+        except ValueError:
+            request_size = 0
+
+        record = RequestRecord(
+            request_id=request_id,
+            timestamp=datetime.utcnow(),
+            method=method,
+            path=path,
+            query_string=scope.get("query_string", b"").decode("latin-1"),
+            client_ip=_client_ip(scope, headers),
+            user_agent=headers.get("user-agent", ""),
+            headers=headers,
+            identity=identity,
+            request_size=request_size,
+        )
+
+        # Bodies are only sampled when a sink needs them, copied as they pass
+        capture_request = method in ("POST", "PUT", "PATCH") and (
+            self.debug or (self.audit and any(p in path for p in LOGIN_PATHS))
+        )
+        request_chunks: List[bytes] = []
+        response_chunks: List[bytes] = []
+        response_started = False
+        trace = Trace(f"{method} {path}") if self.tracing else None
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                if body and sum(map(len, request_chunks)) < BODY_SAMPLE_LIMIT:
+                    request_chunks.append(body)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                record.status_code = message["status"]
+                record.ttfb_ms = (time.perf_counter() - start) * 1000
+                for key, value in message.get("headers", ()):
+                    if key.lower() == b"content-type":
+                        record.response_content_type = value.decode("latin-1")
+                if trace is not None and self.server_timing:
+                    timing = trace.server_timing(record.ttfb_ms)
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", ()),
+                            (b"server-timing", timing.encode("latin-1")),
+                        ],
+                    }
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                record.response_size += len(body)
+                if (
+                    self.debug
+                    and body
+                    and sum(map(len, response_chunks)) < BODY_SAMPLE_LIMIT
+                ):
+                    response_chunks.append(body)
+            await send(message)
+
+        # Fresh per-request dict that endpoints fill in via set_analytics_data
+        context_token = analytics_context.set({})
+        trace_token = trace_context.set(trace)
+        try:
+            await self.app(
+                scope, receive_wrapper if capture_request else receive, send_wrapper
+            )
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            record.error_message = str(e)
+            record.status_code = 500
+            if response_started:
+                raise
+            body = json.dumps(
+                {"error": "INTERNAL_ERROR", "message": "Internal server error"}
+            ).encode()
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 500,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+        finally:
+            record.duration_ms = (time.perf_counter() - start) * 1000
+            record.route = getattr(scope.get("route"), "path", None)
+            observe_http_request(
+                method, record.route, record.status_code, record.duration_ms
+            )
+            record.analytics_data = analytics_context.get()
+            analytics_context.reset(context_token)
+            trace_context.reset(trace_token)
+            if trace is not None:
+                self._finish_trace(trace, record)
+            if request_chunks:
+                record.request_body = b"".join(request_chunks)[:BODY_SAMPLE_LIMIT]
+            if response_chunks:
+                record.response_body = b"".join(response_chunks)[:BODY_SAMPLE_LIMIT]
+            self._dispatch(record)
+
+    def _finish_trace(self, trace: Trace, record: RequestRecord):
+        """Sample the trace if it was slow and queue it for export"""
+        if record.route:
+            trace.name = f"{record.method} {record.route}"
+        trace.finish(
+            error=record.error_message,
+            **{
+                "http.method": record.method,
+                "http.route": record.route or record.path,
+                "http.status_code": record.status_code,
+                "request.id": record.request_id,
+                "enduser.id": record.user_id,
+            },
+        )
+        if slow_traces.offer(trace) and settings.TRACING_EXPORT_PATH:
+            trace_export_sink.submit(trace)
+
+    def _dispatch(self, record: RequestRecord):
+        """Hand the record to each enabled sink without waiting on them"""
+        if self.analytics:
+            analytics_sink.submit(record)
+        if self.audit and audit_middleware.should_audit(record.path):
+            audit_sink.submit(record)
+        if self.debug:
+            debug_sink.submit(record)
+
+
+def get_observability_stats() -> Dict[str, Any]:
+    """Queue and drop counters of each sink"""
+    return {sink.name: sink.get_stats() for sink in SINKS}
+
+
+async def stop_observability_sinks():
+    """Drain and stop all sinks"""
+    for sink in SINKS:
+        try:
+            await sink.stop()
+        except Exception as e:
+            logger.error(f"Error stopping {sink.name} sink: {e}")
+
+
+def setup_observability_middleware(app):
+    """Add the observability middleware to the FastAPI app"""
+    app.add_middleware(
+        ObservabilityMiddleware,
+        analytics=True,
+        audit=settings.AUDIT_REQUEST_LOGGING,
+        debug=settings.DEBUG_REQUEST_LOGGING,
+        tracing=settings.TRACING_ENABLED,
+        server_timing=settings.TRACING_SERVER_TIMING,
+    )
+    logger.info("Observability middleware configured")
@@ -5,6 +5,7 @@ Database models package
 from .user import User
 from .api_key import APIKey
 from .usage_tracking import UsageTracking
+from .usage_rollup import UsageRollup
 from .budget import Budget
 from .audit_log import AuditLog
 from .rag_collection import RagCollection
@@ -41,6 +42,7 @@ __all__ = [
     "User",
     "APIKey",
     "UsageTracking",
+    "UsageRollup",
     "Budget",
     "AuditLog",
     "RagCollection",
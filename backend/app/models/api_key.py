@@ -28,6 +28,9 @@ class APIKey(Base):
     key_prefix = Column(
         String, index=True, nullable=False
     )  # First 8 characters for identification
+    key_digest = Column(
+        String, nullable=True
+    )  # Keyed HMAC digest for fast verification (None for legacy keys)
 
     # User relationship
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
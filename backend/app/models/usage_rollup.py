@@ -0,0 +1,70 @@
+"""
+Usage rollup model for pre-aggregated analytics
+"""
+
+from datetime import datetime
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
+from app.db.database import Base
+
+
+class UsageRollup(Base):
+    """Request, token and cost totals per time bucket and dimension
+
+    One row per (granularity, bucket_start, user, API key, model, endpoint).
+    Dimensions that do not apply are stored as 0 / "" so the unique
+    constraint can be used for upserts.
+    """
+
+    __tablename__ = "usage_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Bucket
+    granularity = Column(String(8), nullable=False)  # minute, hour, day
+    bucket_start = Column(DateTime, nullable=False)
+
+    # Dimensions
+    user_id = Column(Integer, nullable=False, default=0)  # 0 = anonymous
+    api_key_id = Column(Integer, nullable=False, default=0)  # 0 = not an API key
+    model = Column(String, nullable=False, default="")
+    endpoint = Column(String, nullable=False)  # "METHOD /route/template"
+
+    # Totals
+    request_count = Column(BigInteger, nullable=False, default=0)
+    error_count = Column(BigInteger, nullable=False, default=0)
+    request_tokens = Column(BigInteger, nullable=False, default=0)
+    response_tokens = Column(BigInteger, nullable=False, default=0)
+    total_tokens = Column(BigInteger, nullable=False, default=0)
+    cost_cents = Column(BigInteger, nullable=False, default=0)
+    total_response_time_ms = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "granularity",
+            "bucket_start",
+            "user_id",
+            "api_key_id",
+            "model",
+            "endpoint",
+            name="uq_usage_rollups_bucket",
+        ),
+        Index("ix_usage_rollups_granularity_bucket", "granularity", "bucket_start"),
+        Index("ix_usage_rollups_user_bucket", "granularity", "user_id", "bucket_start"),
+    )
+
+    def __repr__(self):
+        return (
+            f"<UsageRollup({self.granularity} {self.bucket_start}, "
+            f"endpoint='{self.endpoint}', requests={self.request_count})>"
+        )
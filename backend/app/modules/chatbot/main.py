@@ -29,6 +29,7 @@ from app.services.llm.models import (
 )
 from app.services.llm.exceptions import LLMError, ProviderError, SecurityError
 from app.services.base_module import BaseModule, Permission
+from app.services.tracing import traced
 from app.models.user import User
 from app.models.chatbot import (
     ChatbotInstance as DBChatbotInstance,
@@ -976,6 +977,7 @@ class ChatbotModule(BaseModule):
                 None,
             )
 
+    @traced("chatbot.build_messages")
     def _build_conversation_messages(
         self,
         db_messages: List[DBMessage],
@@ -1317,6 +1319,7 @@ class ChatbotModule(BaseModule):
 
         return re.sub(r"\\{\\{\\s*([^}]+)\\s*\\}\\}", replace_var, template)
 
+    @traced("rag.collection_lookup")
     async def _get_qdrant_collection_name(
         self, collection_identifier: str, db=None
     ) -> Optional[str]:
@@ -1349,10 +1352,9 @@ class ChatbotModule(BaseModule):
                 if self.rag_module:
                     try:
                         # Try to verify the collection exists in Qdrant
-                        from qdrant_client import QdrantClient
+                        from app.core.qdrant import get_qdrant_client
 
-                        qdrant_client = QdrantClient(host="enclava-qdrant", port=6333)
-                        collections = qdrant_client.get_collections()
+                        collections = await get_qdrant_client().get_collections()
                         collection_names = [c.name for c in collections.collections]
 
                         if actual_collection_name in collection_names:
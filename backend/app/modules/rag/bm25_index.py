@@ -0,0 +1,490 @@
+"""
+Persistent inverted index for BM25 scoring in RAG hybrid search
+
+Each Qdrant collection gets its own index of term -> postings (chunk, term
+frequency) plus chunk lengths, maintained incrementally as chunks are indexed
+and deleted. Queries only touch the postings of the query terms, so scoring
+cost no longer grows with the size of the collection.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Alphabetic runs only; digits and underscores split tokens
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# Fixed English stop words so that persisted indexes do not depend on whether
+# NLTK corpora happen to be installed. Tokens of two characters or fewer are
+# dropped anyway, so only longer stop words are listed.
+STOP_WORDS = frozenset(
+    {
+        "about", "above", "after", "again", "against", "all", "and", "any",
+        "are", "aren", "because", "been", "before", "being", "below",
+        "between", "both", "but", "can", "couldn", "did", "didn", "does",
+        "doesn", "doing", "don", "down", "during", "each", "few", "for",
+        "from", "further", "had", "hadn", "has", "hasn", "have", "haven",
+        "having", "her", "here", "hers", "herself", "him", "himself", "his",
+        "how", "into", "isn", "its", "itself", "just", "mightn", "more",
+        "most", "mustn", "myself", "needn", "nor", "not", "now", "off",
+        "once", "only", "other", "our", "ours", "ourselves", "out", "over",
+        "own", "same", "shan", "she", "should", "shouldn", "some", "such",
+        "than", "that", "the", "their", "theirs", "them", "themselves",
+        "then", "there", "these", "they", "this", "those", "through", "too",
+        "under", "until", "very", "was", "wasn", "were", "weren", "what",
+        "when", "where", "which", "while", "who", "whom", "why", "will",
+        "with", "won", "wouldn", "you", "your", "yours", "yourself",
+        "yourselves",
+    }
+)
+
+INDEX_FORMAT_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase BM25 terms, dropping stop words and short tokens"""
+    if not text:
+        return []
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 2 and token not in STOP_WORDS
+    ]
+
+
+class BM25Index:
+    """In-memory inverted index for a single collection
+
+    Chunks are addressed externally by their Qdrant point id and internally by
+    a dense integer slot, which keeps posting lists and the on-disk format
+    compact.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._chunk_ids: List[Optional[str]] = []
+        self._chunk_documents: List[Optional[str]] = []
+        self._chunk_terms: List[Tuple[str, ...]] = []
+        self._lengths: List[int] = []
+        self._slots: Dict[str, int] = {}
+        self._document_slots: Dict[str, Set[int]] = {}
+        self._free_slots: List[int] = []
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._slots)
+
+    @property
+    def term_count(self) -> int:
+        return len(self._postings)
+
+    @property
+    def average_length(self) -> float:
+        return self._total_length / len(self._slots) if self._slots else 0.0
+
+    def add_chunk(self, chunk_id: str, document_id: str, text: str) -> None:
+        """Index (or re-index) a chunk"""
+        self.add_terms(chunk_id, document_id, tokenize(text))
+
+    def add_terms(self, chunk_id: str, document_id: str, terms: List[str]) -> None:
+        """Index a chunk from already tokenized terms"""
+        chunk_id = str(chunk_id)
+        frequencies = Counter(terms)
+
+        with self._lock:
+            if chunk_id in self._slots:
+                self._remove_slot(self._slots[chunk_id])
+
+            if self._free_slots:
+                slot = self._free_slots.pop()
+                self._chunk_ids[slot] = chunk_id
+                self._chunk_documents[slot] = document_id
+                self._lengths[slot] = len(terms)
+            else:
+                slot = len(self._chunk_ids)
+                self._chunk_ids.append(chunk_id)
+                self._chunk_documents.append(document_id)
+                self._chunk_terms.append(())
+                self._lengths.append(len(terms))
+
+            chunk_terms = []
+            for term, tf in frequencies.items():
+                term = sys.intern(term)
+                self._postings.setdefault(term, {})[slot] = tf
+                chunk_terms.append(term)
+
+            self._chunk_terms[slot] = tuple(chunk_terms)
+            self._slots[chunk_id] = slot
+            self._document_slots.setdefault(document_id, set()).add(slot)
+            self._total_length += len(terms)
+            self.dirty = True
+
+    def remove_chunk(self, chunk_id: str) -> bool:
+        """Remove a single chunk, returning whether it was indexed"""
+        with self._lock:
+            slot = self._slots.get(str(chunk_id))
+            if slot is None:
+                return False
+            self._remove_slot(slot)
+            self.dirty = True
+            return True
+
+    def remove_document(self, document_id: str) -> int:
+        """Remove every chunk belonging to a document, returning the count removed"""
+        with self._lock:
+            slots = self._document_slots.get(document_id)
+            if not slots:
+                return 0
+            removed = 0
+            for slot in list(slots):
+                self._remove_slot(slot)
+                removed += 1
+            self.dirty = True
+            return removed
+
+    def _remove_slot(self, slot: int) -> None:
+        """Remove a slot from all postings; caller must hold the lock"""
+        for term in self._chunk_terms[slot]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(slot, None)
+            if not postings:
+                del self._postings[term]
+
+        chunk_id = self._chunk_ids[slot]
+        document_id = self._chunk_documents[slot]
+        self._slots.pop(chunk_id, None)
+
+        document_slots = self._document_slots.get(document_id)
+        if document_slots is not None:
+            document_slots.discard(slot)
+            if not document_slots:
+                del self._document_slots[document_id]
+
+        self._total_length -= self._lengths[slot]
+        self._chunk_ids[slot] = None
+        self._chunk_documents[slot] = None
+        self._chunk_terms[slot] = ()
+        self._lengths[slot] = 0
+        self._free_slots.append(slot)
+
+    def idf(self, term: str) -> float:
+        """Okapi BM25 inverse document frequency (always non-negative)"""
+        document_frequency = len(self._postings.get(term, ()))
+        total = len(self._slots)
+        return math.log(
+            1.0 + (total - document_frequency + 0.5) / (document_frequency + 0.5)
+        )
+
+    def score(
+        self,
+        query_terms: Iterable[str],
+        candidates: Optional[Iterable[str]] = None,
+    ) -> Dict[str, float]:
+        """Score every chunk that contains at least one query term
+
+        Only the posting lists of the query terms are visited; chunks that do
+        not match any term are omitted and implicitly score zero. With
+        ``candidates`` only those chunk ids are scored (e.g. the hits of a
+        filtered vector search); term statistics stay collection-wide.
+        """
+        if not self._slots:
+            return {}
+
+        candidate_slots = None
+        if candidates is not None:
+            candidate_slots = {
+                self._slots[chunk_id]
+                for chunk_id in candidates
+                if chunk_id in self._slots
+            }
+            if not candidate_slots:
+                return {}
+
+        avg_length = self.average_length or 1.0
+        k1 = self.k1
+        b = self.b
+        lengths = self._lengths
+        scores: Dict[int, float] = {}
+
+        for term in set(query_terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            if candidate_slots is not None:
+                postings = {
+                    slot: postings[slot]
+                    for slot in candidate_slots
+                    if slot in postings
+                }
+            for slot, tf in postings.items():
+                norm = k1 * (1.0 - b + b * lengths[slot] / avg_length)
+                scores[slot] = scores.get(slot, 0.0) + idf * tf * (k1 + 1.0) / (
+                    tf + norm
+                )
+
+        chunk_ids = self._chunk_ids
+        return {chunk_ids[slot]: value for slot, value in scores.items()}
+
+    def to_dict(self) -> Dict:
+        """Serialize to a compact JSON-compatible structure"""
+        with self._lock:
+            chunks = [
+                [chunk_id, self._chunk_documents[slot], self._lengths[slot]]
+                if chunk_id is not None
+                else None
+                for slot, chunk_id in enumerate(self._chunk_ids)
+            ]
+            postings = {}
+            for term, entries in self._postings.items():
+                flat = []
+                for slot, tf in entries.items():
+                    flat.append(slot)
+                    flat.append(tf)
+                postings[term] = flat
+
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "chunks": chunks,
+            "postings": postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        """Rebuild an index from :meth:`to_dict` output"""
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index version: {data.get('version')}")
+
+        index = cls(k1=data.get("k1", 1.2), b=data.get("b", 0.75))
+        chunk_terms: List[List[str]] = []
+
+        for slot, entry in enumerate(data.get("chunks", [])):
+            chunk_terms.append([])
+            if entry is None:
+                index._chunk_ids.append(None)
+                index._chunk_documents.append(None)
+                index._lengths.append(0)
+                index._free_slots.append(slot)
+                continue
+            chunk_id, document_id, length = entry
+            index._chunk_ids.append(chunk_id)
+            index._chunk_documents.append(document_id)
+            index._lengths.append(length)
+            index._slots[chunk_id] = slot
+            index._document_slots.setdefault(document_id, set()).add(slot)
+            index._total_length += length
+
+        for term, flat in data.get("postings", {}).items():
+            term = sys.intern(term)
+            entries = {}
+            for i in range(0, len(flat), 2):
+                slot = flat[i]
+                entries[slot] = flat[i + 1]
+                chunk_terms[slot].append(term)
+            index._postings[term] = entries
+
+        index._chunk_terms = [tuple(terms) for terms in chunk_terms]
+        return index
+
+
+class BM25IndexManager:
+    """Owns the per-collection BM25 indexes and their on-disk persistence
+
+    Updates are applied in memory immediately and written to disk after a
+    short debounce so that bulk indexing does not rewrite the file per chunk.
+    """
+
+    def __init__(self, index_dir: str, flush_delay: float = 5.0):
+        self.index_dir = Path(index_dir)
+        self.flush_delay = flush_delay
+        self._indexes: Dict[str, BM25Index] = {}
+        self._loaded_mtimes: Dict[str, float] = {}
+        self._build_locks: Dict[str, asyncio.Lock] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+
+    def _index_path(self, collection_name: str) -> Path:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", collection_name)
+        return self.index_dir / f"{safe_name}.json.gz"
+
+    def get(self, collection_name: str) -> Optional[BM25Index]:
+        """Return the index for a collection, loading it from disk if needed
+
+        A clean in-memory copy is reloaded when another worker has written a
+        newer file for the same collection.
+        """
+        path = self._index_path(collection_name)
+        index = self._indexes.get(collection_name)
+
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return index
+
+        if index is not None and (
+            index.dirty or mtime <= self._loaded_mtimes.get(collection_name, 0)
+        ):
+            return index
+
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                index = BM25Index.from_dict(json.load(f))
+        except Exception as e:
+            logger.warning(f"Failed to load BM25 index for {collection_name}: {e}")
+            return self._indexes.get(collection_name)
+
+        self._indexes[collection_name] = index
+        self._loaded_mtimes[collection_name] = mtime
+        return index
+
+    def create(self, collection_name: str) -> BM25Index:
+        """Register an empty index for a newly created collection"""
+        index = BM25Index()
+        index.dirty = True
+        self._indexes[collection_name] = index
+        self._schedule_flush(collection_name)
+        return index
+
+    def install(self, collection_name: str, index: BM25Index) -> None:
+        """Replace a collection's index with a freshly built one"""
+        index.dirty = True
+        self._indexes[collection_name] = index
+        self._schedule_flush(collection_name)
+
+    def build_lock(self, collection_name: str) -> asyncio.Lock:
+        if collection_name not in self._build_locks:
+            self._build_locks[collection_name] = asyncio.Lock()
+        return self._build_locks[collection_name]
+
+    def add_chunks(
+        self, collection_name: str, chunks: Iterable[Tuple[str, str, str]]
+    ) -> int:
+        """Add (chunk_id, document_id, text) tuples to an existing index
+
+        Collections without an index are skipped; their index is bootstrapped
+        from the vector store on first hybrid query and will include these
+        chunks then.
+        """
+        index = self.get(collection_name)
+        if index is None:
+            return 0
+
+        added = 0
+        for chunk_id, document_id, text in chunks:
+            index.add_chunk(chunk_id, document_id, text)
+            added += 1
+
+        if added:
+            self._schedule_flush(collection_name)
+        return added
+
+    def remove_document(self, collection_name: str, document_id: str) -> int:
+        index = self.get(collection_name)
+        if index is None:
+            return 0
+        removed = index.remove_document(document_id)
+        if removed:
+            self._schedule_flush(collection_name)
+        return removed
+
+    def drop(self, collection_name: str) -> None:
+        """Forget a collection's index and delete its file"""
+        self._indexes.pop(collection_name, None)
+        self._loaded_mtimes.pop(collection_name, None)
+        self._build_locks.pop(collection_name, None)
+        task = self._flush_tasks.pop(collection_name, None)
+        if task and not task.done():
+            task.cancel()
+        try:
+            self._index_path(collection_name).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove BM25 index for {collection_name}: {e}")
+
+    def _schedule_flush(self, collection_name: str) -> None:
+        task = self._flush_tasks.get(collection_name)
+        if task and not task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_tasks[collection_name] = loop.create_task(
+            self._delayed_flush(collection_name)
+        )
+
+    async def _delayed_flush(self, collection_name: str) -> None:
+        await asyncio.sleep(self.flush_delay)
+        await self.flush(collection_name)
+
+    async def flush(self, collection_name: str) -> None:
+        """Write a collection's index to disk if it has unsaved changes"""
+        index = self._indexes.get(collection_name)
+        if index is None or not index.dirty:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._save, collection_name, index)
+        except Exception as e:
+            logger.error(f"Failed to persist BM25 index for {collection_name}: {e}")
+
+    async def flush_all(self) -> None:
+        """Persist all dirty indexes, e.g. on shutdown"""
+        for task in list(self._flush_tasks.values()):
+            if not task.done():
+                task.cancel()
+        self._flush_tasks.clear()
+        for collection_name in list(self._indexes):
+            await self.flush(collection_name)
+
+    def _save(self, collection_name: str, index: BM25Index) -> None:
+        index.dirty = False
+        data = index.to_dict()
+
+        path = self._index_path(collection_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=3) as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except Exception:
+            index.dirty = True
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+
+        self._loaded_mtimes[collection_name] = path.stat().st_mtime
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "chunks": index.chunk_count,
+                "terms": index.term_count,
+                "average_length": round(index.average_length, 2),
+            }
+            for name, index in self._indexes.items()
+        }
@@ -0,0 +1,137 @@
+"""
+Streaming ingestion pipeline for RAG indexing
+
+Chunks flow from a generator into fixed-size embedding batches and from
+there into concurrent batched upserts. The stages are connected by bounded
+queues, so a slow stage applies backpressure instead of letting chunks,
+embeddings or points pile up in memory: at most ``max_pending_batches``
+batches wait between two stages regardless of document size, and embedding
+the next batch overlaps with upserting the previous ones.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+EmbedBatch = Callable[[List[str]], Awaitable[List[List[float]]]]
+BuildPoints = Callable[[int, List[str], List[List[float]]], Awaitable[List[Any]]]
+UpsertPoints = Callable[[List[Any]], Awaitable[None]]
+
+# Queue sentinel marking the end of a stage's output
+_DONE = object()
+
+
+@dataclass
+class IngestionStats:
+    """Per-stage timing and volume for one pipeline run"""
+
+    chunks: int = 0
+    batches: int = 0
+    chunk_time: float = 0.0
+    embed_time: float = 0.0
+    upsert_time: float = 0.0
+    total_time: float = 0.0
+    max_queued_batches: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            key: round(value, 4) if isinstance(value, float) else value
+            for key, value in asdict(self).items()
+        }
+
+
+class IngestionPipeline:
+    """Bounded chunk -> embed -> upsert pipeline"""
+
+    def __init__(
+        self,
+        embed_batch: EmbedBatch,
+        build_points: BuildPoints,
+        upsert: UpsertPoints,
+        batch_size: int = 64,
+        max_pending_batches: int = 2,
+        upsert_concurrency: int = 2,
+    ):
+        self.embed_batch = embed_batch
+        self.build_points = build_points
+        self.upsert = upsert
+        self.batch_size = max(1, batch_size)
+        self.max_pending_batches = max(1, max_pending_batches)
+        self.upsert_concurrency = max(1, upsert_concurrency)
+
+    async def run(self, chunks: Iterable[str]) -> IngestionStats:
+        """Stream chunks through the pipeline; raises if any stage fails"""
+        stats = IngestionStats()
+        started = time.perf_counter()
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending_batches)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending_batches)
+
+        def track_depth(queue: asyncio.Queue):
+            stats.max_queued_batches = max(stats.max_queued_batches, queue.qsize())
+
+        async def produce():
+            iterator = iter(chunks)
+            index = 0
+            while True:
+                chunk_started = time.perf_counter()
+                batch: List[str] = []
+                for chunk in iterator:
+                    batch.append(chunk)
+                    if len(batch) >= self.batch_size:
+                        break
+                stats.chunk_time += time.perf_counter() - chunk_started
+
+                if not batch:
+                    break
+                await embed_queue.put((index, batch))
+                track_depth(embed_queue)
+                index += len(batch)
+                stats.chunks += len(batch)
+                stats.batches += 1
+            await embed_queue.put(_DONE)
+
+        async def embed():
+            while True:
+                item = await embed_queue.get()
+                if item is _DONE:
+                    break
+                start_index, batch = item
+                embed_started = time.perf_counter()
+                embeddings = await self.embed_batch(batch)
+                points = await self.build_points(start_index, batch, embeddings)
+                stats.embed_time += time.perf_counter() - embed_started
+                await upsert_queue.put(points)
+                track_depth(upsert_queue)
+            for _ in range(self.upsert_concurrency):
+                await upsert_queue.put(_DONE)
+
+        async def store():
+            while True:
+                points = await upsert_queue.get()
+                if points is _DONE:
+                    break
+                upsert_started = time.perf_counter()
+                await self.upsert(points)
+                stats.upsert_time += time.perf_counter() - upsert_started
+
+        tasks = [asyncio.create_task(produce()), asyncio.create_task(embed())]
+        tasks += [asyncio.create_task(store()) for _ in range(self.upsert_concurrency)]
+        try:
+            # Fail fast: a failing stage would otherwise leave the others blocked
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        stats.total_time = time.perf_counter() - started
+        return stats
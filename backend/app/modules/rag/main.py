@@ -9,7 +9,7 @@ import logging
 import mimetypes
 import re
 import time
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from datetime import datetime
 from dataclasses import dataclass, asdict
 from pathlib import Path
@@ -57,7 +57,7 @@ except ImportError:
     logger.warning("python-docx not available - DOCX processing will be limited")
     PYTHON_DOCX_AVAILABLE = False
 
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.models import (
     Distance,
     VectorParams,
@@ -72,7 +72,33 @@ import tiktoken
 
 from app.core.config import settings
 from app.core.logging import log_module_event
+from app.core.qdrant import qdrant_connection
 from app.services.base_module import BaseModule, Permission
+from app.services.tracing import span
+from app.modules.rag.bm25_index import BM25Index, BM25IndexManager, tokenize
+from app.modules.rag.ingestion import IngestionPipeline, IngestionStats
+from app.modules.rag.search_cache import SearchResultCache
+
+# Characters tokenized at a time when chunking a document
+TOKENIZE_SEGMENT_CHARS = 64 * 1024
+
+
+def _iter_text_segments(text: str, segment_chars: int) -> Iterator[str]:
+    """Split text into segments of roughly segment_chars, cut before whitespace
+
+    Cutting before whitespace keeps word-initial tokens intact, so encoding
+    the segments one by one matches encoding the whole text in practice.
+    """
+    start = 0
+    while len(text) - start > segment_chars:
+        end = start + segment_chars
+        cut = max(text.rfind(" ", start + 1, end), text.rfind("\n", start + 1, end))
+        if cut > start:
+            end = cut
+        yield text[start:end]
+        start = end
+    if start < len(text):
+        yield text[start:]
 
 
 @dataclass
@@ -140,13 +166,47 @@ class SearchResult:
     relevance_score: float
 
 
+def _serialize_search_results(results: List[SearchResult]) -> List[Dict[str, Any]]:
+    """Convert search results to JSON-safe dicts for the shared cache"""
+    return [
+        {
+            "document": {
+                "id": result.document.id,
+                "content": result.document.content,
+                "metadata": json.loads(
+                    json.dumps(result.document.metadata, default=str)
+                ),
+            },
+            "score": result.score,
+            "relevance_score": result.relevance_score,
+        }
+        for result in results
+    ]
+
+
+def _deserialize_search_results(data: List[Dict[str, Any]]) -> List[SearchResult]:
+    """Rebuild search results from the shared cache"""
+    return [
+        SearchResult(
+            document=Document(
+                id=item["document"]["id"],
+                content=item["document"]["content"],
+                metadata=item["document"]["metadata"],
+            ),
+            score=item["score"],
+            relevance_score=item["relevance_score"],
+        )
+        for item in data
+    ]
+
+
 class RAGModule(BaseModule):
     """RAG module for document storage, retrieval, and augmented generation with integrated content processing"""
 
     def __init__(self, config: Dict[str, Any] = None):
         super().__init__(module_id="rag", config=config)
         self.enabled = False
-        self.qdrant_client: Optional[QdrantClient] = None
+        self.qdrant_client: Optional[AsyncQdrantClient] = None
         self.default_collection_name = "documents"  # Keep for backward compatibility
         self.embedding_model = None
         self.embedding_service = None
@@ -202,8 +262,18 @@ class RAGModule(BaseModule):
             "errors": 0,
             "supported_types": len(self.supported_types),
         }
-        self.search_cache = {}
+        self.search_cache = SearchResultCache(
+            max_entries=getattr(settings, "RAG_SEARCH_CACHE_MAX_ENTRIES", 1000),
+            ttl=getattr(settings, "RAG_SEARCH_CACHE_TTL", 300),
+            use_redis=getattr(settings, "RAG_SEARCH_CACHE_REDIS", True),
+            serialize=_serialize_search_results,
+            deserialize=_deserialize_search_results,
+        )
         self.collection_vector_sizes: Dict[str, int] = {}
+        self.bm25_indexes = BM25IndexManager(
+            index_dir=getattr(settings, "RAG_BM25_INDEX_DIR", "storage/bm25_index"),
+            flush_delay=getattr(settings, "RAG_BM25_FLUSH_DELAY", 5.0),
+        )
 
     def get_required_permissions(self) -> List[Permission]:
         """Return list of permissions this module requires"""
@@ -219,11 +289,8 @@ class RAGModule(BaseModule):
         """Initialize the RAG module with content processing capabilities"""
 
         try:
-            # Initialize Qdrant client
-            qdrant_host = getattr(settings, "QDRANT_HOST", "localhost")
-            qdrant_port = getattr(settings, "QDRANT_PORT", 6333)
-            qdrant_url = f"http://{qdrant_host}:{qdrant_port}"
-            self.qdrant_client = QdrantClient(url=qdrant_url)
+            # Use the shared async Qdrant client so vector I/O never blocks the loop
+            self.qdrant_client = qdrant_connection.get_client()
 
             # Initialize tokenizer
             self.tokenizer = tiktoken.get_encoding("cl100k_base")
@@ -501,9 +568,10 @@ class RAGModule(BaseModule):
 
     async def cleanup(self):
         """Cleanup RAG resources"""
-        if self.qdrant_client:
-            self.qdrant_client.close()
-            self.qdrant_client = None
+        await self.bm25_indexes.flush_all()
+
+        # The shared Qdrant client is closed on application shutdown
+        self.qdrant_client = None
 
         if self.embedding_service:
             await self.embedding_service.cleanup()
@@ -607,31 +675,23 @@ class RAGModule(BaseModule):
     async def _get_collections_safely(self) -> List[str]:
         """Get list of collections using raw HTTP to avoid Pydantic validation issues"""
         try:
-            import httpx
-
-            qdrant_host = getattr(settings, "QDRANT_HOST", "localhost")
-            qdrant_port = getattr(settings, "QDRANT_PORT", 6333)
-            qdrant_url = f"http://{qdrant_host}:{qdrant_port}"
-
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{qdrant_url}/collections")
-                if response.status_code == 200:
-                    data = response.json()
-                    result = data.get("result", {})
-                    collections = result.get("collections", [])
-                    return [
-                        col.get("name", "") for col in collections if col.get("name")
-                    ]
-                else:
-                    logger.warning(
-                        f"Failed to get collections via HTTP: {response.status_code}"
-                    )
-                    return []
+            client = qdrant_connection.get_http_client()
+            response = await client.get("/collections")
+            if response.status_code == 200:
+                data = response.json()
+                result = data.get("result", {})
+                collections = result.get("collections", [])
+                return [col.get("name", "") for col in collections if col.get("name")]
+            else:
+                logger.warning(
+                    f"Failed to get collections via HTTP: {response.status_code}"
+                )
+                return []
         except Exception as e:
             logger.error(f"Error getting collections safely: {e}")
             # Fallback to direct client call with error handling
             try:
-                collections = self.qdrant_client.get_collections()
+                collections = await self.qdrant_client.get_collections()
                 return [col.name for col in collections.collections]
             except Exception as fallback_error:
                 logger.error(f"Fallback collection fetch also failed: {fallback_error}")
@@ -640,57 +700,49 @@ class RAGModule(BaseModule):
     async def _get_collection_info_safely(self, collection_name: str) -> Dict[str, Any]:
         """Get collection information using raw HTTP to avoid Pydantic validation issues"""
         try:
-            import httpx
+            client = qdrant_connection.get_http_client()
+            response = await client.get(f"/collections/{collection_name}")
+            if response.status_code == 200:
+                data = response.json()
+                result = data.get("result", {})
+
+                # Extract relevant information safely
+                collection_info = {
+                    "points_count": result.get("points_count", 0),
+                    "status": result.get("status", "unknown"),
+                    "vector_size": 384,  # Default fallback
+                }
 
-            qdrant_host = getattr(settings, "QDRANT_HOST", "localhost")
-            qdrant_port = getattr(settings, "QDRANT_PORT", 6333)
-            qdrant_url = f"http://{qdrant_host}:{qdrant_port}"
+                # Try to get vector dimension from config
+                try:
+                    config = result.get("config", {})
+                    params = config.get("params", {})
+                    vectors = params.get("vectors", {})
+
+                    if isinstance(vectors, dict) and "size" in vectors:
+                        collection_info["vector_size"] = vectors["size"]
+                    elif isinstance(vectors, dict):
+                        # Handle named vectors or default vector
+                        if "default" in vectors:
+                            collection_info["vector_size"] = vectors["default"].get(
+                                "size", 384
+                            )
+                        else:
+                            # Take first vector config if no default
+                            first_vector = next(iter(vectors.values()), {})
+                            collection_info["vector_size"] = first_vector.get(
+                                "size", 384
+                            )
+                except Exception:
+                    # Keep default fallback
+                    pass
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{qdrant_url}/collections/{collection_name}"
+                return collection_info
+            else:
+                logger.warning(
+                    f"Failed to get collection info via HTTP: {response.status_code}"
                 )
-                if response.status_code == 200:
-                    data = response.json()
-                    result = data.get("result", {})
-
-                    # Extract relevant information safely
-                    collection_info = {
-                        "points_count": result.get("points_count", 0),
-                        "status": result.get("status", "unknown"),
-                        "vector_size": 384,  # Default fallback
-                    }
-
-                    # Try to get vector dimension from config
-                    try:
-                        config = result.get("config", {})
-                        params = config.get("params", {})
-                        vectors = params.get("vectors", {})
-
-                        if isinstance(vectors, dict) and "size" in vectors:
-                            collection_info["vector_size"] = vectors["size"]
-                        elif isinstance(vectors, dict):
-                            # Handle named vectors or default vector
-                            if "default" in vectors:
-                                collection_info["vector_size"] = vectors["default"].get(
-                                    "size", 384
-                                )
-                            else:
-                                # Take first vector config if no default
-                                first_vector = next(iter(vectors.values()), {})
-                                collection_info["vector_size"] = first_vector.get(
-                                    "size", 384
-                                )
-                    except Exception:
-                        # Keep default fallback
-                        pass
-
-                    return collection_info
-                else:
-                    logger.warning(
-                        f"Failed to get collection info via HTTP: {response.status_code}"
-                    )
-                    return {"points_count": 0, "status": "error", "vector_size": 384}
+                return {"points_count": 0, "status": "error", "vector_size": 384}
         except Exception as e:
             logger.error(f"Error getting collection info safely: {e}")
             return {"points_count": 0, "status": "error", "vector_size": 384}
@@ -710,20 +762,21 @@ class RAGModule(BaseModule):
                     getattr(self.embedding_service, "dimension", 384) or 384,
                 )
 
-                self.qdrant_client.create_collection(
+                await self.qdrant_client.create_collection(
                     collection_name=collection_name,
                     vectors_config=VectorParams(
                         size=vector_dimension, distance=Distance.COSINE
                     ),
                 )
                 self.collection_vector_sizes[collection_name] = vector_dimension
+                self.bm25_indexes.create(collection_name)
                 log_module_event(
                     "rag", "collection_created", {"collection": collection_name}
                 )
             else:
                 # Cache existing collection vector size for later alignment
                 try:
-                    info = self.qdrant_client.get_collection(collection_name)
+                    info = await self.qdrant_client.get_collection(collection_name)
                     vectors_param = (
                         getattr(info.config.params, "vectors", None)
                         if hasattr(info, "config")
@@ -755,6 +808,11 @@ class RAGModule(BaseModule):
             logger.error(f"Error creating collection {collection_name}: {e}")
             return False
 
+    async def drop_collection_indexes(self, collection_name: str):
+        """Forget the BM25 index and cached results of a deleted collection"""
+        self.bm25_indexes.drop(collection_name)
+        await self.search_cache.invalidate_collection(collection_name)
+
     async def delete_collection(self, collection_name: str) -> bool:
         """Delete a Qdrant collection"""
         try:
@@ -762,7 +820,8 @@ class RAGModule(BaseModule):
             collection_names = await self._get_collections_safely()
 
             if collection_name in collection_names:
-                self.qdrant_client.delete_collection(collection_name)
+                await self.qdrant_client.delete_collection(collection_name)
+                await self.drop_collection_indexes(collection_name)
                 log_module_event(
                     "rag", "collection_deleted", {"collection": collection_name}
                 )
@@ -813,7 +872,13 @@ class RAGModule(BaseModule):
                     "scope": "documents" if is_document else "queries",
                 },
             )
-            embeddings = await self.embedding_service.get_embeddings(prefixed_texts)
+            # Only short, repetitive queries benefit from the embedding cache,
+            # and random fallback vectors must never be written to a collection
+            embeddings = await self.embedding_service.get_embeddings(
+                prefixed_texts,
+                use_cache=not is_document,
+                allow_fallback=not is_document,
+            )
             duration = time.time() - start_time
             logger.info(
                 "Embedding batch finished",
@@ -841,7 +906,9 @@ class RAGModule(BaseModule):
                 embeddings.append(embedding)
             return embeddings
 
-    def _get_collection_vector_size(self, collection_name: Optional[str]) -> int:
+    async def _get_collection_vector_size(
+        self, collection_name: Optional[str]
+    ) -> int:
         """Return the expected vector size for a collection, caching results."""
         default_dim = self.embedding_model.get(
             "dimension", getattr(self.embedding_service, "dimension", 384) or 384
@@ -854,7 +921,7 @@ class RAGModule(BaseModule):
             return self.collection_vector_sizes[collection_name]
 
         try:
-            info = self.qdrant_client.get_collection(collection_name)
+            info = await self.qdrant_client.get_collection(collection_name)
             vectors_param = (
                 getattr(info.config.params, "vectors", None)
                 if hasattr(info, "config")
@@ -875,14 +942,14 @@ class RAGModule(BaseModule):
         self.collection_vector_sizes[collection_name] = default_dim
         return default_dim
 
-    def _align_embedding_dimension(
+    async def _align_embedding_dimension(
         self, vector: List[float], collection_name: Optional[str]
     ) -> List[float]:
         """Pad or truncate embeddings to match the target collection dimension."""
         if vector is None:
             return vector
 
-        target_dim = self._get_collection_vector_size(collection_name)
+        target_dim = await self._get_collection_vector_size(collection_name)
         current_dim = len(vector)
 
         if current_dim == target_dim:
@@ -894,14 +961,42 @@ class RAGModule(BaseModule):
 
     def _chunk_text(self, text: str, chunk_size: int = None) -> List[str]:
         """Split text into overlapping chunks for better context preservation"""
+        return list(self._iter_text_chunks(text, chunk_size))
+
+    def _iter_text_chunks(
+        self,
+        text: str,
+        chunk_size: int = None,
+        segment_chars: int = TOKENIZE_SEGMENT_CHARS,
+    ) -> Iterator[str]:
+        """Lazily chunk text, tokenizing it one segment at a time
+
+        Yields the same chunks as ``_iter_chunks`` over the fully encoded text,
+        but only holds about one segment plus one chunk of tokens at a time.
+        """
+        chunk_size = chunk_size or self.config.get("chunk_size", 300)
+        step = chunk_size - self.config.get("chunk_overlap", 50)
+        if step <= 0:
+            step = chunk_size
+
+        tokens: List[int] = []
+        for segment in _iter_text_segments(text, segment_chars):
+            tokens.extend(self.tokenizer.encode(segment))
+            # A window is final once more tokens follow it
+            while len(tokens) > chunk_size:
+                chunk_text = self.tokenizer.decode(tokens[:chunk_size])
+                if chunk_text.strip():
+                    yield chunk_text
+                del tokens[:step]
+
+        yield from self._iter_chunks(tokens, chunk_size)
+
+    def _iter_chunks(self, tokens: List[int], chunk_size: int = None) -> Iterator[str]:
+        """Lazily decode overlapping chunks from a token sequence"""
         chunk_size = chunk_size or self.config.get("chunk_size", 300)
         chunk_overlap = self.config.get("chunk_overlap", 50)
 
-        # Tokenize text
-        tokens = self.tokenizer.encode(text)
-
         # Split into chunks with overlap
-        chunks = []
         start_idx = 0
 
         while start_idx < len(tokens):
@@ -909,9 +1004,9 @@ class RAGModule(BaseModule):
             chunk_tokens = tokens[start_idx:end_idx]
             chunk_text = self.tokenizer.decode(chunk_tokens)
 
-            # Only add non-empty chunks
+            # Only yield non-empty chunks
             if chunk_text.strip():
-                chunks.append(chunk_text)
+                yield chunk_text
 
             # Move to next chunk with overlap
             # Ensure we make progress and don't loop infinitely
@@ -923,8 +1018,6 @@ class RAGModule(BaseModule):
             if start_idx <= end_idx - chunk_size:
                 start_idx = end_idx
 
-        return chunks
-
     async def _process_text(self, content: bytes, filename: str) -> str:
         """Process plain text files"""
         try:
@@ -1477,37 +1570,10 @@ class RAGModule(BaseModule):
                 )
                 return doc_id
 
-            # Chunk the document
-            chunks = self._chunk_text(content)
-
-            # Generate embeddings for all chunks in batch (more efficient)
-            embeddings = await self._generate_embeddings(chunks, is_document=True)
-
-            # Create document points
-            points = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                aligned_embedding = self._align_embedding_dimension(
-                    embedding, collection_name
-                )
-                chunk_id = str(uuid.uuid4())
-
-                chunk_metadata = {
-                    **metadata,
-                    "document_id": doc_id,
-                    "chunk_index": i,
-                    "chunk_count": len(chunks),
-                    "content": chunk,
-                    "indexed_at": datetime.utcnow().isoformat(),
-                }
-
-                points.append(
-                    PointStruct(
-                        id=chunk_id, vector=aligned_embedding, payload=chunk_metadata
-                    )
-                )
-
-            # Insert points into Qdrant
-            self.qdrant_client.upsert(collection_name=collection_name, points=points)
+            # Stream chunks through embedding and upsert
+            chunk_count, pipeline_stats = await self._index_chunks(
+                collection_name, doc_id, content, {**metadata, "document_id": doc_id}
+            )
 
             self.stats["documents_indexed"] += 1
             log_module_event(
@@ -1516,8 +1582,9 @@ class RAGModule(BaseModule):
                 {
                     "document_id": doc_id,
                     "collection": collection_name,
-                    "chunks": len(chunks),
+                    "chunks": chunk_count,
                     "metadata": metadata,
+                    "pipeline": pipeline_stats.to_dict(),
                 },
             )
 
@@ -1550,12 +1617,14 @@ class RAGModule(BaseModule):
                     file_content = f.read()
 
                 # Process using the optimized JSONL processor
-                return await jsonl_processor.process_and_index_jsonl(
+                document_id = await jsonl_processor.process_and_index_jsonl(
                     collection_name=collection_name,
                     content=file_content,
                     filename=processed_doc.original_filename,
                     metadata=processed_doc.metadata,
                 )
+                await self.search_cache.invalidate_collection(collection_name)
+                return document_id
 
             # Ensure collection exists
             await self._ensure_collection_exists(collection_name)
@@ -1569,51 +1638,30 @@ class RAGModule(BaseModule):
                 )
                 return processed_doc.id
 
-            # Chunk the document
-            chunks = self._chunk_text(processed_doc.content)
-
-            # Generate embeddings for all chunks in batch (more efficient)
-            embeddings = await self._generate_embeddings(chunks, is_document=True)
-
-            # Create document points with enhanced metadata
-            points = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                aligned_embedding = self._align_embedding_dimension(
-                    embedding, collection_name
-                )
-                chunk_id = str(uuid.uuid4())
-
-                chunk_metadata = {
-                    **processed_doc.metadata,
-                    "document_id": processed_doc.id,
-                    "original_filename": processed_doc.original_filename,
-                    "file_type": processed_doc.file_type,
-                    "mime_type": processed_doc.mime_type,
-                    "language": processed_doc.language,
-                    "entities": processed_doc.entities,
-                    "keywords": processed_doc.keywords,
-                    "word_count": processed_doc.word_count,
-                    "sentence_count": processed_doc.sentence_count,
-                    "file_hash": processed_doc.file_hash,
-                    "processed_at": processed_doc.processed_at.isoformat(),
-                    "chunk_index": i,
-                    "chunk_count": len(chunks),
-                    "content": chunk,
-                    "indexed_at": datetime.utcnow().isoformat(),
-                }
-
-                # Add source_url if present in ProcessedDocument
-                if processed_doc.source_url:
-                    chunk_metadata["source_url"] = processed_doc.source_url
+            # Enhanced metadata shared by every chunk
+            base_payload = {
+                **processed_doc.metadata,
+                "document_id": processed_doc.id,
+                "original_filename": processed_doc.original_filename,
+                "file_type": processed_doc.file_type,
+                "mime_type": processed_doc.mime_type,
+                "language": processed_doc.language,
+                "entities": processed_doc.entities,
+                "keywords": processed_doc.keywords,
+                "word_count": processed_doc.word_count,
+                "sentence_count": processed_doc.sentence_count,
+                "file_hash": processed_doc.file_hash,
+                "processed_at": processed_doc.processed_at.isoformat(),
+            }
 
-                points.append(
-                    PointStruct(
-                        id=chunk_id, vector=aligned_embedding, payload=chunk_metadata
-                    )
-                )
+            # Add source_url if present in ProcessedDocument
+            if processed_doc.source_url:
+                base_payload["source_url"] = processed_doc.source_url
 
-            # Insert points into Qdrant
-            self.qdrant_client.upsert(collection_name=collection_name, points=points)
+            # Stream chunks through embedding and upsert
+            chunk_count, pipeline_stats = await self._index_chunks(
+                collection_name, processed_doc.id, processed_doc.content, base_payload
+            )
 
             self.stats["documents_indexed"] += 1
             log_module_event(
@@ -1623,9 +1671,10 @@ class RAGModule(BaseModule):
                     "document_id": processed_doc.id,
                     "filename": processed_doc.original_filename,
                     "collection": collection_name,
-                    "chunks": len(chunks),
+                    "chunks": chunk_count,
                     "file_type": processed_doc.file_type,
                     "language": processed_doc.language,
+                    "pipeline": pipeline_stats.to_dict(),
                 },
             )
 
@@ -1636,6 +1685,90 @@ class RAGModule(BaseModule):
             log_module_event("rag", "indexing_failed", {"error": str(e)})
             raise
 
+    async def _index_chunks(
+        self,
+        collection_name: str,
+        document_id: str,
+        text: str,
+        base_payload: Dict[str, Any],
+    ) -> Tuple[int, IngestionStats]:
+        """Chunk, embed and upsert a document through the streaming pipeline
+
+        The text is tokenized and chunks are decoded lazily, and only a bounded
+        number of batches is in flight at any time. ``chunk_count`` is written
+        to the document's points once all chunks have been upserted. If any
+        stage fails, the points already written for the document are removed
+        again.
+        """
+        indexed_at = datetime.utcnow().isoformat()
+
+        async def embed_batch(chunks: List[str]) -> List[List[float]]:
+            return await self._generate_embeddings(chunks, is_document=True)
+
+        async def build_points(
+            start_index: int, chunks: List[str], embeddings: List[List[float]]
+        ) -> List[PointStruct]:
+            points = []
+            for offset, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+                aligned_embedding = await self._align_embedding_dimension(
+                    embedding, collection_name
+                )
+                points.append(
+                    PointStruct(
+                        id=str(uuid.uuid4()),
+                        vector=aligned_embedding,
+                        payload={
+                            **base_payload,
+                            "chunk_index": start_index + offset,
+                            "content": chunk,
+                            "indexed_at": indexed_at,
+                        },
+                    )
+                )
+            return points
+
+        async def upsert(points: List[PointStruct]):
+            await self.qdrant_client.upsert(
+                collection_name=collection_name, points=points
+            )
+            self._add_points_to_bm25_index(collection_name, points)
+
+        pipeline = IngestionPipeline(
+            embed_batch,
+            build_points,
+            upsert,
+            batch_size=getattr(settings, "RAG_INGEST_EMBED_BATCH_SIZE", 64),
+            max_pending_batches=getattr(settings, "RAG_INGEST_MAX_PENDING_BATCHES", 2),
+            upsert_concurrency=getattr(settings, "RAG_INGEST_UPSERT_CONCURRENCY", 2),
+        )
+        try:
+            stats = await pipeline.run(self._iter_text_chunks(text))
+            if stats.chunks:
+                # The total is only known once the text has been consumed
+                await self.qdrant_client.set_payload(
+                    collection_name=collection_name,
+                    payload={"chunk_count": stats.chunks},
+                    points=Filter(
+                        must=[
+                            FieldCondition(
+                                key="document_id", match=MatchValue(value=document_id)
+                            )
+                        ]
+                    ),
+                )
+        except Exception:
+            # Do not leave a partially indexed document behind
+            await self.delete_document(document_id, collection_name)
+            raise
+        finally:
+            await self.search_cache.invalidate_collection(collection_name)
+
+        logger.info(
+            f"Indexed {stats.chunks} chunks of {document_id} into {collection_name}: "
+            f"{stats.to_dict()}"
+        )
+        return stats.chunks, stats
+
     async def _document_exists(
         self, document_id: str, collection_name: str = None
     ) -> bool:
@@ -1643,7 +1776,7 @@ class RAGModule(BaseModule):
         collection_name = collection_name or self.default_collection_name
 
         try:
-            result = self.qdrant_client.search(
+            result = await self.qdrant_client.search(
                 collection_name=collection_name,
                 query_filter=Filter(
                     must=[
@@ -1658,6 +1791,83 @@ class RAGModule(BaseModule):
         except Exception:
             return False
 
+    def _add_points_to_bm25_index(
+        self, collection_name: str, points: List[PointStruct]
+    ) -> None:
+        """Add freshly upserted points to the collection's BM25 index"""
+        try:
+            self.bm25_indexes.add_chunks(
+                collection_name,
+                (
+                    (
+                        str(point.id),
+                        point.payload.get("document_id", ""),
+                        point.payload.get("content", ""),
+                    )
+                    for point in points
+                ),
+            )
+        except Exception as e:
+            # The vectors are already stored; a stale keyword index only degrades ranking
+            logger.warning(f"Failed to update BM25 index for {collection_name}: {e}")
+
+    async def _get_bm25_index(self, collection_name: str) -> Optional[BM25Index]:
+        """Return the BM25 index for a collection, building it once if missing
+
+        Collections created before the index existed have no file on disk, so
+        the first hybrid query scrolls the collection one time to bootstrap it.
+        """
+        index = self.bm25_indexes.get(collection_name)
+        if index is not None:
+            return index
+
+        async with self.bm25_indexes.build_lock(collection_name):
+            index = self.bm25_indexes.get(collection_name)
+            if index is not None:
+                return index
+
+            start_time = time.time()
+            index = BM25Index()
+            offset = None
+            batch_size = 256
+
+            try:
+                while True:
+                    points, offset = await self.qdrant_client.scroll(
+                        collection_name=collection_name,
+                        limit=batch_size,
+                        offset=offset,
+                        with_payload=["document_id", "content"],
+                        with_vectors=False,
+                    )
+                    for point in points:
+                        payload = point.payload or {}
+                        index.add_chunk(
+                            str(point.id),
+                            payload.get("document_id", ""),
+                            payload.get("content", ""),
+                        )
+                    if offset is None:
+                        break
+                    # Yield to the event loop between batches
+                    await asyncio.sleep(0)
+            except Exception as e:
+                logger.error(f"Failed to build BM25 index for {collection_name}: {e}")
+                return None
+
+            self.bm25_indexes.install(collection_name, index)
+            log_module_event(
+                "rag",
+                "bm25_index_built",
+                {
+                    "collection": collection_name,
+                    "chunks": index.chunk_count,
+                    "terms": index.term_count,
+                    "duration": round(time.time() - start_time, 3),
+                },
+            )
+            return index
+
     async def _hybrid_search(
         self,
         collection_name: str,
@@ -1669,47 +1879,8 @@ class RAGModule(BaseModule):
     ) -> List[Any]:
         """Perform hybrid search combining vector similarity and BM25 scoring"""
 
-        # Preprocess query for BM25
-        query_terms = self._preprocess_text_for_bm25(query)
-
-        # Get all documents from the collection (for BM25 scoring)
-        # Note: In production, you'd want to optimize this with a proper BM25 index
-        scroll_filter = query_filter or Filter()
-        all_points = []
-
-        # Use scroll to get all points
-        offset = None
-        batch_size = 100
-        while True:
-            search_result = self.qdrant_client.scroll(
-                collection_name=collection_name,
-                scroll_filter=scroll_filter,
-                limit=batch_size,
-                offset=offset,
-                with_payload=True,
-                with_vectors=False,
-            )
-
-            points = search_result[0]
-            all_points.extend(points)
-
-            if len(points) < batch_size:
-                break
-
-            offset = points[-1].id
-
-        # Calculate BM25 scores for each document
-        bm25_scores = {}
-        for point in all_points:
-            doc_id = point.payload.get("document_id", "")
-            content = point.payload.get("content", "")
-
-            # Calculate BM25 score
-            bm25_score = self._calculate_bm25_score(query_terms, content)
-            bm25_scores[doc_id] = bm25_score
-
         # Perform vector search
-        vector_results = self.qdrant_client.search(
+        vector_results = await self.qdrant_client.search(
             collection_name=collection_name,
             query_vector=query_vector,
             query_filter=query_filter,
@@ -1717,6 +1888,18 @@ class RAGModule(BaseModule):
             score_threshold=score_threshold / 2,  # Lower threshold for initial search
         )
 
+        # BM25 scores (and their normalization) cover only the vector hits,
+        # which already honour query_filter
+        query_terms = self._preprocess_text_for_bm25(query)
+        bm25_index = await self._get_bm25_index(collection_name)
+        bm25_scores = (
+            bm25_index.score(
+                query_terms, candidates=[str(r.id) for r in vector_results]
+            )
+            if bm25_index
+            else {}
+        )
+
         # Combine scores with improved normalization
         hybrid_weights = self.config.get("hybrid_weights", {"vector": 0.7, "bm25": 0.3})
         vector_weight = hybrid_weights.get("vector", 0.7)
@@ -1724,7 +1907,6 @@ class RAGModule(BaseModule):
 
         # Get score distributions for better normalization
         vector_scores = [r.score for r in vector_results]
-        bm25_scores_list = list(bm25_scores.values())
 
         # Calculate statistics for normalization
         if vector_scores:
@@ -1734,33 +1916,33 @@ class RAGModule(BaseModule):
         else:
             v_max, v_min, v_range = 1, 0, 1
 
-        if bm25_scores_list:
-            bm25_max = max(bm25_scores_list)
-            bm25_min = min(bm25_scores_list)
-            bm25_range = bm25_max - bm25_min if bm25_max != bm25_min else 1
-        else:
-            bm25_max, bm25_min, bm25_range = 1, 0, 1
+        # Chunks without matching terms score zero, which is the natural floor
+        bm25_max = max(bm25_scores.values()) if bm25_scores else 1
+        bm25_range = bm25_max if bm25_max > 0 else 1
+        bm25_ranks = {
+            chunk_id: rank
+            for rank, chunk_id in enumerate(
+                sorted(bm25_scores, key=bm25_scores.get, reverse=True)
+            )
+        }
 
         # Create hybrid results with improved scoring
         hybrid_results = []
-        for result in vector_results:
-            doc_id = result.payload.get("document_id", "")
+        for vector_rank, result in enumerate(vector_results):
+            chunk_id = str(result.id)
             vector_score = result.score
-            bm25_score = bm25_scores.get(doc_id, 0.0)
+            bm25_score = bm25_scores.get(chunk_id, 0.0)
 
             # Improved normalization using actual score distributions
             vector_norm = (vector_score - v_min) / v_range if v_range > 0 else 0.5
-            bm25_norm = (bm25_score - bm25_min) / bm25_range if bm25_range > 0 else 0.5
+            bm25_norm = bm25_score / bm25_range
 
             # Apply reciprocal rank fusion for better combination
             # This gives more weight to documents that rank highly in both methods
-            rrf_vector = 1.0 / (
-                1.0 + vector_results.index(result) + 1
-            )  # +1 to avoid division by zero
+            rrf_vector = 1.0 / (1.0 + vector_rank + 1)  # +1 to avoid division by zero
             rrf_bm25 = (
-                1.0
-                / (1.0 + sorted(bm25_scores_list, reverse=True).index(bm25_score) + 1)
-                if bm25_score in bm25_scores_list
+                1.0 / (1.0 + bm25_ranks[chunk_id] + 1)
+                if chunk_id in bm25_ranks
                 else 0
             )
 
@@ -1772,11 +1954,11 @@ class RAGModule(BaseModule):
             # Create new point with hybrid score
             hybrid_point = ScoredPoint(
                 id=result.id,
+                version=result.version,
                 payload=result.payload,
                 score=hybrid_score,
                 vector=result.vector,
                 shard_key=None,
-                order_value=None,
             )
             hybrid_results.append(hybrid_point)
 
@@ -1787,69 +1969,14 @@ class RAGModule(BaseModule):
         ]
 
         logger.info(
-            f"Hybrid search: {len(vector_results)} vector results, {len(final_results)} final results"
+            f"Hybrid search: {len(vector_results)} vector results, "
+            f"{len(bm25_scores)} BM25 matches, {len(final_results)} final results"
         )
         return final_results
 
     def _preprocess_text_for_bm25(self, text: str) -> List[str]:
-        """Preprocess text for BM25 scoring"""
-        if not NLTK_AVAILABLE:
-            return text.lower().split()
-
-        try:
-            # Tokenize
-            tokens = word_tokenize(text.lower())
-
-            # Remove stopwords and non-alphabetic tokens
-            stop_words = set(stopwords.words("english"))
-            filtered_tokens = [
-                token
-                for token in tokens
-                if token.isalpha() and token not in stop_words and len(token) > 2
-            ]
-
-            return filtered_tokens
-        except:
-            # Fallback to simple splitting
-            return text.lower().split()
-
-    def _calculate_bm25_score(self, query_terms: List[str], document: str) -> float:
-        """Calculate BM25 score for a document against query terms"""
-        if not query_terms:
-            return 0.0
-
-        # Preprocess document
-        doc_terms = self._preprocess_text_for_bm25(document)
-        if not doc_terms:
-            return 0.0
-
-        # Calculate term frequencies
-        doc_len = len(doc_terms)
-        avg_doc_len = 300  # Average document length (configurable)
-
-        # BM25 parameters
-        k1 = 1.2  # Controls term frequency saturation
-        b = 0.75  # Controls document length normalization
-
-        score = 0.0
-
-        # Calculate IDF for each query term
-        for term in set(query_terms):
-            # Term frequency in document
-            tf = doc_terms.count(term)
-
-            # Simple IDF (log(N/n) + 1)
-            # In production, you'd use the actual document frequency
-            idf = 2.0  # Simplified IDF
-
-            # BM25 formula
-            numerator = tf * (k1 + 1)
-            denominator = tf + k1 * (1 - b + b * (doc_len / avg_doc_len))
-
-            score += idf * (numerator / denominator)
-
-        # Normalize score to 0-1 range
-        return min(score / 10.0, 1.0)  # Simple normalization
+        """Preprocess text for BM25 scoring (same tokenization as the index)"""
+        return tokenize(text)
 
     async def search_documents(
         self,
@@ -1866,11 +1993,16 @@ class RAGModule(BaseModule):
         collection_name = collection_name or self.default_collection_name
         max_results = max_results or self.config.get("max_results", 10)
 
-        # Check cache (include collection name in cache key)
-        cache_key = f"{collection_name}_{query}_{max_results}_{hash(str(filters))}"
-        if cache_key in self.search_cache:
+        # Check cache (invalidated per collection on index/delete)
+        cache_key = self.search_cache.make_key(
+            collection_name, query, max_results, filters, score_threshold
+        )
+        cached_results, cache_generation = await self.search_cache.lookup(
+            collection_name, cache_key
+        )
+        if cached_results is not None:
             self.stats["cache_hits"] += 1
-            return self.search_cache[cache_key]
+            return cached_results
 
         try:
             import time
@@ -1879,10 +2011,11 @@ class RAGModule(BaseModule):
 
             # Generate query embedding with task-specific prefix for better retrieval
             optimized_query = f"query: {query}"
-            query_embedding = await self._generate_embedding(optimized_query)
-            query_embedding = self._align_embedding_dimension(
-                query_embedding, collection_name
-            )
+            with span("rag.embed"):
+                query_embedding = await self._generate_embedding(optimized_query)
+                query_embedding = await self._align_embedding_dimension(
+                    query_embedding, collection_name
+                )
 
             # Build filter
             search_filter = None
@@ -1915,25 +2048,27 @@ class RAGModule(BaseModule):
                 else self.config.get("score_threshold", 0.3)
             )
 
-            if enable_hybrid and NLTK_AVAILABLE:
-                # Perform hybrid search (vector + BM25)
-                search_results = await self._hybrid_search(
-                    collection_name=collection_name,
-                    query=query,
-                    query_vector=query_embedding,
-                    query_filter=search_filter,
-                    limit=max_results,
-                    score_threshold=search_score_threshold,
-                )
-            else:
-                # Pure vector search with improved threshold
-                search_results = self.qdrant_client.search(
-                    collection_name=collection_name,
-                    query_vector=query_embedding,
-                    query_filter=search_filter,
-                    limit=max_results,
-                    score_threshold=search_score_threshold,
-                )
+            hybrid = bool(enable_hybrid)
+            with span("rag.search", collection=collection_name, hybrid=hybrid):
+                if hybrid:
+                    # Perform hybrid search (vector + BM25)
+                    search_results = await self._hybrid_search(
+                        collection_name=collection_name,
+                        query=query,
+                        query_vector=query_embedding,
+                        query_filter=search_filter,
+                        limit=max_results,
+                        score_threshold=search_score_threshold,
+                    )
+                else:
+                    # Pure vector search with improved threshold
+                    search_results = await self.qdrant_client.search(
+                        collection_name=collection_name,
+                        query_vector=query_embedding,
+                        query_filter=search_filter,
+                        limit=max_results,
+                        score_threshold=search_score_threshold,
+                    )
 
             logger.info(f"Raw search results count: {len(search_results)}")
 
@@ -2043,7 +2178,9 @@ class RAGModule(BaseModule):
             ) / self.stats["searches_performed"]
 
             # Cache results
-            self.search_cache[cache_key] = results
+            await self.search_cache.set(
+                collection_name, cache_key, results, cache_generation
+            )
 
             log_module_event(
                 "rag",
@@ -2078,7 +2215,7 @@ class RAGModule(BaseModule):
 
         try:
             # Delete all chunks for this document
-            self.qdrant_client.delete(
+            await self.qdrant_client.delete(
                 collection_name=collection_name,
                 points_selector=models.FilterSelector(
                     filter=Filter(
@@ -2090,6 +2227,8 @@ class RAGModule(BaseModule):
                     )
                 ),
             )
+            self.bm25_indexes.remove_document(collection_name, document_id)
+            await self.search_cache.invalidate_collection(collection_name)
 
             log_module_event(
                 "rag",
@@ -2112,57 +2251,54 @@ class RAGModule(BaseModule):
     async def get_stats(self) -> Dict[str, Any]:
         """Get RAG module statistics"""
         stats = self.stats.copy()
+        stats["bm25_indexes"] = self.bm25_indexes.get_stats()
+        stats["search_cache"] = self.search_cache.get_stats()
 
         if self.enabled:
             try:
-                # Use raw HTTP call to avoid Pydantic validation issues
-                import httpx
-
-                # Direct HTTP call to Qdrant API instead of using client to avoid Pydantic issues
-                qdrant_url = f"http://{settings.QDRANT_HOST}:{settings.QDRANT_PORT}"
+                # Raw HTTP call to the Qdrant API to avoid Pydantic validation issues
+                client = qdrant_connection.get_http_client()
+                response = await client.get(
+                    f"/collections/{self.default_collection_name}"
+                )
 
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f"{qdrant_url}/collections/{self.default_collection_name}"
-                    )
+                if response.status_code == 200:
+                    collection_data = response.json()
 
-                    if response.status_code == 200:
-                        collection_data = response.json()
+                    # Safely extract stats from raw JSON
+                    result = collection_data.get("result", {})
 
-                        # Safely extract stats from raw JSON
-                        result = collection_data.get("result", {})
+                    basic_stats = {
+                        "total_points": result.get("points_count", 0),
+                        "collection_status": result.get("status", "unknown"),
+                    }
 
-                        basic_stats = {
-                            "total_points": result.get("points_count", 0),
-                            "collection_status": result.get("status", "unknown"),
-                        }
+                    # Try to get vector dimension from config
+                    try:
+                        config = result.get("config", {})
+                        params = config.get("params", {})
+                        vectors = params.get("vectors", {})
 
-                        # Try to get vector dimension from config
-                        try:
-                            config = result.get("config", {})
-                            params = config.get("params", {})
-                            vectors = params.get("vectors", {})
-
-                            if isinstance(vectors, dict) and "size" in vectors:
-                                basic_stats["vector_dimension"] = vectors["size"]
-                            else:
-                                basic_stats["vector_dimension"] = "unknown"
-                        except Exception as config_error:
-                            logger.debug(
-                                f"Could not get vector dimension: {config_error}"
-                            )
+                        if isinstance(vectors, dict) and "size" in vectors:
+                            basic_stats["vector_dimension"] = vectors["size"]
+                        else:
                             basic_stats["vector_dimension"] = "unknown"
-
-                        stats.update(basic_stats)
-                    else:
-                        # Collection doesn't exist or error
-                        stats.update(
-                            {
-                                "total_points": 0,
-                                "collection_status": "not_found",
-                                "vector_dimension": "unknown",
-                            }
+                    except Exception as config_error:
+                        logger.debug(
+                            f"Could not get vector dimension: {config_error}"
                         )
+                        basic_stats["vector_dimension"] = "unknown"
+
+                    stats.update(basic_stats)
+                else:
+                    # Collection doesn't exist or error
+                    stats.update(
+                        {
+                            "total_points": 0,
+                            "collection_status": "not_found",
+                            "vector_dimension": "unknown",
+                        }
+                    )
 
             except Exception as e:
                 logger.debug(f"Could not get Qdrant stats (using fallback): {e}")
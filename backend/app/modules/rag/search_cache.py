@@ -0,0 +1,249 @@
+"""
+RAG search result cache
+
+Bounded LRU cache with a TTL for search results. Every collection carries a
+generation counter that is bumped whenever documents are indexed or deleted;
+cached entries remember the generation they were computed under, so a bump
+invalidates all results for that collection without scanning the cache.
+``lookup`` returns the generation it saw and ``set`` stores results under
+that generation, so results computed while an invalidation lands are never
+cached as current.
+
+When Redis is available the cache is shared between workers through
+``core_cache``: results and generation counters live in Redis and each lookup
+costs a single MGET round-trip (generation + result). The in-process LRU is
+still consulted first so hot queries avoid deserialization.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.cache import core_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "rag_search"
+
+
+class SearchResultCache:
+    """LRU + TTL search result cache with per-collection generations"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: int = 300,
+        use_redis: bool = True,
+        serialize: Optional[Callable[[List[Any]], List[Dict[str, Any]]]] = None,
+        deserialize: Optional[Callable[[List[Dict[str, Any]]], List[Any]]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._serialize = serialize
+        self._deserialize = deserialize
+        # key -> (collection, generation, expires_at, results)
+        self._entries: "OrderedDict[str, Tuple[str, int, float, List[Any]]]" = (
+            OrderedDict()
+        )
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "redis_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def make_key(
+        collection_name: str,
+        query: str,
+        max_results: int,
+        filters: Optional[Dict[str, Any]] = None,
+        score_threshold: Optional[float] = None,
+    ) -> str:
+        """Build a stable cache key from every parameter that affects results"""
+        payload = json.dumps(
+            {
+                "collection": collection_name,
+                "query": query,
+                "max_results": max_results,
+                "filters": filters or {},
+                "score_threshold": score_threshold,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def _redis_enabled(self) -> bool:
+        return (
+            self.use_redis
+            and self._serialize is not None
+            and self._deserialize is not None
+            and core_cache.enabled
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_local(
+        self, key: str, collection_name: str, generation: int
+    ) -> Optional[List[Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            _, entry_generation, expires_at, results = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                return None
+            if entry_generation != generation:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return results
+
+    def _set_local(
+        self, key: str, collection_name: str, generation: int, results: List[Any]
+    ):
+        with self._lock:
+            self._entries[key] = (
+                collection_name,
+                generation,
+                time.monotonic() + self.ttl,
+                results,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def get(self, collection_name: str, key: str) -> Optional[List[Any]]:
+        """Return cached results for a key, or None on a miss"""
+        results, _ = await self.lookup(collection_name, key)
+        return results
+
+    async def lookup(
+        self, collection_name: str, key: str
+    ) -> Tuple[Optional[List[Any]], int]:
+        """Return (cached results or None, generation seen by the lookup)
+
+        Pass the generation to ``set`` when caching results computed after
+        a miss.
+        """
+        if not self._redis_enabled:
+            generation = self._generations.get(collection_name, 0)
+            results = self._get_local(key, collection_name, generation)
+            if results is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+            return results, generation
+
+        # One round-trip fetches the shared generation and the shared entry
+        raw_generation, cached = await core_cache.get_many(
+            [f"gen:{collection_name}", f"result:{key}"], prefix=CACHE_PREFIX
+        )
+        generation = int(raw_generation or 0)
+        self._generations[collection_name] = generation
+
+        results = self._get_local(key, collection_name, generation)
+        if results is not None:
+            self.stats["hits"] += 1
+            return results, generation
+
+        if isinstance(cached, dict) and cached.get("generation") == generation:
+            try:
+                results = self._deserialize(cached.get("results", []))
+            except Exception as e:
+                logger.warning(f"Discarding undecodable cached search result: {e}")
+            else:
+                self._set_local(key, collection_name, generation, results)
+                self.stats["hits"] += 1
+                self.stats["redis_hits"] += 1
+                return results, generation
+
+        self.stats["misses"] += 1
+        return None, generation
+
+    async def set(
+        self,
+        collection_name: str,
+        key: str,
+        results: List[Any],
+        generation: Optional[int] = None,
+    ):
+        """Store results under the generation their lookup saw
+
+        Without a generation the collection's current one is used. Results
+        from an already invalidated generation are not stored.
+        """
+        current = self._generations.get(collection_name, 0)
+        if generation is None:
+            generation = current
+        elif generation < current:
+            return
+        self._set_local(key, collection_name, generation, results)
+
+        if self._redis_enabled:
+            try:
+                payload = {
+                    "generation": generation,
+                    "results": self._serialize(results),
+                }
+            except Exception as e:
+                logger.warning(f"Could not serialize search results for cache: {e}")
+                return
+            await core_cache.set(
+                f"result:{key}", payload, ttl=self.ttl, prefix=CACHE_PREFIX
+            )
+
+    async def invalidate_collection(self, collection_name: str):
+        """Invalidate every cached result for a collection"""
+        with self._lock:
+            self._generations[collection_name] = (
+                self._generations.get(collection_name, 0) + 1
+            )
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if entry[0] == collection_name
+            ]
+            for key in stale:
+                del self._entries[key]
+        self.stats["invalidations"] += 1
+
+        if self._redis_enabled:
+            generation = await core_cache.increment(
+                f"gen:{collection_name}", prefix=CACHE_PREFIX
+            )
+            if generation:
+                self._generations[collection_name] = generation
+
+    def clear(self):
+        """Drop all local entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache statistics"""
+        stats = self.stats.copy()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["size"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["ttl"] = self.ttl
+        stats["shared"] = self._redis_enabled
+        return stats
@@ -7,16 +7,23 @@ import logging
 from typing import Optional, Dict, Any
 from datetime import datetime
 
-from fastapi import HTTPException, Request, status, Depends
+from fastapi import HTTPException, Request, Response, status, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-
-from app.core.security import verify_api_key
+from sqlalchemy import update
+
+from app.core.security import (
+    api_key_hmac_enabled,
+    get_api_key_digest,
+    verify_api_key_async,
+    verify_api_key_digest,
+)
 from app.db.database import get_db
 from app.models.api_key import APIKey
 from app.models.user import User
 from app.utils.exceptions import AuthenticationError, AuthorizationError
 from app.services.cached_api_key import cached_api_key_service
+from app.services.rate_limiter import rate_limiter
+from app.services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +34,7 @@ class APIKeyAuthService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    @traced("auth.api_key")
     async def validate_api_key(
         self, api_key: str, request: Request
     ) -> Optional[Dict[str, Any]]:
@@ -42,10 +50,10 @@ class APIKeyAuthService:
 
             key_prefix = api_key[:8]
 
-            # Try cached verification first
-            cached_verification = await cached_api_key_service.verify_api_key_cached(
-                api_key, key_prefix
-            )
+            # Warm path: verified context from the in-process cache
+            context = cached_api_key_service.get_local_context(api_key)
+            if context is not None:
+                return await self._check_context(context, key_prefix, request)
 
             # Get API key data from cache or database
             context = await cached_api_key_service.get_cached_api_key(
@@ -57,56 +65,98 @@ class APIKeyAuthService:
                 return None
 
             api_key_obj = context["api_key"]
-
-            # If not in verification cache, verify and cache the result
-            if not cached_verification:
-                # Get the actual key hash for verification (this should be in the cached context)
-                db_api_key = None
-                if not hasattr(api_key_obj, "key_hash"):
-                    # Fallback: fetch full API key from database for hash
-                    stmt = select(APIKey).where(APIKey.key_prefix == key_prefix)
-                    result = await self.db.execute(stmt)
-                    db_api_key = result.scalar_one_or_none()
-                    if not db_api_key:
+            key_digest = getattr(api_key_obj, "key_digest", None)
+
+            if api_key_hmac_enabled():
+                # Fast path: constant-time HMAC check, no bcrypt
+                if not (key_digest and verify_api_key_digest(api_key, key_digest)):
+                    # Legacy key or digest from a rotated secret: verify once
+                    # with bcrypt, then store the current digest
+                    if not await verify_api_key_async(api_key, api_key_obj.key_hash):
+                        logger.warning(f"Invalid API key hash: {key_prefix}")
                         return None
-                    key_hash = db_api_key.key_hash
-                else:
-                    key_hash = api_key_obj.key_hash
-
-                # Verify the API key hash
-                if not verify_api_key(api_key, key_hash):
-                    logger.warning(f"Invalid API key hash: {key_prefix}")
-                    return None
-
-                # Cache successful verification
-                await cached_api_key_service.cache_verification_result(
-                    api_key, key_prefix, key_hash, True
+                    await self._store_key_digest(api_key_obj, api_key, key_prefix)
+            else:
+                # Try cached verification first
+                cached_verification = (
+                    await cached_api_key_service.verify_api_key_cached(
+                        api_key, key_prefix
+                    )
                 )
 
-            # Check if key is valid (expiry, active status)
-            if not api_key_obj.is_valid():
-                logger.warning(f"API key expired or inactive: {key_prefix}")
-                # Invalidate cache for expired keys
-                await cached_api_key_service.invalidate_api_key_cache(key_prefix)
-                return None
+                # If not in verification cache, verify and cache the result
+                if not cached_verification:
+                    key_hash = api_key_obj.key_hash
 
-            # Check IP restrictions
-            client_ip = request.client.host if request.client else "unknown"
-            if not api_key_obj.can_access_from_ip(client_ip):
-                logger.warning(f"IP not allowed for API key {key_prefix}: {client_ip}")
-                return None
+                    # Verify the API key hash off the event loop
+                    if not await verify_api_key_async(api_key, key_hash):
+                        logger.warning(f"Invalid API key hash: {key_prefix}")
+                        return None
 
-            # Update last used timestamp asynchronously (performance optimization)
-            await cached_api_key_service.update_last_used(
-                context["api_key_id"], self.db
-            )
+                    # Cache successful verification
+                    await cached_api_key_service.cache_verification_result(
+                        api_key, key_prefix, key_hash, True
+                    )
 
+            context = await self._check_context(context, key_prefix, request)
+            if context is not None:
+                cached_api_key_service.set_local_context(api_key, context)
             return context
 
         except Exception as e:
             logger.error(f"API key validation error: {e}")
             return None
 
+    async def _store_key_digest(
+        self, api_key_obj: APIKey, api_key: str, key_prefix: str
+    ):
+        """Store the current HMAC digest of a bcrypt-verified key"""
+        key_digest = get_api_key_digest(api_key)
+        if not key_digest:
+            return
+        try:
+            stmt = (
+                update(APIKey)
+                .where(
+                    APIKey.id == api_key_obj.id,
+                    APIKey.key_digest.is_distinct_from(key_digest),
+                )
+                .values(key_digest=key_digest)
+            )
+            await self.db.execute(stmt)
+            await self.db.commit()
+            api_key_obj.key_digest = key_digest
+            # Cached key data predates the digest
+            await cached_api_key_service.invalidate_api_key_cache(key_prefix)
+            logger.info(f"Migrated API key {key_prefix} to HMAC verification")
+        except Exception as e:
+            logger.warning(f"Failed to store digest for API key {key_prefix}: {e}")
+            await self.db.rollback()
+
+    async def _check_context(
+        self, context: Dict[str, Any], key_prefix: str, request: Request
+    ) -> Optional[Dict[str, Any]]:
+        """Apply expiry and IP checks to a verified context"""
+        api_key_obj = context["api_key"]
+
+        # Check if key is valid (expiry, active status)
+        if not api_key_obj.is_valid():
+            logger.warning(f"API key expired or inactive: {key_prefix}")
+            # Invalidate cache for expired keys
+            await cached_api_key_service.invalidate_api_key_cache(key_prefix)
+            return None
+
+        # Check IP restrictions
+        client_ip = request.client.host if request.client else "unknown"
+        if not api_key_obj.can_access_from_ip(client_ip):
+            logger.warning(f"IP not allowed for API key {key_prefix}: {client_ip}")
+            return None
+
+        # Update last used timestamp asynchronously (performance optimization)
+        await cached_api_key_service.update_last_used(context["api_key_id"], self.db)
+
+        return context
+
     async def check_endpoint_permission(
         self, context: Dict[str, Any], endpoint: str
     ) -> bool:
@@ -178,15 +228,27 @@ async def get_api_key_context(
 
 
 async def require_api_key(
-    context: Dict[str, Any] = Depends(get_api_key_context)
+    response: Response, context: Dict[str, Any] = Depends(get_api_key_context)
 ) -> Dict[str, Any]:
-    """Dependency that requires valid API key"""
+    """Dependency that requires valid API key within its rate limits"""
     if not context:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Valid API key required",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Enforced before any budget or database work of the endpoint
+    decision = await rate_limiter.check_api_key(context["api_key"])
+    if decision is not None:
+        if not decision.allowed:
+            logger.warning(f"Rate limit exceeded for API key {context['api_key_id']}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers=decision.headers(),
+            )
+        response.headers.update(decision.headers())
     return context
 
 
@@ -16,7 +16,10 @@ from sqlalchemy.exc import IntegrityError
 
 from app.models.budget import Budget
 from app.models.api_key import APIKey
+from app.services.budget_ledger import BudgetReservation, budget_ledger
+from app.services.budget_plan_cache import BudgetPlan, budget_plan_cache
 from app.services.cost_calculator import CostCalculator, estimate_request_cost
+from app.services.tracing import traced
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -61,26 +64,45 @@ class AsyncBudgetEnforcementService:
         self.max_retries = 3
         self.retry_delay_base = 0.1  # Base delay in seconds
 
+    @traced("budget.reserve")
     async def atomic_check_and_reserve_budget(
         self,
         api_key: APIKey,
         model_name: str,
         estimated_tokens: int,
         endpoint: str = None,
+        estimated_cost_cents: Optional[int] = None,
     ) -> Tuple[bool, Optional[str], List[Dict[str, Any]], List[int]]:
         """
         Atomically check budget compliance and reserve spending
 
+        estimated_cost_cents, when given, replaces the rough cost derived from
+        estimated_tokens (e.g. a tokenizer-based estimate).
+
         Returns:
             Tuple of (is_allowed, error_message, warnings, reserved_budget_ids)
         """
-        estimated_cost = estimate_request_cost(model_name, estimated_tokens)
+        if estimated_cost_cents is not None:
+            estimated_cost = estimated_cost_cents
+        else:
+            estimated_cost = estimate_request_cost(model_name, estimated_tokens)
         budgets = await self._get_applicable_budgets(api_key, model_name, endpoint)
 
         if not budgets:
             logger.debug(f"No applicable budgets found for API key {api_key.id}")
             return True, None, [], []
 
+        # Reserve against the ledger counters when available (no row locks)
+        if budget_ledger.active:
+            try:
+                return await self._reserve_with_ledger(
+                    budgets, estimated_cost, api_key.id
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Budget ledger unavailable, using row-locked reservation: {e}"
+                )
+
         # Try atomic reservation with retries
         for attempt in range(self.max_retries):
             try:
@@ -145,12 +167,8 @@ class AsyncBudgetEnforcementService:
 
                 # Check if request would exceed budget using atomic operation
                 if not self._atomic_can_spend(locked_budget, estimated_cost):
-                    error_msg = (
-                        f"Request would exceed budget '{locked_budget.name}' "
-                        f"(${locked_budget.limit_cents/100:.2f}). "
-                        f"Current usage: ${locked_budget.current_usage_cents/100:.2f}, "
-                        f"Requested: ${estimated_cost/100:.4f}, "
-                        f"Remaining: ${(locked_budget.limit_cents - locked_budget.current_usage_cents)/100:.2f}"
+                    error_msg = self._exceeded_message(
+                        locked_budget, locked_budget.current_usage_cents, estimated_cost
                     )
                     logger.warning(
                         f"Budget exceeded for API key {api_key_id}: {error_msg}"
@@ -163,30 +181,13 @@ class AsyncBudgetEnforcementService:
                     locked_budget.would_exceed_warning(estimated_cost)
                     and not locked_budget.is_warning_sent
                 ):
-                    warning_msg = (
-                        f"Budget '{locked_budget.name}' approaching limit. "
-                        f"Usage will be ${(locked_budget.current_usage_cents + estimated_cost)/100:.2f} "
-                        f"of ${locked_budget.limit_cents/100:.2f} "
-                        f"({((locked_budget.current_usage_cents + estimated_cost) / locked_budget.limit_cents * 100):.1f}%)"
-                    )
-                    warnings.append(
-                        {
-                            "type": "budget_warning",
-                            "budget_id": locked_budget.id,
-                            "budget_name": locked_budget.name,
-                            "message": warning_msg,
-                            "current_usage_cents": locked_budget.current_usage_cents
-                            + estimated_cost,
-                            "limit_cents": locked_budget.limit_cents,
-                            "usage_percentage": (
-                                locked_budget.current_usage_cents + estimated_cost
-                            )
-                            / locked_budget.limit_cents
-                            * 100,
-                        }
+                    warning = self._budget_warning(
+                        locked_budget,
+                        locked_budget.current_usage_cents + estimated_cost,
                     )
+                    warnings.append(warning)
                     logger.info(
-                        f"Budget warning for API key {api_key_id}: {warning_msg}"
+                        f"Budget warning for API key {api_key_id}: {warning['message']}"
                     )
 
                 # Reserve the budget (temporarily add estimated cost)
@@ -198,6 +199,11 @@ class AsyncBudgetEnforcementService:
             logger.debug(
                 f"Successfully reserved budget for API key {api_key_id}, estimated cost: ${estimated_cost/100:.4f}"
             )
+            if reserved_budget_ids:
+                # Settled or released later through the ledger's batched flush
+                reserved_budget_ids = budget_ledger.track(
+                    reserved_budget_ids, estimated_cost
+                )
             return True, None, warnings, reserved_budget_ids
 
         except IntegrityError as e:
@@ -210,6 +216,85 @@ class AsyncBudgetEnforcementService:
             logger.error(f"Error in atomic budget reservation: {e}")
             raise
 
+    async def _reserve_with_ledger(
+        self, budgets: List[Budget], estimated_cost: int, api_key_id: int
+    ) -> Tuple[bool, Optional[str], List[Dict[str, Any]], List[int]]:
+        """Check and reserve all applicable budgets in one ledger operation"""
+        eligible = []
+        for budget in budgets:
+            # Reset budget if expired and auto-renew enabled
+            if budget.is_expired() and budget.auto_renew:
+                await self._reset_expired_budget(budget)
+
+            # Skip inactive or expired budgets
+            if not budget.is_active or budget.is_expired():
+                continue
+
+            if not budget.is_in_period():
+                error_msg = self._exceeded_message(
+                    budget, budget.current_usage_cents, estimated_cost
+                )
+                return False, error_msg, [], []
+            eligible.append(budget)
+
+        if not eligible:
+            return True, None, [], []
+
+        result = await budget_ledger.reserve(eligible, estimated_cost)
+        if not result.allowed:
+            blocked = next(b for b in eligible if b.id == result.blocked_budget_id)
+            error_msg = self._exceeded_message(
+                blocked, result.usages[blocked.id], estimated_cost
+            )
+            logger.warning(f"Budget exceeded for API key {api_key_id}: {error_msg}")
+            return False, error_msg, [], []
+
+        # Warn on the reservation that crosses the threshold
+        warnings = []
+        for budget in eligible:
+            usage = result.usages[budget.id]
+            threshold = budget.warning_threshold_cents
+            if threshold and usage - estimated_cost < threshold <= usage:
+                warning = self._budget_warning(budget, usage)
+                warnings.append(warning)
+                logger.info(
+                    f"Budget warning for API key {api_key_id}: {warning['message']}"
+                )
+
+        logger.debug(
+            f"Reserved budget via ledger for API key {api_key_id}, "
+            f"estimated cost: ${estimated_cost/100:.4f}"
+        )
+        return True, None, warnings, result.reservation
+
+    @staticmethod
+    def _exceeded_message(budget: Budget, usage_cents: int, estimated_cost: int) -> str:
+        return (
+            f"Request would exceed budget '{budget.name}' "
+            f"(${budget.limit_cents/100:.2f}). "
+            f"Current usage: ${usage_cents/100:.2f}, "
+            f"Requested: ${estimated_cost/100:.4f}, "
+            f"Remaining: ${(budget.limit_cents - usage_cents)/100:.2f}"
+        )
+
+    @staticmethod
+    def _budget_warning(budget: Budget, projected_usage_cents: int) -> Dict[str, Any]:
+        usage_percentage = projected_usage_cents / budget.limit_cents * 100
+        return {
+            "type": "budget_warning",
+            "budget_id": budget.id,
+            "budget_name": budget.name,
+            "message": (
+                f"Budget '{budget.name}' approaching limit. "
+                f"Usage will be ${projected_usage_cents/100:.2f} "
+                f"of ${budget.limit_cents/100:.2f} "
+                f"({usage_percentage:.1f}%)"
+            ),
+            "current_usage_cents": projected_usage_cents,
+            "limit_cents": budget.limit_cents,
+            "usage_percentage": usage_percentage,
+        }
+
     def _atomic_can_spend(self, budget: Budget, amount_cents: int) -> bool:
         """Check if budget can accommodate spending"""
         if not budget.is_active or not budget.is_in_period():
@@ -287,6 +372,23 @@ class AsyncBudgetEnforcementService:
         if not reserved_budget_ids:
             return []
 
+        # Replace the reserved estimate with the actual cost (batched, no locks)
+        if isinstance(reserved_budget_ids, BudgetReservation):
+            actual_cost = CostCalculator.calculate_cost_cents(
+                model_name, input_tokens, output_tokens
+            )
+            if not await budget_ledger.settle(reserved_budget_ids, actual_cost):
+                logger.warning(
+                    f"Budget reservation {reserved_budget_ids.reservation_id} "
+                    f"expired before it was settled; charging actual cost"
+                )
+                await budget_ledger.adjust(list(reserved_budget_ids), actual_cost)
+            return []
+
+        # Ledger reservations were already charged without row locks
+        if budget_ledger.active:
+            return []
+
         try:
             actual_cost = CostCalculator.calculate_cost_cents(
                 model_name, input_tokens, output_tokens
@@ -326,28 +428,66 @@ class AsyncBudgetEnforcementService:
             await self.db.rollback()
             return []
 
+    async def release_reservation(self, reserved_budget_ids: List[int]) -> bool:
+        """Refund a reservation whose request failed before completing"""
+        if not isinstance(reserved_budget_ids, BudgetReservation):
+            return False
+        try:
+            return await budget_ledger.release(reserved_budget_ids)
+        except Exception as e:
+            # The sweeper releases it once the reservation TTL has passed
+            logger.error(f"Error releasing budget reservation: {e}")
+            return False
+
+    async def settle_reservation_at_estimate(
+        self, reserved_budget_ids: List[int]
+    ) -> bool:
+        """Keep the reserved estimate as the charge of a completed request
+
+        For requests whose actual token usage is unknown, e.g. streams that do
+        not report usage or a finalization that failed.
+        """
+        if not isinstance(reserved_budget_ids, BudgetReservation):
+            return False
+        try:
+            return await budget_ledger.settle(
+                reserved_budget_ids, reserved_budget_ids.amount_cents
+            )
+        except Exception as e:
+            # The sweeper would refund it, so this request goes uncharged
+            logger.error(f"Error settling budget reservation at estimate: {e}")
+            return False
+
     async def check_budget_compliance(
         self,
         api_key: APIKey,
         model_name: str,
         estimated_tokens: int,
         endpoint: str = None,
+        estimated_cost_cents: Optional[int] = None,
     ) -> Tuple[bool, Optional[str], List[Dict[str, Any]]]:
         """
         Check if a request complies with budget limits (non-atomic version)
 
+        Usage comes from the cached budget plan and may lag the ledger, so
+        this is advisory; atomic_check_and_reserve_budget enforces hard limits.
+
         Args:
             api_key: API key making the request
             model_name: Model being used
             estimated_tokens: Estimated token usage
             endpoint: API endpoint being accessed
+            estimated_cost_cents: Precomputed cost estimate, if available
 
         Returns:
             Tuple of (is_allowed, error_message, warnings)
         """
         try:
             # Calculate estimated cost
-            estimated_cost = estimate_request_cost(model_name, estimated_tokens)
+            if estimated_cost_cents is not None:
+                estimated_cost = estimated_cost_cents
+            else:
+                estimated_cost = estimate_request_cost(model_name, estimated_tokens)
 
             # Get applicable budgets
             budgets = await self._get_applicable_budgets(api_key, model_name, endpoint)
@@ -439,7 +579,7 @@ class AsyncBudgetEnforcementService:
             endpoint: API endpoint that was accessed
 
         Returns:
-            List of budgets that were updated
+            List of budgets that were charged (cached snapshots)
         """
         try:
             # Calculate actual cost
@@ -447,38 +587,48 @@ class AsyncBudgetEnforcementService:
                 model_name, input_tokens, output_tokens
             )
 
-            # Get applicable budgets
-            budgets = await self._get_applicable_budgets(api_key, model_name, endpoint)
-
-            updated_budgets = []
-
-            for budget in budgets:
-                if budget.is_active and budget.is_in_period():
-                    # Add usage to budget
-                    budget.add_usage(actual_cost)
-                    updated_budgets.append(budget)
-
-                    logger.debug(
-                        f"Recorded usage for budget {budget.id}: "
-                        f"${actual_cost/100:.4f} (total: ${budget.current_usage_cents/100:.2f})"
-                    )
-
-            # Commit changes
-            await self.db.commit()
+            budgets = [
+                budget
+                for budget in await self._get_applicable_budgets(
+                    api_key, model_name, endpoint
+                )
+                if budget.is_active and budget.is_in_period()
+            ]
+
+            # Charge the ledger counters that reservations check; the flush
+            # writes the spend to the budgets table
+            if budgets and actual_cost:
+                await budget_ledger.adjust(
+                    [budget.id for budget in budgets], actual_cost
+                )
 
-            return updated_budgets
+            logger.debug(
+                f"Recorded usage of ${actual_cost/100:.4f} for budgets "
+                f"{[budget.id for budget in budgets]}"
+            )
+            return budgets
 
         except Exception as e:
             logger.error(f"Error recording budget usage: {e}")
-            await self.db.rollback()
             return []
 
     async def _get_applicable_budgets(
         self, api_key: APIKey, model_name: str = None, endpoint: str = None
     ) -> List[Budget]:
-        """Get budgets that apply to the given request"""
+        """
+        Get budgets that apply to the given request
 
-        # Build query conditions
+        Served from the API key's cached budget plan, so the returned budgets
+        are detached snapshots whose usage may lag the database.
+        """
+        plan, generation = await budget_plan_cache.lookup(api_key.user_id, api_key.id)
+        if plan is None:
+            plan = BudgetPlan(await self._query_applicable_budgets(api_key))
+            await budget_plan_cache.set(api_key.user_id, api_key.id, plan, generation)
+        return plan.applicable(model_name, endpoint)
+
+    async def _query_applicable_budgets(self, api_key: APIKey) -> List[Budget]:
+        """Load the active budgets of an API key and its owner"""
         conditions = [
             Budget.is_active == True,
             or_(
@@ -489,39 +639,38 @@ class AsyncBudgetEnforcementService:
             ),
         ]
 
-        # Query budgets
         stmt = select(Budget).where(and_(*conditions))
         result = await self.db.execute(stmt)
-        budgets = result.scalars().all()
-
-        # Filter budgets based on allowed models/endpoints
-        applicable_budgets = []
-
-        for budget in budgets:
-            # Check model restrictions
-            if model_name and budget.allowed_models:
-                if model_name not in budget.allowed_models:
-                    continue
-
-            # Check endpoint restrictions
-            if endpoint and budget.allowed_endpoints:
-                if endpoint not in budget.allowed_endpoints:
-                    continue
-
-            applicable_budgets.append(budget)
-
-        return applicable_budgets
+        return list(result.scalars().all())
 
     async def _reset_expired_budget(self, budget: Budget):
         """Reset an expired budget for the next period"""
         try:
-            budget.reset_period()
-            await self.db.commit()
+            # Cached budgets are snapshots, reset the row itself
+            row = await self.db.get(Budget, budget.id)
+            if row is None:
+                return
+            if row.is_expired():
+                row.reset_period()
+                await self.db.commit()
 
-            logger.info(
-                f"Reset expired budget {budget.id} for new period: "
-                f"{budget.period_start} to {budget.period_end}"
-            )
+                logger.info(
+                    f"Reset expired budget {row.id} for new period: "
+                    f"{row.period_start} to {row.period_end}"
+                )
+
+            if row is not budget:
+                for field in (
+                    "limit_cents",
+                    "current_usage_cents",
+                    "is_exceeded",
+                    "is_warning_sent",
+                    "last_reset_at",
+                    "period_start",
+                    "period_end",
+                ):
+                    setattr(budget, field, getattr(row, field))
+            await budget_plan_cache.invalidate_user(row.user_id)
 
         except Exception as e:
             logger.error(f"Error resetting expired budget {budget.id}: {e}")
@@ -530,7 +679,7 @@ class AsyncBudgetEnforcementService:
     async def get_budget_status(self, api_key: APIKey) -> Dict[str, Any]:
         """Get comprehensive budget status for an API key"""
         try:
-            budgets = await self._get_applicable_budgets(api_key)
+            budgets = await self._query_applicable_budgets(api_key)
 
             status = {
                 "total_budgets": len(budgets),
@@ -607,11 +756,12 @@ async def async_check_budget_for_request(
     model_name: str,
     estimated_tokens: int,
     endpoint: str = None,
+    estimated_cost_cents: Optional[int] = None,
 ) -> Tuple[bool, Optional[str], List[Dict[str, Any]]]:
     """Async convenience function to check budget compliance"""
     service = AsyncBudgetEnforcementService(db)
     return await service.check_budget_compliance(
-        api_key, model_name, estimated_tokens, endpoint
+        api_key, model_name, estimated_tokens, endpoint, estimated_cost_cents
     )
 
 
@@ -636,14 +786,31 @@ async def async_atomic_check_and_reserve_budget(
     model_name: str,
     estimated_tokens: int,
     endpoint: str = None,
+    estimated_cost_cents: Optional[int] = None,
 ) -> Tuple[bool, Optional[str], List[Dict[str, Any]], List[int]]:
     """Async atomic convenience function to check budget compliance and reserve spending"""
     service = AsyncBudgetEnforcementService(db)
     return await service.atomic_check_and_reserve_budget(
-        api_key, model_name, estimated_tokens, endpoint
+        api_key, model_name, estimated_tokens, endpoint, estimated_cost_cents
     )
 
 
+async def async_release_budget_reservation(
+    db: AsyncSession, reserved_budget_ids: List[int]
+) -> bool:
+    """Async convenience function to refund a reservation after a failed request"""
+    service = AsyncBudgetEnforcementService(db)
+    return await service.release_reservation(reserved_budget_ids)
+
+
+async def async_settle_budget_reservation(
+    db: AsyncSession, reserved_budget_ids: List[int]
+) -> bool:
+    """Async convenience function to charge a reservation at its estimate"""
+    service = AsyncBudgetEnforcementService(db)
+    return await service.settle_reservation_at_estimate(reserved_budget_ids)
+
+
 async def async_atomic_finalize_usage(
     db: AsyncSession,
     reserved_budget_ids: List[int],
@@ -3,59 +3,293 @@ Audit logging service with async/non-blocking capabilities
 """
 
 import asyncio
-from typing import Optional, Dict, Any
+import glob
+import json
+import os
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List
+from sqlalchemy import insert, inspect as sa_inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from app.models.audit_log import AuditLog
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
-# Background audit logging queue
-_audit_queue = asyncio.Queue(maxsize=1000)
-_audit_worker_started = False
 
+class AuditWriter:
+    """Bounded audit event queue written in batched multi-row INSERTs
 
-async def _audit_worker():
-    """Background worker to process audit events"""
-    from app.db.database import async_session_factory
+    Events are drained when ``batch_size`` of them are queued or
+    ``flush_interval`` seconds have passed, whichever comes first. When the
+    queue is full, ``overflow_policy`` decides what happens to the overflow:
+    "drop_oldest" discards the oldest queued event, "spill" appends the new
+    event to a JSON-lines file that is replayed once the database keeps up.
+    """
 
-    logger.info("Audit worker started")
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        overflow_policy: str = "drop_oldest",
+        spill_path: Optional[str] = None,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.spill_path = spill_path
+        self._queue: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "flush_errors": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
 
-    while True:
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """Queue an audit row without blocking; False if it was not queued"""
+        self.stats["submitted"] += 1
+        if len(self._queue) >= self.max_queue:
+            if self.overflow_policy == "spill" and self.spill_path:
+                self._spill([row])
+                return False
+            self._queue.popleft()
+            self.stats["dropped"] += 1
+        self._queue.append(row)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """Write up to one batch of queued rows, returning the number written"""
+        async with self._flush_lock:
+            if not self._queue:
+                return 0
+            batch = [
+                self._queue.popleft()
+                for _ in range(min(self.batch_size, len(self._queue)))
+            ]
+
+            start = time.perf_counter()
+            try:
+                await self._write(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} audit logs: {e}")
+                self.stats["flush_errors"] += 1
+                self._requeue(batch)
+                return 0
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stats["batches"] += 1
+            self.stats["written"] += len(batch)
+            self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self.stats["max_flush_ms"] = max(
+                self.stats["max_flush_ms"], round(elapsed_ms, 2)
+            )
+            return len(batch)
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        """Insert all rows in one multi-row INSERT"""
+        from app.db.database import async_session_factory
+
+        async with async_session_factory() as db:
+            await db.execute(insert(AuditLog), rows)
+            await db.commit()
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Put a failed batch back in front of the queue, applying the overflow policy"""
+        if self.overflow_policy == "spill" and self.spill_path:
+            room = max(0, self.max_queue - len(self._queue))
+            self._spill(batch[room:])
+            batch = batch[:room]
+        self._queue.extendleft(reversed(batch))
+        while len(self._queue) > self.max_queue:
+            self._queue.popleft()
+            self.stats["dropped"] += 1
+
+    def _spill(self, rows: List[Dict[str, Any]]):
+        """Append rows to the spill file for a later replay"""
+        if not rows:
+            return
         try:
-            # Get audit event from queue
-            audit_data = await _audit_queue.get()
-
-            if audit_data is None:  # Shutdown signal
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+                for row in rows:
+                    spill_file.write(json.dumps(row, default=_json_default) + "\n")
+            self.stats["spilled"] += len(rows)
+        except Exception as e:
+            logger.error(f"Failed to spill {len(rows)} audit logs: {e}")
+            self.stats["dropped"] += len(rows)
+
+    async def replay_spill(self) -> int:
+        """Write rows spilled earlier, returning the number replayed
+
+        Workers sharing a spill path each claim a file by atomically renaming
+        it to a name carrying their pid, and only replay files they renamed
+        themselves. Rows spilled while replaying go to a fresh spill file.
+        """
+        if not self.spill_path:
+            return 0
+
+        replay_path = f"{self.spill_path}.{os.getpid()}.replay"
+        replayed = 0
+        for source in self._replay_sources():
+            try:
+                os.replace(source, replay_path)
+            except FileNotFoundError:
+                # Claimed by another worker first
+                continue
+            replayed += await self._replay_file(replay_path)
+
+        self.stats["replayed"] += replayed
+        return replayed
+
+    def _replay_sources(self) -> List[str]:
+        """Replay files left by workers that died mid-replay, then the spill file"""
+        prefix = f"{self.spill_path}."
+        sources = []
+        for path in glob.glob(f"{glob.escape(self.spill_path)}.*replay"):
+            owner = path[len(prefix) : -len(".replay")]
+            # "" is the unclaimed name written by earlier versions
+            if owner == "" or (owner.isdigit() and not _process_alive(int(owner))):
+                sources.append(path)
+        sources.append(self.spill_path)
+        return sources
+
+    async def _replay_file(self, replay_path: str) -> int:
+        rows = await asyncio.to_thread(_read_spill_file, replay_path)
+        replayed = 0
+        try:
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset : offset + self.batch_size]
+                await self._write(batch)
+                replayed += len(batch)
+        except Exception as e:
+            logger.error(f"Failed to replay spilled audit logs: {e}")
+            self._spill(rows[replayed:])
+        os.remove(replay_path)
+        return replayed
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.flush() == self.batch_size:
+                    pass
+                if not self._queue and self.spill_path and os.path.exists(self.spill_path):
+                    await self.replay_spill()
+            except Exception as e:
+                logger.error(f"Audit writer error: {e}")
+
+    def start(self):
+        """Start the background flush task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info("Audit writer started")
+
+    async def stop(self):
+        """Stop the flush task and write out all queued rows"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while self._queue:
+            if not await self.flush():
                 break
+        if self._queue and self.spill_path:
+            self._spill(list(self._queue))
+            self._queue.clear()
 
-            # Process the audit event in a separate database session
-            async with async_session_factory() as db:
-                try:
-                    audit_log = AuditLog(**audit_data)
-                    db.add(audit_log)
-                    await db.commit()
-                    logger.debug(f"Background audit logged: {audit_data.get('action')}")
-                except Exception as e:
-                    logger.error(f"Failed to write audit log in background: {e}")
-                    await db.rollback()
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "queue_depth": len(self._queue)}
 
-            _audit_queue.task_done()
 
-        except Exception as e:
-            logger.error(f"Audit worker error: {e}")
-            await asyncio.sleep(1)  # Brief pause before retrying
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_spill_file(path: str) -> List[Dict[str, Any]]:
+    rows = []
+    with open(path, encoding="utf-8") as spill_file:
+        for line in spill_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping corrupt line in audit spill file")
+                continue
+            if row.get("created_at"):
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+            rows.append(row)
+    return rows
+
+
+def audit_row(audit_log: AuditLog) -> Dict[str, Any]:
+    """Column values of an unsaved AuditLog, for queueing on the writer"""
+    row = {
+        attr.key: getattr(audit_log, attr.key)
+        for attr in sa_inspect(AuditLog).column_attrs
+        if getattr(audit_log, attr.key) is not None
+    }
+    row.setdefault("created_at", datetime.utcnow())
+    return row
+
+
+# Background audit writer
+audit_writer = AuditWriter(
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    overflow_policy=settings.AUDIT_OVERFLOW_POLICY,
+    spill_path=settings.AUDIT_SPILL_PATH or None,
+)
 
 
 def start_audit_worker():
-    """Start the background audit worker"""
-    global _audit_worker_started
-    if not _audit_worker_started:
-        asyncio.create_task(_audit_worker())
-        _audit_worker_started = True
-        logger.info("Audit worker task created")
+    """Start the background audit writer"""
+    audit_writer.start()
+
+
+async def stop_audit_worker():
+    """Flush queued audit events and stop the writer"""
+    await audit_writer.stop()
 
 
 def _parse_user_id(user_id: Optional[str]) -> Optional[int]:
@@ -87,9 +321,8 @@ async def log_audit_event_async(
     so it doesn't block the main request flow.
     """
     try:
-        # Ensure audit worker is started
-        if not _audit_worker_started:
-            start_audit_worker()
+        # Ensure audit writer is started
+        audit_writer.start()
 
         audit_details = details or {}
         if api_key_id:
@@ -113,11 +346,8 @@ async def log_audit_event_async(
         }
 
         # Queue the audit event (non-blocking)
-        try:
-            _audit_queue.put_nowait(audit_data)
+        if audit_writer.submit(audit_data):
             logger.debug(f"Audit event queued: {action} on {resource_type}")
-        except asyncio.QueueFull:
-            logger.warning("Audit queue full, dropping audit event")
 
     except Exception as e:
         logger.error(f"Failed to queue audit event: {e}")
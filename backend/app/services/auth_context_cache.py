@@ -0,0 +1,188 @@
+"""
+JWT auth context cache
+
+``get_current_user`` resolves a token to the user, the user's role and the
+effective permissions computed by the permission registry. The resolved
+context is kept per user id in a short-lived in-process cache, so dashboard
+requests carrying the same token do not query the database.
+
+Changes to a user (role, permissions, password, activation) invalidate that
+user's context; role changes invalidate all contexts. Invalidations are
+broadcast to all workers over Redis pub/sub, and each user's cache
+generation acts as the token version: contexts resolved before an
+invalidation are never served after it.
+
+The cache holds plain column values of the user and its role, and every hit
+gets its own detached User object, so concurrent requests never share an ORM
+instance.
+"""
+
+import asyncio
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import inspect
+
+from app.core.cache import core_cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub channel carrying user ids (or "*" for all users) to invalidate
+INVALIDATION_CHANNEL = "auth:invalidate_user"
+ALL_USERS = "*"
+
+
+def _column_values(obj: Any) -> Dict[str, Any]:
+    return {
+        attr.key: copy.deepcopy(getattr(obj, attr.key))
+        for attr in inspect(type(obj)).column_attrs
+    }
+
+
+class _UserSnapshot(NamedTuple):
+    """Column values of a user and its role, independent of any session"""
+
+    model: type
+    values: Dict[str, Any]
+    role_model: Optional[type]
+    role_values: Optional[Dict[str, Any]]
+
+    @classmethod
+    def of(cls, user: Any) -> "_UserSnapshot":
+        role = user.role
+        return cls(
+            type(user),
+            _column_values(user),
+            type(role) if role is not None else None,
+            _column_values(role) if role is not None else None,
+        )
+
+    def rebuild(self) -> Any:
+        """Fresh, detached User (with its role) for one request"""
+        user = self.model(**copy.deepcopy(self.values))
+        if self.role_model is not None:
+            user.role = self.role_model(**copy.deepcopy(self.role_values))
+        return user
+
+
+class AuthContextCache:
+    """Per-user cache of resolved JWT auth contexts"""
+
+    def __init__(self, ttl: float = 60, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # user_id -> (generation, expires_at, context)
+        self._entries: "OrderedDict[int, Tuple[int, float, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._listener_task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def generation(self, user_id: int) -> int:
+        """Current version of a user's auth data, read before resolving it"""
+        return self._generations.get(user_id, 0)
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached context of a user"""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if (
+                entry is None
+                or entry[0] != self.generation(user_id)
+                or entry[1] <= time.monotonic()
+            ):
+                if entry is not None:
+                    del self._entries[user_id]
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.stats["hits"] += 1
+            context = dict(entry[2])
+        context["permissions"] = list(context["permissions"])
+        if isinstance(context.get("user_obj"), _UserSnapshot):
+            context["user_obj"] = context["user_obj"].rebuild()
+        return context
+
+    def set(self, user_id: int, context: Dict[str, Any], generation: int):
+        """Cache a context resolved while the user was at generation"""
+        if self.ttl <= 0:
+            return
+        context = dict(context)
+        if context.get("user_obj") is not None:
+            context["user_obj"] = _UserSnapshot.of(context["user_obj"])
+        with self._lock:
+            # Resolved before a concurrent invalidation, already stale
+            if generation != self.generation(user_id):
+                return
+            self._entries[user_id] = (
+                generation,
+                time.monotonic() + self.ttl,
+                context,
+            )
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id: str):
+        """Drop the context of a user id, or of every user for "*" """
+        with self._lock:
+            if user_id == ALL_USERS:
+                for cached_user_id in list(self._generations) + list(self._entries):
+                    self._generations[cached_user_id] = (
+                        self._generations.get(cached_user_id, 0) + 1
+                    )
+                self._entries.clear()
+            else:
+                user_id = int(user_id)
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+                self._entries.pop(user_id, None)
+        self.stats["invalidations"] += 1
+
+    def clear(self):
+        self.evict(ALL_USERS)
+
+    async def invalidate_user(self, user_id: int):
+        """Invalidate a user's context in every worker"""
+        self.evict(str(user_id))
+        await core_cache.publish(INVALIDATION_CHANNEL, str(user_id))
+
+    async def invalidate_all(self):
+        """Invalidate every context in every worker, e.g. after a role change"""
+        self.clear()
+        await core_cache.publish(INVALIDATION_CHANNEL, ALL_USERS)
+
+    def start_invalidation_listener(self):
+        """Follow invalidations published by other workers"""
+        if not core_cache.enabled or self._listener_task:
+            return
+        self._listener_task = asyncio.create_task(
+            core_cache.listen(INVALIDATION_CHANNEL, self.evict, self.clear)
+        )
+
+    async def close(self):
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "size": len(self._entries)}
+
+
+# Global JWT auth context cache instance
+auth_context_cache = AuthContextCache(
+    ttl=settings.AUTH_CONTEXT_CACHE_TTL,
+    max_entries=settings.AUTH_CONTEXT_CACHE_SIZE,
+)
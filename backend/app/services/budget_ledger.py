@@ -0,0 +1,625 @@
+"""
+Budget Ledger
+Counter-based budget reservations that keep row locks off the request path.
+
+Each budget's running usage is held in an atomic counter - a Redis hash
+updated by Lua scripts, so every API worker shares it, or an in-process dict
+for single-node installs. A reservation checks the hard limits of all
+applicable budgets and charges them all-or-nothing in one step (one Redis
+round-trip). Charges also accumulate as per-budget pending deltas, which a
+background task flushes to the ``budgets`` table in one batched UPDATE.
+
+The counter is seeded from ``current_usage_cents`` the first time a budget is
+seen and reseeded whenever its ``period_start`` changes (period reset), so
+the database stays the source of truth across restarts. Limits and the
+hard-limit flag are passed in on every call and never cached here.
+``budgets.current_usage_cents`` trails the ledger by at most one flush
+interval.
+
+Every successful reservation is tracked as a ``BudgetReservation`` handle with
+a TTL. Settling a handle charges the difference between the actual and the
+estimated cost, releasing it refunds the estimate, and a background sweeper
+releases handles that outlive their TTL (crashed workers, lost requests).
+Settling is idempotent, so a handle is charged or refunded exactly once even
+when the sweeper races the request. With the "database" backend the
+reservation itself still takes row locks, but settlements and refunds go
+through the same batched flush.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, update
+
+from app.core.cache import core_cache
+from app.core.config import settings
+from app.db.database import async_session_factory
+from app.models.budget import Budget
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "budget_ledger"
+DIRTY_SET = f"{REDIS_PREFIX}:dirty"
+# Sorted set of open reservations scored by expiry time
+RESERVATIONS_SET = f"{REDIS_PREFIX}:reservations"
+
+# KEYS: dirty set, reservations set, then one hash per budget
+# ARGV: amount, reservation member, expiry, then
+#       (id, limit, hard, seed usage, period) per budget
+# Returns {allowed, blocked index (1-based, 0 if none), usage...}
+RESERVE_SCRIPT = """
+local amount = tonumber(ARGV[1])
+local usages = {}
+for i = 3, #KEYS do
+    local base = 4 + (i - 3) * 5
+    local key = KEYS[i]
+    local period = redis.call('HGET', key, 'period')
+    if period ~= ARGV[base + 4] then
+        local pending = 0
+        if not period then
+            pending = tonumber(redis.call('HGET', key, 'pending') or '0')
+        end
+        redis.call('HSET', key, 'usage', tonumber(ARGV[base + 3]) + pending,
+                   'pending', pending, 'period', ARGV[base + 4])
+    end
+    local usage = tonumber(redis.call('HGET', key, 'usage'))
+    usages[i - 2] = usage
+    if ARGV[base + 2] == '1' and usage + amount > tonumber(ARGV[base + 1]) then
+        local result = {0, i - 2}
+        for j = 1, #usages do result[j + 2] = usages[j] end
+        return result
+    end
+end
+local result = {1, 0}
+for i = 3, #KEYS do
+    result[i] = redis.call('HINCRBY', KEYS[i], 'usage', amount)
+    if amount ~= 0 then
+        redis.call('HINCRBY', KEYS[i], 'pending', amount)
+        redis.call('SADD', KEYS[1], ARGV[4 + (i - 3) * 5])
+    end
+end
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+return result
+"""
+
+# Reservation members are "<id>|<amount>|<budget id>,<budget id>,..."
+# KEYS: dirty set, reservations set; ARGV: member, delta, hash key prefix
+# Applies delta only if the reservation was still open; returns 1 or 0
+SETTLE_SCRIPT = """
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+local delta = tonumber(ARGV[2])
+if delta ~= 0 then
+    local ids = string.match(ARGV[1], '^[^|]*|[^|]*|(.*)$')
+    for id in string.gmatch(ids, '%d+') do
+        redis.call('HINCRBY', ARGV[3] .. id, 'usage', delta)
+        redis.call('HINCRBY', ARGV[3] .. id, 'pending', delta)
+        redis.call('SADD', KEYS[1], id)
+    end
+end
+return 1
+"""
+
+# KEYS: dirty set, reservations set; ARGV: now, max count, hash key prefix
+# Refunds and removes expired reservations; returns how many were released
+SWEEP_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1],
+                           'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], member)
+    local amount, ids = string.match(member, '^[^|]*|(-?%d+)|(.*)$')
+    for id in string.gmatch(ids, '%d+') do
+        redis.call('HINCRBY', ARGV[3] .. id, 'usage', -tonumber(amount))
+        redis.call('HINCRBY', ARGV[3] .. id, 'pending', -tonumber(amount))
+        redis.call('SADD', KEYS[1], id)
+    end
+end
+return #expired
+"""
+
+# KEYS: dirty set, then one hash per budget; ARGV: delta, then one id per budget
+ADJUST_SCRIPT = """
+local delta = tonumber(ARGV[1])
+for i = 2, #KEYS do
+    redis.call('HINCRBY', KEYS[i], 'usage', delta)
+    redis.call('HINCRBY', KEYS[i], 'pending', delta)
+    redis.call('SADD', KEYS[1], ARGV[i])
+end
+return #KEYS - 1
+"""
+
+# KEYS: dirty set; ARGV: hash key prefix
+# Returns a flat {id, pending, id, pending, ...} list and zeroes the deltas
+TAKE_PENDING_SCRIPT = """
+local ids = redis.call('SMEMBERS', KEYS[1])
+local result = {}
+for _, id in ipairs(ids) do
+    local key = ARGV[1] .. id
+    local pending = tonumber(redis.call('HGET', key, 'pending') or '0')
+    if pending ~= 0 then
+        redis.call('HINCRBY', key, 'pending', -pending)
+        table.insert(result, id)
+        table.insert(result, pending)
+    end
+    redis.call('SREM', KEYS[1], id)
+end
+return result
+"""
+
+# KEYS: dirty set, then one hash per budget; ARGV: one (id, delta) pair per budget
+RESTORE_PENDING_SCRIPT = """
+for i = 2, #KEYS do
+    redis.call('HINCRBY', KEYS[i], 'pending', tonumber(ARGV[(i - 2) * 2 + 2]))
+    redis.call('SADD', KEYS[1], ARGV[(i - 2) * 2 + 1])
+end
+return #KEYS - 1
+"""
+
+
+@dataclass
+class LedgerBudget:
+    """Budget state passed to the ledger with each reservation"""
+
+    id: int
+    limit_cents: int
+    usage_cents: int
+    period: str
+    hard_limit: bool = True
+
+    @classmethod
+    def from_budget(cls, budget: Budget) -> "LedgerBudget":
+        return cls(
+            id=budget.id,
+            limit_cents=budget.limit_cents,
+            usage_cents=budget.current_usage_cents or 0,
+            period=budget.period_start.isoformat() if budget.period_start else "",
+            hard_limit=bool(budget.enforce_hard_limit),
+        )
+
+
+class BudgetReservation(list):
+    """Handle for an open reservation: the reserved budget ids plus metadata
+
+    It is a list of budget ids so it can be passed wherever the reserved
+    budget ids used to be.
+    """
+
+    def __init__(
+        self,
+        budget_ids: List[int],
+        amount_cents: int,
+        ttl: float,
+        reservation_id: Optional[str] = None,
+    ):
+        super().__init__(budget_ids)
+        self.reservation_id = reservation_id or uuid.uuid4().hex
+        self.amount_cents = amount_cents
+        self.expires_at = time.time() + ttl
+
+    @property
+    def member(self) -> str:
+        """Stable encoding used as the reservation's key in the stores"""
+        budget_ids = ",".join(str(budget_id) for budget_id in self)
+        return f"{self.reservation_id}|{self.amount_cents}|{budget_ids}"
+
+
+@dataclass
+class LedgerResult:
+    """Outcome of a ledger reservation"""
+
+    allowed: bool
+    # Usage per budget id: after the charge if allowed, otherwise current usage
+    usages: Dict[int, int]
+    blocked_budget_id: Optional[int] = None
+    reservation: Optional[BudgetReservation] = None
+
+
+class MemoryLedgerStore:
+    """In-process ledger store for single-node installs
+
+    Operations never await, so each one is atomic on the event loop.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Dict[str, object]] = {}
+        self._reservations: Dict[str, BudgetReservation] = {}
+
+    def _entry(self, budget: LedgerBudget) -> Dict[str, object]:
+        entry = self._entries.get(budget.id)
+        if entry is None or entry["period"] != budget.period:
+            # Deltas of a finished period are dropped; deltas recorded before
+            # the budget was seen (period None) still need to be flushed
+            pending = entry["pending"] if entry and entry["period"] is None else 0
+            entry = {
+                "usage": budget.usage_cents + pending,
+                "pending": pending,
+                "period": budget.period,
+            }
+            self._entries[budget.id] = entry
+        return entry
+
+    async def reserve(
+        self,
+        budgets: List[LedgerBudget],
+        amount: int,
+        reservation: BudgetReservation,
+    ) -> LedgerResult:
+        entries = [self._entry(budget) for budget in budgets]
+        usages = {budget.id: entry["usage"] for budget, entry in zip(budgets, entries)}
+        for budget, entry in zip(budgets, entries):
+            if budget.hard_limit and entry["usage"] + amount > budget.limit_cents:
+                return LedgerResult(False, usages, budget.id)
+
+        for budget, entry in zip(budgets, entries):
+            entry["usage"] += amount
+            entry["pending"] += amount
+            usages[budget.id] = entry["usage"]
+        self._reservations[reservation.member] = reservation
+        return LedgerResult(True, usages, reservation=reservation)
+
+    def track(self, reservation: BudgetReservation):
+        """Track a reservation whose charge was applied elsewhere"""
+        self._reservations[reservation.member] = reservation
+
+    def is_open(self, reservation: BudgetReservation) -> bool:
+        return reservation.member in self._reservations
+
+    @property
+    def open_reservations(self) -> int:
+        return len(self._reservations)
+
+    async def settle(self, reservation: BudgetReservation, delta: int) -> bool:
+        if self._reservations.pop(reservation.member, None) is None:
+            return False
+        if delta:
+            await self.adjust(list(reservation), delta)
+        return True
+
+    async def sweep(self, now: float, limit: int) -> int:
+        expired = [
+            reservation
+            for reservation in self._reservations.values()
+            if reservation.expires_at <= now
+        ][:limit]
+        for reservation in expired:
+            await self.settle(reservation, -reservation.amount_cents)
+        return len(expired)
+
+    async def adjust(self, budget_ids: List[int], delta: int):
+        for budget_id in budget_ids:
+            entry = self._entries.setdefault(
+                budget_id, {"usage": 0, "pending": 0, "period": None}
+            )
+            entry["usage"] += delta
+            entry["pending"] += delta
+
+    async def take_pending(self) -> Dict[int, int]:
+        deltas = {}
+        for budget_id, entry in self._entries.items():
+            if entry["pending"]:
+                deltas[budget_id] = entry["pending"]
+                entry["pending"] = 0
+        return deltas
+
+    async def restore_pending(self, deltas: Dict[int, int]):
+        for budget_id, delta in deltas.items():
+            entry = self._entries.setdefault(
+                budget_id, {"usage": 0, "pending": 0, "period": None}
+            )
+            entry["pending"] += delta
+
+    async def forget(self, budget_ids: List[int]):
+        for budget_id in budget_ids:
+            self._entries.pop(budget_id, None)
+
+
+class RedisLedgerStore:
+    """Ledger store shared by all workers through Redis Lua scripts"""
+
+    def __init__(self, client):
+        self.client = client
+        self._reserve = client.register_script(RESERVE_SCRIPT)
+        self._adjust = client.register_script(ADJUST_SCRIPT)
+        self._take_pending = client.register_script(TAKE_PENDING_SCRIPT)
+        self._restore_pending = client.register_script(RESTORE_PENDING_SCRIPT)
+        self._settle = client.register_script(SETTLE_SCRIPT)
+        self._sweep = client.register_script(SWEEP_SCRIPT)
+
+    @staticmethod
+    def _key(budget_id: int) -> str:
+        return f"{REDIS_PREFIX}:{budget_id}"
+
+    async def reserve(
+        self,
+        budgets: List[LedgerBudget],
+        amount: int,
+        reservation: BudgetReservation,
+    ) -> LedgerResult:
+        keys = [DIRTY_SET, RESERVATIONS_SET]
+        keys += [self._key(budget.id) for budget in budgets]
+        args = [amount, reservation.member, reservation.expires_at]
+        for budget in budgets:
+            args += [
+                budget.id,
+                budget.limit_cents,
+                1 if budget.hard_limit else 0,
+                budget.usage_cents,
+                budget.period,
+            ]
+        result = await self._reserve(keys=keys, args=args)
+
+        allowed, blocked_index = int(result[0]), int(result[1])
+        usages = {budget.id: int(usage) for budget, usage in zip(budgets, result[2:])}
+        if not allowed:
+            return LedgerResult(False, usages, budgets[blocked_index - 1].id)
+        return LedgerResult(True, usages, reservation=reservation)
+
+    async def settle(self, reservation: BudgetReservation, delta: int) -> bool:
+        settled = await self._settle(
+            keys=[DIRTY_SET, RESERVATIONS_SET],
+            args=[reservation.member, delta, f"{REDIS_PREFIX}:"],
+        )
+        return bool(settled)
+
+    async def sweep(self, now: float, limit: int) -> int:
+        return int(
+            await self._sweep(
+                keys=[DIRTY_SET, RESERVATIONS_SET],
+                args=[now, limit, f"{REDIS_PREFIX}:"],
+            )
+        )
+
+    async def adjust(self, budget_ids: List[int], delta: int):
+        if not budget_ids or not delta:
+            return
+        await self._adjust(
+            keys=[DIRTY_SET] + [self._key(budget_id) for budget_id in budget_ids],
+            args=[delta] + list(budget_ids),
+        )
+
+    async def take_pending(self) -> Dict[int, int]:
+        result = await self._take_pending(keys=[DIRTY_SET], args=[f"{REDIS_PREFIX}:"])
+        return {int(result[i]): int(result[i + 1]) for i in range(0, len(result), 2)}
+
+    async def restore_pending(self, deltas: Dict[int, int]):
+        if not deltas:
+            return
+        args = []
+        for budget_id, delta in deltas.items():
+            args += [budget_id, delta]
+        await self._restore_pending(
+            keys=[DIRTY_SET] + [self._key(budget_id) for budget_id in deltas],
+            args=args,
+        )
+
+    async def forget(self, budget_ids: List[int]):
+        if budget_ids:
+            await self.client.delete(
+                *[self._key(budget_id) for budget_id in budget_ids]
+            )
+
+
+class BudgetLedger:
+    """Budget counters with periodic batched reconciliation to Postgres"""
+
+    def __init__(
+        self,
+        backend: str = "redis",
+        flush_interval: float = 2.0,
+        reservation_ttl: float = 600.0,
+        sweep_batch_size: int = 500,
+    ):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.reservation_ttl = reservation_ttl
+        self.sweep_batch_size = sweep_batch_size
+        self._memory_store = MemoryLedgerStore()
+        self._redis_store: Optional[RedisLedgerStore] = None
+        self._redis_client = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.stats = {
+            "reservations": 0,
+            "rejections": 0,
+            "settled": 0,
+            "released": 0,
+            "expired": 0,
+            "flushes": 0,
+            "flushed_budgets": 0,
+            "flush_errors": 0,
+        }
+
+    @property
+    def store(self):
+        """Active store, or None when reservations should use row locks"""
+        if self.backend == "memory":
+            return self._memory_store
+        if self.backend == "redis" and core_cache.enabled:
+            if self._redis_client is not core_cache.redis_client:
+                self._redis_client = core_cache.redis_client
+                self._redis_store = RedisLedgerStore(self._redis_client)
+            return self._redis_store
+        return None
+
+    @property
+    def active(self) -> bool:
+        return self.store is not None
+
+    @property
+    def _delta_store(self):
+        """Store holding reservations and pending deltas for the flush"""
+        return self.store or self._memory_store
+
+    async def reserve(self, budgets: List[Budget], amount_cents: int) -> LedgerResult:
+        """Charge amount_cents to every budget, or to none if a hard limit blocks"""
+        reservation = BudgetReservation(
+            [budget.id for budget in budgets], amount_cents, self.reservation_ttl
+        )
+        result = await self.store.reserve(
+            [LedgerBudget.from_budget(budget) for budget in budgets],
+            amount_cents,
+            reservation,
+        )
+        self.stats["reservations" if result.allowed else "rejections"] += 1
+        return result
+
+    def track(self, budget_ids: List[int], amount_cents: int) -> BudgetReservation:
+        """Open a handle for a reservation already charged to the database"""
+        reservation = BudgetReservation(budget_ids, amount_cents, self.reservation_ttl)
+        self._memory_store.track(reservation)
+        self.stats["reservations"] += 1
+        return reservation
+
+    async def settle(
+        self, reservation: BudgetReservation, actual_cost_cents: int
+    ) -> bool:
+        """Replace the reserved estimate with the actual cost
+
+        Returns False if the reservation was already settled or released.
+        """
+        store = self._store_for(reservation)
+        settled = await store.settle(
+            reservation, actual_cost_cents - reservation.amount_cents
+        )
+        if settled:
+            self.stats["settled"] += 1
+        return settled
+
+    async def release(self, reservation: BudgetReservation) -> bool:
+        """Refund the reserved estimate (request failed or was abandoned)"""
+        store = self._store_for(reservation)
+        released = await store.settle(reservation, -reservation.amount_cents)
+        if released:
+            self.stats["released"] += 1
+        return released
+
+    def _store_for(self, reservation: BudgetReservation):
+        # Handles tracked for row-locked reservations live in the memory store
+        if self._memory_store.is_open(reservation):
+            return self._memory_store
+        return self._delta_store
+
+    async def sweep(self) -> int:
+        """Release reservations whose TTL has passed"""
+        now = time.time()
+        expired = await self._memory_store.sweep(now, self.sweep_batch_size)
+        if self.store is not None and self.store is not self._memory_store:
+            expired += await self.store.sweep(now, self.sweep_batch_size)
+        if expired:
+            self.stats["expired"] += expired
+            logger.warning(f"Released {expired} expired budget reservations")
+        return expired
+
+    async def adjust(self, budget_ids: List[int], delta_cents: int):
+        """Add delta_cents (may be negative) to budgets without a limit check"""
+        await self._delta_store.adjust(budget_ids, delta_cents)
+
+    async def forget(self, budget_ids: List[int]):
+        """Drop cached counters so they are reseeded from the database"""
+        if self.store is not None:
+            await self.store.forget(budget_ids)
+
+    async def flush(self) -> int:
+        """Write pending deltas to the budgets table; returns budgets updated"""
+        updated = await self._flush_store(self._memory_store)
+        if self.store is not None and self.store is not self._memory_store:
+            updated += await self._flush_store(self.store)
+        return updated
+
+    async def _flush_store(self, store) -> int:
+        async with self._flush_lock:
+            deltas = await store.take_pending()
+            if not deltas:
+                return 0
+
+            try:
+                await self._apply_deltas(deltas)
+            except Exception as e:
+                # Put the deltas back so the next flush retries them
+                await store.restore_pending(deltas)
+                self.stats["flush_errors"] += 1
+                logger.error(
+                    f"Budget ledger flush failed for {len(deltas)} budgets: {e}"
+                )
+                return 0
+
+            self.stats["flushes"] += 1
+            self.stats["flushed_budgets"] += len(deltas)
+            logger.debug(f"Flushed budget ledger deltas: {deltas}")
+            return len(deltas)
+
+    async def _apply_deltas(self, deltas: Dict[int, int]):
+        """Apply all deltas in a single UPDATE ... WHERE id IN (...)"""
+        new_usage = Budget.current_usage_cents + case(deltas, value=Budget.id, else_=0)
+        stmt = (
+            update(Budget)
+            .where(Budget.id.in_(list(deltas)))
+            .values(
+                current_usage_cents=new_usage,
+                updated_at=datetime.utcnow(),
+                is_exceeded=new_usage >= Budget.limit_cents,
+                is_warning_sent=(
+                    Budget.is_warning_sent
+                    | (
+                        (Budget.warning_threshold_cents.isnot(None))
+                        & (new_usage >= Budget.warning_threshold_cents)
+                    )
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        async with async_session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.sweep()
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Budget ledger flush loop error: {e}")
+
+    def start(self):
+        """Start the background sweep and flush task"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+            logger.info(
+                f"Budget ledger started ({self.backend}, "
+                f"flush every {self.flush_interval}s, "
+                f"reservation TTL {self.reservation_ttl}s)"
+            )
+
+    async def stop(self):
+        """Stop the flush task and write out remaining deltas"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "backend": self.backend,
+            "active": self.active,
+            "open_local_reservations": self._memory_store.open_reservations,
+        }
+
+
+# Global budget ledger instance
+budget_ledger = BudgetLedger(
+    backend=settings.BUDGET_LEDGER_BACKEND,
+    flush_interval=settings.BUDGET_LEDGER_FLUSH_INTERVAL,
+    reservation_ttl=settings.BUDGET_RESERVATION_TTL,
+)
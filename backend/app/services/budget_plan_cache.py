@@ -0,0 +1,279 @@
+"""
+Budget plan cache
+
+Resolving which budgets apply to a request used to query every active
+budget of the user on each call and filter ``allowed_models`` and
+``allowed_endpoints`` in Python. A ``BudgetPlan`` does that query once per
+API key, pre-indexes the budgets by model and endpoint restriction, and
+memoizes the answer per (model, endpoint) pair.
+
+Plans are cached per API key under a per-user generation counter: budgets of
+a user (user-wide or per key) are created, changed or deleted through the
+budget endpoints, which bump the user's generation and so invalidate every
+plan of that user's keys. As with the RAG search cache, plans and
+generations live in Redis when ``core_cache`` is available, costing one MGET
+per lookup, with an in-process LRU in front of it. ``lookup`` returns the
+generation it saw and ``set`` stores the plan under it, so a plan loaded
+while its budgets change is never cached as current.
+
+Cached budgets are detached snapshots: fine for checks and for seeding the
+budget ledger, but anything that writes a budget row must load it first.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime
+
+from app.core.cache import core_cache
+from app.core.config import settings
+from app.models.budget import Budget
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "budget_plan"
+
+_COLUMNS = [column.name for column in Budget.__table__.columns]
+_DATETIME_COLUMNS = {
+    column.name
+    for column in Budget.__table__.columns
+    if isinstance(column.type, DateTime)
+}
+
+
+def _snapshot(budget: Budget) -> Dict[str, Any]:
+    data = {}
+    for name in _COLUMNS:
+        value = getattr(budget, name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data[name] = value
+    return data
+
+
+def _restore(data: Dict[str, Any]) -> Budget:
+    values = {}
+    for name in _COLUMNS:
+        value = data.get(name)
+        if name in _DATETIME_COLUMNS and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        values[name] = value
+    return Budget(**values)
+
+
+class BudgetPlan:
+    """Budgets that can apply to one API key, indexed by restriction"""
+
+    def __init__(self, budgets: List[Budget]):
+        self.budgets = list(budgets)
+        self._any_model: List[int] = []
+        self._by_model: Dict[str, List[int]] = {}
+        self._any_endpoint: set = set()
+        self._by_endpoint: Dict[str, set] = {}
+        self._resolved: Dict[Tuple[Optional[str], Optional[str]], List[Budget]] = {}
+
+        for index, budget in enumerate(self.budgets):
+            if budget.allowed_models:
+                for model in budget.allowed_models:
+                    self._by_model.setdefault(model, []).append(index)
+            else:
+                self._any_model.append(index)
+
+            if budget.allowed_endpoints:
+                for endpoint in budget.allowed_endpoints:
+                    self._by_endpoint.setdefault(endpoint, set()).add(index)
+            else:
+                self._any_endpoint.add(index)
+
+    def applicable(
+        self, model_name: Optional[str] = None, endpoint: Optional[str] = None
+    ) -> List[Budget]:
+        """Budgets that apply to a request for model_name on endpoint"""
+        key = (model_name, endpoint)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            if model_name:
+                indices = self._any_model + self._by_model.get(model_name, [])
+            else:
+                indices = range(len(self.budgets))
+            if endpoint:
+                allowed = self._any_endpoint | self._by_endpoint.get(endpoint, set())
+                indices = [index for index in indices if index in allowed]
+            resolved = [self.budgets[index] for index in sorted(set(indices))]
+            self._resolved[key] = resolved
+        return resolved
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"budgets": [_snapshot(budget) for budget in self.budgets]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BudgetPlan":
+        return cls([_restore(budget) for budget in data.get("budgets", [])])
+
+
+class BudgetPlanCache:
+    """Per-API-key budget plans with per-user generation invalidation"""
+
+    def __init__(self, max_entries: int = 10000, ttl: int = 60, use_redis: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_redis = use_redis
+        # "user_id:api_key_id" -> (user_id, generation, expires_at, plan)
+        self._entries: "OrderedDict[str, Tuple[int, int, float, BudgetPlan]]" = (
+            OrderedDict()
+        )
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "redis_hits": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    @property
+    def _redis_enabled(self) -> bool:
+        return self.use_redis and core_cache.enabled
+
+    @staticmethod
+    def _key(user_id: int, api_key_id: int) -> str:
+        return f"{user_id}:{api_key_id}"
+
+    def _get_local(self, key: str, generation: int) -> Optional[BudgetPlan]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            _, entry_generation, expires_at, plan = entry
+            if entry_generation != generation or expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return plan
+
+    def _set_local(self, key: str, user_id: int, generation: int, plan: BudgetPlan):
+        with self._lock:
+            self._entries[key] = (
+                user_id,
+                generation,
+                time.monotonic() + self.ttl,
+                plan,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def get(self, user_id: int, api_key_id: int) -> Optional[BudgetPlan]:
+        """Return the cached plan for an API key, or None on a miss"""
+        plan, _ = await self.lookup(user_id, api_key_id)
+        return plan
+
+    async def lookup(
+        self, user_id: int, api_key_id: int
+    ) -> Tuple[Optional[BudgetPlan], int]:
+        """Return (cached plan or None, generation seen by the lookup)
+
+        Pass the generation to ``set`` when caching a plan loaded after a miss.
+        """
+        key = self._key(user_id, api_key_id)
+        if not self._redis_enabled:
+            generation = self._generations.get(user_id, 0)
+            plan = self._get_local(key, generation)
+            self.stats["hits" if plan is not None else "misses"] += 1
+            return plan, generation
+
+        # One round-trip fetches the user's generation and the shared plan
+        raw_generation, cached = await core_cache.get_many(
+            [f"gen:{user_id}", f"plan:{key}"], prefix=CACHE_PREFIX
+        )
+        generation = int(raw_generation or 0)
+        self._generations[user_id] = generation
+
+        plan = self._get_local(key, generation)
+        if plan is not None:
+            self.stats["hits"] += 1
+            return plan, generation
+
+        if isinstance(cached, dict) and cached.get("generation") == generation:
+            try:
+                plan = BudgetPlan.from_dict(cached)
+            except Exception as e:
+                logger.warning(f"Discarding undecodable cached budget plan: {e}")
+            else:
+                self._set_local(key, user_id, generation, plan)
+                self.stats["hits"] += 1
+                self.stats["redis_hits"] += 1
+                return plan, generation
+
+        self.stats["misses"] += 1
+        return None, generation
+
+    async def set(
+        self,
+        user_id: int,
+        api_key_id: int,
+        plan: BudgetPlan,
+        generation: Optional[int] = None,
+    ):
+        """Store a plan under the generation its lookup saw
+
+        Without a generation the user's current one is used. Plans loaded
+        under an already invalidated generation are not stored.
+        """
+        key = self._key(user_id, api_key_id)
+        current = self._generations.get(user_id, 0)
+        if generation is None:
+            generation = current
+        elif generation < current:
+            return
+        self._set_local(key, user_id, generation, plan)
+
+        if self._redis_enabled:
+            payload = {"generation": generation, **plan.to_dict()}
+            await core_cache.set(
+                f"plan:{key}", payload, ttl=self.ttl, prefix=CACHE_PREFIX
+            )
+
+    async def invalidate_user(self, user_id: int):
+        """Invalidate the plans of every API key of a user"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            stale = [key for key, entry in self._entries.items() if entry[0] == user_id]
+            for key in stale:
+                del self._entries[key]
+        self.stats["invalidations"] += 1
+
+        if self._redis_enabled:
+            generation = await core_cache.increment(
+                f"gen:{user_id}", prefix=CACHE_PREFIX
+            )
+            if generation:
+                self._generations[user_id] = generation
+
+    def clear(self):
+        """Drop all local entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache statistics"""
+        stats = self.stats.copy()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["size"] = len(self._entries)
+        stats["shared"] = self._redis_enabled
+        return stats
+
+
+# Global budget plan cache instance
+budget_plan_cache = BudgetPlanCache(
+    max_entries=settings.BUDGET_PLAN_CACHE_SIZE,
+    ttl=settings.BUDGET_PLAN_CACHE_TTL,
+    use_redis=settings.BUDGET_PLAN_CACHE_REDIS,
+)
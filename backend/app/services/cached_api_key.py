@@ -2,24 +2,74 @@
 Cached API Key Service - Refactored to use Core Cache Infrastructure
 High-performance Redis-based API key caching to reduce authentication overhead
 from ~60ms to ~5ms by avoiding expensive bcrypt operations
+
+Verified auth contexts are additionally kept in a short-lived in-process L1
+cache keyed by a digest of the full key, so warm requests authenticate without
+touching Redis or the database. The L1 holds plain column values and every hit
+gets its own detached APIKey and User objects, so handlers that mutate them
+(usage counters, digest migration) never affect other requests. Invalidations
+are broadcast to all workers over Redis pub/sub.
 """
 
+import asyncio
+import copy
+import hashlib
 import json
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, Tuple
-from sqlalchemy import select
+from typing import Optional, Dict, Any, NamedTuple, Tuple
+from sqlalchemy import inspect, select
 from sqlalchemy.orm import joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.cache import core_cache
 from app.core.config import settings
 from app.core.security import verify_api_key
+from app.services.last_seen import api_key_last_used
 from app.models.api_key import APIKey
 from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
+# Pub/sub channel carrying key prefixes whose cached auth data is stale
+INVALIDATION_CHANNEL = "auth:invalidate"
+
+
+class _RowSnapshot(NamedTuple):
+    """Column values of an ORM object, independent of any session"""
+
+    model: type
+    values: Dict[str, Any]
+
+
+def _freeze_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """Plain-data copy of an auth context that requests can share"""
+    frozen = {}
+    for name, value in context.items():
+        if isinstance(value, (APIKey, User)):
+            value = _RowSnapshot(
+                type(value),
+                {
+                    attr.key: copy.deepcopy(getattr(value, attr.key))
+                    for attr in inspect(type(value)).column_attrs
+                },
+            )
+        frozen[name] = value
+    return frozen
+
+
+def _thaw_context(frozen: Dict[str, Any]) -> Dict[str, Any]:
+    """Auth context with fresh, detached ORM objects for one request"""
+    return {
+        name: value.model(**copy.deepcopy(value.values))
+        if isinstance(value, _RowSnapshot)
+        else value
+        for name, value in frozen.items()
+    }
+
 
 class CachedAPIKeyService:
     """Core cache-backed API key caching service for performance optimization"""
@@ -27,14 +77,93 @@ class CachedAPIKeyService:
     def __init__(self):
         self.cache_ttl = 300  # 5 minutes cache TTL
         self.verification_cache_ttl = 3600  # 1 hour for verification results
+        self.local_cache_ttl = settings.API_KEY_LOCAL_CACHE_TTL
+        self.local_cache_size = settings.API_KEY_LOCAL_CACHE_SIZE
+        # key digest -> (expires_at, key_prefix, frozen context)
+        self._local: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._local_lock = threading.Lock()
+        self._listener_task: Optional[asyncio.Task] = None
+        self.local_stats = {"hits": 0, "misses": 0, "invalidations": 0}
         logger.info("Cached API key service initialized with core cache backend")
 
     async def close(self):
-        """Close method for compatibility - core cache handles its own lifecycle"""
+        """Stop the invalidation listener - core cache handles its own lifecycle"""
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        self.clear_local_cache()
         logger.info(
             "Cached API key service close called - core cache handles lifecycle"
         )
 
+    @staticmethod
+    def _digest(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode()).hexdigest()
+
+    def get_local_context(self, api_key: str) -> Optional[Dict[str, Any]]:
+        """Return the verified auth context of a key from the in-process cache"""
+        if self.local_cache_ttl <= 0:
+            return None
+        digest = self._digest(api_key)
+        with self._local_lock:
+            entry = self._local.get(digest)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._local[digest]
+                self.local_stats["misses"] += 1
+                return None
+            self._local.move_to_end(digest)
+            self.local_stats["hits"] += 1
+            frozen = entry[2]
+        return _thaw_context(frozen)
+
+    def set_local_context(self, api_key: str, context: Dict[str, Any]):
+        """Remember a verified auth context in the in-process cache"""
+        if self.local_cache_ttl <= 0:
+            return
+        key_prefix = api_key[:8]
+        frozen = _freeze_context(context)
+        with self._local_lock:
+            self._local[self._digest(api_key)] = (
+                time.monotonic() + self.local_cache_ttl,
+                key_prefix,
+                frozen,
+            )
+            while len(self._local) > self.local_cache_size:
+                self._local.popitem(last=False)
+
+    def evict_local(self, key_prefix: str):
+        """Drop in-process contexts of a key prefix"""
+        with self._local_lock:
+            stale = [
+                digest
+                for digest, entry in self._local.items()
+                if entry[1] == key_prefix
+            ]
+            for digest in stale:
+                del self._local[digest]
+        self.local_stats["invalidations"] += 1
+
+    def clear_local_cache(self):
+        with self._local_lock:
+            self._local.clear()
+
+    def start_invalidation_listener(self):
+        """Follow invalidations published by other workers"""
+        if not core_cache.enabled or self._listener_task:
+            return
+        self._listener_task = asyncio.create_task(
+            core_cache.listen(
+                INVALIDATION_CHANNEL, self.evict_local, self.clear_local_cache
+            )
+        )
+
     async def get_cached_api_key(
         self, key_prefix: str, db: AsyncSession
     ) -> Optional[Dict[str, Any]]:
@@ -105,6 +234,7 @@ class CachedAPIKeyService:
                     "name": api_key.name,
                     "key_hash": api_key.key_hash,
                     "key_prefix": api_key.key_prefix,
+                    "key_digest": api_key.key_digest,
                     "user_id": api_key.user_id,
                     "is_active": api_key.is_active,
                     "permissions": api_key.permissions,
@@ -212,9 +342,11 @@ class CachedAPIKeyService:
             )
 
     async def invalidate_api_key_cache(self, key_prefix: str):
-        """Invalidate cached API key data"""
+        """Invalidate cached API key data in Redis and in every worker"""
+        self.evict_local(key_prefix)
         try:
             await core_cache.invalidate_api_key(key_prefix)
+            await core_cache.publish(INVALIDATION_CHANNEL, key_prefix)
 
             # Also invalidate verification cache
             verification_keys = await core_cache.clear_pattern(
@@ -227,34 +359,8 @@ class CachedAPIKeyService:
             logger.error(f"Error invalidating cache for prefix {key_prefix}: {e}")
 
     async def update_last_used(self, api_key_id: int, db: AsyncSession):
-        """Update last used timestamp asynchronously for performance"""
-        try:
-            # Use core cache to track update requests to avoid database spam
-            cache_key = f"last_used_update:{api_key_id}"
-
-            # Check if we recently updated (within 5 minutes)
-            last_update = await core_cache.get(cache_key, prefix="perf")
-            if last_update:
-                return  # Skip update if recent
-
-            # Update database
-            stmt = select(APIKey).where(APIKey.id == api_key_id)
-            result = await db.execute(stmt)
-            api_key = result.scalar_one_or_none()
-
-            if api_key:
-                api_key.last_used_at = datetime.utcnow()
-                await db.commit()
-
-                # Cache that we updated to prevent spam
-                await core_cache.set(
-                    cache_key, datetime.utcnow().isoformat(), ttl=300, prefix="perf"
-                )
-
-                logger.debug(f"Updated last_used_at for API key {api_key_id}")
-
-        except Exception as e:
-            logger.error(f"Error updating last_used for API key {api_key_id}: {e}")
+        """Record key use; last_used_at is written in the next batched UPDATE"""
+        api_key_last_used.touch(api_key_id)
 
     async def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache performance statistics"""
@@ -264,6 +370,7 @@ class CachedAPIKeyService:
                 "cache_backend": "core_cache",
                 "cache_enabled": core_stats.get("enabled", False),
                 "cache_stats": core_stats,
+                "local_cache": {**self.local_stats, "size": len(self._local)},
             }
         except Exception as e:
             logger.error(f"Error getting cache stats: {e}")
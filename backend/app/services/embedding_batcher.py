@@ -0,0 +1,178 @@
+"""
+Embedding Batcher
+Coalesces concurrent embedding requests into batched forward passes.
+Small requests are queued for a few milliseconds (or until the batch is
+full), encoded together on a dedicated bounded executor and the resulting
+rows are fanned back out to the waiting callers.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.prometheus_metrics import embedding_batch_size
+
+logger = logging.getLogger(__name__)
+
+EncodeFunction = Callable[[List[str]], np.ndarray]
+
+
+class EmbeddingBatcher:
+    """Micro-batching scheduler in front of a synchronous encode function"""
+
+    def __init__(
+        self,
+        encode_fn: EncodeFunction,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_workers: int = 1,
+        executor: Optional[Executor] = None,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_workers = max(1, max_workers)
+        # A caller-supplied executor (e.g. a process pool) is owned by the caller
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="embedding"
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batches: set = set()
+        self.stats = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "largest_batch": 0,
+            "total_queue_wait": 0.0,
+            "total_encode_time": 0.0,
+        }
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_workers)
+            self._worker = loop.create_task(self._run())
+
+    async def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Encode texts, sharing a forward pass with concurrent callers"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        self.stats["requests"] += 1
+        texts = list(texts)
+
+        # Requests that fill a batch on their own gain nothing from waiting
+        if len(texts) >= self.max_batch_size:
+            return await self._encode_batch(texts, [time.perf_counter()])
+
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((texts, future, time.perf_counter()))
+        return await future
+
+    async def _encode_batch(
+        self, texts: List[str], enqueued_at: List[float]
+    ) -> np.ndarray:
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(self._executor, self.encode_fn, texts)
+        finished = time.perf_counter()
+
+        self.stats["texts"] += len(texts)
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(texts))
+        self.stats["total_queue_wait"] += sum(started - t for t in enqueued_at)
+        self.stats["total_encode_time"] += finished - started
+        embedding_batch_size.observe(len(texts))
+        return embeddings
+
+    async def _run(self):
+        """Collect queued requests into batches and dispatch them"""
+        queue = self._queue
+        while True:
+            first = await queue.get()
+            # Wait for a free executor slot; requests keep queueing meanwhile
+            await self._slots.acquire()
+
+            batch = [first]
+            size = len(first[0])
+            if size < self.max_batch_size and self.max_wait:
+                await asyncio.sleep(self.max_wait)
+            while size < self.max_batch_size and not queue.empty():
+                pending = queue.get_nowait()
+                batch.append(pending)
+                size += len(pending[0])
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(
+        self, batch: List[Tuple[List[str], asyncio.Future, float]]
+    ) -> None:
+        try:
+            texts = [text for request_texts, _, _ in batch for text in request_texts]
+            try:
+                embeddings = await self._encode_batch(
+                    texts, [enqueued_at for _, _, enqueued_at in batch]
+                )
+            except Exception as exc:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+
+            offset = 0
+            for request_texts, future, _ in batch:
+                end = offset + len(request_texts)
+                if not future.done():
+                    future.set_result(embeddings[offset:end])
+                offset = end
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        """Stop the scheduler and release the executor"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batcher closed"))
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return throughput and latency counters"""
+        stats = self.stats.copy()
+        batches = stats["batches"]
+        texts = stats["texts"]
+        encode_time = stats.pop("total_encode_time")
+        queue_wait = stats.pop("total_queue_wait")
+        stats["average_batch_size"] = texts / batches if batches else 0.0
+        stats["average_encode_ms"] = encode_time / batches * 1000 if batches else 0.0
+        stats["average_queue_wait_ms"] = (
+            queue_wait / stats["requests"] * 1000 if stats["requests"] else 0.0
+        )
+        stats["texts_per_second"] = texts / encode_time if encode_time else 0.0
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait * 1000
+        stats["pending"] = self._queue.qsize() if self._queue is not None else 0
+        return stats
@@ -0,0 +1,156 @@
+"""
+Embedding Cache
+Two-tier cache for text embeddings keyed by model name and normalized text.
+Tier one is an in-process LRU of float32 vectors; tier two optionally shares
+vectors between workers through the core Redis cache as compact float16 or
+float32 byte blobs, so repeated queries skip the model forward pass.
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.cache import core_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "embedding"
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry"""
+    return WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """In-process LRU with an optional shared Redis tier"""
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl: int = 86400,
+        use_redis: bool = True,
+        dtype: str = "float16",
+    ):
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.dtype = np.dtype(dtype)
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Build the cache key for a model/text pair"""
+        digest = hashlib.sha256(
+            f"{model_name}\x00{normalize_text(text)}".encode("utf-8")
+        ).hexdigest()
+        return f"{model_name}:{digest}"
+
+    @property
+    def _redis_enabled(self) -> bool:
+        return self.use_redis and core_cache.enabled
+
+    def _encode(self, vector: np.ndarray) -> str:
+        return base64.b64encode(vector.astype(self.dtype).tobytes()).decode("ascii")
+
+    def _decode(self, blob: str) -> np.ndarray:
+        return np.frombuffer(base64.b64decode(blob), dtype=self.dtype).astype(
+            np.float32
+        )
+
+    def _get_local(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def _set_local(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def get_many(
+        self, model_name: str, texts: Sequence[str]
+    ) -> List[Optional[np.ndarray]]:
+        """Look up embeddings; missing entries are returned as None"""
+        keys = [self.make_key(model_name, text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [self._get_local(key) for key in keys]
+        self.stats["hits"] += sum(1 for vector in vectors if vector is not None)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing and self._redis_enabled:
+            blobs = await core_cache.get_many(
+                [keys[i] for i in missing], prefix=CACHE_PREFIX
+            )
+            for i, blob in zip(missing, blobs):
+                if not isinstance(blob, str):
+                    continue
+                try:
+                    vector = self._decode(blob)
+                except Exception as e:
+                    logger.debug(f"Discarding undecodable cached embedding: {e}")
+                    continue
+                vectors[i] = vector
+                self._set_local(keys[i], vector)
+                self.stats["hits"] += 1
+                self.stats["redis_hits"] += 1
+
+        self.stats["misses"] += sum(1 for vector in vectors if vector is None)
+        return vectors
+
+    async def set_many(
+        self, model_name: str, texts: Sequence[str], vectors: Sequence[Any]
+    ):
+        """Store freshly computed embeddings in both tiers"""
+        writes = []
+        for text, vector in zip(texts, vectors):
+            key = self.make_key(model_name, text)
+            vector = np.asarray(vector, dtype=np.float32)
+            self._set_local(key, vector)
+            if self._redis_enabled:
+                writes.append(
+                    core_cache.set(
+                        key, self._encode(vector), ttl=self.ttl, prefix=CACHE_PREFIX
+                    )
+                )
+        if writes:
+            await asyncio.gather(*writes)
+
+    def clear(self):
+        """Drop all in-process entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache statistics"""
+        stats = self.stats.copy()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["size"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["dtype"] = self.dtype.name
+        stats["shared"] = self._redis_enabled
+        return stats
@@ -0,0 +1,122 @@
+"""
+Embedding Process Pool
+Out-of-process embedding engine. Each worker process loads its own
+embedding model (SentenceTransformer or ONNX) and encodes batches sent over
+the executor's pipe; results come back as pickled numpy buffers, so there is
+no JSON round-trip and forward passes no longer compete with request
+handling for the API process's interpreter.
+
+This module is imported by the spawned workers, so it deliberately only
+depends on the standard library and numpy at import time.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Model held by each worker process
+_worker_model = None
+
+
+def load_embedding_model(
+    model_name: str,
+    backend: str = "sentence_transformer",
+    onnx_options: Optional[Dict[str, Any]] = None,
+):
+    """Load an embedding model for the configured backend
+
+    Both backends expose encode() and get_sentence_embedding_dimension().
+    """
+    if backend == "onnx":
+        from app.services.onnx_embedding_backend import OnnxEmbeddingModel
+
+        return OnnxEmbeddingModel(**(onnx_options or {}))
+
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def _init_worker(
+    model_name: str,
+    torch_threads: int,
+    backend: str,
+    onnx_options: Optional[Dict[str, Any]],
+):
+    """Load the model once per worker process"""
+    global _worker_model
+
+    try:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    if backend == "onnx" and onnx_options is not None:
+        onnx_options = {**onnx_options, "intra_op_threads": torch_threads}
+    _worker_model = load_embedding_model(model_name, backend, onnx_options)
+
+
+def encode_in_worker(texts: List[str]) -> np.ndarray:
+    """Encode a batch inside a worker process"""
+    return _worker_model.encode(
+        texts,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    ).astype(np.float32, copy=False)
+
+
+def worker_dimension() -> int:
+    """Return the embedding dimension of the worker's model"""
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+class EmbeddingProcessPool:
+    """Pool of worker processes that each hold the embedding model"""
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: int = 2,
+        backend: str = "sentence_transformer",
+        onnx_options: Optional[Dict[str, Any]] = None,
+    ):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.backend = backend
+        self.onnx_options = onnx_options
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> ProcessPoolExecutor:
+        """Start the worker processes (spawned, never forked from the API)"""
+        if self.executor is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(
+                    self.model_name,
+                    torch_threads,
+                    self.backend,
+                    self.onnx_options,
+                ),
+            )
+            logger.info(
+                f"Started {self.workers} embedding worker processes for "
+                f"{self.model_name} ({torch_threads} torch threads each)"
+            )
+        return self.executor
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
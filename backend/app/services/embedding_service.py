@@ -7,10 +7,19 @@ Falls back to deterministic random vectors when the local model is unavailable.
 import asyncio
 import logging
 import time
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Dict, Any, Optional
 import numpy as np
 
 from app.core.config import settings
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_process_pool import (
+    EmbeddingProcessPool,
+    encode_in_worker,
+    load_embedding_model,
+    worker_dimension,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -26,31 +35,79 @@ class EmbeddingService:
         self.initialized = False
         self.local_model = None
         self.backend = "uninitialized"
+        self.batcher: Optional[EmbeddingBatcher] = None
+        self.process_pool: Optional[EmbeddingProcessPool] = None
+        self.cache = EmbeddingCache(
+            max_entries=getattr(settings, "RAG_EMBEDDING_CACHE_SIZE", 2048),
+            ttl=getattr(settings, "RAG_EMBEDDING_CACHE_TTL", 86400),
+            use_redis=getattr(settings, "RAG_EMBEDDING_CACHE_REDIS", True),
+            dtype=getattr(settings, "RAG_EMBEDDING_CACHE_DTYPE", "float16"),
+        )
+
+    @property
+    def model_available(self) -> bool:
+        """Whether a real model (in-process or in worker processes) is loaded"""
+        return self.local_model is not None or self.process_pool is not None
+
+    def _model_backend(self) -> str:
+        """Configured model backend: "sentence_transformer" or "onnx" """
+        return getattr(settings, "RAG_EMBEDDING_BACKEND", "sentence_transformer")
+
+    def _onnx_options(self) -> Optional[Dict[str, Any]]:
+        if self._model_backend() != "onnx":
+            return None
+        return {
+            "model_dir": getattr(settings, "RAG_EMBEDDING_ONNX_DIR", None),
+            "quantized": getattr(settings, "RAG_EMBEDDING_ONNX_QUANTIZED", False),
+            "pooling": getattr(settings, "RAG_EMBEDDING_ONNX_POOLING", "cls"),
+        }
+
+    def _backend_label(self) -> str:
+        options = self._onnx_options()
+        if options is None:
+            return "sentence_transformer"
+        return "onnx_int8" if options["quantized"] else "onnx"
+
+    def _cache_model_key(self) -> str:
+        """Embedding cache namespace
+
+        Backends, ONNX quantization and pooling all produce different vectors
+        for the same model, so each combination gets its own cache entries.
+        """
+        options = self._onnx_options()
+        if options is None:
+            return f"{self.model_name}|{self._backend_label()}"
+        return f"{self.model_name}|{self._backend_label()}|{options['pooling']}"
 
     async def initialize(self):
         """Initialize the embedding service with LLM service"""
-        try:
-            from sentence_transformers import SentenceTransformer
+        if getattr(settings, "RAG_EMBEDDING_WORKER_MODE", "thread") == "process":
+            return await self._initialize_process_pool()
 
+        try:
             loop = asyncio.get_running_loop()
 
             def load_model():
                 # Load model synchronously in a worker thread to avoid blocking event loop
-                return SentenceTransformer(self.model_name)
+                return load_embedding_model(
+                    self.model_name, self._model_backend(), self._onnx_options()
+                )
 
             self.local_model = await loop.run_in_executor(None, load_model)
             self.dimension = self.local_model.get_sentence_embedding_dimension()
+            self.batcher = self._create_batcher()
             self.initialized = True
-            self.backend = "sentence_transformer"
+            self.backend = self._backend_label()
             logger.info(
-                "Embedding service initialized with local model %s (dimension: %s)",
+                "Embedding service initialized with local model %s via %s (dimension: %s)",
                 self.model_name,
+                self.backend,
                 self.dimension,
             )
             return True
 
         except ImportError as exc:
-            logger.error("sentence-transformers not installed: %s", exc)
+            logger.error("Embedding backend dependencies not installed: %s", exc)
             logger.warning("Falling back to random embeddings")
             self.local_model = None
             self.initialized = False
@@ -67,44 +124,155 @@ class EmbeddingService:
             self.backend = "fallback_random"
             return False
 
-    async def get_embedding(self, text: str) -> List[float]:
+    async def _initialize_process_pool(self) -> bool:
+        """Load the model in a pool of worker processes instead of in-process"""
+        self.process_pool = EmbeddingProcessPool(
+            self.model_name,
+            workers=getattr(settings, "RAG_EMBEDDING_PROCESS_WORKERS", 2),
+            backend=self._model_backend(),
+            onnx_options=self._onnx_options(),
+        )
+        try:
+            executor = self.process_pool.start()
+            loop = asyncio.get_running_loop()
+            # Also surfaces model load errors from the workers
+            self.dimension = await loop.run_in_executor(executor, worker_dimension)
+            self.batcher = self._create_process_batcher(executor)
+            self.initialized = True
+            self.backend = f"{self._backend_label()}_process"
+            logger.info(
+                "Embedding service initialized with %s worker processes for %s (dimension: %s)",
+                self.process_pool.workers,
+                self.model_name,
+                self.dimension,
+            )
+            return True
+
+        except Exception as exc:
+            logger.error(
+                f"Failed to start embedding worker processes for {self.model_name}: {exc}"
+            )
+            logger.warning("Falling back to random embeddings")
+            self.process_pool.shutdown()
+            self.process_pool = None
+            self.initialized = False
+            self.backend = "fallback_random"
+            return False
+
+    def _create_process_batcher(self, executor) -> EmbeddingBatcher:
+        return EmbeddingBatcher(
+            encode_in_worker,
+            max_batch_size=getattr(settings, "RAG_EMBEDDING_COALESCE_MAX_BATCH", 32),
+            max_wait_ms=getattr(settings, "RAG_EMBEDDING_COALESCE_MAX_WAIT_MS", 5.0),
+            max_workers=self.process_pool.workers,
+            executor=executor,
+        )
+
+    async def _restart_process_pool(self, broken: EmbeddingBatcher):
+        """Replace a process pool whose worker died
+
+        A dead worker leaves the executor permanently broken. Concurrent
+        callers that hit the same broken pool only restart it once.
+        """
+        if self.batcher is not broken:
+            return
+        logger.warning(
+            f"Embedding worker process died; restarting the pool for {self.model_name}"
+        )
+        self.process_pool.shutdown()
+        self.batcher = self._create_process_batcher(self.process_pool.start())
+        await broken.close()
+
+    async def _encode_missing(self, texts: List[str]) -> np.ndarray:
+        """Encode through the batcher, restarting a broken process pool once"""
+        batcher = self.batcher
+        try:
+            return await batcher.encode(texts)
+        except BrokenProcessPool:
+            if self.process_pool is None:
+                raise
+            await self._restart_process_pool(batcher)
+            return await self.batcher.encode(texts)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Run one batched forward pass (called on the batcher's executor)"""
+        return self.local_model.encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+
+    def _create_batcher(self) -> EmbeddingBatcher:
+        return EmbeddingBatcher(
+            self._encode,
+            max_batch_size=getattr(settings, "RAG_EMBEDDING_COALESCE_MAX_BATCH", 32),
+            max_wait_ms=getattr(settings, "RAG_EMBEDDING_COALESCE_MAX_WAIT_MS", 5.0),
+            max_workers=getattr(settings, "RAG_EMBEDDING_EXECUTOR_WORKERS", 1),
+        )
+
+    async def get_embedding(self, text: str, use_cache: bool = True) -> List[float]:
         """Get embedding for a single text"""
-        embeddings = await self.get_embeddings([text])
+        embeddings = await self.get_embeddings([text], use_cache=use_cache)
         return embeddings[0]
 
-    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings for multiple texts using LLM service"""
+    async def get_embeddings(
+        self, texts: List[str], use_cache: bool = True, allow_fallback: bool = True
+    ) -> List[List[float]]:
+        """Get embeddings for multiple texts using LLM service
+
+        With use_cache, previously computed vectors are served from the
+        embedding cache and only the misses are encoded. Without
+        allow_fallback, a failing model raises instead of returning random
+        vectors, so they are never persisted.
+        """
         start_time = time.time()
 
-        if self.local_model:
+        if self.model_available:
             if not texts:
                 return []
 
-            loop = asyncio.get_running_loop()
+            cached = [None] * len(texts)
+            if use_cache:
+                cached = await self.cache.get_many(self._cache_model_key(), texts)
+                if all(vector is not None for vector in cached):
+                    return [vector.tolist() for vector in cached]
+
+            missing = [i for i, vector in enumerate(cached) if vector is None]
+            missing_texts = [texts[i] for i in missing]
+            if self.batcher is None:
+                self.batcher = self._create_batcher()
 
             try:
-                embeddings = await loop.run_in_executor(
-                    None,
-                    lambda: self.local_model.encode(
-                        texts,
-                        convert_to_numpy=True,
-                        normalize_embeddings=True,
-                    ),
-                )
+                # Concurrent callers share one forward pass
+                encoded = await self._encode_missing(missing_texts)
                 duration = time.time() - start_time
                 logger.info(
                     "Embedding batch completed",
                     extra={
                         "backend": self.backend,
                         "model": self.model_name,
-                        "count": len(texts),
+                        "count": len(missing_texts),
+                        "cached": len(texts) - len(missing_texts),
                         "dimension": self.dimension,
                         "duration_sec": round(duration, 4),
                     },
                 )
-                return embeddings.tolist()
+                if use_cache:
+                    await self.cache.set_many(
+                        self._cache_model_key(), missing_texts, encoded
+                    )
+
+                embeddings = [
+                    vector.tolist() if vector is not None else None
+                    for vector in cached
+                ]
+                for i, vector in zip(missing, encoded):
+                    embeddings[i] = vector.tolist()
+                return embeddings
             except Exception as exc:
                 logger.error(f"Local embedding generation failed: {exc}")
+                if not allow_fallback:
+                    raise
                 self.backend = "fallback_random"
                 return self._generate_fallback_embeddings(
                     texts, duration=time.time() - start_time
@@ -168,13 +336,22 @@ class EmbeddingService:
             "dimension": self.dimension,
             "backend": self.backend,
             "initialized": self.initialized,
+            "cache": self.cache.get_stats(),
+            "batching": self.batcher.get_stats() if self.batcher else None,
         }
 
     async def cleanup(self):
         """Cleanup resources"""
+        if self.batcher is not None:
+            await self.batcher.close()
+            self.batcher = None
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+            self.process_pool = None
         self.local_model = None
         self.initialized = False
         self.backend = "uninitialized"
+        self.cache.clear()
 
 
 # Global embedding service instance
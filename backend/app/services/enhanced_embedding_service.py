@@ -49,7 +49,7 @@ class EnhancedEmbeddingService(EmbeddingService):
         Get embeddings with retry bookkeeping.
         """
         embeddings = await super().get_embeddings(texts)
-        success = self.local_model is not None
+        success = self.model_available
         if not success:
             logger.warning(
                 "Embedding service operating in fallback mode; consider installing the local model %s",
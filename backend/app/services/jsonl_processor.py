@@ -266,9 +266,10 @@ class JSONLProcessor:
 
             # Insert all points in this batch
             if points:
-                self.rag_module.qdrant_client.upsert(
+                await self.rag_module.qdrant_client.upsert(
                     collection_name=collection_name, points=points
                 )
+                self.rag_module._add_points_to_bm25_index(collection_name, points)
 
                 # Update stats
                 self.rag_module.stats["documents_indexed"] += len(points)
@@ -0,0 +1,111 @@
+"""
+Last-seen batching
+
+Authenticated requests used to write ``users.last_login`` (and, at most every
+few minutes per key, ``api_keys.last_used_at``) inline. A ``LastSeenBatcher``
+records the latest timestamp per row in memory instead and writes all pending
+rows in one ``UPDATE ... SET column = CASE id ...`` per flush interval.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import case, update
+
+from app.core.config import settings
+from app.db.database import async_session_factory
+from app.models.api_key import APIKey
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class LastSeenBatcher:
+    """Coalesces last-seen timestamps of one table into periodic batched UPDATEs"""
+
+    def __init__(self, model, column: str, flush_interval: float = 60.0):
+        self.model = model
+        self.column = column
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, datetime] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.stats = {"touches": 0, "flushes": 0, "flushed_rows": 0, "flush_errors": 0}
+
+    def touch(self, row_id: int, seen_at: Optional[datetime] = None):
+        """Record that a row was seen, to be written on the next flush"""
+        self._pending[row_id] = seen_at or datetime.utcnow()
+        self.stats["touches"] += 1
+
+    async def flush(self) -> int:
+        """Write all pending timestamps, returning the number of rows"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+            try:
+                await self._apply(pending)
+            except Exception as e:
+                logger.error(
+                    f"Failed to flush {self.model.__tablename__} last seen: {e}"
+                )
+                self.stats["flush_errors"] += 1
+                # Keep the timestamps for the next flush unless newer ones arrived
+                for row_id, seen_at in pending.items():
+                    self._pending.setdefault(row_id, seen_at)
+                return 0
+
+            self.stats["flushes"] += 1
+            self.stats["flushed_rows"] += len(pending)
+            return len(pending)
+
+    async def _apply(self, pending: Dict[int, datetime]):
+        """Write all timestamps in a single UPDATE ... WHERE id IN (...)"""
+        stmt = (
+            update(self.model)
+            .where(self.model.id.in_(list(pending)))
+            .values({self.column: case(pending, value=self.model.id)})
+            .execution_options(synchronize_session=False)
+        )
+        async with async_session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Last seen flush loop error: {e}")
+
+    def start(self):
+        """Start the background flush task"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write out pending timestamps"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, object]:
+        return {**self.stats, "pending": len(self._pending)}
+
+
+# Global batchers for JWT users and API keys
+user_last_seen = LastSeenBatcher(
+    User, "last_login", flush_interval=settings.LAST_SEEN_FLUSH_INTERVAL
+)
+api_key_last_used = LastSeenBatcher(
+    APIKey, "last_used_at", flush_interval=settings.LAST_SEEN_FLUSH_INTERVAL
+)
@@ -1,63 +1,74 @@
 """
 LLM Service Metrics Collection
 
-Collects and manages metrics for LLM operations.
+Collects and manages metrics for LLM operations. Requests are folded into
+fixed-memory ring buffers per (provider, model, request type) with latency
+histograms, so aggregates and percentiles cost O(buckets) regardless of the
+request rate.
 """
 
-import time
 import logging
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
-from dataclasses import dataclass, field
-from collections import defaultdict, deque
-import threading
+from typing import Dict, Any, Optional
+from datetime import datetime
+from collections import defaultdict
+
+from app.services.metrics_store import HistogramLayout, MetricSummary, MetricsStore
+from app.services.prometheus_metrics import observe_llm_request
 
 from .models import LLMMetrics
 
 logger = logging.getLogger(__name__)
 
+# Latency histogram: 1 ms to 10 min within 10%, 72 bins. With the default
+# 200 label sets of 60 buckets the request store stays below 8 MB.
+LATENCY_LAYOUT = HistogramLayout(min_value=1.0, max_value=600_000.0, precision=0.1)
 
-@dataclass
-class RequestMetric:
-    """Individual request metric"""
-
-    timestamp: datetime
-    provider: str
-    model: str
-    request_type: str  # chat, embedding, etc.
-    success: bool
-    latency_ms: float
-    token_usage: Optional[Dict[str, int]] = None
-    security_risk_score: float = 0.0
-    error_code: Optional[str] = None
-    user_id: Optional[str] = None
-    api_key_id: Optional[int] = None
+REQUEST_FIELDS = (
+    "requests",
+    "successes",
+    "latency_ms",
+    "risk_score",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+)
 
 
 class MetricsCollector:
     """Collects and aggregates LLM service metrics"""
 
-    def __init__(self, max_history_size: int = 10000):
+    def __init__(
+        self,
+        bucket_seconds: float = 60.0,
+        num_buckets: int = 60,
+        max_series: int = 200,
+    ):
         """
         Initialize metrics collector
 
         Args:
-            max_history_size: Maximum number of metrics to keep in memory
+            bucket_seconds: Width of one time bucket
+            num_buckets: Buckets kept per series (retention = width * count)
+            max_series: Label sets tracked before folding into an overflow series
         """
-        self.max_history_size = max_history_size
-        self._metrics: deque = deque(maxlen=max_history_size)
-        self._provider_metrics: Dict[str, deque] = defaultdict(
-            lambda: deque(maxlen=1000)
+        # Labels: (provider, model, request_type)
+        self._requests = MetricsStore(
+            REQUEST_FIELDS,
+            bucket_seconds=bucket_seconds,
+            num_buckets=num_buckets,
+            histogram=LATENCY_LAYOUT,
+            max_series=max_series,
+        )
+        # Labels: (provider, error_code)
+        self._errors = MetricsStore(
+            ("errors",),
+            bucket_seconds=bucket_seconds,
+            num_buckets=num_buckets,
+            max_series=max_series,
         )
-        self._lock = threading.RLock()
-
-        # Aggregated metrics cache
-        self._cache_timestamp: Optional[datetime] = None
-        self._cached_metrics: Optional[LLMMetrics] = None
-        self._cache_ttl_seconds = 60  # Cache for 1 minute
 
         logger.info(
-            f"Metrics collector initialized with max history: {max_history_size}"
+            f"Metrics collector initialized with {num_buckets} x {bucket_seconds}s buckets"
         )
 
     def record_request(
@@ -72,29 +83,32 @@ class MetricsCollector:
         error_code: Optional[str] = None,
         user_id: Optional[str] = None,
         api_key_id: Optional[int] = None,
+        time_to_first_token_ms: Optional[float] = None,
     ):
         """Record a request metric"""
-        metric = RequestMetric(
-            timestamp=datetime.utcnow(),
-            provider=provider,
-            model=model,
-            request_type=request_type,
-            success=success,
-            latency_ms=latency_ms,
-            token_usage=token_usage,
-            security_risk_score=security_risk_score,
-            error_code=error_code,
-            user_id=user_id,
-            api_key_id=api_key_id,
+        token_usage = token_usage or {}
+        observe_llm_request(
+            provider,
+            model,
+            request_type,
+            success,
+            latency_ms,
+            completion_tokens=token_usage.get("completion_tokens", 0),
+            time_to_first_token_ms=time_to_first_token_ms,
         )
-
-        with self._lock:
-            self._metrics.append(metric)
-            self._provider_metrics[provider].append(metric)
-
-            # Invalidate cache
-            self._cached_metrics = None
-            self._cache_timestamp = None
+        self._requests.record(
+            (provider, model, request_type),
+            latency=latency_ms if latency_ms > 0 else None,
+            requests=1,
+            successes=1 if success else 0,
+            latency_ms=max(latency_ms, 0.0),
+            risk_score=security_risk_score,
+            prompt_tokens=token_usage.get("prompt_tokens", 0),
+            completion_tokens=token_usage.get("completion_tokens", 0),
+            total_tokens=token_usage.get("total_tokens", 0),
+        )
+        if not success and error_code:
+            self._errors.record((provider, error_code), errors=1)
 
         # Log significant events
         if not success:
@@ -108,212 +122,139 @@ class MetricsCollector:
 
     def get_metrics(self, force_refresh: bool = False) -> LLMMetrics:
         """Get aggregated metrics"""
-        with self._lock:
-            # Check cache validity
-            if (
-                not force_refresh
-                and self._cached_metrics
-                and self._cache_timestamp
-                and (datetime.utcnow() - self._cache_timestamp).total_seconds()
-                < self._cache_ttl_seconds
-            ):
-                return self._cached_metrics
-
-            # Calculate fresh metrics
-            metrics = self._calculate_metrics()
-
-            # Cache results
-            self._cached_metrics = metrics
-            self._cache_timestamp = datetime.utcnow()
-
-            return metrics
-
-    def _calculate_metrics(self) -> LLMMetrics:
-        """Calculate aggregated metrics from recorded data"""
-        if not self._metrics:
+        totals = self._requests.summary()
+        total_requests = int(totals["requests"])
+        if not total_requests:
             return LLMMetrics()
 
-        total_requests = len(self._metrics)
-        successful_requests = sum(1 for m in self._metrics if m.success)
-        failed_requests = total_requests - successful_requests
+        successful_requests = int(totals["successes"])
+        latency_count = totals.latency_count
 
-        # Calculate averages
-        latencies = [m.latency_ms for m in self._metrics if m.latency_ms > 0]
-        risk_scores = [m.security_risk_score for m in self._metrics]
-
-        avg_latency = sum(latencies) / len(latencies) if latencies else 0.0
-        avg_risk_score = sum(risk_scores) / len(risk_scores) if risk_scores else 0.0
-
-        # Provider-specific metrics
         provider_metrics = {}
-        for provider, provider_data in self._provider_metrics.items():
-            if provider_data:
-                provider_metrics[provider] = self._calculate_provider_metrics(
-                    provider_data
-                )
+        for provider in {labels[0] for labels in self._requests.labels()}:
+            provider_metrics[provider] = self.get_provider_metrics(provider)
 
         return LLMMetrics(
             total_requests=total_requests,
             successful_requests=successful_requests,
-            failed_requests=failed_requests,
-            average_latency_ms=avg_latency,
-            average_risk_score=avg_risk_score,
+            failed_requests=total_requests - successful_requests,
+            average_latency_ms=totals["latency_ms"] / latency_count
+            if latency_count
+            else 0.0,
+            average_risk_score=totals["risk_score"] / total_requests,
             provider_metrics=provider_metrics,
             last_updated=datetime.utcnow(),
         )
 
-    def _calculate_provider_metrics(self, provider_data: deque) -> Dict[str, Any]:
-        """Calculate metrics for a specific provider"""
-        if not provider_data:
-            return {}
-
-        total = len(provider_data)
-        successful = sum(1 for m in provider_data if m.success)
-        failed = total - successful
+    def get_provider_metrics(self, provider: str) -> Optional[Dict[str, Any]]:
+        """Get metrics for a specific provider"""
 
-        latencies = [m.latency_ms for m in provider_data if m.latency_ms > 0]
-        avg_latency = sum(latencies) / len(latencies) if latencies else 0.0
+        def is_provider(labels):
+            return labels[0] == provider
 
-        # Token usage aggregation
-        total_prompt_tokens = 0
-        total_completion_tokens = 0
-        total_tokens = 0
+        totals = self._requests.summary(match=is_provider)
+        total = int(totals["requests"])
+        if not total:
+            return None
 
-        for metric in provider_data:
-            if metric.token_usage:
-                total_prompt_tokens += metric.token_usage.get("prompt_tokens", 0)
-                total_completion_tokens += metric.token_usage.get(
-                    "completion_tokens", 0
-                )
-                total_tokens += metric.token_usage.get("total_tokens", 0)
+        successful = int(totals["successes"])
+        latency_count = totals.latency_count
+        prompt_tokens = int(totals["prompt_tokens"])
+        completion_tokens = int(totals["completion_tokens"])
 
-        # Model distribution
         model_counts = defaultdict(int)
-        for metric in provider_data:
-            model_counts[metric.model] += 1
-
-        # Request type distribution
         request_type_counts = defaultdict(int)
-        for metric in provider_data:
-            request_type_counts[metric.request_type] += 1
-
-        # Error analysis
-        error_counts = defaultdict(int)
-        for metric in provider_data:
-            if not metric.success and metric.error_code:
-                error_counts[metric.error_code] += 1
+        for (_, model, request_type), summary in self._requests.aggregate(
+            group_by=lambda labels: labels, match=is_provider
+        ).items():
+            model_counts[model] += int(summary["requests"])
+            request_type_counts[request_type] += int(summary["requests"])
+
+        recent = self._requests.summary(
+            self._requests.retention_seconds, match=is_provider
+        )
 
         return {
             "total_requests": total,
             "successful_requests": successful,
-            "failed_requests": failed,
-            "success_rate": successful / total if total > 0 else 0.0,
-            "average_latency_ms": avg_latency,
+            "failed_requests": total - successful,
+            "success_rate": successful / total,
+            "average_latency_ms": totals["latency_ms"] / latency_count
+            if latency_count
+            else 0.0,
+            "p50_latency_ms": totals.percentile(50),
+            "p95_latency_ms": totals.percentile(95),
+            "p99_latency_ms": totals.percentile(99),
             "token_usage": {
-                "total_prompt_tokens": total_prompt_tokens,
-                "total_completion_tokens": total_completion_tokens,
-                "total_tokens": total_tokens,
-                "avg_prompt_tokens": total_prompt_tokens / total if total > 0 else 0,
-                "avg_completion_tokens": total_completion_tokens / successful
+                "total_prompt_tokens": prompt_tokens,
+                "total_completion_tokens": completion_tokens,
+                "total_tokens": int(totals["total_tokens"]),
+                "avg_prompt_tokens": prompt_tokens / total,
+                "avg_completion_tokens": completion_tokens / successful
                 if successful > 0
                 else 0,
             },
             "model_distribution": dict(model_counts),
             "request_type_distribution": dict(request_type_counts),
-            "error_distribution": dict(error_counts),
-            "recent_requests": total,
+            "error_distribution": self.get_error_metrics(hours=None, provider=provider),
+            "recent_requests": int(recent["requests"]),
         }
 
-    def get_provider_metrics(self, provider: str) -> Optional[Dict[str, Any]]:
-        """Get metrics for a specific provider"""
-        with self._lock:
-            if provider not in self._provider_metrics:
-                return None
-
-            return self._calculate_provider_metrics(self._provider_metrics[provider])
-
-    def get_recent_metrics(self, minutes: int = 5) -> List[RequestMetric]:
-        """Get metrics from the last N minutes"""
-        cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
-
-        with self._lock:
-            return [m for m in self._metrics if m.timestamp >= cutoff_time]
-
-    def get_error_metrics(self, hours: int = 1) -> Dict[str, int]:
-        """Get error distribution from the last N hours"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        error_counts = defaultdict(int)
-
-        with self._lock:
-            for metric in self._metrics:
-                if (
-                    metric.timestamp >= cutoff_time
-                    and not metric.success
-                    and metric.error_code
-                ):
-                    error_counts[metric.error_code] += 1
-
-        return dict(error_counts)
+    def get_recent_summary(self, minutes: int = 5) -> MetricSummary:
+        """Summed request counters and latencies of the last N minutes"""
+        return self._requests.summary(minutes * 60)
+
+    def get_error_metrics(
+        self, hours: Optional[int] = 1, provider: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Get error distribution from the last N hours (None: since startup)"""
+        summaries = self._errors.aggregate(
+            hours * 3600 if hours else None,
+            group_by=lambda labels: labels[1],
+            match=(lambda labels: labels[0] == provider) if provider else None,
+        )
+        return {
+            error_code: int(summary["errors"])
+            for error_code, summary in summaries.items()
+            if summary["errors"]
+        }
 
     def get_performance_metrics(self, minutes: int = 15) -> Dict[str, Dict[str, float]]:
         """Get performance metrics by provider from the last N minutes"""
-        cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
-        provider_perf = defaultdict(list)
-
-        with self._lock:
-            for metric in self._metrics:
-                if metric.timestamp >= cutoff_time and metric.success:
-                    provider_perf[metric.provider].append(metric.latency_ms)
-
         performance = {}
-        for provider, latencies in provider_perf.items():
-            if latencies:
-                performance[provider] = {
-                    "avg_latency_ms": sum(latencies) / len(latencies),
-                    "min_latency_ms": min(latencies),
-                    "max_latency_ms": max(latencies),
-                    "p95_latency_ms": self._percentile(latencies, 95),
-                    "p99_latency_ms": self._percentile(latencies, 99),
-                    "request_count": len(latencies),
-                }
+        for provider, summary in self._requests.aggregate(
+            minutes * 60, group_by=lambda labels: labels[0]
+        ).items():
+            count = summary.latency_count
+            if not count:
+                continue
+            performance[provider] = {
+                "avg_latency_ms": summary["latency_ms"] / count,
+                "min_latency_ms": summary.min,
+                "max_latency_ms": summary.max,
+                "p95_latency_ms": summary.percentile(95),
+                "p99_latency_ms": summary.percentile(99),
+                "request_count": count,
+            }
 
         return performance
 
-    def _percentile(self, data: List[float], percentile: int) -> float:
-        """Calculate percentile of a list of numbers"""
-        if not data:
-            return 0.0
-
-        sorted_data = sorted(data)
-        index = (percentile / 100.0) * (len(sorted_data) - 1)
-
-        if index.is_integer():
-            return sorted_data[int(index)]
-        else:
-            lower = sorted_data[int(index)]
-            upper = sorted_data[int(index) + 1]
-            return lower + (upper - lower) * (index - int(index))
-
     def clear_metrics(self):
         """Clear all metrics (use with caution)"""
-        with self._lock:
-            self._metrics.clear()
-            self._provider_metrics.clear()
-            self._cached_metrics = None
-            self._cache_timestamp = None
+        self._requests.clear()
+        self._errors.clear()
 
         logger.info("All metrics cleared")
 
     def get_health_summary(self) -> Dict[str, Any]:
         """Get a health summary for monitoring"""
         metrics = self.get_metrics()
-        recent_metrics = self.get_recent_metrics(minutes=5)
+        recent = self.get_recent_summary(minutes=5)
         error_metrics = self.get_error_metrics(hours=1)
 
         # Calculate health scores
-        total_recent = len(recent_metrics)
-        successful_recent = sum(1 for m in recent_metrics if m.success)
-        success_rate = successful_recent / total_recent if total_recent > 0 else 1.0
+        total_recent = int(recent["requests"])
+        success_rate = recent["successes"] / total_recent if total_recent > 0 else 1.0
 
         # Determine health status
         if success_rate >= 0.95:
@@ -327,6 +268,7 @@ class MetricsCollector:
             "health_status": health_status,
             "success_rate_5min": success_rate,
             "total_requests_5min": total_recent,
+            "p95_latency_ms_5min": recent.percentile(95),
             "average_latency_ms": metrics.average_latency_ms,
             "error_count_1hour": sum(error_metrics.values()),
             "top_errors": dict(
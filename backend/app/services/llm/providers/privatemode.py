@@ -385,6 +385,8 @@ class PrivateModeProvider(BaseLLMProvider):
                 ],
                 "temperature": request.temperature,
                 "stream": True,
+                # Ask for a final usage chunk so streamed requests can be billed
+                "stream_options": {"include_usage": True},
             }
 
             # Add optional parameters
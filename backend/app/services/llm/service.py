@@ -25,7 +25,8 @@ from ...core.config import settings
 
 from .resilience import ResilienceManagerFactory
 
-# from .metrics import metrics_collector
+from .metrics import metrics_collector
+from ..tracing import record_span, span
 from .providers import BaseLLMProvider, PrivateModeProvider
 from .exceptions import (
     LLMError,
@@ -193,22 +194,45 @@ class LLMService:
         start_time = time.time()
 
         try:
-            response = await resilience_manager.execute(
-                provider.create_chat_completion,
-                request,
-                retryable_exceptions=(ProviderError, TimeoutError),
-                non_retryable_exceptions=(ValidationError,),
-            )
+            with span("llm.provider", provider=provider_name, model=request.model):
+                response = await resilience_manager.execute(
+                    provider.create_chat_completion,
+                    request,
+                    retryable_exceptions=(ProviderError, TimeoutError),
+                    non_retryable_exceptions=(ValidationError,),
+                )
 
-            # Record successful request - metrics disabled
+            # Record successful request
             total_latency = (time.time() - start_time) * 1000
+            metrics_collector.record_request(
+                provider=provider_name,
+                model=request.model,
+                request_type="chat",
+                success=True,
+                latency_ms=total_latency,
+                token_usage=response.usage.model_dump() if response.usage else None,
+                security_risk_score=risk_score,
+                user_id=request.user_id,
+                api_key_id=request.api_key_id,
+            )
 
             return response
 
         except Exception as e:
-            # Record failed request - metrics disabled
+            # Record failed request
             total_latency = (time.time() - start_time) * 1000
             error_code = getattr(e, "error_code", e.__class__.__name__)
+            metrics_collector.record_request(
+                provider=provider_name,
+                model=request.model,
+                request_type="chat",
+                success=False,
+                latency_ms=total_latency,
+                security_risk_score=risk_score,
+                error_code=error_code,
+                user_id=request.user_id,
+                api_key_id=request.api_key_id,
+            )
 
             logger.exception(
                 "Chat completion failed for provider %s (model=%s, latency=%.2fms, error=%s)",
@@ -239,21 +263,73 @@ class LLMService:
                 provider=provider_name,
             )
 
-        # Execute streaming with resilience
+        # Streams cannot be retried or wrapped in a timeout once tokens have
+        # been sent, so only the circuit breaker applies here
         resilience_manager = ResilienceManagerFactory.get_manager(provider_name)
+        circuit_breaker = resilience_manager.circuit_breaker
+        if not circuit_breaker.can_execute():
+            raise LLMError(
+                f"Circuit breaker is OPEN for provider {provider_name}",
+                error_code="CIRCUIT_BREAKER_OPEN",
+            )
+
+        start_time = time.time()
+        span_start = time.perf_counter()
+        first_chunk_ms = None
+        token_usage = None
 
         try:
-            async for chunk in await resilience_manager.execute(
-                provider.create_chat_completion_stream,
-                request,
-                retryable_exceptions=(ProviderError, TimeoutError),
-                non_retryable_exceptions=(ValidationError,),
-            ):
+            async for chunk in provider.create_chat_completion_stream(request):
+                if first_chunk_ms is None:
+                    first_chunk_ms = (time.time() - start_time) * 1000
+                if isinstance(chunk, dict) and chunk.get("usage"):
+                    token_usage = chunk["usage"]
                 yield chunk
+            circuit_breaker.record_success()
+            # The stream is consumed by the response, so the span is recorded
+            # once it ends rather than wrapped around the generator
+            record_span(
+                "llm.provider",
+                span_start,
+                provider=provider_name,
+                model=request.model,
+                time_to_first_token_ms=first_chunk_ms,
+            )
+            metrics_collector.record_request(
+                provider=provider_name,
+                model=request.model,
+                request_type="chat_stream",
+                success=True,
+                latency_ms=(time.time() - start_time) * 1000,
+                token_usage=token_usage,
+                security_risk_score=risk_score,
+                user_id=request.user_id,
+                api_key_id=request.api_key_id,
+                time_to_first_token_ms=first_chunk_ms,
+            )
 
         except Exception as e:
-            # Record streaming failure - metrics disabled
+            # Record streaming failure
+            circuit_breaker.record_failure()
             error_code = getattr(e, "error_code", e.__class__.__name__)
+            record_span(
+                "llm.provider",
+                span_start,
+                error=error_code,
+                provider=provider_name,
+                model=request.model,
+            )
+            metrics_collector.record_request(
+                provider=provider_name,
+                model=request.model,
+                request_type="chat_stream",
+                success=False,
+                latency_ms=(time.time() - start_time) * 1000,
+                security_risk_score=risk_score,
+                error_code=error_code,
+                user_id=request.user_id,
+                api_key_id=request.api_key_id,
+            )
             logger.exception(
                 "Streaming chat completion failed for provider %s (model=%s, error=%s)",
                 provider_name,
@@ -285,22 +361,45 @@ class LLMService:
         start_time = time.time()
 
         try:
-            response = await resilience_manager.execute(
-                provider.create_embedding,
-                request,
-                retryable_exceptions=(ProviderError, TimeoutError),
-                non_retryable_exceptions=(ValidationError,),
-            )
+            with span("llm.provider", provider=provider_name, model=request.model):
+                response = await resilience_manager.execute(
+                    provider.create_embedding,
+                    request,
+                    retryable_exceptions=(ProviderError, TimeoutError),
+                    non_retryable_exceptions=(ValidationError,),
+                )
 
-            # Record successful request - metrics disabled
+            # Record successful request
             total_latency = (time.time() - start_time) * 1000
+            metrics_collector.record_request(
+                provider=provider_name,
+                model=request.model,
+                request_type="embedding",
+                success=True,
+                latency_ms=total_latency,
+                token_usage=response.usage.model_dump() if response.usage else None,
+                security_risk_score=risk_score,
+                user_id=request.user_id,
+                api_key_id=request.api_key_id,
+            )
 
             return response
 
         except Exception as e:
-            # Record failed request - metrics disabled
+            # Record failed request
             total_latency = (time.time() - start_time) * 1000
             error_code = getattr(e, "error_code", e.__class__.__name__)
+            metrics_collector.record_request(
+                provider=provider_name,
+                model=request.model,
+                request_type="embedding",
+                success=False,
+                latency_ms=total_latency,
+                security_risk_score=risk_score,
+                error_code=error_code,
+                user_id=request.user_id,
+                api_key_id=request.api_key_id,
+            )
             logger.exception(
                 "Embedding request failed for provider %s (model=%s, latency=%.2fms, error=%s)",
                 provider_name,
@@ -361,15 +460,12 @@ class LLMService:
         return status_dict
 
     def get_metrics(self) -> LLMMetrics:
-        """Get service metrics - metrics disabled"""
-        # return metrics_collector.get_metrics()
-        return LLMMetrics(
-            total_requests=0, success_rate=0.0, avg_latency_ms=0, error_rates={}
-        )
+        """Get service metrics"""
+        return metrics_collector.get_metrics()
 
     def get_health_summary(self) -> Dict[str, Any]:
-        """Get comprehensive health summary - metrics disabled"""
-        # metrics_health = metrics_collector.get_health_summary()
+        """Get comprehensive health summary"""
+        metrics_health = metrics_collector.get_health_summary()
         resilience_health = ResilienceManagerFactory.get_all_health_status()
 
         return {
@@ -379,7 +475,7 @@ class LLMService:
             else None,
             "provider_count": len(self._providers),
             "active_providers": list(self._providers.keys()),
-            "metrics": {"status": "disabled"},
+            "metrics": metrics_health,
             "resilience": resilience_health,
         }
 
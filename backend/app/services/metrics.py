@@ -4,21 +4,19 @@ Metrics and monitoring service
 import time
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime
 import asyncio
 from collections import defaultdict, deque
 
 from app.core.config import settings
 from app.core.logging import log_module_event, log_security_event
+from app.services.metrics_store import OVERFLOW_LABEL, MetricsStore
 
-
-@dataclass
-class MetricData:
-    """Individual metric data point"""
-
-    timestamp: datetime
-    value: float
-    labels: Dict[str, str] = field(default_factory=dict)
+# Metric history: one-minute buckets for the last 24 hours
+HISTORY_BUCKET_SECONDS = 60
+HISTORY_BUCKETS = 24 * 60
+# Label sets kept per metric before folding into an overflow series
+HISTORY_MAX_SERIES = 100
 
 
 @dataclass
@@ -53,7 +51,15 @@ class MetricsService:
     def __init__(self):
         self.request_metrics = RequestMetrics()
         self.system_metrics = SystemMetrics()
-        self.metric_history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+        # Metric name -> count and sum per label set and minute
+        self.metric_history: Dict[str, MetricsStore] = defaultdict(
+            lambda: MetricsStore(
+                ("count", "sum"),
+                bucket_seconds=HISTORY_BUCKET_SECONDS,
+                num_buckets=HISTORY_BUCKETS,
+                max_series=HISTORY_MAX_SERIES,
+            )
+        )
         self.start_time = time.time()
         self.response_times: deque = deque(maxlen=100)  # Keep last 100 response times
         self.active_requests: Dict[str, float] = {}  # Track active requests
@@ -65,7 +71,6 @@ class MetricsService:
 
         # Start background tasks
         asyncio.create_task(self._collect_system_metrics())
-        asyncio.create_task(self._cleanup_old_metrics())
 
         log_module_event("metrics_service", "initialized", {"success": True})
 
@@ -93,33 +98,12 @@ class MetricsService:
                 )
                 await asyncio.sleep(60)
 
-    async def _cleanup_old_metrics(self):
-        """Clean up old metric data"""
-        while True:
-            try:
-                cutoff_time = datetime.now() - timedelta(hours=24)
-
-                for metric_name, metric_data in self.metric_history.items():
-                    # Remove old data points
-                    while metric_data and metric_data[0].timestamp < cutoff_time:
-                        metric_data.popleft()
-
-                await asyncio.sleep(3600)  # Clean up every hour
-
-            except Exception as e:
-                log_module_event("metrics_service", "cleanup_error", {"error": str(e)})
-                await asyncio.sleep(3600)
-
     def _store_metric(
         self, name: str, value: float, labels: Optional[Dict[str, str]] = None
     ):
-        """Store a metric data point"""
-        if labels is None:
-            labels = {}
-
-        metric_data = MetricData(timestamp=datetime.now(), value=value, labels=labels)
-
-        self.metric_history[name].append(metric_data)
+        """Fold a metric data point into the current minute bucket"""
+        label_set = tuple(sorted(labels.items())) if labels else ()
+        self.metric_history[name].record(label_set, count=1, sum=value)
 
     def start_request(
         self, request_id: str, endpoint: str, user_id: Optional[str] = None
@@ -260,23 +244,32 @@ class MetricsService:
             },
         }
 
+    @staticmethod
+    def _history_labels(label_set) -> Dict[str, str]:
+        """Labels of a history series stored as sorted (name, value) pairs"""
+        if label_set and not isinstance(label_set[0], tuple):
+            # The store folds label sets beyond max_series into plain strings
+            return {OVERFLOW_LABEL: OVERFLOW_LABEL}
+        return dict(label_set)
+
     def get_metrics_history(
         self, metric_name: str, hours: int = 1
     ) -> List[Dict[str, Any]]:
-        """Get historical metrics data"""
+        """Get per-minute historical metrics data (mean value per minute)"""
         if metric_name not in self.metric_history:
             return []
 
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-
         return [
             {
-                "timestamp": data.timestamp.isoformat(),
-                "value": data.value,
-                "labels": data.labels,
+                "timestamp": datetime.fromtimestamp(bucket_start).isoformat(),
+                "value": sums["sum"] / sums["count"] if sums["count"] else 0.0,
+                "count": int(sums["count"]),
+                "sum": sums["sum"],
+                "labels": self._history_labels(label_set),
             }
-            for data in self.metric_history[metric_name]
-            if data.timestamp > cutoff_time
+            for bucket_start, label_set, sums in self.metric_history[
+                metric_name
+            ].history(hours * 3600)
         ]
 
     def get_top_metrics(self, metric_type: str, limit: int = 10) -> Dict[str, Any]:
@@ -0,0 +1,311 @@
+"""
+Fixed-memory time-series metrics store
+
+Metrics are kept per label set in preallocated numpy ring buffers with one
+slot per time bucket. Each slot holds summed counters and an HDR-style
+latency histogram whose bucket bounds grow geometrically, so every
+percentile is reported within the layout's relative precision.
+
+Recording is O(1). Rates, sums and percentiles over a window are
+O(buckets) and never look at individual requests. Memory depends on the
+number of label sets and never on the request rate. Once ``max_series``
+label sets exist, new ones are folded into a single overflow series, so
+``max_nbytes`` bounds the store's memory.
+"""
+
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Labels = Tuple[str, ...]
+
+# Label value of the series that absorbs label sets beyond max_series
+OVERFLOW_LABEL = "__other__"
+
+
+class HistogramLayout:
+    """Geometric histogram bucket bounds shared by all series of a store
+
+    Index 0 counts values below ``min_value`` and the last index counts
+    values at or above ``max_value``. Each bucket in between is reported as
+    its geometric midpoint, which is within ``precision`` of every value
+    that falls into it.
+    """
+
+    def __init__(
+        self,
+        min_value: float = 0.1,
+        max_value: float = 600_000.0,
+        precision: float = 0.05,
+    ):
+        self.min_value = min_value
+        self._log_growth = 2 * math.log1p(precision)
+        count = math.ceil(math.log(max_value / min_value) / self._log_growth)
+        bounds = min_value * np.exp(self._log_growth * np.arange(count + 1))
+        self.size = count + 2
+        self.values = np.empty(self.size, dtype=np.float64)
+        self.values[0] = min_value
+        self.values[1:-1] = np.sqrt(bounds[:-1] * bounds[1:])
+        self.values[-1] = bounds[-1]
+
+    def index(self, value: float) -> int:
+        """Bucket index of a value"""
+        if value < self.min_value:
+            return 0
+        index = 1 + int(math.log(value / self.min_value) / self._log_growth)
+        return min(index, self.size - 1)
+
+    def percentile(self, counts: np.ndarray, percentile: float) -> float:
+        """Value at a percentile (0-100) of a histogram"""
+        cumulative = np.cumsum(counts)
+        total = cumulative[-1] if len(cumulative) else 0
+        if total <= 0:
+            return 0.0
+        rank = max(1, math.ceil(percentile / 100.0 * total))
+        return float(self.values[int(np.searchsorted(cumulative, rank))])
+
+
+class RingSeries:
+    """Per-bucket counters and latency histograms for one label set"""
+
+    def __init__(
+        self, num_fields: int, num_buckets: int, layout: Optional[HistogramLayout]
+    ):
+        self.epochs = np.full(num_buckets, -1, dtype=np.int64)
+        self.sums = np.zeros((num_buckets, num_fields), dtype=np.float64)
+        self.mins = np.full(num_buckets, np.inf)
+        self.maxs = np.full(num_buckets, -np.inf)
+        self.hist = (
+            np.zeros((num_buckets, layout.size), dtype=np.int64) if layout else None
+        )
+
+        # Lifetime totals
+        self.totals = np.zeros(num_fields, dtype=np.float64)
+        self.total_hist = np.zeros(layout.size, dtype=np.int64) if layout else None
+        self.total_min = math.inf
+        self.total_max = -math.inf
+
+    def _slot(self, epoch: int) -> int:
+        slot = epoch % len(self.epochs)
+        if self.epochs[slot] != epoch:
+            # Lazily recycle the slot of a bucket that left the ring
+            self.epochs[slot] = epoch
+            self.sums[slot] = 0
+            self.mins[slot] = np.inf
+            self.maxs[slot] = -np.inf
+            if self.hist is not None:
+                self.hist[slot] = 0
+        return slot
+
+    def record(
+        self,
+        epoch: int,
+        values: Sequence[Tuple[int, float]],
+        latency_index: Optional[int],
+        latency: Optional[float],
+    ):
+        slot = self._slot(epoch)
+        row = self.sums[slot]
+        for index, value in values:
+            row[index] += value
+            self.totals[index] += value
+
+        if latency_index is not None:
+            self.hist[slot, latency_index] += 1
+            self.total_hist[latency_index] += 1
+            if latency < self.mins[slot]:
+                self.mins[slot] = latency
+            if latency > self.maxs[slot]:
+                self.maxs[slot] = latency
+            self.total_min = min(self.total_min, latency)
+            self.total_max = max(self.total_max, latency)
+
+
+class MetricSummary:
+    """Summed counters and latency distribution of one or more series"""
+
+    def __init__(self, store: "MetricsStore"):
+        self._store = store
+        self.sums = np.zeros(len(store.fields), dtype=np.float64)
+        self.hist = (
+            np.zeros(store.layout.size, dtype=np.int64) if store.layout else None
+        )
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __getitem__(self, field: str) -> float:
+        return float(self.sums[self._store.field_index[field]])
+
+    def as_dict(self) -> Dict[str, float]:
+        return {field: float(self.sums[i]) for i, field in enumerate(self._store.fields)}
+
+    @property
+    def latency_count(self) -> int:
+        return int(self.hist.sum()) if self.hist is not None else 0
+
+    def percentile(self, percentile: float) -> float:
+        """Latency at a percentile, clamped to the observed min / max"""
+        if self.hist is None or self.latency_count == 0:
+            return 0.0
+        value = self._store.layout.percentile(self.hist, percentile)
+        return min(max(value, self.min), self.max)
+
+
+class MetricsStore:
+    """Label-set keyed ring buffers of counters and latency histograms"""
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        bucket_seconds: float = 60.0,
+        num_buckets: int = 60,
+        histogram: Optional[HistogramLayout] = None,
+        max_series: int = 1000,
+    ):
+        self.fields = tuple(fields)
+        self.field_index = {field: i for i, field in enumerate(self.fields)}
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = num_buckets
+        self.layout = histogram
+        self.max_series = max_series
+        self._series: Dict[Labels, RingSeries] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def retention_seconds(self) -> float:
+        return self.bucket_seconds * self.num_buckets
+
+    @property
+    def series_nbytes(self) -> int:
+        """Bytes preallocated per label set"""
+        # epochs, mins and maxs per bucket, plus the counter and histogram rows
+        row = 3 * 8 + len(self.fields) * 8
+        if self.layout is not None:
+            row += self.layout.size * 8
+        return self.num_buckets * row
+
+    @property
+    def max_nbytes(self) -> int:
+        """Upper bound of the memory held by all series (overflow included)"""
+        return (self.max_series + 1) * self.series_nbytes
+
+    def _epoch(self, now: Optional[float]) -> int:
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    def record(
+        self,
+        labels: Labels,
+        latency: Optional[float] = None,
+        now: Optional[float] = None,
+        **values: float,
+    ):
+        """Add field values (and a latency sample) to the current bucket"""
+        epoch = self._epoch(now)
+        indexed = [(self.field_index[name], value) for name, value in values.items()]
+        latency_index = None
+        if latency is not None and self.layout is not None:
+            latency_index = self.layout.index(latency)
+
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                if len(self._series) >= self.max_series:
+                    labels = (OVERFLOW_LABEL,) * len(labels)
+                    series = self._series.get(labels)
+                if series is None:
+                    series = RingSeries(len(self.fields), self.num_buckets, self.layout)
+                    self._series[labels] = series
+            series.record(epoch, indexed, latency_index, latency)
+
+    def labels(self) -> List[Labels]:
+        with self._lock:
+            return list(self._series)
+
+    def _window_mask(self, series: RingSeries, window_seconds: float, now_epoch: int):
+        span = min(self.num_buckets, math.ceil(window_seconds / self.bucket_seconds))
+        return (series.epochs > now_epoch - span) & (series.epochs <= now_epoch)
+
+    def aggregate(
+        self,
+        window_seconds: Optional[float] = None,
+        group_by: Optional[Callable[[Labels], Any]] = None,
+        match: Optional[Callable[[Labels], bool]] = None,
+        now: Optional[float] = None,
+    ) -> Dict[Any, MetricSummary]:
+        """Sum series into one summary per group
+
+        Without a window the lifetime totals are used. Windows longer than
+        the ring are clamped to its retention.
+        """
+        now_epoch = self._epoch(now)
+        summaries: Dict[Any, MetricSummary] = {}
+
+        with self._lock:
+            for labels, series in self._series.items():
+                if match is not None and not match(labels):
+                    continue
+                key = group_by(labels) if group_by else None
+                summary = summaries.get(key)
+                if summary is None:
+                    summary = summaries[key] = MetricSummary(self)
+
+                if window_seconds is None:
+                    summary.sums += series.totals
+                    if series.total_hist is not None:
+                        summary.hist += series.total_hist
+                    summary.min = min(summary.min, series.total_min)
+                    summary.max = max(summary.max, series.total_max)
+                    continue
+
+                mask = self._window_mask(series, window_seconds, now_epoch)
+                if not mask.any():
+                    continue
+                summary.sums += series.sums[mask].sum(axis=0)
+                if series.hist is not None:
+                    summary.hist += series.hist[mask].sum(axis=0)
+                summary.min = min(summary.min, float(series.mins[mask].min()))
+                summary.max = max(summary.max, float(series.maxs[mask].max()))
+
+        return summaries
+
+    def summary(
+        self,
+        window_seconds: Optional[float] = None,
+        match: Optional[Callable[[Labels], bool]] = None,
+        now: Optional[float] = None,
+    ) -> MetricSummary:
+        """Sum all (matching) series into one summary"""
+        summaries = self.aggregate(window_seconds, match=match, now=now)
+        return summaries.get(None) or MetricSummary(self)
+
+    def history(
+        self,
+        window_seconds: float,
+        now: Optional[float] = None,
+    ) -> List[Tuple[float, Labels, Dict[str, float]]]:
+        """Per-bucket field sums as (bucket start, labels, sums), oldest first"""
+        now_epoch = self._epoch(now)
+        points = []
+        with self._lock:
+            for labels, series in self._series.items():
+                mask = self._window_mask(series, window_seconds, now_epoch)
+                for slot in np.flatnonzero(mask):
+                    points.append(
+                        (
+                            float(series.epochs[slot] * self.bucket_seconds),
+                            labels,
+                            {
+                                field: float(series.sums[slot, i])
+                                for i, field in enumerate(self.fields)
+                            },
+                        )
+                    )
+        points.sort(key=lambda point: point[0])
+        return points
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
@@ -0,0 +1,182 @@
+"""
+ONNX Embedding Backend
+Runs an exported BGE/BERT-style encoder graph with ONNX Runtime on CPU,
+optionally int8-quantized, using the standalone HF ``tokenizers`` library
+for tokenization. Exposes the subset of the SentenceTransformer interface
+used by EmbeddingService, so it can be swapped in by config.
+
+A model directory is produced by ``export_onnx_model`` and contains
+``tokenizer.json``, ``model.onnx`` and (when quantized) ``model_quantized.onnx``.
+"""
+
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxEmbeddingModel:
+    """Sentence embedding model backed by an ONNX Runtime session"""
+
+    def __init__(
+        self,
+        model_dir: str,
+        quantized: bool = False,
+        pooling: str = "cls",
+        max_length: int = 512,
+        batch_size: int = 32,
+        intra_op_threads: Optional[int] = None,
+    ):
+        if not ONNX_AVAILABLE:
+            raise ImportError(
+                "onnxruntime and tokenizers are required for ONNX embeddings"
+            )
+        if pooling not in ("cls", "mean"):
+            raise ValueError(f"Unsupported pooling mode: {pooling}")
+
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        model_path = os.path.join(model_dir, model_file)
+        tokenizer_path = os.path.join(model_dir, TOKENIZER_FILE)
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"{path} not found; export the model with export_onnx_model()"
+                )
+
+        self.model_path = model_path
+        self.quantized = quantized
+        self.pooling = pooling
+        self.batch_size = max(1, batch_size)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {node.name for node in self.session.get_inputs()}
+        self._dimension: Optional[int] = None
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            hidden_size = self.session.get_outputs()[0].shape[-1]
+            if isinstance(hidden_size, int):
+                self._dimension = hidden_size
+            else:
+                self._dimension = self._encode_batch(["dimension probe"]).shape[1]
+        return self._dimension
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feed["token_type_ids"] = np.array(
+                [e.type_ids for e in encodings], dtype=np.int64
+            )
+        feed = {
+            name: value for name, value in feed.items() if name in self._input_names
+        }
+
+        hidden_states = self.session.run(None, feed)[0]
+        if self.pooling == "cls":
+            return hidden_states[:, 0]
+
+        mask = attention_mask[:, :, None].astype(hidden_states.dtype)
+        return (hidden_states * mask).sum(axis=1) / np.clip(
+            mask.sum(axis=1), 1e-9, None
+        )
+
+    def encode(
+        self,
+        sentences: List[str],
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = True,
+    ) -> np.ndarray:
+        """Embed texts; batches are built from length-sorted texts to limit padding"""
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        if not sentences:
+            return np.empty((0, self.get_sentence_embedding_dimension()), np.float32)
+
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        embeddings = np.empty(
+            (len(sentences), self.get_sentence_embedding_dimension()), np.float32
+        )
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start : start + self.batch_size]
+            embeddings[indices] = self._encode_batch([sentences[i] for i in indices])
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings
+
+
+def export_onnx_model(
+    model_name: str, output_dir: str, quantize: bool = True, opset: int = 14
+) -> str:
+    """Export a Hugging Face encoder to ONNX (plus an int8 copy when quantize)
+
+    Needs torch and transformers, which ship with sentence-transformers.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(output_dir)
+
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [
+        name
+        for name in ("input_ids", "attention_mask", "token_type_ids")
+        if name in dummy
+    ]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    logger.info(f"Exported {model_name} to {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8-quantized model to {quantized_path}")
+
+    return output_dir
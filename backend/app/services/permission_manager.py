@@ -6,11 +6,13 @@ dynamic module permission registration, and fine-grained access control.
 """
 
 import re
-from typing import Dict, List, Set, Optional, Any
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Set, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
 from fastapi import HTTPException, status
+from app.core.config import settings
 from app.core.logging import get_logger
 from app.utils.exceptions import CustomHTTPException
 
@@ -50,12 +52,76 @@ class PermissionScope:
     context: Dict[str, Any] = None
 
 
+class CompiledPermissions:
+    """A user's granted permissions compiled into a segment trie
+
+    Matching follows ``PermissionTree._matches_wildcard``: a ``*`` segment
+    matches exactly one segment, and two-part patterns like ``platform:*``
+    also match any deeper permission under that namespace. A lookup walks
+    the required permission once instead of scanning every grant.
+    """
+
+    _WILDCARD = "*"
+    _END = None
+
+    def __init__(self, granted: Iterable[str]):
+        self.root: Dict[Optional[str], Any] = {}
+        # Namespaces granted through "namespace:*"
+        self.namespaces: Set[str] = set()
+        self.exact: Set[str] = set()
+        self.wildcards: List[str] = []
+        # Registered permissions matched by the wildcards, filled lazily
+        self.expanded: Optional[Set[str]] = None
+
+        for pattern in granted:
+            if "*" not in pattern:
+                self.exact.add(pattern)
+                continue
+            self.wildcards.append(pattern)
+            parts = pattern.split(":")
+            if parts[-1] == self._WILDCARD and len(parts) == 2:
+                self.namespaces.add(parts[0])
+            node = self.root
+            for part in parts:
+                node = node.setdefault(part, {})
+            node[self._END] = True
+
+    def matches(self, required: str) -> bool:
+        """Check if any granted permission matches the required one"""
+        if required in self.exact:
+            return True
+        if not self.wildcards:
+            return False
+
+        parts = required.split(":")
+        if len(parts) >= 2 and parts[0] in self.namespaces:
+            return True
+
+        nodes = [self.root]
+        for part in parts:
+            next_nodes = []
+            for node in nodes:
+                if part in node:
+                    next_nodes.append(node[part])
+                if part != self._WILDCARD and self._WILDCARD in node:
+                    next_nodes.append(node[self._WILDCARD])
+            if not next_nodes:
+                return False
+            nodes = next_nodes
+
+        return any(self._END in node for node in nodes)
+
+
 class PermissionTree:
     """Hierarchical permission tree for efficient wildcard matching"""
 
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024):
         self.root = {}
         self.permissions: Dict[str, Permission] = {}
+        self.cache_size = cache_size
+        self._compiled: "OrderedDict[FrozenSet[str], CompiledPermissions]" = (
+            OrderedDict()
+        )
 
     def add_permission(self, permission_string: str, permission: Permission):
         """Add a permission to the tree"""
@@ -70,22 +136,35 @@ class PermissionTree:
         current["_permission"] = permission
         self.permissions[permission_string] = permission
 
+        # Wildcard expansions depend on the registered permissions
+        for compiled in self._compiled.values():
+            compiled.expanded = None
+
+    def compile(self, user_permissions: Iterable[str]) -> CompiledPermissions:
+        """Return the memoized matcher for a set of granted permissions"""
+        key = frozenset(user_permissions)
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            self._compiled.move_to_end(key)
+            return compiled
+
+        compiled = CompiledPermissions(key)
+        self._compiled[key] = compiled
+        while len(self._compiled) > self.cache_size:
+            self._compiled.popitem(last=False)
+        return compiled
+
+    def clear_compiled(self):
+        """Drop all compiled matchers"""
+        self._compiled.clear()
+
     def has_permission(self, user_permissions: List[str], required: str) -> bool:
         """Check if user has required permission with wildcard support"""
         # Handle None or empty permissions
         if not user_permissions:
             return False
 
-        # Direct match
-        if required in user_permissions:
-            return True
-
-        # Check wildcard patterns
-        for user_perm in user_permissions:
-            if self._matches_wildcard(user_perm, required):
-                return True
-
-        return False
+        return self.compile(user_permissions).matches(required)
 
     def _matches_wildcard(self, pattern: str, permission: str) -> bool:
         """Check if a wildcard pattern matches a permission"""
@@ -115,27 +194,28 @@ class PermissionTree:
 
     def get_matching_permissions(self, user_permissions: List[str]) -> Set[str]:
         """Get all permissions that match user's granted permissions"""
-        matching = set()
-
-        for granted in user_permissions:
-            if "*" in granted:
-                # Find all permissions matching this wildcard
-                for perm in self.permissions.keys():
-                    if self._matches_wildcard(granted, perm):
-                        matching.add(perm)
-            else:
-                matching.add(granted)
+        compiled = self.compile(user_permissions or [])
+
+        if compiled.expanded is None:
+            wildcards = CompiledPermissions(compiled.wildcards)
+            compiled.expanded = {
+                perm for perm in self.permissions if wildcards.matches(perm)
+            }
 
-        return matching
+        return compiled.exact | compiled.expanded
 
 
 class ModulePermissionRegistry:
     """Registry for module-specific permissions"""
 
     def __init__(self):
-        self.tree = PermissionTree()
+        self.tree = PermissionTree(cache_size=settings.PERMISSION_CACHE_SIZE)
         self.module_permissions: Dict[str, List[Permission]] = {}
         self.role_permissions: Dict[str, List[str]] = {}
+        # (roles, custom permissions) -> effective permissions
+        self._user_permissions: "OrderedDict[Tuple[tuple, tuple], List[str]]" = (
+            OrderedDict()
+        )
         self.default_roles = self._initialize_default_roles()
         self._platform_permissions_registered = False
 
@@ -266,6 +346,22 @@ class ModulePermissionRegistry:
         self, roles: List[str], custom_permissions: List[str] = None
     ) -> List[str]:
         """Get effective permissions for a user based on roles and custom permissions"""
+        key = (tuple(roles), tuple(custom_permissions or ()))
+        cached = self._user_permissions.get(key)
+        if cached is not None:
+            self._user_permissions.move_to_end(key)
+            return list(cached)
+
+        permissions = self._expand_user_permissions(roles, custom_permissions)
+        self._user_permissions[key] = permissions
+        while len(self._user_permissions) > self.tree.cache_size:
+            self._user_permissions.popitem(last=False)
+        return list(permissions)
+
+    def _expand_user_permissions(
+        self, roles: List[str], custom_permissions: List[str] = None
+    ) -> List[str]:
+        """Expand roles and custom permissions into effective permissions"""
         import time
 
         start_time = time.time()
@@ -335,8 +431,14 @@ class ModulePermissionRegistry:
     def create_role(self, role_name: str, permissions: List[str]):
         """Create a custom role with specific permissions"""
         self.role_permissions[role_name] = permissions
+        self.invalidate_role_cache()
         logger.info(f"Created role '{role_name}' with {len(permissions)} permissions")
 
+    def invalidate_role_cache(self):
+        """Drop expanded role permissions and compiled matchers"""
+        self._user_permissions.clear()
+        self.tree.clear_compiled()
+
     def validate_permissions(self, permissions: List[str]) -> Dict[str, Any]:
         """Validate a list of permissions"""
         valid = []
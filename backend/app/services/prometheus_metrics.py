@@ -0,0 +1,271 @@
+"""
+Prometheus / OpenMetrics exposition of gateway internals
+
+Request-path measurements (HTTP and LLM latencies, time to first token,
+completion tokens per second, embedding batch sizes) are observed into
+histograms as they happen. Everything else is read at scrape time by
+``GatewayCollector`` from the counters the services already keep: circuit
+breakers, database pools, the Redis cache, and the document processor,
+audit and observability queues. A scrape therefore costs O(series), with no
+database or Redis round-trips, and is cheap enough to run every few seconds.
+
+All metrics live in a dedicated registry served at ``/metrics``.
+"""
+
+import logging
+from typing import Iterable, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, Histogram
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.openmetrics.exposition import (
+    CONTENT_TYPE_LATEST as OPENMETRICS_CONTENT_TYPE,
+    generate_latest as generate_openmetrics,
+)
+from prometheus_client.registry import Collector
+
+logger = logging.getLogger(__name__)
+
+registry = CollectorRegistry(auto_describe=False)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+http_request_duration = Histogram(
+    "enclava_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+llm_request_duration = Histogram(
+    "enclava_llm_request_duration_seconds",
+    "LLM provider call latency",
+    ("provider", "model", "request_type", "outcome"),
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+llm_time_to_first_token = Histogram(
+    "enclava_llm_time_to_first_token_seconds",
+    "Time until the first streamed chunk of a chat completion",
+    ("provider", "model"),
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+llm_tokens_per_second = Histogram(
+    "enclava_llm_completion_tokens_per_second",
+    "Completion tokens generated per second",
+    ("provider", "model"),
+    buckets=(1, 5, 10, 20, 40, 80, 160, 320, 640),
+    registry=registry,
+)
+embedding_batch_size = Histogram(
+    "enclava_embedding_batch_size",
+    "Texts per batched embedding forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+    registry=registry,
+)
+
+CIRCUIT_STATES = ("closed", "open", "half_open")
+
+
+def observe_http_request(
+    method: str, route: Optional[str], status_code: int, duration_ms: float
+):
+    """Record a finished HTTP request (unmatched paths share one label)"""
+    http_request_duration.labels(
+        method, route or "unmatched", f"{status_code // 100}xx"
+    ).observe(duration_ms / 1000)
+
+
+def observe_llm_request(
+    provider: str,
+    model: str,
+    request_type: str,
+    success: bool,
+    latency_ms: float,
+    completion_tokens: int = 0,
+    time_to_first_token_ms: Optional[float] = None,
+):
+    """Record an LLM provider call"""
+    llm_request_duration.labels(
+        provider, model, request_type, "success" if success else "error"
+    ).observe(latency_ms / 1000)
+
+    generation_ms = latency_ms
+    if time_to_first_token_ms is not None:
+        llm_time_to_first_token.labels(provider, model).observe(
+            time_to_first_token_ms / 1000
+        )
+        generation_ms -= time_to_first_token_ms
+    if success and completion_tokens and generation_ms > 0:
+        llm_tokens_per_second.labels(provider, model).observe(
+            completion_tokens / (generation_ms / 1000)
+        )
+
+
+class GatewayCollector(Collector):
+    """Reads service counters and gauges at scrape time"""
+
+    def collect(self) -> Iterable:
+        for collect in (
+            self._circuit_breakers,
+            self._db_pools,
+            self._cache,
+            self._embeddings,
+            self._document_processor,
+            self._audit,
+            self._observability,
+        ):
+            try:
+                yield from collect()
+            except Exception as e:
+                logger.warning(f"Metrics collection failed in {collect.__name__}: {e}")
+
+    def _circuit_breakers(self):
+        from app.services.llm.resilience import ResilienceManagerFactory
+
+        state = GaugeMetricFamily(
+            "enclava_circuit_breaker_state",
+            "Circuit breaker state per provider (1 for the current state)",
+            labels=("provider", "state"),
+        )
+        failures = GaugeMetricFamily(
+            "enclava_circuit_breaker_failures",
+            "Consecutive failures counted by the circuit breaker",
+            labels=("provider",),
+        )
+        for provider, health in ResilienceManagerFactory.get_all_health_status().items():
+            breaker = health["circuit_breaker"]
+            for name in CIRCUIT_STATES:
+                state.add_metric((provider, name), 1 if breaker["state"] == name else 0)
+            failures.add_metric((provider,), breaker["failure_count"])
+        yield state
+        yield failures
+
+    def _db_pools(self):
+        from app.db.database import get_pool_status
+
+        connections = GaugeMetricFamily(
+            "enclava_db_pool_connections",
+            "Database connection pool usage",
+            labels=("engine", "state"),
+        )
+        pools = get_pool_status()
+        for engine in ("async", "sync"):
+            status = pools.get(f"{engine}_pool", {})
+            if "error" in status:
+                continue
+            for state in ("size", "checked_in", "checked_out", "overflow"):
+                connections.add_metric((engine, state), status[state])
+        yield connections
+
+    def _cache(self):
+        from app.core.cache import core_cache
+
+        stats = core_cache.stats
+        requests = CounterMetricFamily(
+            "enclava_cache_requests",
+            "Redis cache lookups by result",
+            labels=("result",),
+        )
+        requests.add_metric(("hit",), stats["hits"])
+        requests.add_metric(("miss",), stats["misses"])
+        yield requests
+        yield CounterMetricFamily(
+            "enclava_cache_errors", "Redis cache errors", value=stats["errors"]
+        )
+        lookups = stats["hits"] + stats["misses"]
+        yield GaugeMetricFamily(
+            "enclava_cache_hit_ratio",
+            "Redis cache hit ratio since startup",
+            value=stats["hits"] / lookups if lookups else 0.0,
+        )
+
+    def _embeddings(self):
+        from app.services.embedding_service import embedding_service
+
+        batcher = embedding_service.batcher
+        if batcher is None:
+            return
+        stats = batcher.get_stats()
+        yield GaugeMetricFamily(
+            "enclava_embedding_queue_pending",
+            "Embedding requests waiting for a batch",
+            value=stats["pending"],
+        )
+        yield CounterMetricFamily(
+            "enclava_embedding_texts",
+            "Texts embedded through the batcher",
+            value=stats["texts"],
+        )
+
+    def _document_processor(self):
+        from app.services.document_processor import document_processor
+
+        yield GaugeMetricFamily(
+            "enclava_document_processor_queue_depth",
+            "Documents waiting to be processed",
+            value=document_processor.processing_queue.qsize(),
+        )
+        yield GaugeMetricFamily(
+            "enclava_document_processor_active_workers",
+            "Document processor workers busy with a document",
+            value=document_processor.stats["active_workers"],
+        )
+        processed = CounterMetricFamily(
+            "enclava_documents_processed",
+            "Documents processed by outcome",
+            labels=("outcome",),
+        )
+        processed.add_metric(("success",), document_processor.stats["processed_count"])
+        processed.add_metric(("error",), document_processor.stats["error_count"])
+        yield processed
+
+    def _audit(self):
+        from app.services.audit_service import audit_writer
+
+        stats = audit_writer.get_stats()
+        yield GaugeMetricFamily(
+            "enclava_audit_queue_depth",
+            "Audit events waiting to be written",
+            value=stats["queue_depth"],
+        )
+        events = CounterMetricFamily(
+            "enclava_audit_events",
+            "Audit events by outcome",
+            labels=("outcome",),
+        )
+        for outcome in ("written", "dropped", "spilled"):
+            events.add_metric((outcome,), stats[outcome])
+        yield events
+
+    def _observability(self):
+        from app.middleware.observability import get_observability_stats
+
+        queued = GaugeMetricFamily(
+            "enclava_observability_sink_queue_depth",
+            "Request records waiting in each observability sink",
+            labels=("sink",),
+        )
+        dropped = CounterMetricFamily(
+            "enclava_observability_sink_dropped",
+            "Request records dropped because a sink queue was full",
+            labels=("sink",),
+        )
+        for sink, stats in get_observability_stats().items():
+            queued.add_metric((sink,), stats["queued"])
+            dropped.add_metric((sink,), stats["dropped"])
+        yield queued
+        yield dropped
+
+
+registry.register(GatewayCollector())
+
+
+def render_metrics(accept: Optional[str] = None) -> Tuple[bytes, str]:
+    """Exposition body and content type, OpenMetrics when the scraper accepts it"""
+    if accept and "application/openmetrics-text" in accept:
+        return generate_openmetrics(registry), OPENMETRICS_CONTENT_TYPE
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -615,20 +615,15 @@ class RAGService:
     async def _create_qdrant_collection(self, collection_name: str):
         """Create Qdrant collection with proper error handling"""
         try:
-            from qdrant_client import QdrantClient
             from qdrant_client.models import Distance, VectorParams
             from qdrant_client.http import models
-            from app.core.config import settings
+            from app.core.qdrant import get_qdrant_client
 
-            client = QdrantClient(
-                host=getattr(settings, "QDRANT_HOST", "localhost"),
-                port=getattr(settings, "QDRANT_PORT", 6333),
-                timeout=30,
-            )
+            client = get_qdrant_client()
 
             # Check if collection already exists
             try:
-                collections = client.get_collections()
+                collections = await client.get_collections()
                 if collection_name in [c.name for c in collections.collections]:
                     logger.info(f"Collection {collection_name} already exists")
                     return True
@@ -640,7 +635,7 @@ class RAGService:
 
             vector_dimension = getattr(embedding_service, "dimension", 1024) or 1024
 
-            client.create_collection(
+            await client.create_collection(
                 collection_name=collection_name,
                 vectors_config=VectorParams(
                     size=vector_dimension, distance=Distance.COSINE
@@ -679,18 +674,13 @@ class RAGService:
     async def _delete_qdrant_collection(self, collection_name: str):
         """Delete collection from Qdrant vector database"""
         try:
-            from qdrant_client import QdrantClient
-            from app.core.config import settings
+            from app.core.qdrant import get_qdrant_client
 
-            client = QdrantClient(
-                host=getattr(settings, "QDRANT_HOST", "localhost"),
-                port=getattr(settings, "QDRANT_PORT", 6333),
-                timeout=30,
-            )
+            client = get_qdrant_client()
 
             # Check if collection exists before trying to delete
             try:
-                collections = client.get_collections()
+                collections = await client.get_collections()
                 if collection_name not in [c.name for c in collections.collections]:
                     logger.warning(
                         f"Qdrant collection {collection_name} not found, nothing to delete"
@@ -700,7 +690,7 @@ class RAGService:
                 logger.warning(f"Could not check existing collections: {e}")
 
             # Delete the collection
-            client.delete_collection(collection_name)
+            await client.delete_collection(collection_name)
             logger.info(f"Deleted Qdrant collection: {collection_name}")
             return True
 
@@ -708,6 +698,22 @@ class RAGService:
             logger.error(f"Qdrant client not available: {e}")
             return False
 
+        finally:
+            await self._drop_collection_indexes(collection_name)
+
+    async def _drop_collection_indexes(self, collection_name: str):
+        """Drop the RAG module's BM25 index and cached results of a collection"""
+        try:
+            from app.services.module_manager import module_manager
+
+            rag_module = module_manager.get_module("rag")
+            if rag_module and hasattr(rag_module, "drop_collection_indexes"):
+                await rag_module.drop_collection_indexes(collection_name)
+        except Exception as e:
+            logger.warning(
+                f"Failed to drop search indexes of collection {collection_name}: {e}"
+            )
+
         except Exception as e:
             logger.error(f"Error deleting Qdrant collection {collection_name}: {e}")
             # Don't re-raise the error for deletion as it's not critical if cleanup fails
@@ -716,17 +722,13 @@ class RAGService:
     async def check_qdrant_health(self) -> Dict[str, Any]:
         """Check Qdrant database connectivity and health"""
         try:
-            from qdrant_client import QdrantClient
             from app.core.config import settings
+            from app.core.qdrant import get_qdrant_client
 
-            client = QdrantClient(
-                host=getattr(settings, "QDRANT_HOST", "localhost"),
-                port=getattr(settings, "QDRANT_PORT", 6333),
-                timeout=5,  # Short timeout for health check
-            )
+            client = get_qdrant_client()
 
-            # Try to get collections (basic connectivity test)
-            collections = client.get_collections()
+            # Try to get collections (basic connectivity test), short timeout
+            collections = await asyncio.wait_for(client.get_collections(), timeout=5)
             collection_count = len(collections.collections)
 
             return {
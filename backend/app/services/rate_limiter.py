@@ -0,0 +1,275 @@
+"""
+API Key Rate Limiter
+
+Enforces the per-minute, per-hour and per-day request limits stored on each
+API key. All windows are checked together and a request is only counted
+against them when every window admits it.
+
+With Redis available the limits are shared by all workers as GCRA (generic
+cell rate algorithm) counters: each window keeps a single "theoretical
+arrival time", and one Lua script checks and advances all windows of a key,
+so a request costs one Redis round-trip. Without Redis, or when Redis
+fails, an in-process token bucket per key and window enforces the same
+limits for the local worker.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.cache import core_cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "rate_limit:gcra"
+
+# KEYS: one TAT key per window
+# ARGV: now (ms), then (period ms, emission interval ms) per window
+# Returns {1, diff ms per window} when admitted, otherwise
+#         {0, blocked index (1-based), retry after ms, reset after ms}
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tats = {}
+local blocked = 0
+local retry = 0
+for i = 1, #KEYS do
+    local period = tonumber(ARGV[i * 2])
+    local interval = tonumber(ARGV[i * 2 + 1])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then
+        tat = now
+    end
+    local new_tat = tat + interval
+    local wait = new_tat - now - period
+    if wait > 0 and wait > retry then
+        retry = wait
+        blocked = i
+    end
+    tats[i] = new_tat
+end
+if blocked > 0 then
+    return {0, blocked, math.ceil(retry), math.ceil(tats[blocked] - now - tonumber(ARGV[blocked * 2 + 1]))}
+end
+local result = {1}
+for i = 1, #KEYS do
+    local diff = tats[i] - now
+    redis.call('SET', KEYS[i], tats[i], 'PX', math.ceil(diff))
+    result[i + 1] = math.ceil(diff)
+end
+return result
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """A request limit over a window"""
+
+    limit: int
+    period_seconds: int
+
+    @property
+    def interval(self) -> float:
+        """Seconds between requests at the sustained rate"""
+        return self.period_seconds / self.limit
+
+
+@dataclass
+class RateLimitDecision:
+    """Outcome of a rate limit check, reported for the tightest window"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def _admitted(limits: Sequence[RateLimit], diffs: Sequence[float]) -> RateLimitDecision:
+    """Decision for an admitted request from each window's time to reset"""
+    decision = None
+    for rate_limit, diff in zip(limits, diffs):
+        remaining = max(
+            0, int((rate_limit.period_seconds - diff) // rate_limit.interval)
+        )
+        if decision is None or remaining < decision.remaining:
+            decision = RateLimitDecision(True, rate_limit.limit, remaining, diff)
+    return decision
+
+
+class MemoryRateLimitStore:
+    """Per-process token buckets, bounded to the most recently used keys"""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        # key -> [(tokens, updated_at) per window]
+        self._buckets: "OrderedDict[str, List[Tuple[float, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(
+        self, key: str, limits: Sequence[RateLimit], now: Optional[float] = None
+    ) -> RateLimitDecision:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            buckets = self._buckets.get(key)
+            if buckets is None or len(buckets) != len(limits):
+                buckets = [(float(limit.limit), now) for limit in limits]
+
+            refilled = []
+            blocked = None
+            for index, (rate_limit, (tokens, updated_at)) in enumerate(
+                zip(limits, buckets)
+            ):
+                tokens = min(
+                    float(rate_limit.limit),
+                    tokens + (now - updated_at) / rate_limit.interval,
+                )
+                refilled.append(tokens)
+                if tokens < 1:
+                    retry_after = (1 - tokens) * rate_limit.interval
+                    if blocked is None or retry_after > blocked[1]:
+                        blocked = (index, retry_after)
+
+            if blocked is not None:
+                index, retry_after = blocked
+                rate_limit = limits[index]
+                self._store(key, [(tokens, now) for tokens in refilled])
+                return RateLimitDecision(
+                    allowed=False,
+                    limit=rate_limit.limit,
+                    remaining=0,
+                    reset_after=(rate_limit.limit - refilled[index])
+                    * rate_limit.interval,
+                    retry_after=retry_after,
+                )
+
+            consumed = [tokens - 1 for tokens in refilled]
+            self._store(key, [(tokens, now) for tokens in consumed])
+            return _admitted(
+                limits,
+                [
+                    (rate_limit.limit - tokens) * rate_limit.interval
+                    for rate_limit, tokens in zip(limits, consumed)
+                ],
+            )
+
+    def _store(self, key: str, buckets: List[Tuple[float, float]]):
+        self._buckets[key] = buckets
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_entries:
+            self._buckets.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisRateLimitStore:
+    """GCRA counters shared by all workers through one Lua script"""
+
+    def __init__(self, client):
+        self.client = client
+        self._gcra = client.register_script(GCRA_SCRIPT)
+
+    async def hit(self, key: str, limits: Sequence[RateLimit]) -> RateLimitDecision:
+        keys = [f"{REDIS_PREFIX}:{key}:{limit.period_seconds}" for limit in limits]
+        args = [int(time.time() * 1000)]
+        for rate_limit in limits:
+            args.extend([rate_limit.period_seconds * 1000, rate_limit.interval * 1000])
+
+        result = await self._gcra(keys=keys, args=args)
+
+        if int(result[0]) == 1:
+            return _admitted(limits, [int(diff) / 1000 for diff in result[1:]])
+
+        rate_limit = limits[int(result[1]) - 1]
+        return RateLimitDecision(
+            allowed=False,
+            limit=rate_limit.limit,
+            remaining=0,
+            reset_after=int(result[3]) / 1000,
+            retry_after=int(result[2]) / 1000,
+        )
+
+
+class RateLimiter:
+    """Multi-window request limiter for API keys"""
+
+    def __init__(self, backend: str = "redis", enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self._memory_store = MemoryRateLimitStore()
+        self._redis_client = None
+        self._redis_store: Optional[RedisRateLimitStore] = None
+        self.stats = {"allowed": 0, "limited": 0, "redis_errors": 0}
+
+    @property
+    def store(self):
+        """Shared store, or the local one when Redis is not in use"""
+        if self.backend == "redis" and core_cache.enabled:
+            if self._redis_client is not core_cache.redis_client:
+                self._redis_client = core_cache.redis_client
+                self._redis_store = RedisRateLimitStore(self._redis_client)
+            return self._redis_store
+        return self._memory_store
+
+    @staticmethod
+    def limits_for(api_key) -> List[RateLimit]:
+        """The configured windows of an API key (unset or zero means no limit)"""
+        windows = (
+            (api_key.rate_limit_per_minute, 60),
+            (api_key.rate_limit_per_hour, 3600),
+            (api_key.rate_limit_per_day, 86400),
+        )
+        return [RateLimit(limit, period) for limit, period in windows if limit]
+
+    async def hit(
+        self, key: str, limits: Sequence[RateLimit]
+    ) -> Optional[RateLimitDecision]:
+        """Count one request against all windows of key if every window admits it"""
+        if not self.enabled or not limits:
+            return None
+
+        store = self.store
+        if store is self._memory_store:
+            decision = store.hit(key, limits)
+        else:
+            try:
+                decision = await store.hit(key, limits)
+            except Exception as e:
+                logger.warning(f"Redis rate limiting failed, using local limits: {e}")
+                self.stats["redis_errors"] += 1
+                decision = self._memory_store.hit(key, limits)
+
+        self.stats["allowed" if decision.allowed else "limited"] += 1
+        return decision
+
+    async def check_api_key(self, api_key) -> Optional[RateLimitDecision]:
+        """Count one request against an API key's limits"""
+        return await self.hit(f"api_key:{api_key.id}", self.limits_for(api_key))
+
+    def get_stats(self) -> Dict[str, object]:
+        stats = dict(self.stats)
+        stats["backend"] = "redis" if self.store is self._redis_store else "memory"
+        return stats
+
+
+# Global API key rate limiter instance
+rate_limiter = RateLimiter(
+    backend=settings.API_KEY_RATE_LIMIT_BACKEND,
+    enabled=settings.API_KEY_RATE_LIMIT_ENABLED,
+)
@@ -10,6 +10,8 @@ import logging
 import time
 from datetime import datetime
 from typing import Dict, Any, List, Optional
+
+import anyio
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -20,7 +22,7 @@ from app.schemas.responses import ResponseCreateRequest, ResponseObject, TokenUs
 from app.services.responses.translator import ItemMessageTranslator
 from app.services.tool_calling_service import ToolCallingService
 from app.services.llm.models import ChatRequest, ChatMessage
-from app.services.budget_enforcement import BudgetEnforcementService
+from app.services.async_budget_enforcement import AsyncBudgetEnforcementService
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +34,7 @@ class ResponsesService:
         self.db = db
         self.translator = ItemMessageTranslator()
         self.tool_calling_service = ToolCallingService(db)
-        self.budget_service = BudgetEnforcementService(db)
+        self.budget_service = AsyncBudgetEnforcementService(db)
 
     async def create_response(
         self,
@@ -61,6 +63,11 @@ class ResponsesService:
         response_id = self._generate_response_id()
         api_key = api_key_context.get("api_key")
         user = api_key_context.get("user")
+        reserved_budget_ids: List[int] = []
+        # Set once the reservation is settled with the actual usage
+        reservation_handed_off = False
+        # Set once the provider has answered, the request is then charged
+        provider_succeeded = False
 
         try:
             # 1. Load agent config (prompt) if referenced
@@ -98,10 +105,11 @@ class ResponsesService:
                 error_msg,
                 warnings,
                 reserved_budget_ids
-            ) = self.budget_service.atomic_check_and_reserve_budget(
+            ) = await self.budget_service.atomic_check_and_reserve_budget(
                 api_key,
                 request.model,
-                estimated_tokens
+                estimated_tokens,
+                "responses"
             )
 
             if not is_allowed:
@@ -127,7 +135,9 @@ class ResponsesService:
                 max_tokens=request.max_tokens,
                 top_p=request.top_p,
                 tools=None,  # Will be set by tool calling service
-                stream=False
+                stream=False,
+                user_id=str(user.id),
+                api_key_id=api_key_context.get("api_key_id", 0)
             )
 
             # 10. Execute agentic loop with tool calling
@@ -140,6 +150,7 @@ class ResponsesService:
                 auto_execute_tools=True,
                 max_tool_calls=5
             )
+            provider_succeeded = True
 
             # 11. Extract usage from LLM response
             if llm_response.usage:
@@ -152,13 +163,16 @@ class ResponsesService:
 
             # 13. Finalize budget with actual usage
             if reserved_budget_ids:
-                self.budget_service.atomic_finalize_usage(
-                    reserved_budget_ids,
-                    api_key,
-                    request.model,
-                    total_input_tokens,
-                    total_output_tokens
-                )
+                with anyio.CancelScope(shield=True):
+                    await self.budget_service.atomic_finalize_usage(
+                        reserved_budget_ids,
+                        api_key,
+                        request.model,
+                        total_input_tokens,
+                        total_output_tokens,
+                        "responses"
+                    )
+            reservation_handed_off = True
 
             # 14. Create response object
             response_obj = ResponseObject(
@@ -212,6 +226,19 @@ class ResponsesService:
                 "internal_error",
                 str(e)
             )
+        finally:
+            if reserved_budget_ids and not reservation_handed_off:
+                with anyio.CancelScope(shield=True):
+                    if provider_succeeded:
+                        # The call completed but was not finalized, charge the estimate
+                        await self.budget_service.settle_reservation_at_estimate(
+                            reserved_budget_ids
+                        )
+                    else:
+                        # Refund the estimate of a request that failed or was cancelled
+                        await self.budget_service.release_reservation(
+                            reserved_budget_ids
+                        )
 
     async def get_response(
         self,
@@ -624,6 +651,9 @@ class ResponsesService:
         response_id = self._generate_response_id()
         api_key = api_key_context.get("api_key")
         user = api_key_context.get("user")
+        reserved_budget_ids: List[int] = []
+        # Set once the provider has been called, the request is then charged
+        stream_started = False
 
         try:
             # 1. Load agent config if referenced
@@ -663,10 +693,11 @@ class ResponsesService:
                 error_msg,
                 warnings,
                 reserved_budget_ids
-            ) = self.budget_service.atomic_check_and_reserve_budget(
+            ) = await self.budget_service.atomic_check_and_reserve_budget(
                 api_key,
                 request.model,
-                estimated_tokens
+                estimated_tokens,
+                "responses"
             )
 
             if not is_allowed:
@@ -701,12 +732,15 @@ class ResponsesService:
                 max_tokens=request.max_tokens,
                 top_p=request.top_p,
                 tools=None,  # Will be set by tool calling service
-                stream=True  # Enable streaming
+                stream=True,  # Enable streaming
+                user_id=str(user.id),
+                api_key_id=api_key_context.get("api_key_id", 0)
             )
 
             # 10. Stream response with tool execution support
             # This routes through the tool calling service to include tool definitions
             # and handles tool execution when tool calls are detected
+            stream_started = True
             async for event in stream_response_events_with_tools(
                 response_id=response_id,
                 model=request.model,
@@ -735,3 +769,17 @@ class ResponsesService:
                 }
             )
             yield error_event.to_sse()
+
+        finally:
+            if reserved_budget_ids:
+                # Streamed events carry no token usage, so a started stream is
+                # charged at its estimate and one that never started is refunded
+                with anyio.CancelScope(shield=True):
+                    if stream_started:
+                        await self.budget_service.settle_reservation_at_estimate(
+                            reserved_budget_ids
+                        )
+                    else:
+                        await self.budget_service.release_reservation(
+                            reserved_budget_ids
+                        )
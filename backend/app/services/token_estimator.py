@@ -0,0 +1,160 @@
+"""
+Token Estimator
+Tokenizer-based prompt size and cost estimates used to reserve budget before
+a request is sent. Counts come from the tiktoken encodings (the same
+``cl100k_base`` encoding the RAG module uses for chunking), are memoized per
+message text, and include the per-message chat framing, tool schemas and the
+requested completion length. When no encoding can be loaded (for example an
+offline deployment without a tiktoken cache) a characters-per-token heuristic
+is used instead.
+"""
+
+import json
+import logging
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import tiktoken
+
+from app.services.cost_calculator import CostCalculator
+
+logger = logging.getLogger(__name__)
+
+# Encoding used for model families tiktoken does not know (Llama, Mistral, ...)
+DEFAULT_ENCODING = "cl100k_base"
+
+# Chat framing overhead, following OpenAI's accounting for chat models
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Completion length assumed when the request does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 150
+
+# Heuristic used when no encoding is available
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class TokenEstimate:
+    """Estimated token usage and cost of a request"""
+
+    prompt_tokens: int
+    completion_tokens: int
+    cost_cents: int
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class TokenEstimator:
+    """Memoized tokenizer-based estimator for budget reservation"""
+
+    def __init__(self, cache_size: int = 8192, model_cache_size: int = 1024):
+        self._encodings: Dict[str, Optional[tiktoken.Encoding]] = {}
+        self._count_cached = lru_cache(maxsize=cache_size)(self._count_uncached)
+        # Model names come from requests, so the memo must stay bounded
+        self._encoding_name = lru_cache(maxsize=model_cache_size)(
+            self._resolve_encoding_name
+        )
+
+    @staticmethod
+    def _resolve_encoding_name(model: str) -> str:
+        normalized = model.lower().split("/")[-1]
+        try:
+            return tiktoken.encoding_name_for_model(normalized)
+        except KeyError:
+            return DEFAULT_ENCODING
+
+    def _encoding(self, name: str) -> Optional[tiktoken.Encoding]:
+        if name not in self._encodings:
+            try:
+                self._encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e:
+                logger.warning(
+                    f"tiktoken encoding {name} unavailable, "
+                    f"falling back to character-based estimates: {e}"
+                )
+                self._encodings[name] = None
+        return self._encodings[name]
+
+    def _count_uncached(self, encoding_name: str, text: str) -> int:
+        encoding = self._encoding(encoding_name)
+        if encoding is None:
+            return math.ceil(len(text) / CHARS_PER_TOKEN)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def count_tokens(self, model: str, text: str) -> int:
+        """Token count of a piece of text for the given model"""
+        if not text:
+            return 0
+        return self._count_cached(self._encoding_name(model), text)
+
+    def count_message_tokens(
+        self, model: str, messages: Iterable[Tuple[str, Optional[str]]]
+    ) -> int:
+        """Prompt tokens of (role, content) chat messages, including framing"""
+        encoding_name = self._encoding_name(model)
+        tokens = TOKENS_PER_REPLY
+        for role, content in messages:
+            tokens += TOKENS_PER_MESSAGE + self._count_cached(encoding_name, role)
+            if content:
+                tokens += self._count_cached(encoding_name, content)
+        return tokens
+
+    def count_tool_tokens(
+        self, model: str, tools: Optional[List[Dict[str, Any]]]
+    ) -> int:
+        """Tokens the tool schemas add to the prompt"""
+        if not tools:
+            return 0
+        # Serialized deterministically so identical schemas hit the cache
+        schema = json.dumps(tools, sort_keys=True, separators=(",", ":"))
+        return self.count_tokens(model, schema)
+
+    def estimate_chat(
+        self,
+        model: str,
+        messages: Iterable[Tuple[str, Optional[str]]],
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> TokenEstimate:
+        """Estimate usage and cost of a chat completion"""
+        prompt_tokens = self.count_message_tokens(model, messages)
+        prompt_tokens += self.count_tool_tokens(model, tools)
+        completion_tokens = max_tokens or DEFAULT_COMPLETION_TOKENS
+        return TokenEstimate(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost_cents=CostCalculator.calculate_cost_cents(
+                model, prompt_tokens, completion_tokens
+            ),
+        )
+
+    def estimate_embedding(self, model: str, text: str) -> TokenEstimate:
+        """Estimate usage and cost of an embedding request"""
+        prompt_tokens = self.count_tokens(model, text)
+        return TokenEstimate(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=0,
+            cost_cents=CostCalculator.calculate_cost_cents(model, prompt_tokens, 0),
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        info = self._count_cached.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+            "size": info.currsize,
+            "encodings": {
+                name: encoding is not None for name, encoding in self._encodings.items()
+            },
+        }
+
+
+# Global token estimator instance
+token_estimator = TokenEstimator()
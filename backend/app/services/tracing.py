@@ -0,0 +1,355 @@
+"""
+Per-request latency tracing
+
+A request that reaches the LLM passes through authentication, budget
+reservation, RAG lookups (collection resolution, query embedding, vector
+search), prompt building, the provider call and several commits. Histograms
+report each of these separately. Tracing records them per request, so a slow
+request shows where its time went.
+
+The ``ObservabilityMiddleware`` puts a ``Trace`` into ``trace_context``.
+Code on the request path opens ``span``s or decorates functions with
+``traced``. Both are a single contextvar lookup when no trace is active, and
+no external collector is involved. When a request finishes:
+
+- its stage timings can be returned in a ``Server-Timing`` header (opt-in);
+- requests slower than ``TRACING_SLOW_REQUEST_MS`` are kept in a
+  fixed-size ring buffer served by an internal debug endpoint;
+- sampled traces can be appended as OTLP/JSON lines to
+  ``TRACING_EXPORT_PATH``, which an OpenTelemetry collector's file receiver
+  can read.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+# Spans kept per trace, later ones are only counted
+MAX_SPANS = 256
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+trace_context: ContextVar[Optional["Trace"]] = ContextVar(
+    "trace_context", default=None
+)
+# Id of the innermost open span, parent of spans opened below it
+_parent_span: ContextVar[Optional[str]] = ContextVar("parent_span", default=None)
+
+
+@dataclass
+class Span:
+    """One timed stage of a request, relative to the trace start"""
+
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ms: float
+    duration_ms: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": round(self.start_ms, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """Spans recorded while handling one request"""
+
+    def __init__(self, name: str, max_spans: int = MAX_SPANS):
+        self.trace_id = secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.name = name
+        self.attributes: Dict[str, Any] = {}
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.max_spans = max_spans
+        self.start_unix_ns = time.time_ns()
+        self._start = time.perf_counter()
+
+    def offset_ms(self, perf_time: Optional[float] = None) -> float:
+        """Milliseconds between the trace start and a perf_counter() value"""
+        if perf_time is None:
+            perf_time = time.perf_counter()
+        return (perf_time - self._start) * 1000
+
+    def add(self, span: Span) -> bool:
+        if len(self.spans) >= self.max_spans:
+            self.dropped_spans += 1
+            return False
+        self.spans.append(span)
+        return True
+
+    def finish(self, error: Optional[str] = None, **attributes):
+        self.duration_ms = self.offset_ms()
+        self.error = error
+        self.attributes.update(attributes)
+
+    def stage_timings(self) -> Dict[str, float]:
+        """Summed duration per span name, in the order stages first ran"""
+        timings: Dict[str, float] = {}
+        for span in self.spans:
+            timings[span.name] = timings.get(span.name, 0.0) + span.duration_ms
+        return timings
+
+    def server_timing(self, total_ms: Optional[float] = None) -> str:
+        """``Server-Timing`` header value of the stages finished so far"""
+        entries = [
+            f"{name};dur={duration:.1f}"
+            for name, duration in self.stage_timings().items()
+        ]
+        total = self.offset_ms() if total_ms is None else total_ms
+        entries.append(f"total;dur={total:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start_time": self.start_unix_ns / 1e9,
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+            "stages": {
+                name: round(duration, 3)
+                for name, duration in self.stage_timings().items()
+            },
+            "spans": [span.to_dict() for span in self.spans],
+            "dropped_spans": self.dropped_spans,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON ``ExportTraceServiceRequest`` with the request as root span"""
+
+        def unix_ns(offset_ms: float) -> str:
+            return str(self.start_unix_ns + int(offset_ms * 1_000_000))
+
+        def otlp_span(
+            span_id, parent_id, name, kind, start_ms, duration_ms, attributes, error
+        ):
+            encoded = {
+                "traceId": self.trace_id,
+                "spanId": span_id,
+                "name": name,
+                "kind": kind,
+                "startTimeUnixNano": unix_ns(start_ms),
+                "endTimeUnixNano": unix_ns(start_ms + duration_ms),
+                "attributes": _otlp_attributes(attributes),
+                "status": {"code": 2, "message": error} if error else {"code": 1},
+            }
+            if parent_id:
+                encoded["parentSpanId"] = parent_id
+            return encoded
+
+        spans = [
+            otlp_span(
+                self.span_id,
+                None,
+                self.name,
+                SPAN_KIND_SERVER,
+                0.0,
+                self.duration_ms or 0.0,
+                self.attributes,
+                self.error,
+            )
+        ]
+        for span in self.spans:
+            spans.append(
+                otlp_span(
+                    span.span_id,
+                    span.parent_id or self.span_id,
+                    span.name,
+                    SPAN_KIND_INTERNAL,
+                    span.start_ms,
+                    span.duration_ms,
+                    span.attributes,
+                    span.error,
+                )
+            )
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {"service.name": settings.APP_NAME}
+                        )
+                    },
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+                }
+            ]
+        }
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    encoded = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": typed})
+    return encoded
+
+
+def current_trace() -> Optional[Trace]:
+    return trace_context.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a stage of the current request
+
+    Yields the ``Span`` (or None outside a traced request) so callers can
+    add attributes once they are known.
+    """
+    trace = trace_context.get()
+    if trace is None:
+        yield None
+        return
+
+    start = time.perf_counter()
+    current = Span(
+        name=name,
+        span_id=secrets.token_hex(8),
+        parent_id=_parent_span.get(),
+        start_ms=trace.offset_ms(start),
+        attributes=attributes,
+    )
+    token = _parent_span.set(current.span_id)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _parent_span.reset(token)
+        current.duration_ms = (time.perf_counter() - start) * 1000
+        trace.add(current)
+
+
+def record_span(name: str, start: float, error: Optional[str] = None, **attributes):
+    """Record a stage that ran from ``start`` (a perf_counter() value) until now
+
+    For stages that cannot be wrapped in ``span``, such as async generators
+    consumed by another task or SQLAlchemy event hooks.
+    """
+    trace = trace_context.get()
+    if trace is None:
+        return
+    trace.add(
+        Span(
+            name=name,
+            span_id=secrets.token_hex(8),
+            parent_id=_parent_span.get(),
+            start_ms=trace.offset_ms(start),
+            duration_ms=(time.perf_counter() - start) * 1000,
+            attributes=attributes,
+            error=error,
+        )
+    )
+
+
+def traced(name: str):
+    """Decorator recording each call of a function (sync or async) as a span"""
+
+    def decorator(func: Callable):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class SlowTraceBuffer:
+    """Ring buffer of the most recent traces slower than a threshold"""
+
+    def __init__(self, threshold_ms: float, size: int):
+        self.threshold_ms = threshold_ms
+        self._traces: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.stats = {"finished": 0, "sampled": 0}
+
+    def offer(self, trace: Trace) -> bool:
+        """Keep a finished trace if it was slow, returns whether it was sampled"""
+        self.stats["finished"] += 1
+        if (trace.duration_ms or 0.0) < self.threshold_ms:
+            return False
+        with self._lock:
+            self._traces.append(trace)
+        self.stats["sampled"] += 1
+        return True
+
+    def list(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Sampled traces, newest first"""
+        with self._lock:
+            traces = list(reversed(self._traces))
+        return [trace.to_dict() for trace in traces[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "buffered": len(self._traces),
+            "capacity": self._traces.maxlen,
+            "threshold_ms": self.threshold_ms,
+        }
+
+
+def _append_line(path: str, line: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+async def export_trace(trace: Trace):
+    """Append a trace as one OTLP/JSON line to TRACING_EXPORT_PATH"""
+    line = json.dumps(trace.to_otlp(), separators=(",", ":")) + "\n"
+    await asyncio.to_thread(_append_line, settings.TRACING_EXPORT_PATH, line)
+
+
+slow_traces = SlowTraceBuffer(
+    settings.TRACING_SLOW_REQUEST_MS, settings.TRACING_RING_SIZE
+)
@@ -0,0 +1,298 @@
+"""
+Usage rollups
+
+Analytics dashboards used to scan every ``UsageTracking`` row in their window
+and sum them in Python. Each tracked request is now folded into per-minute,
+per-hour and per-day ``UsageRollup`` buckets (by user, API key, model and
+endpoint). A ``UsageRollupWriter`` accumulates the increments in memory and
+upserts them with ``INSERT ... ON CONFLICT DO UPDATE`` once per flush
+interval, so dashboard queries read O(buckets) rows instead of O(requests).
+
+The statement builders at the bottom return plain ``select()`` statements
+that work with both sync and async sessions.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, desc, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.database import async_session_factory
+from app.models.usage_rollup import UsageRollup
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("minute", "hour", "day")
+
+# Summed columns, in the order kept by the in-memory accumulator
+COUNTERS = (
+    "request_count",
+    "error_count",
+    "request_tokens",
+    "response_tokens",
+    "total_tokens",
+    "cost_cents",
+    "total_response_time_ms",
+)
+
+# Rows per INSERT, well below PostgreSQL's bind parameter limit
+UPSERT_CHUNK_SIZE = 1000
+
+RollupKey = Tuple[str, datetime, int, int, str, str]
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing timestamp"""
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _dimension_id(value) -> int:
+    """User / API key id as stored in rollups (0 when absent)"""
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def granularity_for(window: timedelta) -> str:
+    """Coarsest granularity that still resolves a window well"""
+    if window <= timedelta(hours=settings.ANALYTICS_ROLLUP_MINUTE_WINDOW_HOURS):
+        return "minute"
+    if window <= timedelta(days=7):
+        return "hour"
+    return "day"
+
+
+class UsageRollupWriter:
+    """Accumulates rollup increments and upserts them periodically"""
+
+    def __init__(self, flush_interval: float = 10.0):
+        self.flush_interval = flush_interval
+        self._pending: Dict[RollupKey, List[float]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._last_prune: Optional[datetime] = None
+        self.stats = {
+            "events": 0,
+            "flushes": 0,
+            "flushed_rows": 0,
+            "flush_errors": 0,
+            "pruned_rows": 0,
+        }
+
+    def record(self, event):
+        """Fold one RequestEvent into the pending minute/hour/day buckets"""
+        endpoint = f"{event.method} {event.path}"
+        increments = (
+            1,
+            1 if event.status_code >= 400 else 0,
+            event.request_tokens or 0,
+            event.response_tokens or 0,
+            event.total_tokens or 0,
+            event.cost_cents or 0,
+            event.response_time or 0.0,
+        )
+        for granularity in GRANULARITIES:
+            key = (
+                granularity,
+                bucket_start(event.timestamp, granularity),
+                _dimension_id(event.user_id),
+                _dimension_id(event.api_key_id),
+                event.model or "",
+                endpoint,
+            )
+            totals = self._pending.get(key)
+            if totals is None:
+                self._pending[key] = list(increments)
+            else:
+                for i, value in enumerate(increments):
+                    totals[i] += value
+        self.stats["events"] += 1
+
+    async def flush(self) -> int:
+        """Upsert all pending buckets, returning the number of rows"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+            try:
+                await self._apply(pending)
+            except Exception as e:
+                logger.error(f"Failed to flush usage rollups: {e}")
+                self.stats["flush_errors"] += 1
+                # Merge back so the increments are retried on the next flush
+                for key, totals in pending.items():
+                    current = self._pending.get(key)
+                    if current is None:
+                        self._pending[key] = totals
+                    else:
+                        for i, value in enumerate(totals):
+                            current[i] += value
+                return 0
+
+            self.stats["flushes"] += 1
+            self.stats["flushed_rows"] += len(pending)
+            return len(pending)
+
+    async def _apply(self, pending: Dict[RollupKey, List[float]]):
+        now = datetime.utcnow()
+        rows = [
+            {
+                "granularity": granularity,
+                "bucket_start": start,
+                "user_id": user_id,
+                "api_key_id": api_key_id,
+                "model": model,
+                "endpoint": endpoint,
+                "updated_at": now,
+                **dict(zip(COUNTERS, totals)),
+            }
+            for (granularity, start, user_id, api_key_id, model, endpoint), totals in pending.items()
+        ]
+
+        async with async_session_factory() as session:
+            for offset in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                stmt = insert(UsageRollup).values(rows[offset : offset + UPSERT_CHUNK_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    constraint="uq_usage_rollups_bucket",
+                    set_={
+                        **{
+                            column: getattr(UsageRollup, column)
+                            + getattr(stmt.excluded, column)
+                            for column in COUNTERS
+                        },
+                        "updated_at": stmt.excluded.updated_at,
+                    },
+                )
+                await session.execute(stmt)
+            await session.commit()
+
+    async def prune(self) -> int:
+        """Delete minute and hour buckets past their retention"""
+        now = datetime.utcnow()
+        retention = {
+            "minute": timedelta(hours=settings.ANALYTICS_ROLLUP_MINUTE_RETENTION_HOURS),
+            "hour": timedelta(days=settings.ANALYTICS_ROLLUP_HOUR_RETENTION_DAYS),
+        }
+        deleted = 0
+        async with async_session_factory() as session:
+            for granularity, keep in retention.items():
+                result = await session.execute(
+                    delete(UsageRollup).where(
+                        UsageRollup.granularity == granularity,
+                        UsageRollup.bucket_start < now - keep,
+                    )
+                )
+                deleted += result.rowcount or 0
+            await session.commit()
+        self.stats["pruned_rows"] += deleted
+        self._last_prune = now
+        return deleted
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if self._last_prune is None or datetime.utcnow() - self._last_prune > timedelta(hours=1):
+                    await self.prune()
+            except Exception as e:
+                logger.error(f"Usage rollup flush loop error: {e}")
+
+    def start(self):
+        """Start the background flush task"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write out pending increments"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, object]:
+        return {**self.stats, "pending": len(self._pending)}
+
+
+def rollup_filters(
+    since: datetime,
+    granularity: str,
+    user_id: Optional[int] = None,
+    api_key_id: Optional[int] = None,
+) -> list:
+    """WHERE clauses selecting the buckets that overlap [since, now]"""
+    filters = [
+        UsageRollup.granularity == granularity,
+        UsageRollup.bucket_start >= bucket_start(since, granularity),
+    ]
+    if user_id:
+        filters.append(UsageRollup.user_id == user_id)
+    if api_key_id:
+        filters.append(UsageRollup.api_key_id == api_key_id)
+    return filters
+
+
+def totals_stmt(filters: list):
+    """Request, error, token, cost and latency totals"""
+    return select(
+        func.coalesce(func.sum(UsageRollup.request_count), 0).label("requests"),
+        func.coalesce(func.sum(UsageRollup.error_count), 0).label("errors"),
+        func.coalesce(func.sum(UsageRollup.total_tokens), 0).label("tokens"),
+        func.coalesce(func.sum(UsageRollup.cost_cents), 0).label("cost_cents"),
+        func.coalesce(func.sum(UsageRollup.total_response_time_ms), 0).label(
+            "response_time_ms"
+        ),
+    ).where(and_(*filters))
+
+
+def grouped_stmt(column, filters: list, limit: Optional[int] = None):
+    """Requests, tokens and cost grouped by one dimension, busiest first"""
+    stmt = (
+        select(
+            column,
+            func.sum(UsageRollup.request_count).label("requests"),
+            func.sum(UsageRollup.total_tokens).label("tokens"),
+            func.sum(UsageRollup.cost_cents).label("cost_cents"),
+        )
+        .where(and_(*filters))
+        .group_by(column)
+        .order_by(desc("requests"))
+    )
+    if limit:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def series_stmt(filters: list):
+    """Requests, tokens and cost per bucket, oldest first"""
+    return (
+        select(
+            UsageRollup.bucket_start,
+            func.sum(UsageRollup.request_count).label("requests"),
+            func.sum(UsageRollup.total_tokens).label("tokens"),
+            func.sum(UsageRollup.cost_cents).label("cost_cents"),
+        )
+        .where(and_(*filters))
+        .group_by(UsageRollup.bucket_start)
+        .order_by(UsageRollup.bucket_start)
+    )
+
+
+# Global writer fed by the analytics service
+usage_rollup_writer = UsageRollupWriter(
+    flush_interval=settings.ANALYTICS_ROLLUP_FLUSH_INTERVAL
+)
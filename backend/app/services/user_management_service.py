@@ -14,6 +14,7 @@ from app.models.user import User
 from app.models.role import Role, RoleLevel
 from app.models.audit_log import AuditLog, AuditAction, AuditSeverity
 from app.core.security import create_access_token, get_password_hash
+from app.services.auth_context_cache import auth_context_cache
 from pydantic import EmailStr
 
 
@@ -273,6 +274,7 @@ class UserManagementService:
         user.updated_at = datetime.utcnow()
         await self.db.commit()
         await self.db.refresh(user, ["role"])
+        await auth_context_cache.invalidate_user(user.id)
 
         return user
 
@@ -311,6 +313,7 @@ class UserManagementService:
 
         await self.db.commit()
         await self.db.refresh(user)
+        await auth_context_cache.invalidate_user(user.id)
 
         return user
 
@@ -337,6 +340,7 @@ class UserManagementService:
 
         await self.db.commit()
         await self.db.refresh(user)
+        await auth_context_cache.invalidate_user(user.id)
 
         # Log password reset audit event
         await self._log_audit_event(
@@ -375,6 +379,7 @@ class UserManagementService:
             user.updated_at = datetime.utcnow()
 
         await self.db.commit()
+        await auth_context_cache.invalidate_user(user_id)
         return True
 
     async def lock_user_account(self, user_id: int, duration_hours: int = 24) -> User:
@@ -541,6 +546,7 @@ class UserManagementService:
         role.updated_at = datetime.utcnow()
         await self.db.commit()
         await self.db.refresh(role)
+        await auth_context_cache.invalidate_all()
 
         return role
 
@@ -572,6 +578,7 @@ class UserManagementService:
 
         await self.db.delete(role)
         await self.db.commit()
+        await auth_context_cache.invalidate_all()
 
         return True
 
@@ -601,6 +608,7 @@ class UserManagementService:
 
         await self.db.commit()
         await self.db.refresh(user)
+        await auth_context_cache.invalidate_user(user.id)
 
         return user
 
@@ -618,6 +626,7 @@ class UserManagementService:
 
         await self.db.commit()
         await self.db.refresh(user)
+        await auth_context_cache.invalidate_user(user.id)
 
         return user
 
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Embedding backend benchmark
+
+Compares the ONNX Runtime backends (fp32 and int8-quantized) against the
+sentence-transformers baseline on CPU: encoding throughput in texts/sec and
+recall@k of the top-k neighbours each backend retrieves for a set of queries,
+taking the baseline's neighbours as ground truth.
+
+Usage:
+    # Export BAAI/bge-small-en-v1.5 (fp32 + int8) and benchmark it
+    python tests/performance/embedding_backend_benchmark.py --export
+
+    # Benchmark an existing export on your own corpus (one text per line)
+    python tests/performance/embedding_backend_benchmark.py \\
+        --onnx-dir storage/onnx/bge-small-en-v1.5 --corpus docs.txt --queries q.txt
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from app.services.onnx_embedding_backend import (  # noqa: E402
+    QUANTIZED_MODEL_FILE,
+    OnnxEmbeddingModel,
+    export_onnx_model,
+)
+
+WORDS = (
+    "device firmware update reset recovery wallet backup seed password "
+    "install support account billing invoice warranty shipping battery "
+    "screen connect bluetooth cable android windows linux mac browser"
+).split()
+
+
+def synthetic_texts(count: int, min_words: int, max_words: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+        for _ in range(count)
+    ]
+
+
+def read_lines(path: str, limit: int) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    return lines[:limit]
+
+
+def encode(model, texts: List[str], batch_size: int) -> Dict[str, object]:
+    # Warm up so one-off graph/kernel initialisation is not measured
+    model.encode(texts[:batch_size], convert_to_numpy=True, normalize_embeddings=True)
+
+    start = time.perf_counter()
+    chunks = [
+        model.encode(
+            texts[i : i + batch_size], convert_to_numpy=True, normalize_embeddings=True
+        )
+        for i in range(0, len(texts), batch_size)
+    ]
+    elapsed = time.perf_counter() - start
+    return {
+        "embeddings": np.vstack(chunks).astype(np.float32),
+        "texts_per_sec": len(texts) / elapsed if elapsed else 0.0,
+    }
+
+
+def top_k(queries: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(reference: np.ndarray, candidate: np.ndarray) -> float:
+    k = reference.shape[1]
+    hits = [len(set(r) & set(c)) / k for r, c in zip(reference, candidate)]
+    return float(np.mean(hits))
+
+
+def run_backend(
+    label: str,
+    model,
+    corpus: List[str],
+    queries: List[str],
+    args: argparse.Namespace,
+    baseline: Optional[Dict[str, np.ndarray]],
+) -> Dict[str, np.ndarray]:
+    corpus_run = encode(model, corpus, args.batch_size)
+    query_run = encode(model, queries, args.batch_size)
+    neighbours = top_k(query_run["embeddings"], corpus_run["embeddings"], args.k)
+
+    recall = (
+        recall_at_k(baseline["neighbours"], neighbours) if baseline is not None else 1.0
+    )
+    print(
+        f"{label:<22} {corpus_run['texts_per_sec']:>10.1f} texts/s   "
+        f"recall@{args.k}={recall:.3f}"
+    )
+    return {"neighbours": neighbours}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model", default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--onnx-dir", default="storage/onnx/bge-small-en-v1.5")
+    parser.add_argument("--export", action="store_true", help="export before running")
+    parser.add_argument("--corpus", help="file with one passage per line")
+    parser.add_argument("--queries", help="file with one query per line")
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--pooling", default="cls", choices=["cls", "mean"])
+    args = parser.parse_args()
+
+    if args.export:
+        print(f"Exporting {args.model} to {args.onnx_dir} ...")
+        export_onnx_model(args.model, args.onnx_dir, quantize=True)
+
+    corpus = (
+        read_lines(args.corpus, args.limit)
+        if args.corpus
+        else synthetic_texts(args.limit, 20, 80, seed=1)
+    )
+    queries = (
+        read_lines(args.queries, args.limit)
+        if args.queries
+        else synthetic_texts(max(1, args.limit // 10), 3, 10, seed=2)
+    )
+    # Same prefixes the RAG module uses when indexing and searching
+    corpus = [f"passage: {text}" for text in corpus]
+    queries = [f"query: {text}" for text in queries]
+    print(
+        f"{len(corpus)} passages, {len(queries)} queries, batch size {args.batch_size}"
+    )
+
+    from sentence_transformers import SentenceTransformer
+
+    baseline = run_backend(
+        "sentence_transformer",
+        SentenceTransformer(args.model),
+        corpus,
+        queries,
+        args,
+        baseline=None,
+    )
+    run_backend(
+        "onnx fp32",
+        OnnxEmbeddingModel(args.onnx_dir, pooling=args.pooling),
+        corpus,
+        queries,
+        args,
+        baseline,
+    )
+    if os.path.exists(os.path.join(args.onnx_dir, QUANTIZED_MODEL_FILE)):
+        run_backend(
+            "onnx int8",
+            OnnxEmbeddingModel(args.onnx_dir, quantized=True, pooling=args.pooling),
+            corpus,
+            queries,
+            args,
+            baseline,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Request middleware overhead benchmark
+
+Compares the per-request cost of three middleware setups around the same
+Starlette app, driven directly through ASGI so no server or network is
+involved:
+
+  bare      - no observability middleware
+  previous  - the former stack of four BaseHTTPMiddleware layers (analytics,
+              audit, login audit, debugging), each decoding the JWT or
+              buffering the request body as they used to
+  pure-asgi - ObservabilityMiddleware with analytics, audit and debug sinks
+              enabled (sink handlers are no-ops, so only queueing is measured)
+
+Usage:
+    python tests/performance/middleware_overhead_benchmark.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.responses import JSONResponse, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from app.core.security import create_access_token, verify_token  # noqa: E402
+from app.middleware import observability  # noqa: E402
+from app.middleware.observability import ObservabilityMiddleware  # noqa: E402
+
+
+async def chat(request):
+    await request.body()
+    return JSONResponse({"choices": [{"message": {"content": "hello"}}]})
+
+
+async def stream(request):
+    async def chunks():
+        for i in range(20):
+            yield f"data: {i}\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+class DecodeTokenLayer(BaseHTTPMiddleware):
+    """Stand-in for the former analytics/audit layers"""
+
+    async def dispatch(self, request, call_next):
+        authorization = request.headers.get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            try:
+                verify_token(authorization.split(" ")[1])
+            except Exception:
+                pass
+        return await call_next(request)
+
+
+class BufferBodyLayer(BaseHTTPMiddleware):
+    """Stand-in for the former login audit/debugging layers"""
+
+    async def dispatch(self, request, call_next):
+        if request.method == "POST":
+            await request.body()
+        return await call_next(request)
+
+
+def build_app(variant: str):
+    app = Starlette(routes=[Route("/chat", chat, methods=["POST"]), Route("/stream", stream)])
+    if variant == "previous":
+        for layer in (DecodeTokenLayer, DecodeTokenLayer, BufferBodyLayer, BufferBodyLayer):
+            app.add_middleware(layer)
+    elif variant == "pure-asgi":
+        app.add_middleware(ObservabilityMiddleware, analytics=True, audit=True, debug=True)
+    return app
+
+
+def make_scope(path: str, method: str, token: str):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"authorization", f"Bearer {token}".encode()),
+            (b"content-type", b"application/json"),
+            (b"content-length", b"32"),
+        ],
+        "client": ("127.0.0.1", 5000),
+        "server": ("testserver", 80),
+    }
+
+
+async def run(app, path: str, method: str, token: str, requests: int):
+    body = b'{"messages":[{"content":"hi"}]}\n'
+    samples = []
+    for _ in range(requests):
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                await asyncio.sleep(3600)
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            pass
+
+        start = time.perf_counter()
+        await app(make_scope(path, method, token), receive, send)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+async def drain_sinks():
+    for sink in (observability.analytics_sink, observability.audit_sink, observability.debug_sink):
+        await sink.stop()
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main_async(requests: int):
+    token = create_access_token({"sub": "1", "email": "bench@example.com"})
+
+    async def noop(record):
+        pass
+
+    for sink in (observability.analytics_sink, observability.audit_sink, observability.debug_sink):
+        sink.handler = noop
+
+    for path, method in (("/chat", "POST"), ("/stream", "GET")):
+        print(f"\n{method} {path} ({requests} requests)")
+        baseline = None
+        for variant in ("bare", "previous", "pure-asgi"):
+            app = build_app(variant)
+            await run(app, path, method, token, min(requests, 200))  # warm up
+            samples = await run(app, path, method, token, requests)
+            await drain_sinks()
+            p50 = statistics.median(samples)
+            if baseline is None:
+                baseline = p50
+            print(
+                f"  {variant:<10} p50 {p50:8.1f}µs  p99 {percentile(samples, 0.99):8.1f}µs  "
+                f"overhead {p50 - baseline:+8.1f}µs"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Chat latency under concurrent RAG load
+
+Measures /api/v1/llm/chat/completions latency percentiles twice: once on an
+idle worker and once while RAG-backed chatbot requests run concurrently. With
+blocking Qdrant calls the loaded p99 grows with every in-flight vector search;
+with the async client it should stay close to the idle baseline.
+
+Usage:
+    python tests/performance/rag_concurrency_benchmark.py \\
+        --api-key en_... --chatbot-id <rag-enabled chatbot> --model <model>
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+RAG_QUESTIONS = [
+    "How do I reset my device?",
+    "What is the warranty period?",
+    "How can I update the firmware?",
+    "Which operating systems are supported?",
+    "Where can I find my recovery words?",
+]
+
+
+def percentile(data: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not data:
+        return 0.0
+    ordered = sorted(data)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], errors: int) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+async def chat_worker(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    deadline: float,
+    latencies: List[float],
+    errors: List[int],
+):
+    payload = {
+        "model": args.model,
+        "messages": [{"role": "user", "content": "Reply with the single word OK."}],
+        "max_tokens": 5,
+    }
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post("/api/v1/llm/chat/completions", json=payload)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[0] += 1
+        except httpx.HTTPError:
+            errors[0] += 1
+
+
+async def rag_worker(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    deadline: float,
+    worker_id: int,
+    completed: List[int],
+):
+    i = worker_id
+    while time.perf_counter() < deadline:
+        question = RAG_QUESTIONS[i % len(RAG_QUESTIONS)]
+        i += 1
+        try:
+            await client.post(
+                f"/api/v1/chatbot/external/{args.chatbot_id}/chat",
+                json={"message": question},
+            )
+            completed[0] += 1
+        except httpx.HTTPError:
+            pass
+
+
+async def run_phase(args: argparse.Namespace, rag_concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = [0]
+    rag_completed = [0]
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        headers={"Authorization": f"Bearer {args.api_key}"},
+        timeout=120.0,
+        limits=httpx.Limits(max_connections=args.chat_concurrency + rag_concurrency),
+    ) as client:
+        tasks = [
+            chat_worker(client, args, deadline, latencies, errors)
+            for _ in range(args.chat_concurrency)
+        ]
+        tasks += [
+            rag_worker(client, args, deadline, i, rag_completed)
+            for i in range(rag_concurrency)
+        ]
+        await asyncio.gather(*tasks)
+
+    summary = summarize(latencies, errors[0])
+    summary["rag_requests"] = rag_completed[0]
+    return summary
+
+
+def print_summary(label: str, summary: Dict[str, float]):
+    print(
+        f"{label:<14} chat={summary['requests']:>5} err={summary['errors']:>3} "
+        f"rag={summary['rag_requests']:>5}  p50={summary['p50_ms']:8.1f}ms  "
+        f"p95={summary['p95_ms']:8.1f}ms  p99={summary['p99_ms']:8.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--api-key", required=True)
+    parser.add_argument("--chatbot-id", required=True)
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--chat-concurrency", type=int, default=4)
+    parser.add_argument("--rag-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"Benchmarking {args.base_url} for {args.duration:.0f}s per phase")
+    print_summary("idle", await run_phase(args, rag_concurrency=0))
+    print_summary("under RAG", await run_phase(args, args.rag_concurrency))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
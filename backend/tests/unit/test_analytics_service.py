@@ -0,0 +1,87 @@
+"""
+Test the async analytics service result cache.
+"""
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.analytics import AnalyticsService, RequestEvent
+
+
+def make_event():
+    return RequestEvent(
+        timestamp=datetime.utcnow(),
+        method="GET",
+        path="/api/v1/analytics/metrics",
+        status_code=200,
+        response_time=10.0,
+    )
+
+
+class TestAnalyticsCache:
+    """Test caching, coalescing and error handling of analytics results."""
+
+    @pytest.mark.asyncio
+    async def test_result_is_cached(self):
+        service = AnalyticsService(cache_ttl=60)
+        compute = AsyncMock(return_value={"total": 1})
+
+        assert await service._cached("key", compute) == {"total": 1}
+        assert await service._cached("key", compute) == {"total": 1}
+
+        assert compute.await_count == 1
+        assert service.cache_stats == {"hits": 1, "misses": 1, "coalesced": 0}
+        service.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_tracking_does_not_clear_cache(self):
+        service = AnalyticsService(cache_ttl=60)
+        await service._cached("key", AsyncMock(return_value=1))
+
+        with patch("app.services.analytics.usage_rollup_writer"):
+            await service.track_request(make_event())
+
+        assert "key" in service.metrics_cache
+        service.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_computation(self):
+        service = AnalyticsService(cache_ttl=60)
+        release = asyncio.Event()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return calls
+
+        tasks = [asyncio.create_task(service._cached("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*tasks) == [1, 1, 1]
+        assert service.cache_stats["coalesced"] == 2
+        service.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self):
+        service = AnalyticsService(cache_ttl=60)
+
+        with pytest.raises(RuntimeError):
+            await service._cached("key", AsyncMock(side_effect=RuntimeError))
+
+        assert "key" not in service.metrics_cache
+        assert await service._cached("key", AsyncMock(return_value=2)) == 2
+        service.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_cache_is_bounded(self):
+        service = AnalyticsService(cache_ttl=60, max_cache_entries=2)
+        for i in range(3):
+            await service._cached(f"key{i}", AsyncMock(return_value=i))
+
+        assert list(service.metrics_cache) == ["key1", "key2"]
+        service.cleanup()
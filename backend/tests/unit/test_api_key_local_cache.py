@@ -0,0 +1,111 @@
+"""
+Test the in-process cache of verified API key contexts.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.api_key import APIKey
+from app.models.user import User
+from app.services import api_key_auth, cached_api_key
+from app.services.api_key_auth import APIKeyAuthService
+from app.services.cached_api_key import CachedAPIKeyService
+
+
+RAW_KEY = "en_abcd1234567890secret"
+
+
+def make_context():
+    api_key = APIKey(
+        id=3, user_id=1, name="Test API Key", key_prefix=RAW_KEY[:8], is_active=True
+    )
+    return {"api_key": api_key, "user": User(id=1), "api_key_id": 3}
+
+
+@pytest.fixture
+def service():
+    service = CachedAPIKeyService()
+    service.local_cache_ttl = 30
+    service.update_last_used = AsyncMock()
+    return service
+
+
+class TestLocalContextCache:
+    """Test lookups, expiry and invalidation."""
+
+    def test_hit_is_keyed_by_full_key(self, service):
+        service.set_local_context(RAW_KEY, make_context())
+
+        assert service.get_local_context(RAW_KEY)["api_key_id"] == 3
+        # Same prefix, different secret
+        assert service.get_local_context(RAW_KEY[:8] + "forged") is None
+
+    def test_expired_entry_misses(self, service):
+        service.local_cache_ttl = -1
+        service.set_local_context(RAW_KEY, make_context())
+
+        assert service.get_local_context(RAW_KEY) is None
+
+    @pytest.mark.asyncio
+    async def test_invalidation_evicts_and_publishes(self, service):
+        service.set_local_context(RAW_KEY, make_context())
+        fake_cache = MagicMock(enabled=True)
+        fake_cache.invalidate_api_key = AsyncMock()
+        fake_cache.clear_pattern = AsyncMock()
+        fake_cache.publish = AsyncMock()
+
+        with patch.object(cached_api_key, "core_cache", fake_cache):
+            await service.invalidate_api_key_cache(RAW_KEY[:8])
+
+        assert service.get_local_context(RAW_KEY) is None
+        fake_cache.publish.assert_awaited_once_with(
+            cached_api_key.INVALIDATION_CHANNEL, RAW_KEY[:8]
+        )
+
+    def test_evicts_least_recently_used(self, service):
+        service.local_cache_size = 1
+        service.set_local_context(RAW_KEY, make_context())
+        service.set_local_context("en_other000000secret", make_context())
+
+        assert service.get_local_context(RAW_KEY) is None
+
+    def test_hits_get_independent_objects(self, service):
+        context = make_context()
+        context["api_key"].total_requests = 0
+        context["api_key"].total_tokens = 0
+        context["api_key"].total_cost = 0
+        context["api_key"].scopes = ["chat.completions"]
+        service.set_local_context(RAW_KEY, context)
+
+        first = service.get_local_context(RAW_KEY)
+        first["api_key"].update_usage(10, 1)
+        first["api_key"].scopes.append("admin")
+        second = service.get_local_context(RAW_KEY)
+
+        assert first["api_key"] is not second["api_key"]
+        assert second["api_key"].total_requests == 0
+        assert second["api_key"].scopes == ["chat.completions"]
+        # The object the context was cached from is not shared either
+        assert context["api_key"] is not second["api_key"]
+        assert second["user"].id == 1
+
+
+class TestValidateApiKey:
+    """Test the warm authentication path."""
+
+    @pytest.mark.asyncio
+    async def test_warm_request_skips_redis_and_database(self, service):
+        service.set_local_context(RAW_KEY, make_context())
+        service.verify_api_key_cached = AsyncMock()
+        service.get_cached_api_key = AsyncMock()
+        request = MagicMock()
+        request.client.host = "127.0.0.1"
+
+        with patch.object(api_key_auth, "cached_api_key_service", service):
+            context = await APIKeyAuthService(db=AsyncMock()).validate_api_key(
+                RAW_KEY, request
+            )
+
+        assert context["api_key_id"] == 3
+        service.verify_api_key_cached.assert_not_awaited()
+        service.get_cached_api_key.assert_not_awaited()
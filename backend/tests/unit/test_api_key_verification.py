@@ -0,0 +1,185 @@
+"""
+Test bcrypt offloading and HMAC API key verification.
+"""
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core import security
+from app.core.security import (
+    get_api_key_digest,
+    get_password_hash,
+    verify_api_key_digest,
+    verify_password_async,
+)
+from app.models.api_key import APIKey
+from app.models.user import User
+from app.services import api_key_auth
+from app.services.api_key_auth import APIKeyAuthService
+
+
+RAW_KEY = "en_abcd1234567890secretsecretsecret"
+
+
+@pytest.fixture(autouse=True)
+def hmac_secret():
+    with patch.object(
+        security.settings, "API_KEY_HMAC_SECRET", "test-secret"
+    ), patch.object(security.settings, "API_KEY_HMAC_ENABLED", True):
+        yield
+
+
+class TestDigests:
+    """Test the keyed digest scheme."""
+
+    def test_digest_round_trip(self):
+        digest = get_api_key_digest(RAW_KEY)
+
+        assert digest.startswith("hmac-sha256$")
+        assert verify_api_key_digest(RAW_KEY, digest)
+        assert not verify_api_key_digest(RAW_KEY + "x", digest)
+
+    def test_no_digests_without_dedicated_secret(self):
+        with patch.object(security.settings, "API_KEY_HMAC_SECRET", None):
+            assert get_api_key_digest(RAW_KEY) is None
+            assert not verify_api_key_digest(RAW_KEY, "hmac-sha256$anything")
+
+    def test_digest_depends_on_secret(self):
+        digest = get_api_key_digest(RAW_KEY)
+
+        with patch.object(security.settings, "API_KEY_HMAC_SECRET", "rotated"):
+            assert not verify_api_key_digest(RAW_KEY, digest)
+
+
+class TestBcryptPool:
+    """Test that bcrypt runs off the event loop."""
+
+    @pytest.mark.asyncio
+    async def test_verification_runs_in_pool(self):
+        hashed = get_password_hash("password")
+        threads = []
+        original_verify = security.pwd_context.verify
+
+        def verify(plain, hashed_password):
+            threads.append(threading.current_thread().name)
+            return original_verify(plain, hashed_password)
+
+        with patch.object(security.pwd_context, "verify", side_effect=verify):
+            assert await verify_password_async("password", hashed)
+
+        assert threads[0].startswith("bcrypt")
+
+
+class TestValidateApiKey:
+    """Test verification paths of the API key auth service."""
+
+    def make_service(self, api_key_obj):
+        cache = MagicMock()
+        cache.get_local_context.return_value = None
+        cache.get_cached_api_key = AsyncMock(
+            return_value={"api_key": api_key_obj, "user": User(id=1), "api_key_id": 3}
+        )
+        cache.verify_api_key_cached = AsyncMock()
+        cache.invalidate_api_key_cache = AsyncMock()
+        cache.update_last_used = AsyncMock()
+        return cache
+
+    def request(self):
+        request = MagicMock()
+        request.client.host = "127.0.0.1"
+        return request
+
+    @pytest.mark.asyncio
+    async def test_digest_keys_skip_bcrypt(self):
+        api_key_obj = APIKey(
+            id=3,
+            user_id=1,
+            key_prefix=RAW_KEY[:8],
+            key_hash="not-a-bcrypt-hash",
+            key_digest=get_api_key_digest(RAW_KEY),
+            is_active=True,
+        )
+        cache = self.make_service(api_key_obj)
+
+        with patch.object(api_key_auth, "cached_api_key_service", cache), patch.object(
+            api_key_auth, "verify_api_key_async", AsyncMock(return_value=False)
+        ) as bcrypt_verify:
+            service = APIKeyAuthService(db=AsyncMock())
+            assert await service.validate_api_key(RAW_KEY, self.request())
+            bcrypt_verify.assert_not_awaited()
+
+            # A mismatch is checked against the bcrypt hash before rejecting
+            assert await service.validate_api_key(RAW_KEY + "x", self.request()) is None
+            bcrypt_verify.assert_awaited_once()
+
+        cache.verify_api_key_cached.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_legacy_key_is_migrated_after_bcrypt(self):
+        api_key_obj = APIKey(
+            id=3,
+            user_id=1,
+            key_prefix=RAW_KEY[:8],
+            key_hash=get_password_hash(RAW_KEY),
+            is_active=True,
+        )
+        cache = self.make_service(api_key_obj)
+        db = AsyncMock()
+
+        with patch.object(api_key_auth, "cached_api_key_service", cache):
+            context = await APIKeyAuthService(db=db).validate_api_key(
+                RAW_KEY, self.request()
+            )
+
+        assert context["api_key_id"] == 3
+        assert api_key_obj.key_digest == get_api_key_digest(RAW_KEY)
+        db.execute.assert_awaited_once()
+        db.commit.assert_awaited_once()
+        cache.invalidate_api_key_cache.assert_awaited_once_with(RAW_KEY[:8])
+
+    @pytest.mark.asyncio
+    async def test_legacy_key_with_wrong_secret_is_rejected(self):
+        api_key_obj = APIKey(
+            id=3,
+            user_id=1,
+            key_prefix=RAW_KEY[:8],
+            key_hash=get_password_hash(RAW_KEY),
+            is_active=True,
+        )
+        cache = self.make_service(api_key_obj)
+        # A cached verification is bound to the prefix only and must not be trusted
+        cache.verify_api_key_cached = AsyncMock(return_value=True)
+        db = AsyncMock()
+
+        with patch.object(api_key_auth, "cached_api_key_service", cache):
+            context = await APIKeyAuthService(db=db).validate_api_key(
+                RAW_KEY[:8] + "forged", self.request()
+            )
+
+        assert context is None
+        db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_stale_digest_falls_back_to_bcrypt_and_is_replaced(self):
+        with patch.object(security.settings, "API_KEY_HMAC_SECRET", "old-secret"):
+            stale_digest = get_api_key_digest(RAW_KEY)
+        api_key_obj = APIKey(
+            id=3,
+            user_id=1,
+            key_prefix=RAW_KEY[:8],
+            key_hash=get_password_hash(RAW_KEY),
+            key_digest=stale_digest,
+            is_active=True,
+        )
+        cache = self.make_service(api_key_obj)
+        db = AsyncMock()
+
+        with patch.object(api_key_auth, "cached_api_key_service", cache):
+            service = APIKeyAuthService(db=db)
+            assert await service.validate_api_key(RAW_KEY, self.request())
+            assert await service.validate_api_key(RAW_KEY + "x", self.request()) is None
+
+        assert api_key_obj.key_digest == get_api_key_digest(RAW_KEY)
+        db.execute.assert_awaited_once()
+        cache.invalidate_api_key_cache.assert_awaited_once_with(RAW_KEY[:8])
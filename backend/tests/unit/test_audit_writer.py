@@ -0,0 +1,142 @@
+"""
+Test the batched, bounded audit log writer.
+"""
+import asyncio
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models.audit_log import AuditLog
+from app.services import audit_service
+from app.services.audit_service import AuditWriter, audit_row
+
+
+def make_row(i):
+    return {
+        "action": "read",
+        "resource_type": "user",
+        "description": f"event {i}",
+        "created_at": datetime(2026, 1, 1),
+    }
+
+
+class TestAuditWriter:
+    """Test batching, overflow policies and shutdown flushing."""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_one_batch_per_insert(self):
+        writer = AuditWriter(batch_size=3)
+        for i in range(5):
+            writer.submit(make_row(i))
+
+        with patch.object(writer, "_write", new=AsyncMock()) as write:
+            assert await writer.flush() == 3
+            assert await writer.flush() == 2
+
+        assert [len(call.args[0]) for call in write.await_args_list] == [3, 2]
+        assert writer.get_stats()["batches"] == 2
+        assert writer.get_stats()["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest_when_full(self):
+        writer = AuditWriter(max_queue=2)
+        for i in range(3):
+            writer.submit(make_row(i))
+
+        with patch.object(writer, "_write", new=AsyncMock()) as write:
+            await writer.flush()
+
+        descriptions = [row["description"] for row in write.await_args.args[0]]
+        assert descriptions == ["event 1", "event 2"]
+        assert writer.get_stats()["dropped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_spill_and_replay(self, tmp_path):
+        spill_path = str(tmp_path / "audit_spill.jsonl")
+        writer = AuditWriter(max_queue=1, overflow_policy="spill", spill_path=spill_path)
+        writer.submit(make_row(0))
+        assert not writer.submit(make_row(1))
+        assert writer.get_stats()["spilled"] == 1
+
+        with patch.object(writer, "_write", new=AsyncMock()) as write:
+            assert await writer.replay_spill() == 1
+
+        replayed = write.await_args.args[0][0]
+        assert replayed["description"] == "event 1"
+        assert replayed["created_at"] == datetime(2026, 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_workers_sharing_a_spill_file_replay_it_once(self, tmp_path):
+        spill_path = str(tmp_path / "audit_spill.jsonl")
+        first = AuditWriter(max_queue=1, overflow_policy="spill", spill_path=spill_path)
+        second = AuditWriter(spill_path=spill_path)
+        first.submit(make_row(0))
+        first.submit(make_row(1))
+        release = asyncio.Event()
+
+        async def slow_write(rows):
+            await release.wait()
+
+        with patch.object(first, "_write", new=slow_write), patch.object(
+            second, "_write", new=AsyncMock()
+        ) as second_write:
+            replay = asyncio.create_task(first.replay_spill())
+            await asyncio.sleep(0.01)
+            assert await second.replay_spill() == 0
+            release.set()
+            assert await replay == 1
+
+        second_write.assert_not_awaited()
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_replays_of_dead_workers_are_adopted(self, tmp_path):
+        spill_path = str(tmp_path / "audit_spill.jsonl")
+        for owner in ("", "111.", "222."):
+            with open(f"{spill_path}.{owner}replay", "w") as replay_file:
+                replay_file.write(json.dumps({"description": owner}) + "\n")
+        writer = AuditWriter(spill_path=spill_path)
+
+        with patch.object(
+            audit_service, "_process_alive", lambda pid: pid == 222
+        ), patch.object(writer, "_write", new=AsyncMock()) as write:
+            assert await writer.replay_spill() == 2
+
+        replayed = [call.args[0][0]["description"] for call in write.await_args_list]
+        assert sorted(replayed) == ["", "111."]
+        assert [path.name for path in tmp_path.iterdir()] == [
+            "audit_spill.jsonl.222.replay"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_requeued(self):
+        writer = AuditWriter(batch_size=10)
+        writer.submit(make_row(0))
+
+        with patch.object(writer, "_write", new=AsyncMock(side_effect=RuntimeError)):
+            assert await writer.flush() == 0
+
+        assert writer.get_stats()["queue_depth"] == 1
+        assert writer.get_stats()["flush_errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_queue(self):
+        writer = AuditWriter(batch_size=2)
+        for i in range(5):
+            writer.submit(make_row(i))
+
+        with patch.object(writer, "_write", new=AsyncMock()) as write:
+            await writer.stop()
+
+        assert sum(len(call.args[0]) for call in write.await_args_list) == 5
+
+    def test_audit_row_keeps_set_columns(self):
+        row = audit_row(
+            AuditLog(action="login", resource_type="user", description="d")
+        )
+
+        assert row["action"] == "login"
+        assert "id" not in row
+        assert isinstance(row["created_at"], datetime)
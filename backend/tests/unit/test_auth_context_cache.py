@@ -0,0 +1,200 @@
+"""
+Test JWT auth context caching and batched last-seen writes.
+"""
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core import security
+from app.core.security import create_access_token, get_current_user
+from app.models.role import Role
+from app.models.user import User
+from app.services import auth_context_cache as auth_context_cache_module
+from app.services import last_seen
+from app.services.auth_context_cache import AuthContextCache
+from app.services.last_seen import LastSeenBatcher
+
+
+def make_context(user_id=1):
+    return {"id": user_id, "email": "user@example.com", "permissions": ["a"]}
+
+
+class TestAuthContextCache:
+    """Test lookups and generation-based invalidation."""
+
+    def test_hit_returns_copy(self):
+        cache = AuthContextCache()
+        cache.set(1, make_context(), cache.generation(1))
+
+        context = cache.get(1)
+        context["permissions"].append("b")
+
+        assert cache.get(1)["permissions"] == ["a"]
+
+    def test_invalidate_user_only_drops_that_user(self):
+        cache = AuthContextCache()
+        cache.set(1, make_context(1), 0)
+        cache.set(2, make_context(2), 0)
+
+        cache.evict("1")
+
+        assert cache.get(1) is None
+        assert cache.get(2) is not None
+
+    def test_context_resolved_before_invalidation_is_not_cached(self):
+        cache = AuthContextCache()
+        generation = cache.generation(1)
+
+        cache.evict("1")
+        cache.set(1, make_context(), generation)
+
+        assert cache.get(1) is None
+
+    def test_invalidate_all(self):
+        cache = AuthContextCache()
+        cache.set(1, make_context(1), 0)
+        cache.set(2, make_context(2), 0)
+
+        cache.evict("*")
+
+        assert cache.get(1) is None and cache.get(2) is None
+
+
+class TestGetCurrentUser:
+    """Test the cached JWT path."""
+
+    @pytest.mark.asyncio
+    async def test_second_request_uses_cache_and_no_writes(self):
+        cache = AuthContextCache()
+        batcher = LastSeenBatcher(User, "last_login")
+        user = User(
+            id=5,
+            email="user@example.com",
+            username="user",
+            is_superuser=False,
+            is_active=True,
+            custom_permissions={},
+        )
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = user
+        db = AsyncMock()
+        db.execute.return_value = result
+        token = create_access_token({"sub": "5"})
+        credentials = MagicMock(credentials=token)
+
+        with patch.object(
+            auth_context_cache_module, "auth_context_cache", cache
+        ), patch.object(last_seen, "user_last_seen", batcher):
+            first = await get_current_user(credentials, db)
+            second = await get_current_user(credentials, db)
+
+        assert first["id"] == second["id"] == 5
+        assert second["permissions"] == first["permissions"]
+        db.execute.assert_awaited_once()
+        db.commit.assert_not_awaited()
+        assert list(batcher._pending) == [5]
+
+
+    @pytest.mark.asyncio
+    async def test_cached_hits_get_their_own_user_object(self):
+        cache = AuthContextCache()
+        role = Role(
+            id=2,
+            name="developer",
+            display_name="Developer",
+            level="developer",
+            permissions={"granted": ["manage_tools"]},
+            inherits_from=[],
+        )
+        user = User(
+            id=6,
+            email="dev@example.com",
+            username="dev",
+            is_superuser=False,
+            is_active=True,
+            custom_permissions={},
+        )
+        user.role = role
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = user
+        db = AsyncMock()
+        db.execute.return_value = result
+        credentials = MagicMock(credentials=create_access_token({"sub": "6"}))
+        batcher = LastSeenBatcher(User, "last_login")
+
+        with patch.object(
+            auth_context_cache_module, "auth_context_cache", cache
+        ), patch.object(last_seen, "user_last_seen", batcher):
+            await get_current_user(credentials, db)
+            first = (await get_current_user(credentials, db))["user_obj"]
+            second = (await get_current_user(credentials, db))["user_obj"]
+
+        assert first is not user and second is not user and first is not second
+        first.custom_permissions["denied"] = ["manage_tools"]
+        assert not first.has_permission("manage_tools")
+        assert second.has_permission("manage_tools")
+        assert second.role.name == "developer" and second.role is not role
+
+
+class TestPasswordChanges:
+    """Test that password changes drop the cached auth context."""
+
+    @pytest.mark.asyncio
+    async def test_reset_password_invalidates_user(self):
+        from app.api.v1 import users as users_api
+
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = User(id=5, username="user")
+        db = AsyncMock()
+        db.execute.return_value = result
+        cache = MagicMock(invalidate_user=AsyncMock())
+        admin = {"id": 1, "username": "admin", "permissions": ["platform:*"]}
+
+        with patch.object(users_api, "auth_context_cache", cache), patch.object(
+            users_api, "require_permission"
+        ), patch.object(users_api, "log_audit_event", AsyncMock()), patch.object(
+            users_api, "get_password_hash_async", AsyncMock(return_value="hashed")
+        ):
+            await users_api.reset_password(
+                "5",
+                users_api.PasswordResetRequest(new_password="n3w-Password"),
+                admin,
+                db,
+            )
+
+        cache.invalidate_user.assert_awaited_once_with(5)
+
+
+class TestLastSeenBatcher:
+    """Test coalesced last-seen writes."""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_latest_timestamp_per_row(self):
+        batcher = LastSeenBatcher(User, "last_login")
+        later = datetime(2026, 1, 1, 12, 0)
+        batcher.touch(1, datetime(2026, 1, 1, 11, 0))
+        batcher.touch(1, later)
+        batcher.touch(2, later)
+
+        with patch.object(batcher, "_apply", AsyncMock()) as apply:
+            assert await batcher.flush() == 2
+            assert await batcher.flush() == 0
+
+        apply.assert_awaited_once_with({1: later, 2: later})
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_newer_timestamps(self):
+        batcher = LastSeenBatcher(User, "last_login")
+        old, new = datetime(2026, 1, 1, 11, 0), datetime(2026, 1, 1, 12, 0)
+        batcher.touch(1, old)
+
+        async def fail(pending):
+            batcher.touch(1, new)
+            raise RuntimeError("database down")
+
+        with patch.object(batcher, "_apply", side_effect=fail):
+            assert await batcher.flush() == 0
+
+        assert batcher._pending == {1: new}
+        assert batcher.stats["flush_errors"] == 1
@@ -0,0 +1,143 @@
+"""
+Test the persistent BM25 inverted index used by RAG hybrid search.
+"""
+import math
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.modules.rag.bm25_index import BM25Index, BM25IndexManager, tokenize
+
+
+class TestTokenize:
+    """Test BM25 tokenization."""
+
+    def test_drops_stop_words_short_tokens_and_digits(self):
+        assert tokenize("The 2 quick foxes, and 42 lazy dogs!") == [
+            "quick",
+            "foxes",
+            "lazy",
+            "dogs",
+        ]
+
+    def test_empty_text(self):
+        assert tokenize("") == []
+
+
+class TestBM25Index:
+    """Test index maintenance and scoring."""
+
+    def _build(self):
+        index = BM25Index()
+        index.add_chunk("c1", "doc-a", "python asyncio event loop")
+        index.add_chunk("c2", "doc-a", "python packaging tools")
+        index.add_chunk("c3", "doc-b", "rust borrow checker")
+        return index
+
+    def test_scores_only_matching_chunks(self):
+        index = self._build()
+        scores = index.score(["python"])
+        assert set(scores) == {"c1", "c2"}
+
+    def test_scores_only_candidates(self):
+        index = self._build()
+        scores = index.score(["python"], candidates=["c2", "c3", "missing"])
+        assert set(scores) == {"c2"}
+        assert scores["c2"] == index.score(["python"])["c2"]
+        assert index.score(["python"], candidates=[]) == {}
+
+    def test_rare_terms_weigh_more(self):
+        index = self._build()
+        assert index.idf("asyncio") > index.idf("python")
+        scores = index.score(["python", "asyncio"])
+        assert scores["c1"] > scores["c2"]
+
+    def test_idf_uses_real_document_frequency(self):
+        index = self._build()
+        expected = math.log(1 + (3 - 2 + 0.5) / (2 + 0.5))
+        assert index.idf("python") == pytest.approx(expected)
+
+    def test_remove_document(self):
+        index = self._build()
+        assert index.remove_document("doc-a") == 2
+        assert index.chunk_count == 1
+        assert index.score(["python"]) == {}
+        assert index.average_length == 3
+
+    def test_reindexing_a_chunk_replaces_postings(self):
+        index = self._build()
+        index.add_chunk("c1", "doc-a", "golang goroutines")
+        assert "c1" not in index.score(["asyncio"])
+        assert "c1" in index.score(["goroutines"])
+        assert index.chunk_count == 3
+
+    def test_freed_slots_are_reused(self):
+        index = self._build()
+        index.remove_chunk("c3")
+        index.add_chunk("c4", "doc-c", "haskell monads")
+        assert index.chunk_count == 3
+        assert set(index.score(["haskell", "rust"])) == {"c4"}
+
+    def test_round_trip_serialization(self):
+        index = self._build()
+        index.remove_chunk("c2")
+        restored = BM25Index.from_dict(index.to_dict())
+        assert restored.chunk_count == index.chunk_count
+        assert restored.score(["python", "rust"]) == pytest.approx(
+            index.score(["python", "rust"])
+        )
+        assert restored.remove_document("doc-a") == 1
+
+
+class TestBM25IndexManager:
+    """Test per-collection persistence."""
+
+    @pytest.mark.asyncio
+    async def test_flush_and_reload(self, tmp_path):
+        manager = BM25IndexManager(str(tmp_path), flush_delay=0)
+        manager.create("docs")
+        manager.add_chunks("docs", [("c1", "doc-a", "vector database search")])
+        await manager.flush_all()
+
+        reloaded = BM25IndexManager(str(tmp_path))
+        index = reloaded.get("docs")
+        assert index is not None
+        assert set(index.score(["vector"])) == {"c1"}
+
+    def test_collections_without_index_are_skipped(self, tmp_path):
+        manager = BM25IndexManager(str(tmp_path))
+        assert manager.add_chunks("legacy", [("c1", "doc-a", "text here")]) == 0
+        assert manager.get("legacy") is None
+
+    @pytest.mark.asyncio
+    async def test_drop_removes_file(self, tmp_path):
+        manager = BM25IndexManager(str(tmp_path), flush_delay=0)
+        manager.create("docs")
+        await manager.flush_all()
+        assert list(tmp_path.iterdir())
+        manager.drop("docs")
+        assert not list(tmp_path.iterdir())
+
+    @pytest.mark.asyncio
+    async def test_deleting_a_collection_drops_its_index(self, tmp_path, monkeypatch):
+        from app.services.rag_service import RAGService
+
+        monkeypatch.chdir(tmp_path)
+        client = MagicMock()
+        client.get_collections = AsyncMock(
+            return_value=SimpleNamespace(collections=[SimpleNamespace(name="docs")])
+        )
+        client.delete_collection = AsyncMock()
+        rag_module = MagicMock(drop_collection_indexes=AsyncMock())
+
+        with patch(
+            "app.core.qdrant.get_qdrant_client", return_value=client
+        ), patch(
+            "app.services.module_manager.module_manager.get_module",
+            return_value=rag_module,
+        ):
+            await RAGService(db=AsyncMock())._delete_qdrant_collection("docs")
+
+        client.delete_collection.assert_awaited_once_with("docs")
+        rag_module.drop_collection_indexes.assert_awaited_once_with("docs")
@@ -0,0 +1,365 @@
+"""
+Test the counter-based budget ledger.
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models.api_key import APIKey
+from app.models.budget import Budget
+from app.services import async_budget_enforcement
+from app.services.async_budget_enforcement import AsyncBudgetEnforcementService
+from app.services.cost_calculator import CostCalculator
+from app.services.budget_ledger import (
+    BudgetLedger,
+    BudgetReservation,
+    LedgerBudget,
+    MemoryLedgerStore,
+)
+
+
+# Fixed so every budget built by a test shares the same period
+NOW = datetime.utcnow()
+
+
+def make_budget(budget_id, limit=1000, usage=0, warning=None, hard=True):
+    return Budget(
+        id=budget_id,
+        name=f"Budget {budget_id}",
+        user_id=1,
+        limit_cents=limit,
+        warning_threshold_cents=warning,
+        current_usage_cents=usage,
+        period_type="monthly",
+        period_start=NOW - timedelta(days=1),
+        period_end=NOW + timedelta(days=29),
+        is_active=True,
+        enforce_hard_limit=hard,
+        auto_renew=True,
+    )
+
+
+def handle(budget_ids=(1,), amount=0, ttl=60):
+    return BudgetReservation(list(budget_ids), amount, ttl)
+
+
+class TestMemoryLedgerStore:
+    """Test reservation, seeding and pending deltas."""
+
+    @pytest.mark.asyncio
+    async def test_reserve_charges_all_budgets(self):
+        store = MemoryLedgerStore()
+        budgets = [
+            LedgerBudget(1, limit_cents=100, usage_cents=10, period="p1"),
+            LedgerBudget(2, limit_cents=500, usage_cents=0, period="p1"),
+        ]
+
+        result = await store.reserve(budgets, 30, handle())
+
+        assert result.allowed
+        assert result.usages == {1: 40, 2: 30}
+        assert await store.take_pending() == {1: 30, 2: 30}
+        assert await store.take_pending() == {}
+
+    @pytest.mark.asyncio
+    async def test_hard_limit_rejects_without_charging_any_budget(self):
+        store = MemoryLedgerStore()
+        budgets = [
+            LedgerBudget(1, limit_cents=1000, usage_cents=0, period="p1"),
+            LedgerBudget(2, limit_cents=50, usage_cents=40, period="p1"),
+        ]
+
+        result = await store.reserve(budgets, 20, handle())
+
+        assert not result.allowed
+        assert result.blocked_budget_id == 2
+        assert await store.take_pending() == {}
+
+    @pytest.mark.asyncio
+    async def test_soft_limit_allows_overspend(self):
+        store = MemoryLedgerStore()
+        budget = LedgerBudget(1, 50, 40, "p1", hard_limit=False)
+
+        result = await store.reserve([budget], 20, handle())
+
+        assert result.allowed
+        assert result.usages[1] == 60
+
+    @pytest.mark.asyncio
+    async def test_counter_ignores_stale_database_usage(self):
+        store = MemoryLedgerStore()
+        await store.reserve([LedgerBudget(1, 100, 0, "p1")], 60, handle())
+
+        # The row has not been flushed yet, so it still shows 0 usage
+        result = await store.reserve([LedgerBudget(1, 100, 0, "p1")], 60, handle())
+
+        assert not result.allowed
+        assert result.usages[1] == 60
+
+    @pytest.mark.asyncio
+    async def test_period_change_reseeds_from_database(self):
+        store = MemoryLedgerStore()
+        await store.reserve([LedgerBudget(1, 100, 0, "p1")], 90, handle())
+
+        result = await store.reserve([LedgerBudget(1, 100, 0, "p2")], 90, handle())
+
+        assert result.allowed
+        assert result.usages[1] == 90
+
+    @pytest.mark.asyncio
+    async def test_restore_pending(self):
+        store = MemoryLedgerStore()
+        await store.reserve([LedgerBudget(1, 100, 0, "p1")], 10, handle())
+        deltas = await store.take_pending()
+
+        await store.restore_pending(deltas)
+
+        assert await store.take_pending() == {1: 10}
+
+
+class TestBudgetLedgerFlush:
+    """Test batched reconciliation to the database."""
+
+    @pytest.mark.asyncio
+    async def test_flush_applies_deltas_in_one_batch(self):
+        ledger = BudgetLedger(backend="memory")
+        await ledger.reserve([make_budget(1), make_budget(2)], 25)
+
+        with patch.object(ledger, "_apply_deltas", AsyncMock()) as apply:
+            assert await ledger.flush() == 2
+
+        apply.assert_awaited_once_with({1: 25, 2: 25})
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_deltas(self):
+        ledger = BudgetLedger(backend="memory")
+        await ledger.reserve([make_budget(1)], 25)
+
+        failing = AsyncMock(side_effect=RuntimeError("database down"))
+        with patch.object(ledger, "_apply_deltas", failing):
+            assert await ledger.flush() == 0
+
+        with patch.object(ledger, "_apply_deltas", AsyncMock()) as apply:
+            await ledger.flush()
+        apply.assert_awaited_once_with({1: 25})
+        assert ledger.stats["flush_errors"] == 1
+
+    def test_database_backend_is_inactive(self):
+        assert not BudgetLedger(backend="database").active
+
+
+class TestReservationHandles:
+    """Test settling, releasing and sweeping reservations."""
+
+    @pytest.mark.asyncio
+    async def test_settle_charges_actual_cost(self):
+        ledger = BudgetLedger(backend="memory")
+        result = await ledger.reserve([make_budget(1), make_budget(2)], 100)
+
+        assert await ledger.settle(result.reservation, 40)
+
+        assert await ledger._memory_store.take_pending() == {1: 40, 2: 40}
+        usage = await ledger.reserve([make_budget(1)], 0)
+        assert usage.usages[1] == 40
+
+    @pytest.mark.asyncio
+    async def test_settle_is_idempotent(self):
+        ledger = BudgetLedger(backend="memory")
+        result = await ledger.reserve([make_budget(1)], 100)
+
+        assert await ledger.settle(result.reservation, 40)
+        assert not await ledger.settle(result.reservation, 40)
+        assert not await ledger.release(result.reservation)
+
+        assert await ledger._memory_store.take_pending() == {1: 40}
+
+    @pytest.mark.asyncio
+    async def test_release_refunds_estimate(self):
+        ledger = BudgetLedger(backend="memory")
+        result = await ledger.reserve([make_budget(1)], 100)
+
+        assert await ledger.release(result.reservation)
+
+        assert await ledger._memory_store.take_pending() == {}
+        assert ledger.stats["released"] == 1
+
+    @pytest.mark.asyncio
+    async def test_sweeper_releases_expired_reservations(self):
+        ledger = BudgetLedger(backend="memory", reservation_ttl=-1)
+        expired = await ledger.reserve([make_budget(1)], 100)
+        ledger.reservation_ttl = 60
+        live = await ledger.reserve([make_budget(1)], 30)
+
+        assert await ledger.sweep() == 1
+
+        assert not await ledger.settle(expired.reservation, 100)
+        assert await ledger.settle(live.reservation, 30)
+        assert await ledger._memory_store.take_pending() == {1: 30}
+
+    @pytest.mark.asyncio
+    async def test_tracked_database_reservation_settles_through_flush(self):
+        ledger = BudgetLedger(backend="database")
+        reservation = ledger.track([1, 2], 100)
+
+        assert await ledger.settle(reservation, 130)
+
+        with patch.object(ledger, "_apply_deltas", AsyncMock()) as apply:
+            assert await ledger.flush() == 2
+        apply.assert_awaited_once_with({1: 30, 2: 30})
+
+
+class TestLedgerReservation:
+    """Test the budget service's ledger path."""
+
+    @pytest.fixture
+    def ledger(self):
+        ledger = BudgetLedger(backend="memory")
+        with patch.object(async_budget_enforcement, "budget_ledger", ledger):
+            yield ledger
+
+    @pytest.fixture
+    def api_key(self):
+        return APIKey(id=1, user_id=1, name="Test API Key")
+
+    def service(self, budgets):
+        service = AsyncBudgetEnforcementService(db=AsyncMock())
+        service._get_applicable_budgets = AsyncMock(return_value=budgets)
+        return service
+
+    @pytest.mark.asyncio
+    async def test_reserves_without_database_writes(self, ledger, api_key):
+        service = self.service([make_budget(1), make_budget(2)])
+
+        (
+            allowed,
+            error,
+            warnings,
+            budget_ids,
+        ) = await service.atomic_check_and_reserve_budget(
+            api_key, "gpt-4", 0, estimated_cost_cents=100
+        )
+
+        assert allowed and error is None
+        assert budget_ids == [1, 2]
+        service.db.execute.assert_not_awaited()
+        service.db.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_rejects_over_hard_limit(self, ledger, api_key):
+        service = self.service([make_budget(1, limit=150, usage=100)])
+
+        allowed, error, _, budget_ids = await service.atomic_check_and_reserve_budget(
+            api_key, "gpt-4", 0, estimated_cost_cents=100
+        )
+
+        assert not allowed
+        assert "Budget 1" in error
+        assert budget_ids == []
+
+    @pytest.mark.asyncio
+    async def test_warns_once_when_threshold_is_crossed(self, ledger, api_key):
+        service = self.service([make_budget(1, limit=1000, warning=150)])
+
+        results = [
+            await service.atomic_check_and_reserve_budget(
+                api_key, "gpt-4", 0, estimated_cost_cents=100
+            )
+            for _ in range(3)
+        ]
+
+        assert [len(result[2]) for result in results] == [0, 1, 0]
+        assert results[1][2][0]["current_usage_cents"] == 200
+
+    @pytest.mark.asyncio
+    async def test_finalize_settles_without_row_locks(self, ledger, api_key):
+        service = self.service([make_budget(1)])
+        *_, reservation = await service.atomic_check_and_reserve_budget(
+            api_key, "gpt-4", 0, estimated_cost_cents=500
+        )
+
+        await service.atomic_finalize_usage(reservation, api_key, "gpt-4", 1000, 1000)
+
+        actual = CostCalculator.calculate_cost_cents("gpt-4", 1000, 1000)
+        assert await ledger._memory_store.take_pending() == {1: actual}
+        service.db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_release_after_failed_request(self, ledger, api_key):
+        service = self.service([make_budget(1)])
+        *_, reservation = await service.atomic_check_and_reserve_budget(
+            api_key, "gpt-4", 0, estimated_cost_cents=500
+        )
+
+        assert await service.release_reservation(reservation)
+
+        assert await ledger._memory_store.take_pending() == {}
+
+    @pytest.mark.asyncio
+    async def test_recorded_usage_counts_against_reservations(self, ledger, api_key):
+        service = self.service([make_budget(1, limit=1000)])
+
+        with patch.object(CostCalculator, "calculate_cost_cents", return_value=900):
+            charged = await service.record_usage(api_key, "gpt-4", 1000, 0)
+        allowed, *_ = await service.atomic_check_and_reserve_budget(
+            api_key, "gpt-4", 0, estimated_cost_cents=200
+        )
+
+        assert [budget.id for budget in charged] == [1]
+        assert not allowed
+        assert await ledger._memory_store.take_pending() == {1: 900}
+        service.db.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_settle_at_estimate_keeps_the_charge(self, ledger, api_key):
+        service = self.service([make_budget(1)])
+        *_, reservation = await service.atomic_check_and_reserve_budget(
+            api_key, "gpt-4", 0, estimated_cost_cents=500
+        )
+
+        assert await service.settle_reservation_at_estimate(reservation)
+        assert not await service.release_reservation(reservation)
+
+        assert await ledger._memory_store.take_pending() == {1: 500}
+
+
+class TestResponsesReservation:
+    """Test that the Responses API always settles its reservation."""
+
+    @pytest.mark.asyncio
+    async def test_failed_finalize_charges_the_estimate(self):
+        from types import SimpleNamespace
+
+        from app.schemas.responses import ResponseCreateRequest
+        from app.services.responses.responses_service import ResponsesService
+
+        service = ResponsesService(db=AsyncMock())
+        budget_service = AsyncMock()
+        reservation = handle(amount=500)
+        budget_service.atomic_check_and_reserve_budget.return_value = (
+            True,
+            None,
+            [],
+            reservation,
+        )
+        budget_service.atomic_finalize_usage.side_effect = RuntimeError("db down")
+        service.budget_service = budget_service
+        message = SimpleNamespace(role="assistant", content="hi", tool_calls=None)
+        service.tool_calling_service = SimpleNamespace(
+            create_chat_completion_with_tools=AsyncMock(
+                return_value=SimpleNamespace(
+                    usage=None, choices=[SimpleNamespace(message=message)]
+                )
+            )
+        )
+
+        response = await service.create_response(
+            ResponseCreateRequest(model="gpt-4", input="hello", store=False),
+            {"api_key": APIKey(id=1, user_id=1), "user": SimpleNamespace(id=1)},
+        )
+
+        assert response.status == "failed"
+        budget_service.settle_reservation_at_estimate.assert_awaited_once_with(
+            reservation
+        )
+        budget_service.release_reservation.assert_not_awaited()
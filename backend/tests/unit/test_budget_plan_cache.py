@@ -0,0 +1,179 @@
+"""
+Test the cached per-API-key budget plans.
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.api_key import APIKey
+from app.models.budget import Budget
+from app.services import async_budget_enforcement
+from app.services.async_budget_enforcement import AsyncBudgetEnforcementService
+from app.services.budget_plan_cache import BudgetPlan, BudgetPlanCache
+
+
+NOW = datetime.utcnow()
+
+
+def make_budget(budget_id, models=None, endpoints=None):
+    return Budget(
+        id=budget_id,
+        name=f"Budget {budget_id}",
+        user_id=1,
+        limit_cents=1000,
+        current_usage_cents=0,
+        period_type="monthly",
+        period_start=NOW - timedelta(days=1),
+        period_end=NOW + timedelta(days=29),
+        is_active=True,
+        enforce_hard_limit=True,
+        auto_renew=True,
+        allowed_models=models,
+        allowed_endpoints=endpoints,
+    )
+
+
+class TestBudgetPlan:
+    """Test model and endpoint indexing."""
+
+    @pytest.fixture
+    def plan(self):
+        return BudgetPlan(
+            [
+                make_budget(1),
+                make_budget(2, models=["gpt-4"]),
+                make_budget(3, endpoints=["chat/completions"]),
+                make_budget(4, models=["gpt-4", "claude"], endpoints=["embeddings"]),
+            ]
+        )
+
+    @staticmethod
+    def ids(budgets):
+        return [budget.id for budget in budgets]
+
+    def test_unrestricted_lookup_returns_all_budgets(self, plan):
+        assert self.ids(plan.applicable()) == [1, 2, 3, 4]
+
+    def test_filters_by_model(self, plan):
+        assert self.ids(plan.applicable("gpt-4")) == [1, 2, 3, 4]
+        assert self.ids(plan.applicable("mistral")) == [1, 3]
+
+    def test_filters_by_model_and_endpoint(self, plan):
+        assert self.ids(plan.applicable("gpt-4", "chat/completions")) == [1, 2, 3]
+        assert self.ids(plan.applicable("claude", "embeddings")) == [1, 4]
+
+    def test_round_trips_through_dict(self, plan):
+        restored = BudgetPlan.from_dict(plan.to_dict())
+
+        assert self.ids(restored.applicable("gpt-4", "embeddings")) == [1, 2, 4]
+        assert restored.budgets[0].period_end == NOW + timedelta(days=29)
+
+
+class TestBudgetPlanCache:
+    """Test lookups and per-user invalidation."""
+
+    @pytest.mark.asyncio
+    async def test_hit_after_set(self):
+        cache = BudgetPlanCache(use_redis=False)
+        plan = BudgetPlan([make_budget(1)])
+
+        assert await cache.get(1, 10) is None
+        await cache.set(1, 10, plan)
+
+        assert await cache.get(1, 10) is plan
+        assert cache.get_stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate_user_drops_all_keys_of_user(self):
+        cache = BudgetPlanCache(use_redis=False)
+        for user_id, key_id in [(1, 10), (1, 11), (2, 20)]:
+            await cache.set(user_id, key_id, BudgetPlan([]))
+
+        await cache.invalidate_user(1)
+
+        assert await cache.get(1, 10) is None
+        assert await cache.get(1, 11) is None
+        assert await cache.get(2, 20) is not None
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self):
+        cache = BudgetPlanCache(max_entries=2, use_redis=False)
+        await cache.set(1, 10, BudgetPlan([]))
+        await cache.set(1, 11, BudgetPlan([]))
+        await cache.get(1, 10)
+        await cache.set(1, 12, BudgetPlan([]))
+
+        assert await cache.get(1, 11) is None
+        assert await cache.get(1, 10) is not None
+
+    @pytest.mark.asyncio
+    async def test_plan_from_invalidated_generation_is_not_stored(self):
+        cache = BudgetPlanCache(use_redis=False)
+        plan, generation = await cache.lookup(1, 10)
+        assert plan is None
+
+        # Budgets change while the plan is being loaded
+        await cache.invalidate_user(1)
+        await cache.set(1, 10, BudgetPlan([make_budget(1)]), generation)
+
+        assert await cache.get(1, 10) is None
+
+    @pytest.mark.asyncio
+    async def test_shared_plan_with_stale_generation_is_ignored(self):
+        cache = BudgetPlanCache(use_redis=True)
+        stale = {"generation": 1, **BudgetPlan([make_budget(1)]).to_dict()}
+        fake_cache = MagicMock(enabled=True)
+        fake_cache.get_many = AsyncMock(return_value=["2", stale])
+
+        with patch("app.services.budget_plan_cache.core_cache", fake_cache):
+            assert await cache.get(1, 10) is None
+
+            stale["generation"] = 2
+            plan = await cache.get(1, 10)
+
+        assert [budget.id for budget in plan.budgets] == [1]
+        assert cache.stats["redis_hits"] == 1
+
+
+class TestApplicableBudgets:
+    """Test the enforcement service's use of cached plans."""
+
+    @pytest.fixture
+    def cache(self):
+        cache = BudgetPlanCache(use_redis=False)
+        with patch.object(async_budget_enforcement, "budget_plan_cache", cache):
+            yield cache
+
+    @pytest.mark.asyncio
+    async def test_cached_plan_needs_no_query(self, cache):
+        api_key = APIKey(id=10, user_id=1, name="Test API Key")
+        service = AsyncBudgetEnforcementService(db=AsyncMock())
+        service._query_applicable_budgets = AsyncMock(
+            return_value=[make_budget(1), make_budget(2, models=["gpt-4"])]
+        )
+
+        first = await service._get_applicable_budgets(api_key, "mistral")
+        second = await service._get_applicable_budgets(api_key, "gpt-4")
+
+        assert [budget.id for budget in first] == [1]
+        assert [budget.id for budget in second] == [1, 2]
+        service._query_applicable_budgets.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_budget_change_during_query_is_not_cached(self, cache):
+        api_key = APIKey(id=10, user_id=1, name="Test API Key")
+        service = AsyncBudgetEnforcementService(db=AsyncMock())
+
+        async def query_then_invalidate(_):
+            await cache.invalidate_user(1)
+            return [make_budget(1)]
+
+        service._query_applicable_budgets = AsyncMock(
+            side_effect=query_then_invalidate
+        )
+
+        await service._get_applicable_budgets(api_key)
+        await service._get_applicable_budgets(api_key)
+
+        assert service._query_applicable_budgets.await_count == 2
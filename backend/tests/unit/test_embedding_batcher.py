@@ -0,0 +1,90 @@
+"""
+Test the embedding request coalescer.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    """Encoder that records batch sizes and returns one row per text."""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model exploded")
+        return np.array([[float(len(text))] for text in texts])
+
+
+class TestEmbeddingBatcher:
+    """Test batching, fan-out and error propagation."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_a_batch(self):
+        encoder = RecordingEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch_size=16, max_wait_ms=20)
+
+        results = await asyncio.gather(
+            batcher.encode(["a"]),
+            batcher.encode(["bb", "ccc"]),
+            batcher.encode(["dddd"]),
+        )
+
+        assert encoder.batches == [["a", "bb", "ccc", "dddd"]]
+        assert [r[:, 0].tolist() for r in results] == [[1.0], [2.0, 3.0], [4.0]]
+        stats = batcher.get_stats()
+        assert stats["batches"] == 1
+        assert stats["average_batch_size"] == 4
+        await batcher.close()
+
+    @pytest.mark.asyncio
+    async def test_batches_are_capped(self):
+        encoder = RecordingEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch_size=2, max_wait_ms=20)
+
+        await asyncio.gather(*(batcher.encode([str(i)]) for i in range(5)))
+
+        assert all(len(batch) <= 2 for batch in encoder.batches)
+        assert sum(len(batch) for batch in encoder.batches) == 5
+        await batcher.close()
+
+    @pytest.mark.asyncio
+    async def test_large_requests_bypass_the_queue(self):
+        encoder = RecordingEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch_size=2, max_wait_ms=1000)
+
+        result = await asyncio.wait_for(batcher.encode(["a", "b", "c"]), timeout=1)
+
+        assert result.shape == (3, 1)
+        assert encoder.batches == [["a", "b", "c"]]
+        await batcher.close()
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_caller(self):
+        batcher = EmbeddingBatcher(RecordingEncoder(fail=True), max_wait_ms=5)
+
+        results = await asyncio.gather(
+            batcher.encode(["a"]), batcher.encode(["b"]), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        await batcher.close()
+
+    @pytest.mark.asyncio
+    async def test_supplied_executor_is_left_running(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        batcher = EmbeddingBatcher(RecordingEncoder(), executor=executor)
+
+        await batcher.encode(["a"])
+        await batcher.close()
+
+        assert executor.submit(lambda: 42).result() == 42
+        executor.shutdown()
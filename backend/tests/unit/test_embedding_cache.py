@@ -0,0 +1,219 @@
+"""
+Test the two-tier embedding cache and its use by EmbeddingService.
+"""
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from app.services import embedding_cache as embedding_cache_module
+from app.services.embedding_cache import EmbeddingCache, normalize_text
+from app.services.embedding_service import EmbeddingService
+
+
+class CountingModel:
+    """Minimal encoder that records what it was asked to embed."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True):
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), 1.0, 0.5] for text in texts])
+
+
+class FakeCoreCache:
+    """In-memory stand-in for the Redis-backed core cache."""
+
+    enabled = True
+
+    def __init__(self):
+        self.data = {}
+
+    async def get_many(self, keys, prefix="core"):
+        return [self.data.get(f"{prefix}:{key}") for key in keys]
+
+    async def set(self, key, value, ttl=None, prefix="core"):
+        self.data[f"{prefix}:{key}"] = value
+        return True
+
+
+@pytest_asyncio.fixture
+async def service():
+    service = EmbeddingService(model_name="test-model")
+    service.cache = EmbeddingCache(max_entries=8, use_redis=False)
+    service.local_model = CountingModel()
+    service.backend = "sentence_transformer"
+    yield service
+    await service.cleanup()
+
+
+class TestEmbeddingCache:
+    """Test keys and the shared tier."""
+
+    def test_normalization_collapses_whitespace(self):
+        assert normalize_text("  how do   I\nreset? ") == "how do I reset?"
+        assert EmbeddingCache.make_key("m", "a  b") == EmbeddingCache.make_key(
+            "m", "a b"
+        )
+
+    def test_key_depends_on_model(self):
+        assert EmbeddingCache.make_key("m1", "text") != EmbeddingCache.make_key(
+            "m2", "text"
+        )
+
+    def test_service_key_depends_on_backend_and_quantization(self, monkeypatch):
+        from app.services.embedding_service import EmbeddingService, settings
+
+        service = EmbeddingService("m")
+        keys = set()
+        for backend, quantized in (
+            ("sentence_transformer", False),
+            ("onnx", False),
+            ("onnx", True),
+        ):
+            monkeypatch.setattr(
+                settings, "RAG_EMBEDDING_BACKEND", backend, raising=False
+            )
+            monkeypatch.setattr(
+                settings, "RAG_EMBEDDING_ONNX_QUANTIZED", quantized, raising=False
+            )
+            keys.add(EmbeddingCache.make_key(service._cache_model_key(), "text"))
+        assert len(keys) == 3
+
+    def test_rejects_unknown_dtype(self):
+        with pytest.raises(ValueError):
+            EmbeddingCache(dtype="int8")
+
+    @pytest.mark.asyncio
+    async def test_shared_tier_round_trips_float16(self, monkeypatch):
+        monkeypatch.setattr(embedding_cache_module, "core_cache", FakeCoreCache())
+        writer = EmbeddingCache()
+        reader = EmbeddingCache()
+
+        await writer.set_many("m", ["query"], [[0.25, -0.5, 1.0]])
+        vectors = await reader.get_many("m", ["query", "other"])
+
+        assert vectors[0].dtype == np.float32
+        assert vectors[0].tolist() == [0.25, -0.5, 1.0]
+        assert vectors[1] is None
+        stats = reader.get_stats()
+        assert stats["redis_hits"] == 1
+        assert stats["misses"] == 1
+
+
+class TestEmbeddingServiceCaching:
+    """Test that cached texts skip the forward pass."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_query_skips_encode(self, service):
+        first = await service.get_embedding("query: reset device")
+        second = await service.get_embedding("query:  reset device ")
+        assert first == second
+        assert len(service.local_model.calls) == 1
+        assert service.cache.get_stats()["hit_rate"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_only_misses_are_encoded(self, service):
+        await service.get_embeddings(["alpha"])
+        result = await service.get_embeddings(["alpha", "beta", "gamma"])
+        assert service.local_model.calls[-1] == ["beta", "gamma"]
+        assert [vector[0] for vector in result] == [5.0, 4.0, 5.0]
+
+    @pytest.mark.asyncio
+    async def test_use_cache_false_bypasses_cache(self, service):
+        await service.get_embeddings(["passage: text"], use_cache=False)
+        await service.get_embeddings(["passage: text"], use_cache=False)
+        assert len(service.local_model.calls) == 2
+        assert service.cache.get_stats()["size"] == 0
+
+
+class FakeProcessPool:
+    """Records restarts of the worker pool."""
+
+    workers = 1
+
+    def __init__(self):
+        self.starts = 0
+        self.shutdowns = 0
+
+    def start(self):
+        self.starts += 1
+        return f"executor-{self.starts}"
+
+    def shutdown(self):
+        self.shutdowns += 1
+
+
+class FakeBatcher:
+    """Batcher whose pool is either healthy or broken."""
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.closed = False
+
+    async def encode(self, texts):
+        if self.broken:
+            raise BrokenProcessPool("worker died")
+        return np.array([[1.0, 0.0, 0.0] for _ in texts])
+
+    async def close(self):
+        self.closed = True
+
+
+class TestEmbeddingServiceFailures:
+    """Test recovery from dead workers and the random-vector fallback."""
+
+    @pytest_asyncio.fixture
+    async def pooled(self):
+        service = EmbeddingService(model_name="test-model")
+        service.cache = EmbeddingCache(max_entries=8, use_redis=False)
+        service.process_pool = FakeProcessPool()
+        service.batcher = FakeBatcher(broken=True)
+        yield service
+        service.process_pool = None
+        service.batcher = None
+
+    @pytest.mark.asyncio
+    async def test_broken_pool_is_restarted_and_retried(self, pooled, monkeypatch):
+        broken = pooled.batcher
+        executors = []
+
+        def create_batcher(executor):
+            executors.append(executor)
+            return FakeBatcher()
+
+        monkeypatch.setattr(pooled, "_create_process_batcher", create_batcher)
+
+        result = await pooled.get_embeddings(["passage: text"], allow_fallback=False)
+
+        assert result == [[1.0, 0.0, 0.0]]
+        assert pooled.process_pool.shutdowns == 1
+        assert executors == ["executor-1"]
+        assert broken.closed
+
+    @pytest.mark.asyncio
+    async def test_pool_broken_again_raises_without_fallback(
+        self, pooled, monkeypatch
+    ):
+        monkeypatch.setattr(
+            pooled, "_create_process_batcher", lambda executor: FakeBatcher(True)
+        )
+
+        with pytest.raises(BrokenProcessPool):
+            await pooled.get_embeddings(["passage: text"], allow_fallback=False)
+        assert pooled.process_pool.starts == 1
+
+    @pytest.mark.asyncio
+    async def test_fallback_vectors_only_when_allowed(self, service):
+        def fail(*args, **kwargs):
+            raise RuntimeError("model crashed")
+
+        service.local_model.encode = fail
+
+        with pytest.raises(RuntimeError):
+            await service.get_embeddings(["passage: text"], allow_fallback=False)
+        vectors = await service.get_embeddings(["query: text"])
+        assert service.backend == "fallback_random"
+        assert len(vectors[0]) == service.dimension
@@ -0,0 +1,226 @@
+"""
+Test SSE streaming of chat completions.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1 import llm as llm_api
+from app.services.llm.exceptions import ProviderError
+from app.services.llm.models import ChatMessage, ChatRequest
+
+
+def make_request():
+    return ChatRequest(
+        model="test-model",
+        messages=[ChatMessage(role="user", content="hello there")],
+        stream=True,
+        user_id="1",
+        api_key_id=1,
+    )
+
+
+def content_chunk(text):
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion.chunk",
+        "created": 1,
+        "model": "test-model",
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }
+
+
+class FakeLLMService:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.closed = False
+
+    async def create_chat_completion_stream(self, request):
+        try:
+            for i, chunk in enumerate(self.chunks):
+                if self.fail_after is not None and i == self.fail_after:
+                    raise RuntimeError("provider dropped the connection")
+                yield chunk
+        finally:
+            self.closed = True
+
+
+async def collect(response):
+    events = []
+    async for event in response.body_iterator:
+        assert event.startswith("data: ") and event.endswith("\n\n")
+        data = event[len("data: ") : -2]
+        events.append(data if data == "[DONE]" else json.loads(data))
+    return events
+
+
+class TestChatCompletionStreaming:
+    """Test event framing, usage reporting and budget finalization."""
+
+    @pytest.mark.asyncio
+    async def test_streams_chunks_usage_and_done(self):
+        usage = {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+        service = FakeLLMService(
+            [
+                content_chunk("Hi"),
+                content_chunk(" you"),
+                {**content_chunk(""), "choices": [], "usage": usage},
+            ]
+        )
+        finalize = AsyncMock(return_value=1)
+
+        with patch.object(llm_api, "llm_service", service), patch.object(
+            llm_api, "_finalize_chat_usage", finalize
+        ):
+            response = await llm_api._stream_chat_completion(
+                make_request(), {}, None, None, [7], [], 3
+            )
+            events = await collect(response)
+
+        assert response.media_type == "text/event-stream"
+        assert [e["choices"][0]["delta"]["content"] for e in events[:2]] == [
+            "Hi",
+            " you",
+        ]
+        assert events[2]["choices"] == []
+        assert events[2]["usage"] == usage
+        assert events[3] == "[DONE]"
+        assert service.closed
+        finalize.assert_awaited_once()
+        assert finalize.await_args.args[4:] == ([7], 3, 2, 5)
+
+    @pytest.mark.asyncio
+    async def test_mid_stream_failure_emits_error_and_finalizes(self):
+        service = FakeLLMService(
+            [content_chunk("one two"), content_chunk("three")], fail_after=1
+        )
+        finalize = AsyncMock(return_value=0)
+
+        with patch.object(llm_api, "llm_service", service), patch.object(
+            llm_api, "_finalize_chat_usage", finalize
+        ):
+            response = await llm_api._stream_chat_completion(
+                make_request(), {}, None, None, [], [], 4
+            )
+            events = await collect(response)
+
+        assert "error" in events[-1]
+        finalize.assert_awaited_once()
+        # Estimated from the text relayed before the failure
+        assert finalize.await_args.args[5:7] == (4, 2)
+
+    @pytest.mark.asyncio
+    async def test_disconnect_before_iteration_still_finalizes(self):
+        service = FakeLLMService([content_chunk("a"), content_chunk("b")])
+        finalize = AsyncMock(return_value=0)
+
+        with patch.object(llm_api, "llm_service", service), patch.object(
+            llm_api, "_finalize_chat_usage", finalize
+        ):
+            response = await llm_api._stream_chat_completion(
+                make_request(), {}, None, None, [7], [], 3
+            )
+            # Starlette runs the background task even if the body was never read
+            await response.background()
+
+        assert service.closed
+        finalize.assert_awaited_once()
+        assert finalize.await_args.args[4:6] == ([7], 3)
+
+    @pytest.mark.asyncio
+    async def test_completed_stream_is_finalized_once(self):
+        service = FakeLLMService([content_chunk("a")])
+        finalize = AsyncMock(return_value=0)
+
+        with patch.object(llm_api, "llm_service", service), patch.object(
+            llm_api, "_finalize_chat_usage", finalize
+        ):
+            response = await llm_api._stream_chat_completion(
+                make_request(), {}, None, None, [], [], 1
+            )
+            await collect(response)
+            await response.background()
+
+        finalize.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_provider_error_before_first_chunk_is_raised(self):
+        service = FakeLLMService([content_chunk("x")], fail_after=0)
+
+        with patch.object(llm_api, "llm_service", service):
+            with pytest.raises(RuntimeError):
+                await llm_api._stream_chat_completion(
+                    make_request(), {}, None, None, [], [], 1
+                )
+
+
+class TestChatCompletionReservation:
+    """Test that a non-streamed completion always settles its reservation."""
+
+    async def complete(self, provider, finalize):
+        auth_service = MagicMock()
+        auth_service.check_scope_permission = AsyncMock(return_value=True)
+        auth_service.check_model_permission = AsyncMock(return_value=True)
+        settle, release = AsyncMock(), AsyncMock()
+
+        with patch.object(
+            llm_api, "APIKeyAuthService", return_value=auth_service
+        ), patch.object(
+            llm_api,
+            "async_atomic_check_and_reserve_budget",
+            AsyncMock(return_value=(True, None, [], [7])),
+        ), patch.object(
+            llm_api, "llm_service", SimpleNamespace(create_chat_completion=provider)
+        ), patch.object(
+            llm_api, "_finalize_chat_usage", finalize
+        ), patch.object(
+            llm_api, "async_settle_budget_reservation", settle
+        ), patch.object(
+            llm_api, "async_release_budget_reservation", release
+        ):
+            with pytest.raises(HTTPException):
+                await llm_api.create_chat_completion(
+                    None,
+                    llm_api.ChatCompletionRequest(
+                        model="test-model",
+                        messages=[{"role": "user", "content": "hello"}],
+                    ),
+                    {"auth_type": "api_key", "api_key": object()},
+                    None,
+                )
+        return settle, release
+
+    @pytest.mark.asyncio
+    async def test_failed_finalize_charges_the_estimate(self):
+        llm_response = SimpleNamespace(
+            id="chatcmpl-1",
+            object="chat.completion",
+            created=1,
+            model="test-model",
+            choices=[],
+            usage=None,
+        )
+
+        settle, release = await self.complete(
+            AsyncMock(return_value=llm_response),
+            AsyncMock(side_effect=RuntimeError("database unavailable")),
+        )
+
+        settle.assert_awaited_once_with(None, [7])
+        release.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_provider_failure_refunds_the_estimate(self):
+        finalize = AsyncMock()
+
+        settle, release = await self.complete(
+            AsyncMock(side_effect=ProviderError("upstream down", "test")), finalize
+        )
+
+        release.assert_awaited_once_with(None, [7])
+        settle.assert_not_awaited()
+        finalize.assert_not_awaited()
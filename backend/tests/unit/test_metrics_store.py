@@ -0,0 +1,147 @@
+"""
+Test the fixed-memory metrics store and the LLM metrics collector on top of it.
+"""
+import numpy as np
+import pytest
+
+from app.services import metrics
+from app.services.llm.metrics import MetricsCollector
+from app.services.metrics_store import (
+    OVERFLOW_LABEL,
+    HistogramLayout,
+    MetricsStore,
+)
+
+
+class TestHistogramLayout:
+    """Test bucket indexing and percentile precision."""
+
+    def test_percentiles_within_precision(self):
+        layout = HistogramLayout(precision=0.05)
+        values = np.linspace(1, 1000, 1000)
+        counts = np.zeros(layout.size, dtype=np.int64)
+        for value in values:
+            counts[layout.index(value)] += 1
+
+        for percentile in (50, 95, 99):
+            expected = np.percentile(values, percentile)
+            assert layout.percentile(counts, percentile) == pytest.approx(
+                expected, rel=0.06
+            )
+
+    def test_out_of_range_values(self):
+        layout = HistogramLayout(min_value=1, max_value=100)
+        assert layout.index(0.5) == 0
+        assert layout.index(1e9) == layout.size - 1
+
+
+class TestMetricsStore:
+    """Test ring buckets, windows and bounded label sets."""
+
+    def test_window_and_lifetime_totals(self):
+        store = MetricsStore(("requests",), bucket_seconds=60, num_buckets=5)
+        store.record(("a",), requests=1, now=0)
+        store.record(("a",), requests=2, now=400)
+
+        assert store.summary(now=400)["requests"] == 3
+        assert store.summary(120, now=400)["requests"] == 2
+
+    def test_ring_slots_are_recycled(self):
+        store = MetricsStore(("requests",), bucket_seconds=60, num_buckets=5)
+        store.record(("a",), requests=1, now=0)
+        # Same slot five buckets later
+        store.record(("a",), requests=1, now=300)
+
+        assert store.summary(300, now=300)["requests"] == 1
+        assert store.summary(now=300)["requests"] == 2
+
+    def test_memory_is_preallocated(self):
+        store = MetricsStore(
+            ("requests",), num_buckets=10, histogram=HistogramLayout()
+        )
+        store.record(("a",), latency=5.0, requests=1, now=0)
+        series = store._series[("a",)]
+        before = series.hist.nbytes + series.sums.nbytes
+
+        for i in range(10000):
+            store.record(("a",), latency=float(i % 500 + 1), requests=1, now=i * 0.1)
+
+        assert series.hist.nbytes + series.sums.nbytes == before
+
+    def test_percentile_and_grouping(self):
+        store = MetricsStore(("requests",), histogram=HistogramLayout())
+        for latency in range(1, 101):
+            store.record(("p1", "m1"), latency=float(latency), requests=1, now=0)
+        store.record(("p2", "m1"), latency=500.0, requests=1, now=0)
+
+        groups = store.aggregate(60, group_by=lambda labels: labels[0], now=0)
+        assert groups["p1"]["requests"] == 100
+        assert groups["p1"].percentile(50) == pytest.approx(50, rel=0.06)
+        assert groups["p1"].max == 100
+        assert groups["p2"].percentile(99) == 500
+
+    def test_label_sets_are_bounded(self):
+        store = MetricsStore(("requests",), max_series=2)
+        for name in ("a", "b", "c", "d"):
+            store.record((name,), requests=1, now=0)
+
+        assert set(store.labels()) == {("a",), ("b",), (OVERFLOW_LABEL,)}
+        assert store.summary(now=0)["requests"] == 4
+
+
+class TestMetricsHistory:
+    """Test per-minute history of the metrics service."""
+
+    def test_history_past_max_series(self, monkeypatch):
+        monkeypatch.setattr(metrics, "HISTORY_MAX_SERIES", 2)
+        service = metrics.MetricsService()
+        for user_id in ("1", "2", "3", "4"):
+            service._store_metric("requests_by_user", 1, {"user_id": user_id})
+
+        history = service.get_metrics_history("requests_by_user")
+
+        labels = [point["labels"] for point in history]
+        assert len(labels) == 3
+        assert {"user_id": "1"} in labels and {"user_id": "2"} in labels
+        assert {OVERFLOW_LABEL: OVERFLOW_LABEL} in labels
+        assert sum(point["count"] for point in history) == 4
+
+
+class TestMetricsCollector:
+    """Test LLM request aggregation."""
+
+    def test_metrics_and_errors(self):
+        collector = MetricsCollector()
+        collector.record_request(
+            "privatemode",
+            "model-a",
+            "chat",
+            True,
+            100.0,
+            token_usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        )
+        collector.record_request(
+            "privatemode", "model-a", "chat", False, 300.0, error_code="TIMEOUT"
+        )
+
+        metrics = collector.get_metrics()
+        assert metrics.total_requests == 2
+        assert metrics.failed_requests == 1
+        assert metrics.average_latency_ms == pytest.approx(200.0)
+
+        provider = metrics.provider_metrics["privatemode"]
+        assert provider["token_usage"]["total_tokens"] == 15
+        assert provider["model_distribution"] == {"model-a": 2}
+        assert provider["error_distribution"] == {"TIMEOUT": 1}
+        assert collector.get_error_metrics(hours=1) == {"TIMEOUT": 1}
+        assert collector.get_health_summary()["health_status"] == "unhealthy"
+
+        performance = collector.get_performance_metrics()["privatemode"]
+        assert performance["request_count"] == 2
+        assert performance["min_latency_ms"] == 100.0
+
+    def test_memory_is_bounded(self):
+        collector = MetricsCollector()
+
+        assert collector._requests.max_nbytes < 8 * 1024 * 1024
+        assert collector._errors.max_nbytes < 1024 * 1024
@@ -0,0 +1,177 @@
+"""
+Test the pure-ASGI observability middleware and its sink queues.
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.core.security import create_access_token
+from app.middleware import observability
+from app.middleware.analytics import set_analytics_data
+from app.middleware.observability import EventSink, ObservabilityMiddleware
+
+
+def make_scope(path="/api/v1/chat/completions", method="POST", headers=None):
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"stream=true",
+        "headers": [(k.encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("10.0.0.1", 1234),
+    }
+
+
+async def call(middleware, scope, body=b""):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    return sent
+
+
+async def streaming_app(scope, receive, send):
+    await receive()
+    set_analytics_data(model="gpt-test", total_tokens=7)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream")],
+        }
+    )
+    for chunk in (b"data: a\n\n", b"data: b\n\n"):
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+@pytest.fixture
+def records():
+    """Capture records handed to the sinks instead of queueing them"""
+    captured = {"analytics": [], "audit": [], "debug": []}
+    with patch.object(
+        observability.analytics_sink, "submit", captured["analytics"].append
+    ), patch.object(observability.audit_sink, "submit", captured["audit"].append), patch.object(
+        observability.debug_sink, "submit", captured["debug"].append
+    ):
+        yield captured
+
+
+class TestObservabilityMiddleware:
+    """Test pass-through, timing and identity decoding."""
+
+    @pytest.mark.asyncio
+    async def test_streamed_body_passes_through_unchanged(self, records):
+        middleware = ObservabilityMiddleware(streaming_app)
+
+        sent = await call(middleware, make_scope())
+
+        assert [m.get("body") for m in sent[1:]] == [b"data: a\n\n", b"data: b\n\n", b""]
+        record = records["analytics"][0]
+        assert record.status_code == 200
+        assert record.response_size == 18
+        assert record.duration_ms >= record.ttfb_ms > 0
+        assert record.analytics_data == {"model": "gpt-test", "total_tokens": 7}
+        assert record.request_body is None
+        assert records["audit"] == [] and records["debug"] == []
+
+    @pytest.mark.asyncio
+    async def test_identity_decoded_once_and_shared(self, records):
+        token = create_access_token({"sub": "42", "email": "a@example.com"})
+        seen_state = {}
+
+        async def app(scope, receive, send):
+            seen_state.update(scope["state"])
+            await streaming_app(scope, receive, send)
+
+        middleware = ObservabilityMiddleware(app, audit=True)
+        with patch.object(
+            observability.jwt, "decode", wraps=observability.jwt.decode
+        ) as decode:
+            await call(middleware, make_scope(headers={"authorization": f"Bearer {token}"}))
+
+        assert decode.call_count == 1
+        assert seen_state["identity"]["user_id"] == 42
+        assert records["analytics"][0].user_id == 42
+        assert records["audit"][0] is records["analytics"][0]
+
+    @pytest.mark.asyncio
+    async def test_invalid_token_is_still_tracked(self, records):
+        middleware = ObservabilityMiddleware(streaming_app)
+
+        await call(middleware, make_scope(headers={"authorization": "Bearer en_abc"}))
+
+        assert records["analytics"][0].identity is None
+
+    @pytest.mark.asyncio
+    async def test_skipped_paths_are_not_tracked(self, records):
+        middleware = ObservabilityMiddleware(streaming_app, audit=True, debug=True)
+
+        await call(middleware, make_scope(path="/health", method="GET"))
+
+        assert records == {"analytics": [], "audit": [], "debug": []}
+
+    @pytest.mark.asyncio
+    async def test_login_body_sampled_for_audit(self, records):
+        middleware = ObservabilityMiddleware(streaming_app, audit=True)
+        body = json.dumps({"email": "a@example.com", "password": "x"}).encode()
+
+        await call(middleware, make_scope(path="/api-internal/v1/auth/login"), body)
+
+        assert records["audit"][0].request_body == body
+
+    @pytest.mark.asyncio
+    async def test_exception_before_response_returns_500(self, records):
+        async def failing_app(scope, receive, send):
+            raise RuntimeError("boom")
+
+        middleware = ObservabilityMiddleware(failing_app)
+
+        sent = await call(middleware, make_scope())
+
+        assert sent[0]["status"] == 500
+        assert records["analytics"][0].status_code == 500
+        assert records["analytics"][0].error_message == "boom"
+
+
+class TestEventSink:
+    """Test the bounded, non-blocking sink queue."""
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_records(self):
+        handled = []
+
+        async def handler(record):
+            handled.append(record)
+
+        sink = EventSink("test", handler, maxsize=2)
+
+        assert sink.submit(1) and sink.submit(2)
+        assert not sink.submit(3)
+        await sink.stop()
+
+        assert handled == [1, 2]
+        assert sink.get_stats()["dropped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_handler_errors_do_not_stop_the_sink(self):
+        handled = []
+
+        async def handler(record):
+            if record == "bad":
+                raise ValueError(record)
+            handled.append(record)
+
+        sink = EventSink("test", handler)
+        sink.submit("bad")
+        sink.submit("good")
+        await sink.stop()
+
+        assert handled == ["good"]
+        assert sink.get_stats()["errors"] == 1
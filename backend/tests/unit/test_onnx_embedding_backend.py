@@ -0,0 +1,79 @@
+"""
+Test the ONNX Runtime embedding backend against a tiny hand-built graph.
+"""
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+tokenizers = pytest.importorskip("tokenizers")
+
+from onnx import TensorProto, helper, numpy_helper  # noqa: E402
+
+from app.services.onnx_embedding_backend import OnnxEmbeddingModel  # noqa: E402
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "reset": 2, "device": 3, "firmware": 4}
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """Embedding-lookup 'encoder' whose hidden states are the token vectors."""
+    tokenizer = tokenizers.Tokenizer(
+        tokenizers.models.WordLevel(VOCAB, unk_token="[UNK]")
+    )
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+
+    table = np.random.RandomState(0).randn(len(VOCAB), 8).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "lookup",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["b", "s"]),
+            helper.make_tensor_value_info(
+                "attention_mask", TensorProto.INT64, ["b", "s"]
+            ),
+        ],
+        [
+            helper.make_tensor_value_info(
+                "last_hidden_state", TensorProto.FLOAT, ["b", "s", 8]
+            )
+        ],
+        [numpy_helper.from_array(table, "table")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 14)])
+    model.ir_version = 8
+    onnx.save(model, str(tmp_path / "model.onnx"))
+    return tmp_path, table
+
+
+class TestOnnxEmbeddingModel:
+    """Test pooling, ordering and normalization."""
+
+    def test_cls_pooling_uses_first_token(self, model_dir):
+        path, table = model_dir
+        model = OnnxEmbeddingModel(str(path), pooling="cls")
+        embeddings = model.encode(["device reset"], normalize_embeddings=False)
+        assert np.allclose(embeddings[0], table[VOCAB["device"]])
+
+    def test_mean_pooling_ignores_padding(self, model_dir):
+        path, table = model_dir
+        model = OnnxEmbeddingModel(str(path), pooling="mean")
+        embeddings = model.encode(
+            ["reset device firmware", "reset"], normalize_embeddings=False
+        )
+        assert np.allclose(embeddings[1], table[VOCAB["reset"]], atol=1e-6)
+
+    def test_output_order_matches_input(self, model_dir):
+        path, _ = model_dir
+        model = OnnxEmbeddingModel(str(path), batch_size=1)
+        texts = ["reset device firmware", "device", "firmware reset"]
+        together = model.encode(texts)
+        separately = np.vstack([model.encode([text]) for text in texts])
+        assert np.allclose(together, separately)
+        assert np.allclose(np.linalg.norm(together, axis=1), 1.0)
+        assert model.get_sentence_embedding_dimension() == 8
+
+    def test_missing_export_is_reported(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            OnnxEmbeddingModel(str(tmp_path))
@@ -0,0 +1,103 @@
+"""
+Test compiled permission matching and memoized role expansion.
+"""
+import pytest
+
+from app.services.permission_manager import (
+    CompiledPermissions,
+    ModulePermissionRegistry,
+    Permission,
+    PermissionTree,
+)
+
+
+GRANTED = [
+    "platform:*",
+    "platform:*:read",
+    "modules:*:read",
+    "modules:chatbot:*:execute",
+    "llm:completions:execute",
+    "*",
+]
+
+REQUIRED = [
+    "platform",
+    "platform:users",
+    "platform:users:read",
+    "platform:users:read:extra",
+    "modules:chatbot:read",
+    "modules:chatbot:execute",
+    "modules:chatbot:bots:execute",
+    "modules:rag:bots:execute",
+    "modules:*:read",
+    "llm:completions:execute",
+    "llm:embeddings:execute",
+    "anything",
+    "",
+]
+
+
+@pytest.fixture
+def registry():
+    registry = ModulePermissionRegistry()
+    registry.register_platform_permissions()
+    return registry
+
+
+class TestCompiledPermissions:
+    """Test that the trie agrees with the wildcard matcher."""
+
+    @pytest.mark.parametrize("pattern", GRANTED)
+    @pytest.mark.parametrize("required", REQUIRED)
+    def test_matches_like_wildcard_matcher(self, pattern, required):
+        tree = PermissionTree()
+
+        assert CompiledPermissions([pattern]).matches(
+            required
+        ) == tree._matches_wildcard(pattern, required)
+
+    def test_compiled_matchers_are_memoized_and_bounded(self):
+        tree = PermissionTree(cache_size=1)
+
+        first = tree.compile(["platform:*"])
+        assert tree.compile(["platform:*"]) is first
+
+        tree.compile(["llm:*"])
+        assert tree.compile(["platform:*"]) is not first
+
+    def test_matching_permissions_follow_registrations(self, registry):
+        granted = ["modules:*:*:read", "llm:completions:execute"]
+        assert registry.tree.get_matching_permissions(granted) == {
+            "llm:completions:execute"
+        }
+
+        registry.register_module("rag", [Permission("documents", "read")])
+
+        assert registry.tree.get_matching_permissions(granted) == {
+            "llm:completions:execute",
+            "modules:rag:documents:read",
+        }
+
+
+class TestUserPermissions:
+    """Test memoized expansion of roles."""
+
+    def test_expansion_is_memoized(self, registry):
+        first = registry.get_user_permissions(["developer"], ["custom:perm"])
+        first.append("mutated")
+
+        second = registry.get_user_permissions(["developer"], ["custom:perm"])
+
+        assert "mutated" not in second
+        assert "custom:perm" in second
+        assert registry.check_permission(second, "platform:api-keys:create")
+
+    def test_create_role_invalidates(self, registry):
+        assert registry.get_user_permissions(["auditor"]) == []
+
+        registry.create_role("auditor", ["platform:audit:read"])
+        permissions = registry.get_user_permissions(["auditor"])
+
+        assert permissions == ["platform:audit:read"]
+        assert registry.check_permission(permissions, "platform:audit:read")
+        assert not registry.check_permission(permissions, "platform:audit:export")
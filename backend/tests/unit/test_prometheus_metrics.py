@@ -0,0 +1,73 @@
+"""
+Test the Prometheus / OpenMetrics exposition of gateway internals.
+"""
+from app.services.prometheus_metrics import (
+    observe_http_request,
+    observe_llm_request,
+    registry,
+    render_metrics,
+)
+
+
+def sample(name, labels):
+    return registry.get_sample_value(name, labels)
+
+
+class TestPrometheusMetrics:
+    """Test histogram observations and scrape output."""
+
+    def test_http_requests_use_route_templates(self):
+        labels = {"method": "GET", "route": "/api/v1/items/{item_id}", "status": "2xx"}
+        before = sample("enclava_http_request_duration_seconds_count", labels) or 0
+
+        observe_http_request("GET", "/api/v1/items/{item_id}", 200, 12.0)
+        observe_http_request("GET", None, 404, 1.0)
+
+        assert sample("enclava_http_request_duration_seconds_count", labels) == before + 1
+        assert sample(
+            "enclava_http_request_duration_seconds_count",
+            {"method": "GET", "route": "unmatched", "status": "4xx"},
+        )
+
+    def test_streamed_llm_request_records_ttft_and_token_rate(self):
+        labels = {"provider": "test-provider", "model": "test-model"}
+        observe_llm_request(
+            "test-provider",
+            "test-model",
+            "chat_stream",
+            True,
+            latency_ms=1200.0,
+            completion_tokens=100,
+            time_to_first_token_ms=200.0,
+        )
+
+        assert sample("enclava_llm_time_to_first_token_seconds_sum", labels) == 0.2
+        # 100 tokens over the 1s after the first token
+        assert sample("enclava_llm_completion_tokens_per_second_sum", labels) == 100.0
+
+    def test_failed_llm_request_has_no_token_rate(self):
+        labels = {"provider": "failing-provider", "model": "test-model"}
+        observe_llm_request(
+            "failing-provider", "test-model", "chat", False, 50.0, completion_tokens=10
+        )
+
+        assert sample("enclava_llm_completion_tokens_per_second_count", labels) is None
+        assert sample(
+            "enclava_llm_request_duration_seconds_count",
+            {**labels, "request_type": "chat", "outcome": "error"},
+        ) == 1
+
+    def test_render_includes_collected_gauges(self):
+        body, content_type = render_metrics()
+        text = body.decode()
+
+        assert content_type.startswith("text/plain")
+        assert "enclava_audit_queue_depth" in text
+        assert "enclava_db_pool_connections" in text
+        assert "enclava_cache_hit_ratio" in text
+
+    def test_openmetrics_negotiation(self):
+        body, content_type = render_metrics("application/openmetrics-text; version=1.0.0")
+
+        assert content_type.startswith("application/openmetrics-text")
+        assert body.decode().rstrip().endswith("# EOF")
@@ -0,0 +1,144 @@
+"""
+Test the streaming RAG ingestion pipeline.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.modules.rag.ingestion import IngestionPipeline
+from app.modules.rag.main import RAGModule
+
+
+class Recorder:
+    """Pipeline stages that record what passed through them."""
+
+    def __init__(self, upsert_delay=0.0, fail_upsert=False):
+        self.upsert_delay = upsert_delay
+        self.fail_upsert = fail_upsert
+        self.upserted = []
+        self.produced = 0
+
+    def chunks(self, count):
+        for i in range(count):
+            self.produced += 1
+            yield f"chunk-{i}"
+
+    async def embed(self, chunks):
+        return [[float(len(chunk))] for chunk in chunks]
+
+    async def build(self, start_index, chunks, embeddings):
+        return [(start_index + i, chunk) for i, chunk in enumerate(chunks)]
+
+    async def upsert(self, points):
+        if self.fail_upsert:
+            raise RuntimeError("qdrant unavailable")
+        await asyncio.sleep(self.upsert_delay)
+        self.upserted.extend(points)
+
+
+class TestIngestionPipeline:
+    """Test batching, indices, backpressure and failure handling."""
+
+    @pytest.mark.asyncio
+    async def test_all_chunks_are_upserted_with_global_indices(self):
+        recorder = Recorder()
+        pipeline = IngestionPipeline(
+            recorder.embed, recorder.build, recorder.upsert, batch_size=4
+        )
+
+        stats = await pipeline.run(recorder.chunks(10))
+
+        assert sorted(recorder.upserted) == [(i, f"chunk-{i}") for i in range(10)]
+        assert stats.chunks == 10
+        assert stats.batches == 3
+
+    @pytest.mark.asyncio
+    async def test_slow_upserts_throttle_the_producer(self):
+        recorder = Recorder(upsert_delay=0.01)
+        pipeline = IngestionPipeline(
+            recorder.embed,
+            recorder.build,
+            recorder.upsert,
+            batch_size=2,
+            max_pending_batches=1,
+            upsert_concurrency=1,
+        )
+
+        run = asyncio.create_task(pipeline.run(recorder.chunks(100)))
+        await asyncio.sleep(0.015)
+        # Only a handful of batches may be buffered ahead of the upserts
+        assert recorder.produced - len(recorder.upserted) <= 5 * 2
+        stats = await run
+
+        assert len(recorder.upserted) == 100
+        assert stats.max_queued_batches <= 1
+
+    @pytest.mark.asyncio
+    async def test_stage_failure_is_raised(self):
+        recorder = Recorder(fail_upsert=True)
+        pipeline = IngestionPipeline(
+            recorder.embed, recorder.build, recorder.upsert, batch_size=2
+        )
+
+        with pytest.raises(RuntimeError, match="qdrant unavailable"):
+            await asyncio.wait_for(pipeline.run(recorder.chunks(50)), timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_empty_input(self):
+        recorder = Recorder()
+        pipeline = IngestionPipeline(recorder.embed, recorder.build, recorder.upsert)
+
+        stats = await pipeline.run([])
+
+        assert stats.chunks == 0
+        assert recorder.upserted == []
+
+
+class CharTokenizer:
+    """One token per character, counting how often tokens are decoded."""
+
+    def __init__(self):
+        self.decoded = 0
+
+    def encode(self, text):
+        return [ord(char) for char in text]
+
+    def decode(self, tokens):
+        self.decoded += len(tokens)
+        return "".join(chr(token) for token in tokens)
+
+
+class TestTextChunking:
+    """Test that segment-wise tokenization yields the same chunks."""
+
+    def make_module(self, chunk_size=12, chunk_overlap=4):
+        module = SimpleNamespace(
+            tokenizer=CharTokenizer(),
+            config={"chunk_size": chunk_size, "chunk_overlap": chunk_overlap},
+        )
+        module._iter_chunks = lambda tokens, size=None: RAGModule._iter_chunks(
+            module, tokens, size
+        )
+        return module
+
+    @pytest.mark.parametrize("length", [0, 5, 12, 13, 100, 257])
+    @pytest.mark.parametrize("segment_chars", [7, 30, 10_000])
+    def test_matches_whole_text_chunking(self, length, segment_chars):
+        module = self.make_module()
+        text = ("lorem ipsum\n  dolor " * 20)[:length]
+
+        expected = list(module._iter_chunks(module.tokenizer.encode(text)))
+        chunks = list(
+            RAGModule._iter_text_chunks(module, text, segment_chars=segment_chars)
+        )
+
+        assert chunks == expected
+
+    def test_chunks_are_decoded_once(self):
+        module = self.make_module()
+        text = "word " * 200
+
+        chunks = list(RAGModule._iter_text_chunks(module, text, segment_chars=64))
+
+        assert module.tokenizer.decoded == sum(len(chunk) for chunk in chunks)
@@ -0,0 +1,131 @@
+"""
+Test the bounded RAG search result cache.
+"""
+import pytest
+
+from app.modules.rag import search_cache as search_cache_module
+from app.modules.rag.search_cache import SearchResultCache
+
+
+@pytest.fixture
+def cache():
+    return SearchResultCache(max_entries=2, ttl=60, use_redis=False)
+
+
+class TestSearchResultCache:
+    """Test LRU, TTL and generation invalidation."""
+
+    def test_key_includes_score_threshold_and_filters(self):
+        base = SearchResultCache.make_key("docs", "query", 5, {"a": 1}, 0.3)
+        assert base == SearchResultCache.make_key("docs", "query", 5, {"a": 1}, 0.3)
+        assert base != SearchResultCache.make_key("docs", "query", 5, {"a": 1}, 0.5)
+        assert base != SearchResultCache.make_key("docs", "query", 5, {"a": 2}, 0.3)
+        assert base != SearchResultCache.make_key("other", "query", 5, {"a": 1}, 0.3)
+
+    @pytest.mark.asyncio
+    async def test_hit_and_miss(self, cache):
+        assert await cache.get("docs", "k1") is None
+        await cache.set("docs", "k1", ["r1"])
+        assert await cache.get("docs", "k1") == ["r1"]
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self, cache):
+        await cache.set("docs", "k1", ["r1"])
+        await cache.set("docs", "k2", ["r2"])
+        await cache.get("docs", "k1")
+        await cache.set("docs", "k3", ["r3"])
+        assert await cache.get("docs", "k2") is None
+        assert await cache.get("docs", "k1") == ["r1"]
+        assert cache.get_stats()["evictions"] == 1
+        assert len(cache) == 2
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self, cache, monkeypatch):
+        await cache.set("docs", "k1", ["r1"])
+        now = search_cache_module.time.monotonic()
+        monkeypatch.setattr(search_cache_module.time, "monotonic", lambda: now + 61)
+        assert await cache.get("docs", "k1") is None
+        assert cache.get_stats()["expirations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidation_is_per_collection(self, cache):
+        await cache.set("docs", "k1", ["r1"])
+        await cache.set("other", "k2", ["r2"])
+        await cache.invalidate_collection("docs")
+        assert await cache.get("docs", "k1") is None
+        assert await cache.get("other", "k2") == ["r2"]
+
+    @pytest.mark.asyncio
+    async def test_results_from_before_invalidation_are_not_reused(self, cache):
+        await cache.set("docs", "k1", ["old"])
+        await cache.invalidate_collection("docs")
+        await cache.set("docs", "k1", ["new"])
+        assert await cache.get("docs", "k1") == ["new"]
+
+    @pytest.mark.asyncio
+    async def test_invalidation_during_search_is_not_overwritten(self, cache):
+        results, generation = await cache.lookup("docs", "k1")
+        assert results is None
+        # Documents are indexed while the search for k1 is running
+        await cache.invalidate_collection("docs")
+        await cache.set("docs", "k1", ["stale"], generation)
+        assert await cache.get("docs", "k1") is None
+
+
+class FakeCoreCache:
+    """In-memory stand-in for the Redis-backed core cache."""
+
+    enabled = True
+
+    def __init__(self):
+        self.data = {}
+
+    async def get_many(self, keys, prefix="core"):
+        return [self.data.get(f"{prefix}:{key}") for key in keys]
+
+    async def set(self, key, value, ttl=None, prefix="core"):
+        self.data[f"{prefix}:{key}"] = value
+        return True
+
+    async def increment(self, key, amount=1, ttl=None, prefix="core"):
+        cache_key = f"{prefix}:{key}"
+        self.data[cache_key] = int(self.data.get(cache_key) or 0) + amount
+        return self.data[cache_key]
+
+
+class TestSharedSearchResultCache:
+    """Test sharing results and invalidations between workers."""
+
+    def _worker(self):
+        return SearchResultCache(
+            ttl=60,
+            serialize=lambda results: list(results),
+            deserialize=lambda data: list(data),
+        )
+
+    @pytest.mark.asyncio
+    async def test_results_and_invalidations_are_shared(self, monkeypatch):
+        monkeypatch.setattr(search_cache_module, "core_cache", FakeCoreCache())
+        worker_a, worker_b = self._worker(), self._worker()
+
+        await worker_a.set("docs", "k1", ["r1"])
+        assert await worker_b.get("docs", "k1") == ["r1"]
+        assert worker_b.get_stats()["redis_hits"] == 1
+
+        await worker_b.invalidate_collection("docs")
+        assert await worker_a.get("docs", "k1") is None
+
+    @pytest.mark.asyncio
+    async def test_invalidation_by_another_worker_during_search(self, monkeypatch):
+        monkeypatch.setattr(search_cache_module, "core_cache", FakeCoreCache())
+        worker_a, worker_b = self._worker(), self._worker()
+
+        _, generation = await worker_a.lookup("docs", "k1")
+        await worker_b.invalidate_collection("docs")
+        await worker_a.set("docs", "k1", ["stale"], generation)
+
+        assert await worker_a.get("docs", "k1") is None
+        assert await worker_b.get("docs", "k1") is None
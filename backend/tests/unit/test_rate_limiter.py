@@ -0,0 +1,133 @@
+"""
+Test per-API-key rate limiting.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException, Response
+
+from app.models.api_key import APIKey
+from app.services import api_key_auth
+from app.services.api_key_auth import require_api_key
+from app.services.rate_limiter import (
+    MemoryRateLimitStore,
+    RateLimit,
+    RateLimitDecision,
+    RateLimiter,
+)
+
+
+class TestMemoryRateLimitStore:
+    """Test the in-process token buckets."""
+
+    def test_admits_burst_up_to_limit(self):
+        store = MemoryRateLimitStore()
+        limits = [RateLimit(3, 60)]
+
+        decisions = [store.hit("key", limits, now=0.0) for _ in range(4)]
+
+        assert [decision.allowed for decision in decisions] == [True, True, True, False]
+        assert [decision.remaining for decision in decisions[:3]] == [2, 1, 0]
+        assert decisions[3].retry_after == pytest.approx(20.0)
+
+    def test_refills_at_sustained_rate(self):
+        store = MemoryRateLimitStore()
+        limits = [RateLimit(2, 60)]
+        store.hit("key", limits, now=0.0)
+        store.hit("key", limits, now=0.0)
+
+        assert not store.hit("key", limits, now=29.0).allowed
+        assert store.hit("key", limits, now=30.0).allowed
+
+    def test_rejection_does_not_consume_other_windows(self):
+        store = MemoryRateLimitStore()
+        limits = [RateLimit(1, 60), RateLimit(10, 3600)]
+        store.hit("key", limits, now=0.0)
+
+        rejected = store.hit("key", limits, now=1.0)
+        admitted = store.hit("key", limits, now=60.0)
+
+        assert not rejected.allowed and rejected.limit == 1
+        assert admitted.allowed
+        # Tightest window is reported
+        assert admitted.limit == 1 and admitted.remaining == 0
+
+    def test_keys_are_independent(self):
+        store = MemoryRateLimitStore()
+        limits = [RateLimit(1, 60)]
+
+        assert store.hit("a", limits, now=0.0).allowed
+        assert store.hit("b", limits, now=0.0).allowed
+
+
+class TestRateLimiter:
+    """Test window selection and the local fallback."""
+
+    def test_limits_for_skips_unset_windows(self):
+        api_key = APIKey(
+            id=1,
+            rate_limit_per_minute=10,
+            rate_limit_per_hour=None,
+            rate_limit_per_day=0,
+        )
+
+        assert RateLimiter.limits_for(api_key) == [RateLimit(10, 60)]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_local_limits_on_redis_error(self):
+        limiter = RateLimiter(backend="redis")
+        broken = MagicMock()
+        broken.hit = AsyncMock(side_effect=ConnectionError("redis down"))
+
+        with patch.object(RateLimiter, "store", broken):
+            first = await limiter.hit("key", [RateLimit(1, 60)])
+            second = await limiter.hit("key", [RateLimit(1, 60)])
+
+        assert first.allowed and not second.allowed
+        assert limiter.stats["redis_errors"] == 2
+
+    @pytest.mark.asyncio
+    async def test_disabled_limiter_admits_everything(self):
+        limiter = RateLimiter(backend="memory", enabled=False)
+
+        assert await limiter.hit("key", [RateLimit(1, 60)]) is None
+
+    def test_rejection_headers(self):
+        decision = RateLimitDecision(
+            allowed=False, limit=60, remaining=0, reset_after=30.2, retry_after=0.4
+        )
+
+        assert decision.headers() == {
+            "X-RateLimit-Limit": "60",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": "31",
+            "Retry-After": "1",
+        }
+
+
+class TestRequireApiKey:
+    """Test enforcement in the API key dependency."""
+
+    @pytest.fixture
+    def context(self):
+        api_key = APIKey(
+            id=7,
+            rate_limit_per_minute=1,
+            rate_limit_per_hour=100,
+            rate_limit_per_day=None,
+        )
+        return {"api_key": api_key, "api_key_id": 7}
+
+    @pytest.mark.asyncio
+    async def test_rejects_with_429_and_headers(self, context):
+        with patch.object(api_key_auth, "rate_limiter", RateLimiter(backend="memory")):
+            response = Response()
+            assert await require_api_key(response, context) is context
+            assert response.headers["X-RateLimit-Remaining"] == "0"
+
+            with pytest.raises(HTTPException) as exc_info:
+                await require_api_key(Response(), context)
+
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.headers["Retry-After"] == "60"
+        assert exc_info.value.headers["X-RateLimit-Limit"] == "1"
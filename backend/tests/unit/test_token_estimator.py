@@ -0,0 +1,118 @@
+"""
+Test the tokenizer-based budget estimator.
+"""
+from unittest.mock import patch
+
+import pytest
+import tiktoken
+
+from app.services.cost_calculator import CostCalculator
+from app.services.token_estimator import (
+    DEFAULT_COMPLETION_TOKENS,
+    TOKENS_PER_MESSAGE,
+    TOKENS_PER_REPLY,
+    TokenEstimator,
+)
+
+# One token per byte, so expected counts are easy to compute offline
+BYTE_ENCODING = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+
+@pytest.fixture
+def estimator():
+    with patch("tiktoken.get_encoding", return_value=BYTE_ENCODING) as get_encoding:
+        estimator = TokenEstimator()
+        estimator.get_encoding = get_encoding
+        yield estimator
+
+
+class TestTokenEstimator:
+    """Test counting, framing overhead, memoization and cost conversion."""
+
+    def test_chat_estimate_includes_framing_and_max_tokens(self, estimator):
+        estimate = estimator.estimate_chat(
+            "gpt-4", [("system", "Be brief"), ("user", "hello")], max_tokens=50
+        )
+
+        expected_prompt = (
+            TOKENS_PER_REPLY
+            + 2 * TOKENS_PER_MESSAGE
+            + len("system")
+            + len("Be brief")
+            + len("user")
+            + len("hello")
+        )
+        assert estimate.prompt_tokens == expected_prompt
+        assert estimate.completion_tokens == 50
+        assert estimate.total_tokens == expected_prompt + 50
+        assert estimate.cost_cents == CostCalculator.calculate_cost_cents(
+            "gpt-4", expected_prompt, 50
+        )
+
+    def test_default_completion_length(self, estimator):
+        estimate = estimator.estimate_chat("gpt-4", [("user", "hi")])
+
+        assert estimate.completion_tokens == DEFAULT_COMPLETION_TOKENS
+
+    def test_tool_schemas_add_prompt_tokens(self, estimator):
+        messages = [("user", "weather in Paris?")]
+        tools = [
+            {
+                "type": "function",
+                "function": {
+                    "name": "get_weather",
+                    "parameters": {"type": "object", "properties": {}},
+                },
+            }
+        ]
+
+        without_tools = estimator.estimate_chat("gpt-4", messages)
+        with_tools = estimator.estimate_chat("gpt-4", messages, tools=tools)
+
+        assert with_tools.prompt_tokens - without_tools.prompt_tokens == (
+            estimator.count_tool_tokens("gpt-4", tools)
+        )
+        assert estimator.count_tool_tokens("gpt-4", tools) > 0
+
+    def test_message_counts_are_memoized(self, estimator):
+        messages = [("user", "the same long prompt " * 20)]
+
+        first = estimator.count_message_tokens("gpt-4", messages)
+        misses = estimator.get_stats()["misses"]
+        second = estimator.count_message_tokens("gpt-4", messages)
+
+        assert first == second
+        assert estimator.get_stats()["misses"] == misses
+        assert estimator.get_stats()["hits"] >= 2
+
+    def test_unknown_models_use_default_encoding(self, estimator):
+        estimator.count_tokens("meta-llama/Llama-3.1-70B-Instruct", "hello")
+
+        estimator.get_encoding.assert_called_with("cl100k_base")
+
+    def test_embedding_estimate(self, estimator):
+        estimate = estimator.estimate_embedding("text-embedding-ada-002", "abc" * 1000)
+
+        assert estimate.prompt_tokens == 3000
+        assert estimate.completion_tokens == 0
+        assert estimate.cost_cents == CostCalculator.calculate_cost_cents(
+            "text-embedding-ada-002", 3000, 0
+        )
+
+    def test_falls_back_to_character_heuristic_without_encoding(self):
+        with patch("tiktoken.get_encoding", side_effect=OSError("offline")):
+            estimator = TokenEstimator()
+
+            assert estimator.count_tokens("gpt-4", "x" * 10) == 3
+            assert estimator.get_stats()["encodings"] == {"cl100k_base": False}
+
+    def test_model_name_memo_is_bounded(self):
+        estimator = TokenEstimator(model_cache_size=4)
+        for i in range(100):
+            estimator._encoding_name(f"unknown-model-{i}")
+        assert estimator._encoding_name.cache_info().currsize == 4
@@ -0,0 +1,162 @@
+"""
+Test per-request tracing: spans, Server-Timing, slow sampling and OTLP export.
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.middleware.observability import ObservabilityMiddleware
+from app.services import tracing
+from app.services.tracing import (
+    SlowTraceBuffer,
+    Trace,
+    export_trace,
+    record_span,
+    span,
+    trace_context,
+    traced,
+)
+
+
+@pytest.fixture
+def trace():
+    trace = Trace("POST /api/v1/chat")
+    token = trace_context.set(trace)
+    yield trace
+    trace_context.reset(token)
+
+
+class TestSpans:
+    """Test span recording against the current trace."""
+
+    def test_no_trace_is_a_noop(self):
+        with span("auth.api_key") as current:
+            assert current is None
+
+    def test_nested_spans_and_errors(self, trace):
+        with span("rag.retrieve") as outer:
+            with span("rag.embed"):
+                pass
+            with pytest.raises(ValueError):
+                with span("rag.search", collection="docs"):
+                    raise ValueError("qdrant down")
+
+        names = {s.name: s for s in trace.spans}
+        assert names["rag.embed"].parent_id == outer.span_id
+        assert names["rag.search"].error == "ValueError: qdrant down"
+        assert names["rag.search"].attributes == {"collection": "docs"}
+        assert names["rag.retrieve"].parent_id is None
+
+    @pytest.mark.asyncio
+    async def test_traced_sync_and_async(self, trace):
+        @traced("budget.reserve")
+        async def reserve():
+            await asyncio.sleep(0)
+            return True
+
+        @traced("chatbot.build_messages")
+        def build():
+            return []
+
+        assert await reserve() is True
+        assert build() == []
+        assert [s.name for s in trace.spans] == [
+            "budget.reserve",
+            "chatbot.build_messages",
+        ]
+
+    def test_server_timing_sums_repeated_stages(self, trace):
+        record_span("db.commit", time.perf_counter())
+        record_span("db.commit", time.perf_counter())
+        trace.spans[0].duration_ms = 2.0
+        trace.spans[1].duration_ms = 3.0
+
+        assert trace.server_timing(10.0) == "db.commit;dur=5.0, total;dur=10.0"
+
+    def test_spans_are_bounded(self):
+        trace = Trace("GET /", max_spans=2)
+        token = trace_context.set(trace)
+        try:
+            for _ in range(5):
+                with span("db.commit"):
+                    pass
+        finally:
+            trace_context.reset(token)
+
+        assert len(trace.spans) == 2
+        assert trace.dropped_spans == 3
+
+
+class TestSlowTraceBuffer:
+    """Test slow request sampling."""
+
+    def test_only_slow_traces_are_kept(self):
+        buffer = SlowTraceBuffer(threshold_ms=100, size=2)
+        for duration in (50, 150, 200, 300):
+            trace = Trace(f"GET /{duration}")
+            trace.duration_ms = duration
+            buffer.offer(trace)
+
+        assert [t["name"] for t in buffer.list()] == ["GET /300", "GET /200"]
+        assert buffer.get_stats()["finished"] == 4
+        assert buffer.get_stats()["sampled"] == 3
+
+
+class TestOtlpExport:
+    """Test the OTLP/JSON encoding and file export."""
+
+    @pytest.mark.asyncio
+    async def test_export_writes_otlp_lines(self, trace, tmp_path, monkeypatch):
+        with span("llm.provider", provider="privatemode", tokens=12):
+            pass
+        trace.finish(**{"http.status_code": 200})
+
+        path = tmp_path / "traces.jsonl"
+        monkeypatch.setattr(tracing.settings, "TRACING_EXPORT_PATH", str(path))
+        await export_trace(trace)
+
+        exported = json.loads(path.read_text().splitlines()[0])
+        spans = exported["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        root, child = spans
+        assert root["traceId"] == child["traceId"] == trace.trace_id
+        assert child["parentSpanId"] == root["spanId"]
+        assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+        assert {"key": "tokens", "value": {"intValue": "12"}} in child["attributes"]
+
+
+class TestMiddleware:
+    """Test trace handling in the observability middleware."""
+
+    @pytest.mark.asyncio
+    async def test_server_timing_header(self, monkeypatch):
+        sampled = []
+        monkeypatch.setattr(
+            "app.middleware.observability.slow_traces.offer", sampled.append
+        )
+
+        async def app(scope, receive, send):
+            with span("auth.api_key"):
+                pass
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        middleware = ObservabilityMiddleware(
+            app, analytics=False, tracing=True, server_timing=True
+        )
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": "/api/v1/chat", "method": "POST", "headers": []}
+        await middleware(scope, receive, send)
+
+        headers = dict(sent[0]["headers"])
+        assert headers[b"server-timing"].startswith(b"auth.api_key;dur=")
+        assert sampled[0].attributes["http.status_code"] == 200
+        assert trace_context.get() is None
@@ -0,0 +1,97 @@
+"""
+Test the usage rollup accumulator and bucket helpers.
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.analytics import RequestEvent
+from app.services.usage_rollups import (
+    UsageRollupWriter,
+    bucket_start,
+    granularity_for,
+)
+
+
+def make_event(**overrides):
+    data = {
+        "timestamp": datetime(2026, 1, 1, 12, 34, 56),
+        "method": "POST",
+        "path": "/api/v1/llm/chat/completions",
+        "status_code": 200,
+        "response_time": 120.0,
+        "user_id": 1,
+        "api_key_id": 7,
+        "model": "gpt-4",
+        "request_tokens": 10,
+        "response_tokens": 20,
+        "total_tokens": 30,
+        "cost_cents": 5,
+    }
+    data.update(overrides)
+    return RequestEvent(**data)
+
+
+class TestBuckets:
+    """Test bucket alignment and granularity selection."""
+
+    def test_bucket_start(self):
+        ts = datetime(2026, 1, 1, 12, 34, 56, 789)
+        assert bucket_start(ts, "minute") == datetime(2026, 1, 1, 12, 34)
+        assert bucket_start(ts, "hour") == datetime(2026, 1, 1, 12)
+        assert bucket_start(ts, "day") == datetime(2026, 1, 1)
+
+    def test_granularity_for(self):
+        assert granularity_for(timedelta(hours=1)) == "minute"
+        assert granularity_for(timedelta(hours=24)) == "hour"
+        assert granularity_for(timedelta(days=30)) == "day"
+
+
+class TestUsageRollupWriter:
+    """Test accumulation, flushing and retry on failure."""
+
+    def test_record_folds_into_each_granularity(self):
+        writer = UsageRollupWriter()
+        writer.record(make_event())
+        writer.record(make_event(status_code=500, timestamp=datetime(2026, 1, 1, 12, 35)))
+
+        # Two minute buckets, one shared hour bucket and one shared day bucket
+        assert writer.get_stats()["pending"] == 4
+        hour_key = ("hour", datetime(2026, 1, 1, 12), 1, 7, "gpt-4",
+                    "POST /api/v1/llm/chat/completions")
+        assert writer._pending[hour_key] == [2, 1, 20, 40, 60, 10, 240.0]
+
+    def test_missing_dimensions_use_sentinels(self):
+        writer = UsageRollupWriter()
+        writer.record(make_event(user_id=None, api_key_id=None, model=None))
+
+        key = next(iter(writer._pending))
+        assert key[2:5] == (0, 0, "")
+
+    @pytest.mark.asyncio
+    async def test_flush_upserts_pending(self):
+        writer = UsageRollupWriter()
+        writer.record(make_event())
+
+        with patch.object(writer, "_apply", new=AsyncMock()) as apply:
+            assert await writer.flush() == 3
+            assert await writer.flush() == 0
+
+        assert len(apply.await_args.args[0]) == 3
+        assert writer.get_stats()["pending"] == 0
+        assert writer.get_stats()["flushed_rows"] == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_merged_back(self):
+        writer = UsageRollupWriter()
+        writer.record(make_event())
+
+        with patch.object(writer, "_apply", new=AsyncMock(side_effect=RuntimeError)):
+            assert await writer.flush() == 0
+
+        writer.record(make_event())
+        day_key = ("day", datetime(2026, 1, 1), 1, 7, "gpt-4",
+                   "POST /api/v1/llm/chat/completions")
+        assert writer._pending[day_key][0] == 2
+        assert writer.get_stats()["flush_errors"] == 1